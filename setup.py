@@ -38,6 +38,7 @@ setup(
         "scikit-learn",
         "matplotlib",
         "seppl>=0.3.1",
+        "platformdirs",
         "wai_logging",
         "tabulate",
     ],
@@ -50,6 +51,7 @@ setup(
     packages=find_namespace_packages(where='src'),
     entry_points={
         "console_scripts": [
+            "happy-bench=happy.console.bench.run:sys_main",
             "happy-generate-image-regions-objects=happy.console.image_regions_objects.generate:sys_main",
             "happy-generic-regression-build=happy.console.builders.generic_regression_build:sys_main",
             "happy-generic-unsupervised-build=happy.console.builders.generic_unsupervised_build:sys_main",
@@ -60,10 +62,12 @@ setup(
             "happy-opex2happy=happy.console.ann_to_happy.generate:sys_main",  # deprecated
             "happy-ann2happy=happy.console.ann_to_happy.generate:sys_main",
             "happy-opex-labels=happy.console.opex_labels.generate:sys_main",
+            "happy-predict-server=happy.console.predict_server.server:sys_main",
             "happy-process-data=happy.console.process_data.process:sys_main",
             "happy-plot-preproc=happy.console.plot_preproc.output:sys_main",
             "happy-raw-check=happy.console.raw_check.process:sys_main",
             "happy-scikit-regression-build=happy.console.builders.regression_build:sys_main",
+            "happy-scikit-search=happy.console.builders.scikit_search:sys_main",
             "happy-scikit-segmentation-build=happy.console.builders.segmentation_build:sys_main",
             "happy-scikit-unsupervised-build=happy.console.builders.unsupervised_build:sys_main",
             "happy-splitter=happy.console.happy_splitter.split:sys_main",
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+
+from typing import Dict, List, Optional
+
+from happy.base.core import ObjectWithLogging
+from happy.base.journal import compute_checksum
+
+
+FINGERPRINT_PREFIX = ".happy-fingerprint-"
+""" the prefix for the fingerprint files stored next to the outputs. """
+
+FINGERPRINT_EXT = ".json"
+""" the extension of the fingerprint files. """
+
+PACKAGE = "happy_tools_core"
+""" the package to store the version of in the fingerprints. """
+
+
+def happy_version() -> Optional[str]:
+    """
+    Returns the version of the installed happy-tools package.
+
+    :return: the version, None if not installed
+    :rtype: str
+    """
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version(PACKAGE)
+    except PackageNotFoundError:
+        return None
+
+
+class Fingerprints(ObjectWithLogging):
+    """
+    Manages the fingerprints of the inputs that generated outputs, for skipping inputs
+    whose outputs are still current. A fingerprint covers the input files (size,
+    modification time and optionally the SHA-256 checksum), the pipeline (eg the
+    command-line of the reader/preprocessors/writer) and the version of happy-tools.
+    Each input gets its own fingerprint file in the output directory, allowing
+    concurrent jobs to write to the same directory. Does nothing unless enabled.
+    """
+
+    def __init__(self, enabled: bool = False, pipeline: str = "", use_hash: bool = False):
+        """
+        Initializes the fingerprints.
+
+        :param enabled: whether to skip inputs with current outputs and store the fingerprints
+        :type enabled: bool
+        :param pipeline: the description of the processing (eg command-line) that the outputs depend on
+        :type pipeline: str
+        :param use_hash: whether to include the checksums of the input files rather than just their size/modification time
+        :type use_hash: bool
+        """
+        super().__init__()
+        self.enabled = enabled
+        self.pipeline = pipeline
+        self.use_hash = use_hash
+        self._version = happy_version()
+
+    def is_active(self) -> bool:
+        """
+        Returns whether the fingerprints are enabled.
+
+        :return: True if enabled
+        :rtype: bool
+        """
+        return self.enabled
+
+    def compute(self, files: List[str]) -> Dict:
+        """
+        Computes the fingerprint of the input files, the pipeline and the version.
+
+        :param files: the input files
+        :type files: list
+        :return: the details, with the digest under "fingerprint"
+        :rtype: dict
+        """
+        details = []
+        for f in sorted(set([os.path.abspath(x) for x in files])):
+            stat = os.stat(f)
+            detail = {
+                "path": f,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            }
+            if self.use_hash:
+                detail["checksum"] = compute_checksum([f])
+            details.append(detail)
+        result = {
+            "files": details,
+            "pipeline": self.pipeline,
+            "version": self._version,
+        }
+        result["fingerprint"] = hashlib.sha256(json.dumps(result, sort_keys=True).encode("utf-8")).hexdigest()
+        return result
+
+    def fingerprint_file(self, output_dir: str, key: str) -> str:
+        """
+        Returns the fingerprint file for the input.
+
+        :param output_dir: the directory with the outputs
+        :type output_dir: str
+        :param key: the input (eg the absolute path of the sample)
+        :type key: str
+        :return: the fingerprint file
+        :rtype: str
+        """
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(output_dir, FINGERPRINT_PREFIX + name + FINGERPRINT_EXT)
+
+    def is_current(self, output_dir: str, key: str, fingerprint: Dict) -> bool:
+        """
+        Checks whether the outputs of the input are current, ie the stored fingerprint
+        matches the current one and the outputs are still present.
+
+        :param output_dir: the directory with the outputs
+        :type output_dir: str
+        :param key: the input (eg the absolute path of the sample)
+        :type key: str
+        :param fingerprint: the current fingerprint, see compute
+        :type fingerprint: dict
+        :return: True if current
+        :rtype: bool
+        """
+        if not self.enabled:
+            return False
+        path = self.fingerprint_file(output_dir, key)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r") as fp:
+                stored = json.load(fp)
+        except Exception:
+            self.logger().warning("Failed to read fingerprint file: %s" % path)
+            return False
+        if stored.get("input") != key:
+            return False
+        if stored.get("fingerprint") != fingerprint["fingerprint"]:
+            self.logger().info("Inputs or pipeline of %s changed, reprocessing" % key)
+            return False
+        for output in stored.get("outputs", []):
+            if not os.path.exists(output):
+                self.logger().info("Output of %s missing, reprocessing: %s" % (key, output))
+                return False
+        return True
+
+    def update(self, output_dir: str, key: str, fingerprint: Dict, outputs: List[str]):
+        """
+        Stores the fingerprint of the input with its outputs (atomically).
+
+        :param output_dir: the directory with the outputs
+        :type output_dir: str
+        :param key: the input (eg the absolute path of the sample)
+        :type key: str
+        :param fingerprint: the fingerprint determined before processing the input, see compute
+        :type fingerprint: dict
+        :param outputs: the files that got generated
+        :type outputs: list
+        """
+        if not self.enabled:
+            return
+        content = dict(fingerprint)
+        content["input"] = key
+        content["outputs"] = sorted(set([os.path.abspath(x) for x in outputs]))
+        path = self.fingerprint_file(output_dir, key)
+        os.makedirs(output_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=FINGERPRINT_PREFIX, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(content, fp, indent=2)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        """
+        Adds the options for the fingerprints to the parser.
+
+        :param parser: the parser to add the options to
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument("--incremental", action="store_true", help="Whether to skip inputs whose outputs are current, based on fingerprints of the input files, the pipeline and the version that get stored next to the outputs", required=False)
+        parser.add_argument("--fingerprint_hash", action="store_true", help="Whether to include the checksums of the input files in the fingerprints rather than just their size and modification time", required=False)
+
+    @classmethod
+    def from_arguments(cls, ns: argparse.Namespace, pipeline: str) -> 'Fingerprints':
+        """
+        Creates the fingerprints from the parsed options.
+
+        :param ns: the parsed options
+        :type ns: argparse.Namespace
+        :param pipeline: the description of the processing that the outputs depend on
+        :type pipeline: str
+        :return: the fingerprints
+        :rtype: Fingerprints
+        """
+        return Fingerprints(enabled=ns.incremental, pipeline=pipeline, use_hash=ns.fingerprint_hash)
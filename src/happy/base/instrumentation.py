@@ -0,0 +1,466 @@
+import argparse
+import functools
+import inspect
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from typing import Dict, List, Optional
+
+
+ENV_HAPPY_INSTRUMENT = "HAPPY_INSTRUMENT"
+""" enables the instrumentation when set to 1|true|on|yes. """
+
+ENV_HAPPY_TRACE_FILE = "HAPPY_TRACE_FILE"
+""" the Chrome trace JSON file to write the recorded calls to (enables the instrumentation). """
+
+STAGE_READ = "read"
+STAGE_FIT = "fit"
+STAGE_APPLY = "apply"
+STAGE_SELECT_PIXELS = "select-pixels"
+STAGE_EXTRACT_REGIONS = "extract-regions"
+STAGE_WRITE = "write"
+STAGES = [
+    STAGE_READ,
+    STAGE_FIT,
+    STAGE_APPLY,
+    STAGE_SELECT_PIXELS,
+    STAGE_EXTRACT_REGIONS,
+    STAGE_WRITE,
+]
+
+# Notes on the measurements:
+# - the CPU time is the one of the whole process, ie it includes other threads
+# - the memory peak (via tracemalloc) is the one of the Python allocations during the call,
+#   relative to the allocated memory at the start of the call; tracemalloc slows down
+#   allocations noticeably
+# - calls of generators (eg iter_apply) get recorded per generated item
+# - the self times exclude the time spent in nested instrumented calls (eg the preprocessors
+#   of multi-pp or preprocessors fitted while applying), so that they add up across stages
+
+_enabled = False
+""" whether the instrumentation is enabled. """
+
+_started_tracemalloc = False
+""" whether tracemalloc got started by the instrumentation. """
+
+_trace_file = None
+""" the Chrome trace file to write. """
+
+_origin = time.perf_counter()
+""" the reference point for the start times of the calls. """
+
+_records = []
+""" the recorded calls. """
+
+_call_ids = itertools.count(1)
+""" for generating the IDs of the calls. """
+
+_lock = threading.Lock()
+
+_local = threading.local()
+
+
+def _env_enabled() -> bool:
+    """
+    Checks whether the instrumentation got enabled via the environment variables.
+
+    :return: True if enabled
+    :rtype: bool
+    """
+    if os.getenv(ENV_HAPPY_TRACE_FILE, "") != "":
+        return True
+    return os.getenv(ENV_HAPPY_INSTRUMENT, "").lower() in ["1", "true", "on", "yes"]
+
+
+def set_instrumentation(enabled: bool, trace_file: Optional[str] = None):
+    """
+    Enables/disables the instrumentation of the plugins (timing and memory per call).
+
+    :param enabled: whether to enable the instrumentation
+    :type enabled: bool
+    :param trace_file: the Chrome trace JSON file to write the calls to in output_instrumentation, can be None
+    :type trace_file: str
+    """
+    global _enabled, _started_tracemalloc, _trace_file
+    _enabled = enabled
+    _trace_file = trace_file
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not enabled and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_instrumentation_enabled() -> bool:
+    """
+    Returns whether the instrumentation is enabled.
+
+    :return: True if enabled
+    :rtype: bool
+    """
+    return _enabled
+
+
+def get_trace_file() -> Optional[str]:
+    """
+    Returns the Chrome trace file to write.
+
+    :return: the file, None if not set
+    :rtype: str
+    """
+    return _trace_file
+
+
+def get_records() -> List[Dict]:
+    """
+    Returns the recorded calls.
+
+    :return: the calls
+    :rtype: list
+    """
+    with _lock:
+        return list(_records)
+
+
+def clear_records():
+    """
+    Removes all recorded calls.
+    """
+    with _lock:
+        _records.clear()
+
+
+def data_size(obj) -> int:
+    """
+    Returns the number of bytes of the numpy arrays in the object (HappyData, arrays, lists, tuples, dictionaries).
+
+    :param obj: the object to get the size for
+    :return: the number of bytes
+    :rtype: int
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum([data_size(x) for x in obj])
+    if isinstance(obj, dict):
+        return sum([data_size(x) for x in obj.values()])
+    # HappyData
+    if hasattr(obj, "data") and hasattr(obj, "metadata_dict"):
+        return data_size(obj.data) + data_size(obj.metadata_dict)
+    return 0
+
+
+class _Call:
+    """
+    Measures a single call (or a chunk of a generator call).
+    """
+
+    def __init__(self, stage: str, plugin: str, call_id: int):
+        """
+        Initializes the measurement.
+
+        :param stage: the stage the call belongs to
+        :type stage: str
+        :param plugin: the name of the plugin
+        :type plugin: str
+        :param call_id: the ID of the call, shared by the chunks of generator calls
+        :type call_id: int
+        """
+        self.stage = stage
+        self.plugin = plugin
+        self.call_id = call_id
+        self.start_memory = 0
+        self.peak_memory = 0
+        self.start = 0.0
+        self.start_cpu = 0.0
+        self.children_wall = 0.0
+        self.children_cpu = 0.0
+
+    def begin(self):
+        """
+        Starts the measurement.
+        """
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = []
+            _local.stack = stack
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # keep the peak of the enclosing call before resetting it
+            if len(stack) > 0:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+            self.peak_memory = current
+        stack.append(self)
+        self.start_cpu = time.process_time()
+        self.start = time.perf_counter()
+
+    def end(self, bytes_in: int, bytes_out: int, error: bool = False):
+        """
+        Stops the measurement and records the call.
+
+        :param bytes_in: the number of bytes of the input
+        :type bytes_in: int
+        :param bytes_out: the number of bytes of the output
+        :type bytes_out: int
+        :param error: whether the call failed
+        :type error: bool
+        """
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.start_cpu
+        stack = _local.stack
+        stack.remove(self)
+        if len(stack) > 0:
+            stack[-1].children_wall += wall
+            stack[-1].children_cpu += cpu
+        peak_memory = None
+        if tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            peak_memory = self.peak_memory - self.start_memory
+            if len(stack) > 0:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, self.peak_memory)
+        record = {
+            "stage": self.stage,
+            "plugin": self.plugin,
+            "call": self.call_id,
+            "start": self.start - _origin,
+            "wall": wall,
+            "self_wall": max(0.0, wall - self.children_wall),
+            "cpu": cpu,
+            "self_cpu": max(0.0, cpu - self.children_cpu),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "peak_memory": peak_memory,
+            "thread": threading.get_ident(),
+        }
+        if error:
+            record["error"] = True
+        with _lock:
+            _records.append(record)
+
+
+def _plugin_name(obj) -> str:
+    """
+    Returns the name of the plugin.
+
+    :param obj: the plugin
+    :return: the name
+    :rtype: str
+    """
+    try:
+        return obj.name()
+    except Exception:
+        return obj.__class__.__name__
+
+
+def instrumented(stage: str):
+    """
+    Decorator for plugin methods that records wall time, CPU time, bytes in/out and the
+    memory peak of each call when the instrumentation is enabled. Generator methods get
+    recorded per generated item.
+
+    :param stage: the stage that the method belongs to, see STAGES
+    :type stage: str
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(self, *args, **kwargs):
+                if not _enabled:
+                    yield from func(self, *args, **kwargs)
+                    return
+                call_id = next(_call_ids)
+                bytes_in = data_size(args) + data_size(kwargs)
+                gen = func(self, *args, **kwargs)
+                while True:
+                    call = _Call(stage, _plugin_name(self), call_id)
+                    call.begin()
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        call.end(bytes_in, 0)
+                        return
+                    except BaseException:
+                        call.end(bytes_in, 0, error=True)
+                        raise
+                    call.end(bytes_in, data_size(item))
+                    bytes_in = 0
+                    yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not _enabled:
+                return func(self, *args, **kwargs)
+            call = _Call(stage, _plugin_name(self), next(_call_ids))
+            call.begin()
+            try:
+                result = func(self, *args, **kwargs)
+            except BaseException:
+                call.end(data_size(args) + data_size(kwargs), 0, error=True)
+                raise
+            call.end(data_size(args) + data_size(kwargs), data_size(result))
+            return result
+        return wrapper
+
+    return decorator
+
+
+def summarize(records: List[Dict] = None) -> List[Dict]:
+    """
+    Aggregates the calls per stage and plugin.
+
+    :param records: the calls to aggregate, uses the recorded ones if None
+    :type records: list
+    :return: the summary, one dictionary per stage/plugin (stage, plugin, calls, wall, self_wall, cpu, self_cpu, bytes_in, bytes_out, peak_memory)
+    :rtype: list
+    """
+    if records is None:
+        records = get_records()
+    summary = dict()
+    calls = dict()
+    for record in records:
+        key = (record["stage"], record["plugin"])
+        if key not in summary:
+            summary[key] = {
+                "stage": record["stage"],
+                "plugin": record["plugin"],
+                "calls": 0,
+                "wall": 0.0,
+                "self_wall": 0.0,
+                "cpu": 0.0,
+                "self_cpu": 0.0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "peak_memory": None,
+            }
+            calls[key] = set()
+        item = summary[key]
+        calls[key].add(record["call"])
+        item["calls"] = len(calls[key])
+        for field in ["wall", "self_wall", "cpu", "self_cpu", "bytes_in", "bytes_out"]:
+            item[field] += record[field]
+        if record["peak_memory"] is not None:
+            item["peak_memory"] = max(0 if (item["peak_memory"] is None) else item["peak_memory"], record["peak_memory"])
+    order = {x: i for i, x in enumerate(STAGES)}
+    return sorted(summary.values(), key=lambda x: (order.get(x["stage"], len(STAGES)), x["stage"], x["plugin"]))
+
+
+def format_summary(records: List[Dict] = None) -> str:
+    """
+    Generates a table with the totals per stage and plugin. The self times exclude
+    the time spent in other instrumented calls (eg the preprocessors of multi-pp),
+    the totals of the stages are based on them.
+
+    :param records: the calls to summarize, uses the recorded ones if None
+    :type records: list
+    :return: the table
+    :rtype: str
+    """
+    summary = summarize(records)
+    lines = ["%-16s %-24s %6s %9s %9s %9s %9s %9s %9s"
+             % ("stage", "plugin", "calls", "wall [s]", "self [s]", "cpu [s]", "in [MB]", "out [MB]", "peak [MB]")]
+    for item in summary:
+        lines.append("%-16s %-24s %6d %9.3f %9.3f %9.3f %9.1f %9.1f %9s"
+                     % (item["stage"], item["plugin"], item["calls"], item["wall"], item["self_wall"], item["self_cpu"],
+                        item["bytes_in"] / 1e6, item["bytes_out"] / 1e6,
+                        "-" if (item["peak_memory"] is None) else "%.1f" % (item["peak_memory"] / 1e6)))
+    lines.append("")
+    lines.append("%-16s %9s %9s" % ("stage", "self [s]", "cpu [s]"))
+    stages = []
+    for item in summary:
+        if item["stage"] not in stages:
+            stages.append(item["stage"])
+    for stage in stages:
+        items = [x for x in summary if x["stage"] == stage]
+        lines.append("%-16s %9.3f %9.3f" % (stage, sum([x["self_wall"] for x in items]), sum([x["self_cpu"] for x in items])))
+    return "\n".join(lines)
+
+
+def write_chrome_trace(path: str, records: List[Dict] = None):
+    """
+    Writes the calls as Chrome trace JSON file (chrome://tracing, Perfetto).
+
+    :param path: the file to write to
+    :type path: str
+    :param records: the calls to write, uses the recorded ones if None
+    :type records: list
+    """
+    if records is None:
+        records = get_records()
+    pid = os.getpid()
+    events = []
+    for record in records:
+        events.append({
+            "name": record["plugin"],
+            "cat": record["stage"],
+            "ph": "X",
+            "ts": record["start"] * 1e6,
+            "dur": record["wall"] * 1e6,
+            "pid": pid,
+            "tid": record["thread"],
+            "args": {
+                "cpu": record["cpu"],
+                "self_wall": record["self_wall"],
+                "self_cpu": record["self_cpu"],
+                "call": record["call"],
+                "bytes_in": record["bytes_in"],
+                "bytes_out": record["bytes_out"],
+                "peak_memory": record["peak_memory"],
+            },
+        })
+    with open(path, "w") as fp:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp)
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds the options for enabling the instrumentation to the parser.
+
+    :param parser: the parser to extend
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--instrument", action="store_true", help="Whether to record time, memory and bytes processed by the plugins and output a summary at the end (can be enabled via environment variable " + ENV_HAPPY_INSTRUMENT + " as well)", required=False)
+    parser.add_argument("--trace_file", metavar="FILE", type=str, help="The Chrome trace JSON file to write the recorded plugin calls to, enables the instrumentation (can be set via environment variable " + ENV_HAPPY_TRACE_FILE + " as well)", required=False, default=None)
+
+
+def configure_instrumentation(ns: argparse.Namespace):
+    """
+    Enables the instrumentation if requested via the parsed options or the environment variables.
+
+    :param ns: the parsed options, see add_instrumentation_arguments
+    :type ns: argparse.Namespace
+    """
+    trace_file = ns.trace_file
+    if trace_file is None:
+        trace_file = os.getenv(ENV_HAPPY_TRACE_FILE, "")
+        if trace_file == "":
+            trace_file = None
+    enabled = ns.instrument or (trace_file is not None) or _env_enabled()
+    if enabled:
+        set_instrumentation(True, trace_file=trace_file)
+
+
+def output_instrumentation():
+    """
+    Outputs the summary of the recorded calls on stderr and writes the Chrome trace file (if set).
+    Does nothing if the instrumentation is not enabled.
+    """
+    if not _enabled:
+        return
+    print(format_summary(), file=sys.stderr)
+    if _trace_file is not None:
+        write_chrome_trace(_trace_file)
+
+
+if _env_enabled():
+    set_instrumentation(True, trace_file=os.getenv(ENV_HAPPY_TRACE_FILE) or None)
@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+from typing import Dict, List, Optional
+
+from happy.base.core import ObjectWithLogging
+
+
+CHUNK_SIZE = 1024 * 1024
+""" the number of bytes to read at a time when computing checksums. """
+
+CHECKSUM_PREFIX = "sha256:"
+""" the prefix for the checksums. """
+
+
+def _lock_file(fp, exclusive: bool):
+    """
+    Locks the open file across processes (POSIX only, no-op otherwise).
+
+    :param fp: the file object to lock
+    :param exclusive: whether to acquire an exclusive lock (writing) or a shared one (reading)
+    :type exclusive: bool
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(fp.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock_file(fp):
+    """
+    Releases the lock of the open file (POSIX only, no-op otherwise).
+
+    :param fp: the file object to unlock
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def _list_files(paths: List[str]) -> List[str]:
+    """
+    Expands the paths, replacing directories with the files they contain (recursively).
+
+    :param paths: the files/directories to expand
+    :type paths: list
+    :return: the sorted list of files
+    :rtype: list
+    """
+    result = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for f in files:
+                    result.add(os.path.join(root, f))
+        else:
+            result.add(path)
+    return sorted(result)
+
+
+def compute_checksum(paths: List[str]) -> str:
+    """
+    Computes the SHA-256 checksum over the names (relative to their common directory)
+    and the content of the files. Directories get traversed recursively.
+
+    :param paths: the files/directories to compute the checksum for
+    :type paths: list
+    :return: the checksum, prefixed with the algorithm
+    :rtype: str
+    """
+    files = _list_files(paths)
+    common = os.path.dirname(os.path.commonpath(files)) if (len(files) > 0) else ""
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(os.path.relpath(f, common).encode("utf-8") if (len(common) > 0) else f.encode("utf-8"))
+        digest.update(b"\0")
+        with open(f, "rb") as fp:
+            while True:
+                chunk = fp.read(CHUNK_SIZE)
+                if len(chunk) == 0:
+                    break
+                digest.update(chunk)
+    return CHECKSUM_PREFIX + digest.hexdigest()
+
+
+class Journal(ObjectWithLogging):
+    """
+    Append-only JSONL journal of the completed inputs of a batch job, recording the
+    output files and their checksum. Restarted jobs use it to skip finished work,
+    independent of the order in which the inputs get processed. Entries get appended
+    with a single write under an exclusive file lock, allowing several threads or
+    processes to share a journal. Without a file, the journal does not record anything.
+    """
+
+    def __init__(self, path: Optional[str] = None, job: Optional[str] = None, verify: bool = False):
+        """
+        Initializes the journal.
+
+        :param path: the JSONL file to use, ignored if None
+        :type path: str
+        :param job: the name of the job (eg the name of the tool) to store with the entries
+        :type job: str
+        :param verify: whether to verify the checksums of the outputs rather than just their existence
+        :type verify: bool
+        """
+        super().__init__()
+        self.path = path
+        self.job = job
+        self.verify = verify
+        self._lock = threading.Lock()
+        self._entries = dict()
+        self._offset = 0
+
+    def is_active(self) -> bool:
+        """
+        Returns whether a journal file has been configured.
+
+        :return: True if a file is used
+        :rtype: bool
+        """
+        return self.path is not None
+
+    def refresh(self):
+        """
+        Reads any entries that got appended since the last refresh (eg by other processes).
+        Incomplete or corrupt lines (eg due to a crash) get skipped.
+        """
+        if not self.is_active() or not os.path.exists(self.path):
+            return
+        with self._lock:
+            with open(self.path, "rb") as fp:
+                _lock_file(fp, False)
+                try:
+                    fp.seek(self._offset)
+                    content = fp.read()
+                finally:
+                    _unlock_file(fp)
+            # only consume complete lines
+            end = content.rfind(b"\n")
+            if end == -1:
+                return
+            self._offset += end + 1
+            for line in content[:end].split(b"\n"):
+                line = line.strip()
+                if len(line) == 0:
+                    continue
+                try:
+                    entry = json.loads(line.decode("utf-8"))
+                    self._entries[entry["input"]] = entry
+                except Exception:
+                    self.logger().warning("Skipping invalid journal entry in %s: %s" % (self.path, line[:100]))
+
+    def entries(self) -> Dict[str, Dict]:
+        """
+        Returns the entries of the journal.
+
+        :return: the entries (input -> entry)
+        :rtype: dict
+        """
+        self.refresh()
+        with self._lock:
+            return dict(self._entries)
+
+    def is_done(self, key: str) -> bool:
+        """
+        Checks whether the input has been completed already, ie it is recorded in the
+        journal and its outputs are still present (and unchanged if verifying).
+
+        :param key: the input to check (eg the absolute file path)
+        :type key: str
+        :return: True if completed
+        :rtype: bool
+        """
+        if not self.is_active():
+            return False
+        self.refresh()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False
+        for output in entry["outputs"]:
+            if not os.path.exists(output):
+                self.logger().info("Output of %s missing, reprocessing: %s" % (key, output))
+                return False
+        if self.verify and (compute_checksum(entry["outputs"]) != entry["checksum"]):
+            self.logger().info("Checksum of outputs of %s differs, reprocessing" % key)
+            return False
+        return True
+
+    def record(self, key: str, outputs: List[str]):
+        """
+        Appends the completed input with its outputs to the journal.
+
+        :param key: the input that got completed (eg the absolute file path)
+        :type key: str
+        :param outputs: the files/directories that got generated
+        :type outputs: list
+        """
+        if not self.is_active():
+            return
+        outputs = sorted(set([os.path.abspath(x) for x in outputs]))
+        entry = {
+            "input": key,
+            "outputs": outputs,
+            "checksum": compute_checksum(outputs),
+            "timestamp": time.time(),
+        }
+        if self.job is not None:
+            entry["job"] = self.job
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        with self._lock:
+            parent = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(parent, exist_ok=True)
+            with open(self.path, "a+b") as fp:
+                _lock_file(fp, True)
+                try:
+                    # terminate incomplete line left behind by a crashed job
+                    size = fp.seek(0, os.SEEK_END)
+                    if size > 0:
+                        fp.seek(size - 1)
+                        if fp.read(1) != b"\n":
+                            line = b"\n" + line
+                    fp.write(line)
+                    fp.flush()
+                    os.fsync(fp.fileno())
+                finally:
+                    _unlock_file(fp)
+            self._entries[entry["input"]] = entry
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        """
+        Adds the options for the journal to the parser.
+
+        :param parser: the parser to add the options to
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument("--journal", metavar="FILE", type=str, help="The JSONL file to record the completed inputs in; inputs already recorded (with their outputs present) get skipped, allowing interrupted jobs to resume", required=False, default=None)
+        parser.add_argument("--journal_verify", action="store_true", help="Whether to verify the checksums of the outputs of recorded inputs rather than just their existence before skipping them", required=False)
+
+    @classmethod
+    def from_arguments(cls, ns: argparse.Namespace, job: str) -> 'Journal':
+        """
+        Creates the journal from the parsed options.
+
+        :param ns: the parsed options
+        :type ns: argparse.Namespace
+        :param job: the name of the job
+        :type job: str
+        :return: the journal
+        :rtype: Journal
+        """
+        return Journal(path=ns.journal, job=job, verify=ns.journal_verify)
@@ -0,0 +1,472 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+from happy.base.core import ObjectWithLogging
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+""" the default upper bounds (in seconds) of the latency histogram buckets. """
+
+DEFAULT_INTERVAL = 10.0
+""" the default interval in seconds for writing the metrics files. """
+
+METRICS_HOST = "127.0.0.1"
+""" the host to serve the metrics on. """
+
+PATH_PROMETHEUS = "/metrics"
+PATH_JSON = "/metrics.json"
+
+PREFIX = "happy_"
+""" the prefix for the Prometheus metrics. """
+
+
+class _Histogram:
+    """
+    Simple latency histogram with fixed buckets.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Initializes the histogram.
+
+        :param buckets: the upper bounds of the buckets
+        :type buckets: list
+        """
+        self.buckets = list(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Adds the value to the histogram.
+
+        :param value: the value to add
+        :type value: float
+        """
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> Dict[str, int]:
+        """
+        Returns the cumulative counts per bucket, including +Inf.
+
+        :return: the counts (upper bound -> count)
+        :rtype: dict
+        """
+        result = dict()
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result["%g" % bound] = total
+        result["+Inf"] = self.count
+        return result
+
+
+class MetricsSink(ObjectWithLogging):
+    """
+    Collects progress metrics of long-running batch jobs (samples done/failed, queue depth,
+    bytes read/written, per-stage latencies) and periodically writes them to files in
+    Prometheus text format and/or JSON, or serves them on localhost (/metrics, /metrics.json).
+    Recording is cheap, so the methods can be called regardless of whether any output
+    has been configured.
+    """
+
+    def __init__(self, job: str, prometheus_file: Optional[str] = None, json_file: Optional[str] = None,
+                 port: Optional[int] = None, interval: float = DEFAULT_INTERVAL,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Initializes the sink.
+
+        :param job: the name of the job (eg the name of the tool)
+        :type job: str
+        :param prometheus_file: the file to write the metrics to in Prometheus text format, ignored if None
+        :type prometheus_file: str
+        :param json_file: the file to write the metrics to in JSON format, ignored if None
+        :type json_file: str
+        :param port: the port to serve the metrics on (localhost only), ignored if None
+        :type port: int
+        :param interval: the interval in seconds for writing the files
+        :type interval: float
+        :param buckets: the upper bounds in seconds of the latency histogram buckets
+        :type buckets: list
+        """
+        super().__init__()
+        self.job = job
+        self.prometheus_file = prometheus_file
+        self.json_file = json_file
+        self.port = port
+        self.interval = interval
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._samples_done = 0
+        self._samples_failed = 0
+        self._queue_depth = 0
+        self._bytes_read = 0
+        self._bytes_written = 0
+        self._stages = dict()
+        self._stop_event = None
+        self._writer_thread = None
+        self._server = None
+        self._server_thread = None
+
+    def is_active(self) -> bool:
+        """
+        Returns whether any output has been configured.
+
+        :return: True if the metrics get written or served
+        :rtype: bool
+        """
+        return (self.prometheus_file is not None) or (self.json_file is not None) or (self.port is not None)
+
+    def sample_done(self, count: int = 1):
+        """
+        Records successfully processed samples.
+
+        :param count: the number of samples
+        :type count: int
+        """
+        with self._lock:
+            self._samples_done += count
+
+    def sample_failed(self, count: int = 1):
+        """
+        Records samples that failed to process.
+
+        :param count: the number of samples
+        :type count: int
+        """
+        with self._lock:
+            self._samples_failed += count
+
+    @property
+    def samples_failed(self) -> int:
+        """
+        Returns the number of samples that failed to process so far.
+
+        :return: the number of samples
+        :rtype: int
+        """
+        with self._lock:
+            return self._samples_failed
+
+    def set_queue_depth(self, depth: int):
+        """
+        Sets the number of samples still waiting to get processed.
+
+        :param depth: the number of samples
+        :type depth: int
+        """
+        with self._lock:
+            self._queue_depth = depth
+
+    def add_queue_depth(self, delta: int):
+        """
+        Adjusts the number of samples still waiting to get processed.
+
+        :param delta: the number of samples to add (negative to remove)
+        :type delta: int
+        """
+        with self._lock:
+            self._queue_depth = max(0, self._queue_depth + delta)
+
+    def add_bytes_read(self, num_bytes: int):
+        """
+        Records bytes that were read.
+
+        :param num_bytes: the number of bytes
+        :type num_bytes: int
+        """
+        with self._lock:
+            self._bytes_read += num_bytes
+
+    def add_bytes_written(self, num_bytes: int):
+        """
+        Records bytes that were written.
+
+        :param num_bytes: the number of bytes
+        :type num_bytes: int
+        """
+        with self._lock:
+            self._bytes_written += num_bytes
+
+    def observe(self, stage: str, seconds: float):
+        """
+        Records the duration of a stage.
+
+        :param stage: the name of the stage
+        :type stage: str
+        :param seconds: the duration in seconds
+        :type seconds: float
+        """
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = _Histogram(self.buckets)
+            self._stages[stage].observe(seconds)
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """
+        Context manager that records the duration of the enclosed block for the stage.
+
+        :param stage: the name of the stage
+        :type stage: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def time_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """
+        Generates the items of the iterable, recording the time it takes to obtain each
+        item for the stage (eg for preprocessors that generate their output lazily).
+
+        :param stage: the name of the stage
+        :type stage: str
+        :param iterable: the items to generate
+        :return: the generator
+        :rtype: Iterator
+        """
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def snapshot(self) -> Dict:
+        """
+        Returns the current metrics.
+
+        :return: the metrics
+        :rtype: dict
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._start
+            result = {
+                "job": self.job,
+                "timestamp": now,
+                "start_time": self._start,
+                "elapsed_seconds": elapsed,
+                "samples_done": self._samples_done,
+                "samples_failed": self._samples_failed,
+                "queue_depth": self._queue_depth,
+                "bytes_read": self._bytes_read,
+                "bytes_written": self._bytes_written,
+                "samples_per_second": (self._samples_done / elapsed) if (elapsed > 0) else 0.0,
+                "bytes_read_per_second": (self._bytes_read / elapsed) if (elapsed > 0) else 0.0,
+                "bytes_written_per_second": (self._bytes_written / elapsed) if (elapsed > 0) else 0.0,
+                "stages": dict(),
+            }
+            for stage in sorted(self._stages.keys()):
+                hist = self._stages[stage]
+                result["stages"][stage] = {
+                    "count": hist.count,
+                    "sum": hist.sum,
+                    "mean": (hist.sum / hist.count) if (hist.count > 0) else 0.0,
+                    "buckets": hist.cumulative(),
+                }
+            return result
+
+    def to_json(self) -> str:
+        """
+        Returns the current metrics in JSON format.
+
+        :return: the JSON string
+        :rtype: str
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the current metrics in Prometheus text format.
+
+        :return: the metrics
+        :rtype: str
+        """
+        snapshot = self.snapshot()
+        job = 'job="%s"' % self.job.replace("\\", "\\\\").replace('"', '\\"')
+        lines = []
+
+        def add(name, metric_type, help_text, value):
+            lines.append("# HELP %s%s %s" % (PREFIX, name, help_text))
+            lines.append("# TYPE %s%s %s" % (PREFIX, name, metric_type))
+            lines.append("%s%s{%s} %s" % (PREFIX, name, job, repr(float(value)) if isinstance(value, float) else str(value)))
+
+        add("samples_done_total", "counter", "The number of samples processed successfully.", snapshot["samples_done"])
+        add("samples_failed_total", "counter", "The number of samples that failed to process.", snapshot["samples_failed"])
+        add("queue_depth", "gauge", "The number of samples waiting to get processed.", snapshot["queue_depth"])
+        add("bytes_read_total", "counter", "The number of bytes read.", snapshot["bytes_read"])
+        add("bytes_written_total", "counter", "The number of bytes written.", snapshot["bytes_written"])
+        add("samples_per_second", "gauge", "The average number of samples processed per second.", snapshot["samples_per_second"])
+        add("start_time_seconds", "gauge", "The start time of the job (unix epoch).", snapshot["start_time"])
+        add("elapsed_seconds", "gauge", "The seconds since the start of the job.", snapshot["elapsed_seconds"])
+        name = PREFIX + "stage_duration_seconds"
+        lines.append("# HELP %s The duration of the processing stages." % name)
+        lines.append("# TYPE %s histogram" % name)
+        for stage, hist in snapshot["stages"].items():
+            labels = '%s,stage="%s"' % (job, stage)
+            for bound, count in hist["buckets"].items():
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+            lines.append("%s_sum{%s} %s" % (name, labels, repr(float(hist["sum"]))))
+            lines.append("%s_count{%s} %d" % (name, labels, hist["count"]))
+        return "\n".join(lines) + "\n"
+
+    def _write_file(self, path: str, content: str):
+        """
+        Writes the content atomically to the file, so that readers never see partial content.
+
+        :param path: the file to write to
+        :type path: str
+        :param content: the content to write
+        :type content: str
+        """
+        path = os.path.abspath(path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".metrics-")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                fp.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def write(self):
+        """
+        Writes the metrics to the configured files.
+        """
+        try:
+            if self.prometheus_file is not None:
+                self._write_file(self.prometheus_file, self.to_prometheus())
+            if self.json_file is not None:
+                self._write_file(self.json_file, self.to_json())
+        except OSError:
+            self.logger().exception("Failed to write metrics!")
+
+    def _write_periodically(self):
+        """
+        Writes the metrics files until the sink gets stopped.
+        """
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def _create_handler(self) -> type:
+        """
+        Creates the request handler class for serving the metrics.
+
+        :return: the handler class
+        :rtype: type
+        """
+        from http.server import BaseHTTPRequestHandler
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == PATH_PROMETHEUS:
+                    content = sink.to_prometheus()
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == PATH_JSON:
+                    content = sink.to_json()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = content.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                sink.logger().debug(format % args)
+
+        return Handler
+
+    def start(self):
+        """
+        Starts writing the files periodically and serving the metrics, if configured.
+        """
+        if (self.prometheus_file is not None) or (self.json_file is not None):
+            self.write()
+            self._stop_event = threading.Event()
+            self._writer_thread = threading.Thread(target=self._write_periodically, daemon=True)
+            self._writer_thread.start()
+        if self.port is not None:
+            from http.server import ThreadingHTTPServer
+            self._server = ThreadingHTTPServer((METRICS_HOST, self.port), self._create_handler())
+            self._server.daemon_threads = True
+            self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._server_thread.start()
+            self.logger().info("Serving metrics on: http://%s:%d%s" % (METRICS_HOST, self._server.server_port, PATH_PROMETHEUS))
+
+    def stop(self):
+        """
+        Stops the periodic writing (writing the files one last time) and the serving of the metrics.
+        """
+        if self._writer_thread is not None:
+            self._stop_event.set()
+            self._writer_thread.join()
+            self._writer_thread = None
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server_thread.join()
+            self._server = None
+            self._server_thread = None
+
+    def __enter__(self) -> 'MetricsSink':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        """
+        Adds the command-line options for configuring the metrics output to the parser.
+
+        :param parser: the parser to extend
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument('--metrics_file', metavar="FILE", type=str, help='The file to periodically write the progress metrics to in Prometheus text format', required=False, default=None)
+        parser.add_argument('--metrics_json', metavar="FILE", type=str, help='The file to periodically write the progress metrics to in JSON format', required=False, default=None)
+        parser.add_argument('--metrics_port', metavar="PORT", type=int, help='The port on localhost to serve the progress metrics on (' + PATH_PROMETHEUS + ', ' + PATH_JSON + ')', required=False, default=None)
+        parser.add_argument('--metrics_interval', metavar="SECONDS", type=float, help='The interval for writing the metrics files', required=False, default=DEFAULT_INTERVAL)
+
+    @classmethod
+    def from_arguments(cls, ns: argparse.Namespace, job: str) -> 'MetricsSink':
+        """
+        Instantiates the sink from the parsed command-line options.
+
+        :param ns: the parsed options
+        :type ns: argparse.Namespace
+        :param job: the name of the job (eg the name of the tool)
+        :type job: str
+        :return: the sink
+        :rtype: MetricsSink
+        """
+        return MetricsSink(job, prometheus_file=ns.metrics_file, json_file=ns.metrics_json, port=ns.metrics_port,
+                           interval=ns.metrics_interval)
@@ -0,0 +1,110 @@
+import argparse
+
+import numpy as np
+
+from typing import Optional, Union
+
+
+COMPUTE_DTYPE_FLOAT32 = "float32"
+COMPUTE_DTYPE_FLOAT64 = "float64"
+COMPUTE_DTYPES = [
+    COMPUTE_DTYPE_FLOAT32,
+    COMPUTE_DTYPE_FLOAT64,
+]
+
+# Where precision is kept on purpose, regardless of the compute dtype:
+# - statistics that accumulate over many values (means/variances of std-scaler via scikit-learn,
+#   the averages of the annotation-based preprocessors) are accumulated in float64 and only
+#   the results get converted
+# - the black/white reference methods compute their averages from the unconverted reference
+#   data, only the scan and the corrected scan get converted
+# - the Savitzky-Golay coefficients and the least-squares fit of the edges (derivative)
+#   get computed in float64
+# - the resampling matrices get computed in float64 and converted when applied to float32 data
+
+_compute_dtype = None
+""" the global compute dtype, None to keep the data types of the data. """
+
+
+def check_compute_dtype(dtype: Optional[Union[str, np.dtype]]) -> Optional[np.dtype]:
+    """
+    Checks whether the dtype is a supported compute dtype.
+
+    :param dtype: the dtype to check, can be None
+    :type dtype: str or np.dtype
+    :return: the numpy dtype, None if None supplied
+    :rtype: np.dtype
+    """
+    if dtype is None:
+        return None
+    result = np.dtype(dtype)
+    if result.name not in COMPUTE_DTYPES:
+        raise Exception("Unsupported compute dtype: %s (supported: %s)" % (str(dtype), ", ".join(COMPUTE_DTYPES)))
+    return result
+
+
+def set_compute_dtype(dtype: Optional[Union[str, np.dtype]]):
+    """
+    Sets the global compute dtype that preprocessors, reference methods and writers use.
+
+    :param dtype: the dtype to use (see COMPUTE_DTYPES), None to keep the data types of the data
+    :type dtype: str or np.dtype
+    """
+    global _compute_dtype
+    _compute_dtype = check_compute_dtype(dtype)
+
+
+def get_compute_dtype() -> Optional[np.dtype]:
+    """
+    Returns the global compute dtype.
+
+    :return: the dtype, None if data types of the data get kept
+    :rtype: np.dtype
+    """
+    return _compute_dtype
+
+
+def resolve_compute_dtype(dtype: Optional[Union[str, np.dtype]] = None) -> Optional[np.dtype]:
+    """
+    Returns the compute dtype to use: the supplied one or, if None, the global one.
+
+    :param dtype: the dtype overriding the global one (eg of a pipeline), can be None
+    :type dtype: str or np.dtype
+    :return: the dtype, None if data types of the data get kept
+    :rtype: np.dtype
+    """
+    if dtype is not None:
+        return check_compute_dtype(dtype)
+    return _compute_dtype
+
+
+def to_compute_dtype(data: np.ndarray, dtype: Optional[Union[str, np.dtype]] = None, floating_only: bool = False) -> np.ndarray:
+    """
+    Converts the data to the compute dtype, if necessary. Data that already
+    has the compute dtype gets returned as is.
+
+    :param data: the data to convert, can be None
+    :type data: np.ndarray
+    :param dtype: the dtype overriding the global one (eg of a pipeline), can be None
+    :type dtype: str or np.dtype
+    :param floating_only: whether to convert only floating point data (leaving eg integer data as is)
+    :type floating_only: bool
+    :return: the (converted) data
+    :rtype: np.ndarray
+    """
+    dtype = resolve_compute_dtype(dtype)
+    if (dtype is None) or (data is None) or (data.dtype == dtype):
+        return data
+    if floating_only and not np.issubdtype(data.dtype, np.floating):
+        return data
+    return data.astype(dtype)
+
+
+def add_compute_dtype_argument(parser: argparse.ArgumentParser):
+    """
+    Adds the option for setting the global compute dtype to the parser.
+
+    :param parser: the parser to extend
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--compute_dtype", choices=COMPUTE_DTYPES, help="The data type to perform the computations in (and to write floating point data with), uses the data types of the data if not specified", required=False, default=None)
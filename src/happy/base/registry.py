@@ -1,6 +1,14 @@
-from typing import Dict, Union, List
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
 
-from seppl import ClassListerRegistry, Plugin
+from collections.abc import Mapping as AbstractMapping
+from typing import Dict, Union, List, Mapping, Optional, Iterator
+
+from seppl import ClassListerRegistry, Plugin, get_class, get_class_name, get_all_names, get_class_lister
 
 # the default modules to look for plugins
 HAPPY_DEFAULT_CLASS_LISTERS = [
@@ -13,6 +21,120 @@ HAPPY_ENV_CLASS_LISTERS = "HAPPY_CLASS_LISTERS"
 # the environment variable to use for excluding modules
 HAPPY_ENV_CLASS_LISTERS_EXCL = "HAPPY_CLASS_LISTERS_EXCL"
 
+# the environment variable for controlling the plugin cache (on|off|reset)
+HAPPY_ENV_PLUGIN_CACHE = "HAPPY_PLUGIN_CACHE"
+
+# the environment variable for overriding the directory of the plugin cache
+HAPPY_ENV_PLUGIN_CACHE_DIR = "HAPPY_PLUGIN_CACHE_DIR"
+
+PLUGIN_CACHE_ON = "on"
+PLUGIN_CACHE_OFF = "off"
+PLUGIN_CACHE_RESET = "reset"
+PLUGIN_CACHE_ACTIONS = [
+    PLUGIN_CACHE_ON,
+    PLUGIN_CACHE_OFF,
+    PLUGIN_CACHE_RESET,
+]
+
+# the version of the layout of the plugin cache files
+PLUGIN_CACHE_VERSION = 2
+
+# the packages whose versions are always part of the plugin cache key
+PLUGIN_CACHE_PACKAGES = [
+    "seppl",
+]
+
+
+def find_module_file(module: str) -> Optional[str]:
+    """
+    Locates the source file of the module (the __init__.py for packages) without importing
+    the module or any of its parent packages.
+
+    :param module: the name of the module
+    :type module: str
+    :return: the file, None if not found
+    :rtype: str
+    """
+    from importlib.machinery import PathFinder
+    path = None
+    spec = None
+    parts = module.split(".")
+    for i in range(len(parts)):
+        spec = PathFinder.find_spec(".".join(parts[:i + 1]), path)
+        if spec is None:
+            return None
+        path = spec.submodule_search_locations
+        if (path is None) and (i < len(parts) - 1):
+            return None
+    if (spec.origin is None) or not os.path.isfile(spec.origin):
+        return None
+    return spec.origin
+
+
+class LazyPlugins(AbstractMapping):
+    """
+    Dictionary of plugin name / plugin that only imports and instantiates a plugin class
+    once the plugin gets accessed. Returned by the HappyRegistry when the plugin cache is used.
+    """
+
+    def __init__(self, registry: Optional['HappyRegistry'] = None, super_class: Optional[str] = None,
+                 class_names: Optional[Dict[str, str]] = None):
+        """
+        Initializes the dictionary.
+
+        :param registry: the registry to use for loading the plugins
+        :type registry: HappyRegistry
+        :param super_class: the superclass of the plugins
+        :type super_class: str
+        :param class_names: the plugin names and their class names
+        :type class_names: dict
+        """
+        # either a plugin or a (registry, superclass, classname) tuple
+        self._entries = dict()
+        if class_names is not None:
+            for name in class_names:
+                self._entries[name] = (registry, super_class, class_names[name])
+
+    def __getitem__(self, name: str) -> Plugin:
+        entry = self._entries[name]
+        if isinstance(entry, tuple):
+            registry, super_class, class_name = entry
+            entry = registry.load_plugin(super_class, name, class_name)
+            self._entries[name] = entry
+        return entry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def class_name(self, name: str) -> str:
+        """
+        Returns the class name of the plugin, without importing the class.
+
+        :param name: the name of the plugin
+        :type name: str
+        :return: the class name
+        :rtype: str
+        """
+        entry = self._entries[name]
+        if isinstance(entry, tuple):
+            return entry[2]
+        return get_class_name(entry)
+
+    def update(self, plugins: Mapping[str, Plugin]):
+        """
+        Adds the plugins, without importing any plugins that have not been loaded yet.
+
+        :param plugins: the plugins to add
+        :type plugins: dict
+        """
+        if isinstance(plugins, LazyPlugins):
+            self._entries.update(plugins._entries)
+        else:
+            self._entries.update(plugins)
+
 
 class HappyRegistry(ClassListerRegistry):
     """
@@ -20,7 +142,8 @@ class HappyRegistry(ClassListerRegistry):
     """
 
     def __init__(self, default_class_listers: Union[str, List[str]] = None, env_class_listers: str = None,
-                 excluded_class_listers: Union[str, List[str]] = None, env_excluded_class_listers: str = None):
+                 excluded_class_listers: Union[str, List[str]] = None, env_excluded_class_listers: str = None,
+                 env_plugin_cache: str = None, env_plugin_cache_dir: str = None):
         """
 
         :param default_class_listers: the default class lister to use for registering plugins
@@ -31,20 +154,244 @@ class HappyRegistry(ClassListerRegistry):
         :type excluded_class_listers: str or list
         :param env_excluded_class_listers: the environment variable to retrieve the excluded class listers from (overrides manually set ones)
         :type env_excluded_class_listers: str
+        :param env_plugin_cache: the environment variable with the plugin cache action (on|off|reset, default: on), plugin cache disabled if None
+        :type env_plugin_cache: str
+        :param env_plugin_cache_dir: the environment variable with the directory for the plugin cache (overrides the user cache directory)
+        :type env_plugin_cache_dir: str
         """
         super().__init__(default_class_listers=default_class_listers,
                          env_class_listers=env_class_listers,
                          excluded_class_listers=excluded_class_listers,
                          env_excluded_class_listers=env_excluded_class_listers)
+        self.env_plugin_cache = env_plugin_cache
+        self.env_plugin_cache_dir = env_plugin_cache_dir
+        self._plugin_cache = None
+        self._plugin_cache_lock = threading.RLock()
 
-    def all_plugins(self) -> Dict[str, Plugin]:
+    def plugin_cache_action(self) -> str:
+        """
+        Returns the action for the plugin cache.
+
+        :return: the action (on|off|reset)
+        :rtype: str
+        """
+        if self.env_plugin_cache is None:
+            return PLUGIN_CACHE_OFF
+        result = os.getenv(self.env_plugin_cache, PLUGIN_CACHE_ON).strip().lower()
+        if result == "":
+            result = PLUGIN_CACHE_ON
+        if result not in PLUGIN_CACHE_ACTIONS:
+            raise Exception("Invalid plugin cache action in environment variable %s: %s (supported: %s)"
+                            % (self.env_plugin_cache, result, "|".join(PLUGIN_CACHE_ACTIONS)))
+        return result
+
+    def plugin_cache_files(self) -> Dict[str, int]:
+        """
+        Returns the modification times of the class lister modules and of the modules they list.
+        New plugins get registered in these modules, changing the key of the plugin cache
+        even if the version of the package providing them stays the same (eg editable installs).
+
+        :return: the dictionary of file / modification time (ns)
+        :rtype: dict
+        """
+        class_listers = self._class_listers_from_entry_points() + self.actual_fallback_class_listers()
+        modules = set()
+        for class_lister in class_listers:
+            class_lister = class_lister.strip()
+            if len(class_lister) == 0:
+                continue
+            modules.add(class_lister.split(":")[0])
+            try:
+                class_dict = get_class_lister(class_lister)()
+            except Exception:
+                continue
+            for sub_modules in class_dict.values():
+                modules.update(sub_modules)
+        result = dict()
+        for module in sorted(modules):
+            path = find_module_file(module)
+            if path is not None:
+                result[path] = os.stat(path).st_mtime_ns
+        return result
+
+    def plugin_cache_key(self) -> Dict:
+        """
+        Returns the key for the plugin cache, i.e., the versions of the packages providing
+        class listers, the python environment, the environment variables with the class listers
+        and the modification times of the modules that register the plugins.
+
+        :return: the key
+        :rtype: dict
+        """
+        from importlib.metadata import entry_points, version, PackageNotFoundError
+
+        packages = dict()
+        for package in PLUGIN_CACHE_PACKAGES:
+            try:
+                packages[package] = version(package)
+            except PackageNotFoundError:
+                packages[package] = None
+        for item in entry_points(group="class_lister"):
+            if item.dist is not None:
+                packages[item.dist.name] = item.dist.version
+        env = dict()
+        for var in [self.env_class_listers, self.env_excluded_class_listers]:
+            if var is not None:
+                env[var] = os.getenv(var, "")
+        return {
+            "version": PLUGIN_CACHE_VERSION,
+            "python": "%d.%d" % (sys.version_info.major, sys.version_info.minor),
+            "prefix": sys.prefix,
+            "packages": packages,
+            "env": env,
+            "default_class_listers": self.default_class_listers,
+            "excluded_class_listers": self.excluded_class_listers,
+            "files": self.plugin_cache_files(),
+        }
+
+    def plugin_cache_file(self, key: Dict) -> str:
+        """
+        Returns the file of the plugin cache for the key.
+
+        :param key: the key of the cache
+        :type key: dict
+        :return: the cache file
+        :rtype: str
+        """
+        cache_dir = None
+        if self.env_plugin_cache_dir is not None:
+            cache_dir = os.getenv(self.env_plugin_cache_dir)
+        if (cache_dir is None) or (len(cache_dir) == 0):
+            from platformdirs import user_cache_dir
+            cache_dir = user_cache_dir("happy-tools")
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(cache_dir, "plugins-%s.json" % digest[:16])
+
+    def _load_plugin_cache(self) -> Dict:
+        """
+        Loads the plugin cache from disk, if necessary. Removes it when resetting.
+
+        :return: the cache (superclass / (plugin name / class name))
+        :rtype: dict
+        """
+        if self._plugin_cache is not None:
+            return self._plugin_cache["plugins"]
+        key = self.plugin_cache_key()
+        self._plugin_cache = {
+            "key": key,
+            "file": self.plugin_cache_file(key),
+            "plugins": dict(),
+        }
+        cache_file = self._plugin_cache["file"]
+        if self.plugin_cache_action() == PLUGIN_CACHE_RESET:
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+        elif os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as fp:
+                    cached = json.load(fp)
+                if cached.get("key", None) == key:
+                    self._plugin_cache["plugins"] = cached["plugins"]
+            except Exception:
+                # corrupt cache, gets rebuilt
+                pass
+        return self._plugin_cache["plugins"]
+
+    def _save_plugin_cache(self):
+        """
+        Writes the plugin cache to disk (atomically). Failing to write is ignored, as the
+        cache only speeds up the discovery of the plugins.
+        """
+        cache_file = self._plugin_cache["file"]
+        tmp_file = None
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file), prefix=".plugins-", suffix=".json")
+            with os.fdopen(fd, "w") as fp:
+                json.dump({"key": self._plugin_cache["key"], "plugins": self._plugin_cache["plugins"]}, fp, indent=2)
+            os.replace(tmp_file, cache_file)
+            tmp_file = None
+        except OSError:
+            pass
+        finally:
+            if (tmp_file is not None) and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _discover_plugins(self, c: str) -> Dict[str, Plugin]:
+        """
+        Discovers the plugins of the superclass via the class listers and updates the plugin cache.
+
+        :param c: the superclass
+        :type c: str
+        :return: the dictionary of plugins (name / plugin)
+        :rtype: dict
+        """
+        result = super().plugins(c, fail_if_empty=False)
+        with self._plugin_cache_lock:
+            cache = self._load_plugin_cache()
+            cache[c] = {name: get_class_name(result[name]) for name in result}
+            self._save_plugin_cache()
+        return result
+
+    def load_plugin(self, c: str, name: str, class_name: str) -> Plugin:
+        """
+        Instantiates the plugin from the plugin cache. If the cache turns out to be outdated,
+        the plugins of the superclass get discovered again.
+
+        :param c: the superclass of the plugin
+        :type c: str
+        :param name: the name of the plugin
+        :type name: str
+        :param class_name: the cached class name of the plugin
+        :type class_name: str
+        :return: the plugin
+        :rtype: Plugin
+        """
+        try:
+            result = get_class(full_class_name=class_name)()
+            if name in get_all_names(result):
+                return result
+        except Exception:
+            pass
+        plugins = self._discover_plugins(c)
+        if name not in plugins:
+            raise Exception("Plugin '%s' no longer available (plugin cache has been updated)!" % name)
+        return plugins[name]
+
+    def plugins(self, c: Union[str, type], fail_if_empty: bool = True) -> Mapping[str, Plugin]:
+        """
+        Returns the plugins for the specified superclass. Uses the plugin cache if enabled,
+        only importing the plugin classes that actually get accessed.
+
+        :param c: the super class to get the derived classes for (classname or type)
+        :param fail_if_empty: whether to raise an exception if no classes present
+        :type fail_if_empty: bool
+        :return: the dictionary of plugins (name / plugin)
+        :rtype: dict
+        """
+        if self.plugin_cache_action() == PLUGIN_CACHE_OFF:
+            return super().plugins(c, fail_if_empty=fail_if_empty)
+        if not isinstance(c, str):
+            c = get_class_name(c)
+        with self._plugin_cache_lock:
+            class_names = self._load_plugin_cache().get(c, None)
+        if class_names is None:
+            self._discover_plugins(c)
+            with self._plugin_cache_lock:
+                class_names = self._load_plugin_cache()[c]
+        result = LazyPlugins(registry=self, super_class=c, class_names=class_names)
+        if fail_if_empty and (len(result) == 0):
+            raise Exception("No classes found for: %s" % c)
+        return result
+
+    def all_plugins(self) -> Mapping[str, Plugin]:
         """
         Returns all available plugins.
 
         :return: the dictionary of all plugins (name / plugin)
         :rtype: dict
         """
-        result = dict()
+        result = LazyPlugins()
         result.update(self.blackref_methods())
         result.update(self.happydata_readers())
         result.update(self.happydata_writers())
@@ -56,7 +403,7 @@ class HappyRegistry(ClassListerRegistry):
         result.update(self.whiteref_methods())
         return result
 
-    def blackref_methods(self) -> Dict[str, Plugin]:
+    def blackref_methods(self) -> Mapping[str, Plugin]:
         """
         Returns all the black reference methods.
 
@@ -66,7 +413,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.data.black_ref._core.AbstractBlackReferenceMethod", fail_if_empty=False)
 
-    def whiteref_methods(self) -> Dict[str, Plugin]:
+    def whiteref_methods(self) -> Mapping[str, Plugin]:
         """
         Returns all the white reference methods.
 
@@ -76,7 +423,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.data.white_ref._core.AbstractWhiteReferenceMethod", fail_if_empty=False)
 
-    def ref_locators(self) -> Dict[str, Plugin]:
+    def ref_locators(self) -> Mapping[str, Plugin]:
         """
         Returns all the reference locators.
 
@@ -86,7 +433,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.data.ref_locator._core.AbstractReferenceLocator", fail_if_empty=False)
 
-    def normalizations(self) -> Dict[str, Plugin]:
+    def normalizations(self) -> Mapping[str, Plugin]:
         """
         Returns all the normalization schemes.
 
@@ -96,7 +443,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.data.normalization._core.AbstractNormalization", fail_if_empty=False)
 
-    def happydata_readers(self) -> Dict[str, Plugin]:
+    def happydata_readers(self) -> Mapping[str, Plugin]:
         """
         Returns all the readers for happydata data structure.
 
@@ -106,7 +453,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.readers._happydata_reader.HappyDataReader", fail_if_empty=False)
 
-    def preprocessors(self) -> Dict[str, Plugin]:
+    def preprocessors(self) -> Mapping[str, Plugin]:
         """
         Returns all the preprocessors.
 
@@ -116,7 +463,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.preprocessors._preprocessor.Preprocessor", fail_if_empty=False)
 
-    def happydata_writers(self) -> Dict[str, Plugin]:
+    def happydata_writers(self) -> Mapping[str, Plugin]:
         """
         Returns all the writers for happydata data structure.
 
@@ -126,7 +473,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.writers._happydata_writer.HappyDataWriter", fail_if_empty=False)
 
-    def pixel_selectors(self) -> Dict[str, Plugin]:
+    def pixel_selectors(self) -> Mapping[str, Plugin]:
         """
         Returns all the pixel selectors.
 
@@ -136,7 +483,7 @@ class HappyRegistry(ClassListerRegistry):
         # class via string to avoid circular imports
         return self.plugins("happy.pixel_selectors._pixel_selector.PixelSelector", fail_if_empty=False)
 
-    def region_extractors(self) -> Dict[str, Plugin]:
+    def region_extractors(self) -> Mapping[str, Plugin]:
         """
         Returns all the region extractors.
 
@@ -151,7 +498,9 @@ class HappyRegistry(ClassListerRegistry):
 REGISTRY = HappyRegistry(default_class_listers=HAPPY_DEFAULT_CLASS_LISTERS,
                          env_class_listers=HAPPY_ENV_CLASS_LISTERS,
                          excluded_class_listers=None,
-                         env_excluded_class_listers=HAPPY_ENV_CLASS_LISTERS_EXCL)
+                         env_excluded_class_listers=HAPPY_ENV_CLASS_LISTERS_EXCL,
+                         env_plugin_cache=HAPPY_ENV_PLUGIN_CACHE,
+                         env_plugin_cache_dir=HAPPY_ENV_PLUGIN_CACHE_DIR)
 
 
 def print_help_all():
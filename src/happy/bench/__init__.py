@@ -0,0 +1,2 @@
+from ._synthetic import generate_synthetic_data, write_synthetic_dataset, synthetic_wavelengths, SYNTHETIC_DTYPES, LAYER_TARGET, LAYER_MASK, MASK_MAPPING
+from ._benchmark import BenchmarkSuite, compare_benchmarks, current_rss, peak_rss, reset_peak_rss, GROUPS, GROUP_READER, GROUP_PREPROCESSOR, GROUP_PIXEL_SELECTOR, GROUP_BLACK_REF, GROUP_WHITE_REF, GROUP_MODEL, GROUP_WRITER
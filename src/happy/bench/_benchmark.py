@@ -0,0 +1,553 @@
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from happy.base.core import ObjectWithLogging
+from happy.base.registry import REGISTRY
+from happy.bench._synthetic import LAYER_TARGET, LAYER_MASK
+from happy.data import HappyData
+from happy.readers import HappyReader
+
+BENCHMARK_VERSION = 1
+""" the version of the JSON report layout. """
+
+GROUP_READER = "reader"
+GROUP_PREPROCESSOR = "preprocessor"
+GROUP_PIXEL_SELECTOR = "pixel-selector"
+GROUP_BLACK_REF = "black-ref"
+GROUP_WHITE_REF = "white-ref"
+GROUP_MODEL = "model"
+GROUP_WRITER = "writer"
+GROUPS = [
+    GROUP_READER,
+    GROUP_PREPROCESSOR,
+    GROUP_PIXEL_SELECTOR,
+    GROUP_BLACK_REF,
+    GROUP_WHITE_REF,
+    GROUP_MODEL,
+    GROUP_WRITER,
+]
+
+PREDICTION_MODEL = "linearregression"
+""" the model used for benchmarking predict_images. """
+
+FILE_REFERENCE = "reference.hdr"
+""" the ENVI file used by the subtract preprocessor. """
+
+FILE_ANNOTATIONS = "annotations.json"
+""" the OPEX file used by the annotation-based preprocessors. """
+
+ANNOTATION_LABEL = "reference"
+""" the label of the annotation in the OPEX file. """
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the process, only possible under Linux.
+
+    :return: whether the peak could be reset
+    :rtype: bool
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss() -> Optional[int]:
+    """
+    Returns the current resident set size of the process in bytes, only available under Linux.
+
+    :return: the current size, None if not available
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Returns the peak resident set size of the process in bytes.
+
+    :return: the peak, None if not available
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    result = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes under macOS, kilobytes otherwise
+    return result if (sys.platform == "darwin") else result * 1024
+
+
+def compare_benchmarks(baseline: Dict, current: Dict, max_slowdown: float = 1.25) -> List[Dict]:
+    """
+    Compares the timings of the benchmarks with the ones of the baseline.
+
+    :param baseline: the baseline report
+    :type baseline: dict
+    :param current: the current report
+    :type current: dict
+    :param max_slowdown: the factor by which a benchmark can be slower before it counts as regression
+    :type max_slowdown: float
+    :return: the comparisons of the benchmarks present in both reports (name, baseline_seconds, seconds, ratio, regression)
+    :rtype: list
+    """
+    result = []
+    baseline_seconds = dict()
+    for benchmark in baseline["benchmarks"]:
+        if benchmark.get("seconds", None) is not None:
+            baseline_seconds[benchmark["name"]] = benchmark["seconds"]
+    for benchmark in current["benchmarks"]:
+        name = benchmark["name"]
+        if (benchmark.get("seconds", None) is None) or (name not in baseline_seconds):
+            continue
+        if baseline_seconds[name] <= 0:
+            continue
+        ratio = benchmark["seconds"] / baseline_seconds[name]
+        result.append({
+            "name": name,
+            "baseline_seconds": baseline_seconds[name],
+            "seconds": benchmark["seconds"],
+            "ratio": ratio,
+            "regression": ratio > max_slowdown,
+        })
+    return result
+
+
+class BenchmarkSuite(ObjectWithLogging):
+    """
+    Times the readers, preprocessors, pixel selectors, reference methods, predictions and writers
+    on a HAPPy dataset, recording throughput and peak memory.
+    """
+
+    def __init__(self, data_dir: str, repeat: int = 3, include: Optional[str] = None, exclude: Optional[str] = None,
+                 options: Optional[Dict[str, str]] = None):
+        """
+        Initializes the suite.
+
+        :param data_dir: the directory with the HAPPy dataset
+        :type data_dir: str
+        :param repeat: how often to run each benchmark
+        :type repeat: int
+        :param include: the regular expression the benchmark names (group/plugin) must match, None for all
+        :type include: str
+        :param exclude: the regular expression for excluding benchmarks by name (group/plugin), None to keep all
+        :type exclude: str
+        :param options: the additional options for plugins (plugin name -> options), overriding the derived ones
+        :type options: dict
+        """
+        super().__init__()
+        self.data_dir = data_dir
+        self.repeat = repeat
+        self.include = include
+        self.exclude = exclude
+        self.options = dict() if (options is None) else dict(options)
+        self.sample_ids = None
+        self.data = None
+        self.work_dir = None
+
+    def _is_selected(self, name: str) -> bool:
+        """
+        Checks whether the benchmark is to be run.
+
+        :param name: the name of the benchmark (group/plugin)
+        :type name: str
+        :return: True if to run
+        :rtype: bool
+        """
+        if (self.include is not None) and (re.search(self.include, name) is None):
+            return False
+        if (self.exclude is not None) and (re.search(self.exclude, name) is not None):
+            return False
+        return True
+
+    def _default_options(self) -> Dict[str, str]:
+        """
+        Returns the options for the plugins that cannot be run with their default options,
+        derived from the loaded data and the reference/annotation files in the work directory.
+
+        :return: the options (plugin name -> options)
+        :rtype: dict
+        """
+        first = self.data[0]
+        height, width, bands = first.data.shape
+        wavelengths = [float(x) for x in first.get_wavelengths()]
+        step = (wavelengths[-1] - wavelengths[0]) / max(1, bands // 2 - 1)
+        top_left = "0 0 %d %d" % (max(1, height // 4), max(1, width // 4))
+        n = max(1, height * width // 4)
+        criteria = json.dumps({"class": "happy.criteria.Criteria", "operation": "equals", "value": 1, "key": LAYER_MASK})
+        annotations = "-f %s --label %s" % (os.path.join(self.work_dir, FILE_ANNOTATIONS), ANNOTATION_LABEL)
+        return {
+            "resample-wavelengths": "-f %f -t %f -s %f" % (wavelengths[0], wavelengths[-1], step),
+            "wavelength-subset": "-f 0 -t %d" % (bands // 2),
+            "subtract": "-f %s" % os.path.join(self.work_dir, FILE_REFERENCE),
+            "divide-annotation-avg": annotations,
+            "subtract-annotation-avg": annotations,
+            "ps-simple": "-n %d" % n,
+            "ps-grid-wise": "-n %d" % n,
+            "ps-column-wise": "-n %d -S 1 -c '%s'" % (height, criteria),
+            "ps-multi": "-s \"ps-simple -n %d\" \"ps-grid-wise -n %d\"" % (n, n),
+            "br-annotation-avg": "-a %s" % top_left,
+            "wr-annotation-avg": "-a %s" % top_left,
+        }
+
+    def _write_work_files(self):
+        """
+        Writes the reference (ENVI) and annotation (OPEX) files required by some plugins to the work directory.
+        """
+        import spectral.io.envi as envi
+        from opex import ObjectPredictions, ObjectPrediction, BBox, Polygon
+
+        first = self.data[0]
+        height, width, _ = first.data.shape
+        envi.save_image(os.path.join(self.work_dir, FILE_REFERENCE), np.zeros_like(first.data), force=True,
+                        metadata={"wavelength": first.get_wavelengths()})
+        right = max(1, width // 4)
+        bottom = max(1, height // 4)
+        obj = ObjectPrediction(label=ANNOTATION_LABEL, bbox=BBox(left=0, top=0, right=right, bottom=bottom),
+                               polygon=Polygon(points=[[0, 0], [right, 0], [right, bottom], [0, bottom]]))
+        ObjectPredictions(id=first.sample_id, timestamp=datetime.now().isoformat(), objects=[obj]).save_json_to_file(
+            os.path.join(self.work_dir, FILE_ANNOTATIONS))
+
+    def _parse(self, name: str, parse: Callable):
+        """
+        Instantiates the plugin with the options to use for benchmarking.
+
+        :param name: the name of the plugin
+        :type name: str
+        :param parse: the method to parse the command-line with
+        :return: the plugin
+        """
+        cmdline = name
+        if name in self.options:
+            cmdline += " " + self.options[name]
+        return parse(cmdline)
+
+    def _options(self, name: str) -> Optional[str]:
+        """
+        Returns the options for the plugin.
+
+        :param name: the name of the plugin
+        :type name: str
+        :return: the options, None if none
+        :rtype: str
+        """
+        return self.options.get(name, None)
+
+    def _bench(self, group: str, plugin: str, func: Callable, pixels: int, num_bytes: int,
+               setup: Optional[Callable] = None) -> Optional[Dict]:
+        """
+        Times the function.
+
+        :param group: the group of the benchmark
+        :type group: str
+        :param plugin: the name of the plugin
+        :type plugin: str
+        :param func: the function to time, gets the output of setup as parameter (if available)
+        :param pixels: the number of pixels processed by the function
+        :type pixels: int
+        :param num_bytes: the number of bytes processed by the function
+        :type num_bytes: int
+        :param setup: the function to call before each run (not timed), None if not required
+        :return: the result, None if not selected
+        :rtype: dict
+        """
+        name = group + "/" + plugin
+        if not self._is_selected(name):
+            return None
+        self.logger().info("Running: %s" % name)
+        result = {
+            "name": name,
+            "group": group,
+            "plugin": plugin,
+            "options": self._options(plugin),
+            "pixels": pixels,
+            "bytes": num_bytes,
+        }
+        times = []
+        peak = None
+        increase = None
+        try:
+            for _ in range(self.repeat):
+                arg = None if (setup is None) else setup()
+                # the increase is only meaningful if the peak can be reset
+                before = current_rss() if reset_peak_rss() else None
+                start = time.perf_counter()
+                if setup is None:
+                    func()
+                else:
+                    func(arg)
+                times.append(time.perf_counter() - start)
+                current = peak_rss()
+                if (current is not None) and ((peak is None) or (current > peak)):
+                    peak = current
+                if (current is not None) and (before is not None):
+                    increase = max(0 if (increase is None) else increase, current - before)
+        except (Exception, SystemExit) as e:
+            # SystemExit: invalid plugin options
+            self.logger().warning("Failed to run %s: %s" % (name, str(e)))
+            result["error"] = str(e)
+            return result
+        seconds = statistics.median(times)
+        result["times"] = times
+        result["seconds"] = seconds
+        result["pixels_per_second"] = (pixels / seconds) if (seconds > 0) else None
+        result["mb_per_second"] = (num_bytes / 1e6 / seconds) if (seconds > 0) else None
+        result["peak_rss_mb"] = None if (peak is None) else peak / 1e6
+        result["peak_rss_increase_mb"] = None if (increase is None) else increase / 1e6
+        return result
+
+    def _load_data(self) -> List[HappyData]:
+        """
+        Loads all the samples.
+
+        :return: the loaded data
+        :rtype: list
+        """
+        reader = HappyReader(base_dir=self.data_dir)
+        result = []
+        for sample_id in self.sample_ids:
+            result.extend(reader.load_data(sample_id))
+        return result
+
+    def _pixels(self) -> int:
+        """
+        Returns the total number of pixels of the loaded data.
+
+        :return: the number of pixels
+        :rtype: int
+        """
+        return sum([x.height * x.width for x in self.data])
+
+    def _bytes(self) -> int:
+        """
+        Returns the total number of bytes of the loaded data.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return sum([x.data.nbytes for x in self.data])
+
+    def _bench_readers(self) -> List[Dict]:
+        """
+        Times the loading of the data.
+
+        :return: the results
+        :rtype: list
+        """
+        return [self._bench(GROUP_READER, "happy-reader", self._load_data, self._pixels(), self._bytes())]
+
+    def _bench_preprocessors(self) -> List[Dict]:
+        """
+        Times fitting and applying each preprocessor to the data.
+
+        :return: the results
+        :rtype: list
+        """
+        from happy.preprocessors import Preprocessor
+
+        def run(name: str):
+            preprocessor = self._parse(name, Preprocessor.parse_preprocessor)
+            for happy_data in self.data:
+                preprocessor.fit(happy_data)
+                preprocessor.apply(happy_data)
+
+        return [self._bench(GROUP_PREPROCESSOR, name, lambda name=name: run(name), self._pixels(), self._bytes())
+                for name in sorted(REGISTRY.preprocessors().keys())]
+
+    def _bench_pixel_selectors(self) -> List[Dict]:
+        """
+        Times selecting the pixels with each pixel selector.
+
+        :return: the results
+        :rtype: list
+        """
+        from happy.pixel_selectors import PixelSelector
+
+        def run(name: str):
+            selector = self._parse(name, PixelSelector.parse_pixel_selector)
+            for happy_data in self.data:
+                selector.select_pixels(happy_data)
+
+        return [self._bench(GROUP_PIXEL_SELECTOR, name, lambda name=name: run(name), self._pixels(), self._bytes())
+                for name in sorted(REGISTRY.pixel_selectors().keys())]
+
+    def _bench_reference_methods(self) -> List[Dict]:
+        """
+        Times applying each black and white reference method, using synthetic references
+        of the same size as the scans.
+
+        :return: the results
+        :rtype: list
+        """
+        from happy.data.black_ref import AbstractBlackReferenceMethod
+        from happy.data.white_ref import AbstractWhiteReferenceMethod
+
+        black = [np.full_like(x.data, np.min(x.data)) for x in self.data]
+        white = [np.full_like(x.data, np.max(x.data)) for x in self.data]
+
+        def run(name: str, parse: Callable, references: List[np.ndarray]):
+            method = self._parse(name, parse)
+            for happy_data, reference in zip(self.data, references):
+                method.reference = reference
+                method.apply(happy_data.data)
+
+        result = []
+        for name in sorted(REGISTRY.blackref_methods().keys()):
+            result.append(self._bench(GROUP_BLACK_REF, name,
+                                      lambda name=name: run(name, AbstractBlackReferenceMethod.parse_method, black),
+                                      self._pixels(), self._bytes()))
+        for name in sorted(REGISTRY.whiteref_methods().keys()):
+            result.append(self._bench(GROUP_WHITE_REF, name,
+                                      lambda name=name: run(name, AbstractWhiteReferenceMethod.parse_method, white),
+                                      self._pixels(), self._bytes()))
+        return result
+
+    def _bench_predict_images(self) -> List[Dict]:
+        """
+        Times making predictions for all the images with a linear regression model
+        (fit on the target layer beforehand, not timed).
+
+        :return: the results
+        :rtype: list
+        """
+        name = GROUP_MODEL + "/predict_images"
+        if not self._is_selected(name):
+            return []
+        if LAYER_TARGET not in self.data[0].metadata_dict:
+            self.logger().warning("No '%s' layer, skipping: %s" % (LAYER_TARGET, name))
+            return [{"name": name, "group": GROUP_MODEL, "plugin": "predict_images", "error": "No '%s' layer" % LAYER_TARGET}]
+
+        from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+        from happy.models.sklearn import create_model
+        from happy.pixel_selectors import SimpleSelector
+
+        model = ScikitSpectroscopyModel(self.data_dir, LAYER_TARGET, pixel_selector=SimpleSelector(64),
+                                        model=create_model(PREDICTION_MODEL))
+        model.fit(self.sample_ids)
+        return [self._bench(GROUP_MODEL, "predict_images", lambda: model.predict_images(self.sample_ids),
+                            self._pixels(), self._bytes())]
+
+    def _bench_writers(self) -> List[Dict]:
+        """
+        Times writing the data with each writer (to a new directory in each run).
+
+        :return: the results
+        :rtype: list
+        """
+        from happy.writers import HappyDataWriter
+
+        def setup() -> str:
+            output_dir = os.path.join(self.work_dir, "output")
+            if os.path.exists(output_dir):
+                shutil.rmtree(output_dir)
+            os.makedirs(output_dir)
+            return output_dir
+
+        def run(name: str, output_dir: str):
+            writer = self._parse(name, HappyDataWriter.parse_writer)
+            writer.base_dir = output_dir
+            writer.write_data(self.data)
+
+        return [self._bench(GROUP_WRITER, name, lambda output_dir, name=name: run(name, output_dir),
+                            self._pixels(), self._bytes(), setup=setup)
+                for name in sorted(REGISTRY.happydata_writers().keys())]
+
+    def _environment(self) -> Dict:
+        """
+        Returns information about the environment the benchmarks were run in.
+
+        :return: the environment
+        :rtype: dict
+        """
+        from importlib.metadata import version, PackageNotFoundError
+
+        packages = dict()
+        for package in ["happy_tools_core", "numpy", "scipy", "scikit-learn", "spectral", "seppl"]:
+            try:
+                packages[package] = version(package)
+            except PackageNotFoundError:
+                packages[package] = None
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "packages": packages,
+        }
+
+    def run(self) -> Dict:
+        """
+        Runs the selected benchmarks.
+
+        :return: the report
+        :rtype: dict
+        """
+        reader = HappyReader(base_dir=self.data_dir)
+        self.sample_ids = reader.get_sample_ids()
+        if len(self.sample_ids) == 0:
+            raise Exception("No samples found in: %s" % self.data_dir)
+        self.data = self._load_data()
+        self.work_dir = tempfile.mkdtemp(prefix="happy-bench-")
+        try:
+            self._write_work_files()
+            options = self._default_options()
+            options.update(self.options)
+            self.options = options
+
+            benchmarks = []
+            benchmarks.extend(self._bench_readers())
+            benchmarks.extend(self._bench_preprocessors())
+            benchmarks.extend(self._bench_pixel_selectors())
+            benchmarks.extend(self._bench_reference_methods())
+            benchmarks.extend(self._bench_predict_images())
+            benchmarks.extend(self._bench_writers())
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            self.work_dir = None
+
+        first = self.data[0]
+        return {
+            "version": BENCHMARK_VERSION,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "environment": self._environment(),
+            "data": {
+                "data_dir": self.data_dir,
+                "samples": len(self.sample_ids),
+                "images": len(self.data),
+                "shape": list(first.data.shape),
+                "dtype": str(first.data.dtype),
+                "pixels": self._pixels(),
+                "bytes": self._bytes(),
+            },
+            "repeat": self.repeat,
+            "benchmarks": [x for x in benchmarks if x is not None],
+        }
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+
+from typing import List, Optional
+
+from happy.data import HappyData
+
+
+SYNTHETIC_DTYPES = [
+    "float32",
+    "float64",
+    "uint16",
+    "int16",
+]
+""" the data types that the synthetic cubes can be generated with. """
+
+LAYER_TARGET = "target"
+""" the name of the regression target layer. """
+
+LAYER_MASK = "mask"
+""" the name of the mask layer. """
+
+MASK_MAPPING = {"background": 0, "object": 1}
+""" the mapping of the mask layer. """
+
+NUM_COMPONENTS = 4
+""" the number of pure spectra that get mixed. """
+
+INT_SCALE = 4000.0
+""" the maximum value for integer data types. """
+
+
+def synthetic_wavelengths(bands: int) -> List[float]:
+    """
+    Returns the wavelengths of the synthetic cubes (900-1700nm, NIR).
+
+    :param bands: the number of bands
+    :type bands: int
+    :return: the wavelengths
+    :rtype: list
+    """
+    return [float(x) for x in np.linspace(900.0, 1700.0, bands)]
+
+
+def generate_synthetic_data(sample_id: str = "s000", region_id: str = "1", height: int = 128, width: int = 128,
+                            bands: int = 200, dtype: str = "float32", num_layers: int = 1,
+                            mask_sparsity: float = 0.5, seed: Optional[int] = None) -> HappyData:
+    """
+    Generates a synthetic hyperspectral cube. The spectra are mixtures of a few smooth pure spectra
+    plus noise. The first meta-data layer ("target") is the abundance of the first pure spectrum,
+    any further layers ("layer1", ...) are the abundances of the other pure spectra. The mask layer
+    marks the given fraction of the pixels as background.
+
+    :param sample_id: the sample ID
+    :type sample_id: str
+    :param region_id: the region ID
+    :type region_id: str
+    :param height: the height of the cube
+    :type height: int
+    :param width: the width of the cube
+    :type width: int
+    :param bands: the number of bands
+    :type bands: int
+    :param dtype: the data type of the cube, see SYNTHETIC_DTYPES
+    :type dtype: str
+    :param num_layers: the number of meta-data layers (besides the mask)
+    :type num_layers: int
+    :param mask_sparsity: the fraction of pixels (0-1) to mark as background in the mask
+    :type mask_sparsity: float
+    :param seed: the seed for the random numbers, None for random
+    :type seed: int
+    :return: the generated data
+    :rtype: HappyData
+    """
+    if dtype not in SYNTHETIC_DTYPES:
+        raise Exception("Unsupported data type '%s', supported: %s" % (dtype, ", ".join(SYNTHETIC_DTYPES)))
+    if (mask_sparsity < 0) or (mask_sparsity > 1):
+        raise Exception("Mask sparsity must be between 0 and 1, got: %f" % mask_sparsity)
+    rng = np.random.default_rng(seed)
+    num_components = max(NUM_COMPONENTS, num_layers)
+
+    # smooth pure spectra: sums of gaussian absorption bands
+    x = np.linspace(0.0, 1.0, bands)
+    components = np.zeros((num_components, bands))
+    for i in range(num_components):
+        for center, width_, depth in zip(rng.random(3), rng.uniform(0.02, 0.1, 3), rng.uniform(0.1, 0.5, 3)):
+            components[i] -= depth * np.exp(-0.5 * ((x - center) / width_) ** 2)
+        components[i] += 1.0
+
+    abundances = rng.dirichlet(np.ones(num_components), size=height * width)
+    data = abundances @ components + rng.normal(0.0, 0.01, (height * width, bands))
+    data = data.reshape((height, width, bands))
+    if dtype.startswith("float"):
+        data = data.astype(dtype)
+    else:
+        data = np.clip(data * INT_SCALE / 2, 0, INT_SCALE).astype(dtype)
+
+    metadata = dict()
+    for i in range(num_layers):
+        layer = LAYER_TARGET if (i == 0) else ("layer%d" % i)
+        metadata[layer] = {"data": abundances[:, i].reshape((height, width, 1)).astype(np.float32)}
+    mask = (rng.random((height, width, 1)) >= mask_sparsity).astype(np.uint8)
+    metadata[LAYER_MASK] = {"data": mask, "mapping": dict(MASK_MAPPING)}
+
+    global_dict = {
+        "synthetic": True,
+        "seed": seed,
+    }
+    return HappyData(sample_id, region_id, data, global_dict, metadata, wavenumbers=synthetic_wavelengths(bands))
+
+
+def write_synthetic_dataset(output_dir: str, num_samples: int = 4, num_regions: int = 1, height: int = 128,
+                            width: int = 128, bands: int = 200, dtype: str = "float32", num_layers: int = 1,
+                            mask_sparsity: float = 0.5, seed: Optional[int] = 1) -> List[str]:
+    """
+    Generates a synthetic HAPPy dataset and writes it to the output directory using the happy-writer.
+
+    :param output_dir: the directory to write the dataset to
+    :type output_dir: str
+    :param num_samples: the number of samples
+    :type num_samples: int
+    :param num_regions: the number of regions per sample
+    :type num_regions: int
+    :param height: the height of the cubes
+    :type height: int
+    :param width: the width of the cubes
+    :type width: int
+    :param bands: the number of bands
+    :type bands: int
+    :param dtype: the data type of the cubes, see SYNTHETIC_DTYPES
+    :type dtype: str
+    :param num_layers: the number of meta-data layers (besides the mask)
+    :type num_layers: int
+    :param mask_sparsity: the fraction of pixels (0-1) to mark as background in the masks
+    :type mask_sparsity: float
+    :param seed: the seed for the random numbers, None for random
+    :type seed: int
+    :return: the generated sample IDs
+    :rtype: list
+    """
+    from happy.writers import HappyWriter
+
+    os.makedirs(output_dir, exist_ok=True)
+    writer = HappyWriter(base_dir=os.path.abspath(output_dir))
+    result = []
+    for i in range(num_samples):
+        sample_id = "s%03d" % i
+        for n in range(num_regions):
+            happy_data = generate_synthetic_data(sample_id=sample_id, region_id=str(n + 1), height=height,
+                                                 width=width, bands=bands, dtype=dtype, num_layers=num_layers,
+                                                 mask_sparsity=mask_sparsity,
+                                                 seed=None if (seed is None) else seed + i * num_regions + n)
+            writer.write_data(happy_data)
+        result.append(sample_id)
+    return result
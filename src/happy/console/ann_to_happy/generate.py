@@ -5,6 +5,7 @@ import logging
 import os
 import re
 import shutil
+import time
 import traceback
 
 import numpy as np
@@ -14,6 +15,9 @@ from spectral import envi
 
 from wai.logging import add_logging_level, set_logging_level
 from happy.base.app import init_app
+from happy.base.fingerprint import Fingerprints
+from happy.base.journal import Journal
+from happy.base.metrics import MetricsSink
 from happy.data import DataManager, HappyData, LABEL_WHITEREF
 from happy.data.annotations import locate_annotations, AnnotationFiles, load_label_map, MASK_PREFIX
 from happy.writers import HappyWriter
@@ -51,6 +55,8 @@ CONVERSIONS = [
 ]
 
 
+PROG = "happy-ann2happy"
+
 logger = logging.getLogger("ann2happy")
 
 
@@ -75,7 +81,7 @@ def get_sample_id(path):
     return os.path.splitext(os.path.basename(path))[0]
 
 
-def envi_to_happy(cont_ann: AnnotationFiles, output_dir, datamanager, dry_run=False):
+def envi_to_happy(cont_ann: AnnotationFiles, output_dir, datamanager, dry_run=False, metrics=None):
     """
     Converts the envi data into happy format.
 
@@ -87,19 +93,28 @@ def envi_to_happy(cont_ann: AnnotationFiles, output_dir, datamanager, dry_run=Fa
     :type datamanager: DataManager
     :param dry_run: whether to omit saving data/creating dirs
     :type dry_run: bool
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
+    :return: the files that got written
+    :rtype: list
     """
     logger.info("Converting envi to happy format")
+    if metrics is None:
+        metrics = MetricsSink(PROG)
 
     path_scan = os.path.splitext(cont_ann.png)[0] + ".hdr"
     if not os.path.exists(path_scan):
         logger.info("Not found: %s" % path_scan)
-        return
+        return []
 
     logger.info("Loading: %s" % path_scan)
 
-    datamanager.load_scan(path_scan)
-    datamanager.load_contours(cont_ann.opex)
-    datamanager.calc_norm_data()
+    with metrics.time_stage("load"):
+        datamanager.load_scan(path_scan)
+        datamanager.load_contours(cont_ann.opex)
+    metrics.add_bytes_read(datamanager.scan_data.nbytes)
+    with metrics.time_stage("normalize"):
+        datamanager.calc_norm_data()
 
     wavenumbers = datamanager.get_wavelengths_norm_list()
     sample_id = get_sample_id(cont_ann.png)
@@ -107,7 +122,30 @@ def envi_to_happy(cont_ann: AnnotationFiles, output_dir, datamanager, dry_run=Fa
     if not dry_run:
         logger.info("Writing happy data: %s --> %s" % (output_dir, sample_id))
         writer = HappyWriter(base_dir=output_dir)
-        writer.write_data(data)
+        with metrics.time_stage("write"):
+            writer.write_data(data)
+        metrics.add_bytes_written(data.data.nbytes)
+        return writer.get_output_files()
+    return []
+
+
+def get_input_files(cont_ann: AnnotationFiles):
+    """
+    Returns the input files of the annotations, including the ENVI image files.
+
+    :param cont_ann: the container with the annotation files
+    :type cont_ann: AnnotationFiles
+    :return: the existing files
+    :rtype: list
+    """
+    result = []
+    for path in [cont_ann.base, cont_ann.opex, cont_ann.png, cont_ann.envi_mask]:
+        if path is None:
+            continue
+        result.append(path)
+        if path.endswith(".hdr"):
+            result.append(os.path.splitext(path)[0] + ".img")
+    return [x for x in result if os.path.exists(x)]
 
 
 def pattern_to_filename(pattern, placeholder_map):
@@ -293,7 +331,7 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
             pattern_png: str = FILENAME_PH_SAMPLEID + ".png",
             pattern_opex: str = FILENAME_PH_SAMPLEID + ".json",
             pattern_envi: str = MASK_PREFIX + FILENAME_PH_SAMPLEID + ".hdr",
-            no_implicit_background=False, unlabelled=0, include_input=False, dry_run=False):
+            no_implicit_background=False, unlabelled=0, include_input=False, dry_run=False, metrics=None):
     """
     Converts the specified file.
 
@@ -327,8 +365,14 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
     :type include_input: bool
     :param dry_run: whether to omit saving data/creating dirs
     :type dry_run: bool
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
+    :return: the files that got written
+    :rtype: list
     """
     logger.info("Conversion input: %s" % cont_ann)
+    if metrics is None:
+        metrics = MetricsSink(PROG)
 
     sample_id = os.path.splitext(os.path.basename(cont_ann.png))[0]
     pattern_map = {
@@ -349,8 +393,9 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
     output_envi = os.path.join(output_path, pattern_to_filename(pattern_envi, pattern_map))
     logger.info("Output dir: %s" % output_path)
 
+    result = []
     if output_format == OUTPUT_FORMAT_DIRTREE_WITH_DATA:
-        envi_to_happy(cont_ann, output_dir, datamanager, dry_run=dry_run)
+        result.extend(envi_to_happy(cont_ann, output_dir, datamanager, dry_run=dry_run, metrics=metrics))
 
     # get dimensions
     img = Image.open(cont_ann.png)
@@ -374,6 +419,7 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
         img.fill(unlabelled)
 
     # apply
+    start = time.perf_counter()
     if conversion == CONVERSION_PIXELS:
         img = apply_envi(cont_ann, img, label_map)
     elif conversion == CONVERSION_POLYGONS:
@@ -386,6 +432,7 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
         img = apply_envi(cont_ann, img, label_map)
     else:
         raise Exception("Unsupported conversion: %s" % conversion)
+    metrics.observe("annotations", time.perf_counter() - start)
 
     if not dry_run:
         if not os.path.exists(output_path):
@@ -396,8 +443,10 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
             logger.info("Copying JSON/PNG/ENVI")
             shutil.copy(cont_ann.opex, output_opex)
             shutil.copy(cont_ann.png, output_png)
+            result.extend([output_opex, output_png])
             if cont_ann.envi_mask is not None:
                 shutil.copy(cont_ann.envi_mask, output_envi)
+                result.append(output_envi)
 
         # label map/wavelengths
         wavelengths = [0]
@@ -411,11 +460,17 @@ def convert(cont_ann: AnnotationFiles, output_dir: str, datamanager: DataManager
         logger.info("Writing label map: %s" % output_labels)
         with open(output_labels, "w") as fp:
             json.dump(reverse_label_map, fp, indent=2)
+        result.append(output_labels)
 
         # envi mask
         logger.info("Writing envi mask: %s" % output_mask)
-        envi.save_image(output_mask, np.array(img), dtype=np.uint8, force=True, interleave='BSQ',
-                        metadata={'wavelength': wavelengths})
+        with metrics.time_stage("write"):
+            envi.save_image(output_mask, np.array(img), dtype=np.uint8, force=True, interleave='BSQ',
+                            metadata={'wavelength': wavelengths})
+        metrics.add_bytes_written(img.nbytes)
+        result.extend([output_mask, os.path.splitext(output_mask)[0] + ".img"])
+
+    return result
 
 
 def generate(input_dirs, output_dir, regexp=None, conversion=CONVERSION_PIXELS_THEN_POLYGONS, recursive=False,
@@ -425,7 +480,8 @@ def generate(input_dirs, output_dir, regexp=None, conversion=CONVERSION_PIXELS_T
              pattern_mask="mask.hdr", pattern_labels="mask.json",
              pattern_png=FILENAME_PH_SAMPLEID + ".png", pattern_opex=FILENAME_PH_SAMPLEID + ".json",
              pattern_envi=MASK_PREFIX + FILENAME_PH_SAMPLEID + ".hdr", no_implicit_background=False, unlabelled=0,
-             include_input=False, dry_run=False, resume_from=None):
+             include_input=False, dry_run=False, resume_from=None, metrics=None, journal=None, fingerprints=None,
+             continue_on_error=False):
     """
     Generates fake RGB images from the HSI images found in the specified directories.
 
@@ -477,7 +533,21 @@ def generate(input_dirs, output_dir, regexp=None, conversion=CONVERSION_PIXELS_T
     :type dry_run: bool
     :param resume_from: the directory to resume the processing from (determined dirs preceding this one will get skipped), ignored if None
     :type resume_from: str
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
+    :param journal: the journal for recording the completed annotations and skipping them when resuming, ignored if None
+    :type journal: Journal
+    :param fingerprints: for skipping annotations whose outputs are current, ignored if None
+    :type fingerprints: Fingerprints
+    :param continue_on_error: whether to log annotations that fail to convert and continue with the next one rather than aborting
+    :type continue_on_error: bool
     """
+    if metrics is None:
+        metrics = MetricsSink(PROG)
+    if journal is None:
+        journal = Journal()
+    if fingerprints is None:
+        fingerprints = Fingerprints()
 
     if output_format not in OUTPUT_FORMATS:
         raise Exception("Unknown output format: %s" % output_format)
@@ -563,12 +633,35 @@ def generate(input_dirs, output_dir, regexp=None, conversion=CONVERSION_PIXELS_T
 
     for i, ann_path in enumerate(ann_conts, start=1):
         logger.info("Converting %d/%d..." % (i, len(ann_conts)))
-        convert(ann_path, output_dir, datamanager, conversion=conversion, output_format=output_format,
-                pattern_mask=pattern_mask, pattern_labels=pattern_labels,
-                pattern_png=pattern_png, pattern_opex=pattern_opex, pattern_envi=pattern_envi,
-                labels=labels, include_input=include_input,
-                no_implicit_background=no_implicit_background, unlabelled=unlabelled,
-                dry_run=dry_run)
+        metrics.set_queue_depth(len(ann_conts) - i + 1)
+        key = os.path.abspath(ann_path.png)
+        if journal.is_done(key):
+            logger.info("Already completed, skipping: %s" % ann_path.png)
+            continue
+        fingerprint = None
+        if fingerprints.is_active():
+            fingerprint = fingerprints.compute(get_input_files(ann_path))
+            if fingerprints.is_current(output_dir, key, fingerprint):
+                logger.info("Outputs current, skipping: %s" % ann_path.png)
+                continue
+        try:
+            outputs = convert(ann_path, output_dir, datamanager, conversion=conversion, output_format=output_format,
+                    pattern_mask=pattern_mask, pattern_labels=pattern_labels,
+                    pattern_png=pattern_png, pattern_opex=pattern_opex, pattern_envi=pattern_envi,
+                    labels=labels, include_input=include_input,
+                    no_implicit_background=no_implicit_background, unlabelled=unlabelled,
+                    dry_run=dry_run, metrics=metrics)
+        except Exception:
+            metrics.sample_failed()
+            if not continue_on_error:
+                raise
+            logger.exception("Failed to convert: %s" % ann_path.png)
+            continue
+        if not dry_run:
+            journal.record(key, outputs)
+            fingerprints.update(output_dir, key, fingerprint, outputs)
+        metrics.sample_done()
+    metrics.set_queue_depth(0)
 
 
 def main(args=None):
@@ -581,7 +674,7 @@ def main(args=None):
     init_app()
     parser = argparse.ArgumentParser(
         description="Turns annotations (PNG, OPEX JSON, ENVI pixel annotations) into Happy ENVI format.",
-        prog="happy-ann2happy",
+        prog=PROG,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("-i", "--input_dir", nargs="+", metavar="DIR", type=str, help="Path to the PNG/OPEX/ENVI files", required=True)
     parser.add_argument("--regexp", type=str, metavar="REGEXP", help="The regexp for matching the ENVI base files (name only), e.g., for selecting a subset.", required=False, default=None)
@@ -607,20 +700,41 @@ def main(args=None):
     parser.add_argument("-I", "--include_input", action="store_true", help="whether to copy the PNG/JSON file across to the output dir", required=False)
     parser.add_argument("-n", "--dry_run", action="store_true", help="whether to omit generating any data or creating directories", required=False)
     parser.add_argument("--resume_from", metavar="DIR", type=str, help="The directory to restart the processing with (all determined dirs preceding this one get skipped)", required=False, default=None)
+    MetricsSink.add_arguments(parser)
+    Journal.add_arguments(parser)
+    Fingerprints.add_arguments(parser)
+    parser.add_argument("--continue_on_error", action="store_true", help="whether to log inputs that fail to process and continue with the next one rather than aborting (exits with an error at the end if any failed)", required=False)
     add_logging_level(parser, short_opt="-V")
     parsed = parser.parse_args(args=args)
     set_logging_level(logger, parsed.logging_level)
-    generate(parsed.input_dir, parsed.output_dir, regexp=parsed.regexp, conversion=parsed.conversion,
-             recursive=parsed.recursive, output_format=parsed.output_format, labels=parsed.labels.split(","),
-             black_ref_locator=parsed.black_ref_locator, black_ref_method=parsed.black_ref_method,
-             white_ref_locator=parsed.white_ref_locator, white_ref_method=parsed.white_ref_method,
-             white_ref_annotations=parsed.white_ref_annotations,
-             black_ref_locator_for_white_ref=parsed.black_ref_locator_for_white_ref,
-             black_ref_method_for_white_ref=parsed.black_ref_method_for_white_ref,
-             pattern_mask=parsed.pattern_mask, pattern_labels=parsed.pattern_labels,
-             pattern_png=parsed.pattern_png, pattern_opex=parsed.pattern_opex, pattern_envi=parsed.pattern_envi,
-             no_implicit_background=parsed.no_implicit_background, unlabelled=parsed.unlabelled,
-             include_input=parsed.include_input, dry_run=parsed.dry_run, resume_from=parsed.resume_from)
+    journal = Journal.from_arguments(parsed, PROG)
+    journal.logging_level = parsed.logging_level
+    # the options that the generated data depends on
+    pipeline = dict(vars(parsed))
+    for k in ["input_dir", "regexp", "recursive", "output_dir", "dry_run", "resume_from", "logging_level",
+              "metrics_file", "metrics_json", "metrics_port", "metrics_interval",
+              "journal", "journal_verify", "incremental", "fingerprint_hash", "continue_on_error"]:
+        pipeline.pop(k, None)
+    fingerprints = Fingerprints.from_arguments(parsed, json.dumps(pipeline, sort_keys=True))
+    fingerprints.logging_level = parsed.logging_level
+    metrics = MetricsSink.from_arguments(parsed, PROG)
+    metrics.logging_level = parsed.logging_level
+    with metrics:
+        generate(parsed.input_dir, parsed.output_dir, regexp=parsed.regexp, conversion=parsed.conversion,
+                 recursive=parsed.recursive, output_format=parsed.output_format, labels=parsed.labels.split(","),
+                 black_ref_locator=parsed.black_ref_locator, black_ref_method=parsed.black_ref_method,
+                 white_ref_locator=parsed.white_ref_locator, white_ref_method=parsed.white_ref_method,
+                 white_ref_annotations=parsed.white_ref_annotations,
+                 black_ref_locator_for_white_ref=parsed.black_ref_locator_for_white_ref,
+                 black_ref_method_for_white_ref=parsed.black_ref_method_for_white_ref,
+                 pattern_mask=parsed.pattern_mask, pattern_labels=parsed.pattern_labels,
+                 pattern_png=parsed.pattern_png, pattern_opex=parsed.pattern_opex, pattern_envi=parsed.pattern_envi,
+                 no_implicit_background=parsed.no_implicit_background, unlabelled=parsed.unlabelled,
+                 include_input=parsed.include_input, dry_run=parsed.dry_run, resume_from=parsed.resume_from,
+                 metrics=metrics, journal=journal, fingerprints=fingerprints,
+                 continue_on_error=parsed.continue_on_error)
+    if metrics.samples_failed > 0:
+        raise Exception("Failed to convert %d annotation(s)!" % metrics.samples_failed)
 
 
 def sys_main() -> int:
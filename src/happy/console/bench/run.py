@@ -0,0 +1,142 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+
+from wai.logging import add_logging_level, set_logging_level
+from happy.base.app import init_app
+from happy.bench import BenchmarkSuite, compare_benchmarks, write_synthetic_dataset, SYNTHETIC_DTYPES
+
+
+PROG = "happy-bench"
+
+logger = logging.getLogger(PROG)
+
+
+def has_samples(data_dir: str) -> bool:
+    """
+    Checks whether the directory contains any samples (ie sub-directories).
+
+    :param data_dir: the directory to check
+    :type data_dir: str
+    :return: True if at least one sample present
+    :rtype: bool
+    """
+    if not os.path.isdir(data_dir):
+        return False
+    return any([os.path.isdir(os.path.join(data_dir, x)) for x in os.listdir(data_dir)])
+
+
+def parse_plugin_options(plugin_options) -> dict:
+    """
+    Parses the plugin options ("name:options").
+
+    :param plugin_options: the options to parse, can be None
+    :type plugin_options: list
+    :return: the parsed options (plugin name -> options)
+    :rtype: dict
+    """
+    result = dict()
+    if plugin_options is None:
+        return result
+    for item in plugin_options:
+        if ":" not in item:
+            raise Exception("Expected format 'name:options' for plugin options, got: %s" % item)
+        name, options = item.split(":", 1)
+        result[name.strip()] = options.strip()
+    return result
+
+
+def main():
+    init_app()
+    parser = argparse.ArgumentParser(
+        description='Benchmarks reading, preprocessing, pixel selection, reference methods, predicting and writing '
+                    + 'on a HAPPy dataset and outputs the timings, throughput and peak memory as JSON. '
+                    + 'A synthetic dataset gets generated if the data directory does not contain any samples.',
+        prog=PROG,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-d', '--data_dir', type=str, help='The directory with the HAPPy dataset to use or to generate the synthetic dataset in; uses a temporary directory if omitted', required=False, default=None)
+    parser.add_argument('-H', '--height', type=int, help='The height of the synthetic cubes', required=False, default=128)
+    parser.add_argument('-W', '--width', type=int, help='The width of the synthetic cubes', required=False, default=128)
+    parser.add_argument('-B', '--bands', type=int, help='The number of bands of the synthetic cubes', required=False, default=200)
+    parser.add_argument('-t', '--dtype', choices=SYNTHETIC_DTYPES, help='The data type of the synthetic cubes', required=False, default="float32")
+    parser.add_argument('-n', '--num_samples', type=int, help='The number of synthetic samples', required=False, default=4)
+    parser.add_argument('-R', '--num_regions', type=int, help='The number of regions per synthetic sample', required=False, default=1)
+    parser.add_argument('-l', '--num_layers', type=int, help='The number of meta-data layers (besides the mask) of the synthetic samples, the first one is the target for the predictions', required=False, default=1)
+    parser.add_argument('-m', '--mask_sparsity', type=float, help='The fraction of pixels (0-1) to mark as background in the masks of the synthetic samples', required=False, default=0.5)
+    parser.add_argument('-S', '--seed', type=int, help='The seed to use for generating the synthetic samples', required=False, default=1)
+    parser.add_argument('-r', '--repeat', type=int, help='How often to run each benchmark (reports the median)', required=False, default=3)
+    parser.add_argument('-i', '--include', metavar="REGEXP", type=str, help='The regular expression that the benchmark names (group/plugin) must match', required=False, default=None)
+    parser.add_argument('-e', '--exclude', metavar="REGEXP", type=str, help='The regular expression for excluding benchmarks by name (group/plugin)', required=False, default=None)
+    parser.add_argument('-P', '--plugin_options', metavar="NAME:OPTIONS", type=str, help='The options to use for plugins, overriding the default ones (eg "pca:-n 10")', required=False, nargs="*", default=None)
+    parser.add_argument('-o', '--output_file', type=str, help='The JSON file to write the results to, outputs them on stdout if omitted', required=False, default=None)
+    parser.add_argument('-b', '--baseline', metavar="FILE", type=str, help='The JSON file with the results of a previous run to compare against', required=False, default=None)
+    parser.add_argument('-s', '--max_slowdown', type=float, help='The factor by which a benchmark can be slower than in the baseline before it counts as regression', required=False, default=1.25)
+    add_logging_level(parser, short_opt="-V")
+    args = parser.parse_args()
+    set_logging_level(logger, args.logging_level)
+
+    tmp_dir = None
+    data_dir = args.data_dir
+    if data_dir is None:
+        tmp_dir = tempfile.mkdtemp(prefix="happy-bench-data-")
+        data_dir = tmp_dir
+    try:
+        if not has_samples(data_dir):
+            logger.info("Generating synthetic dataset in: %s" % data_dir)
+            write_synthetic_dataset(data_dir, num_samples=args.num_samples, num_regions=args.num_regions,
+                                    height=args.height, width=args.width, bands=args.bands, dtype=args.dtype,
+                                    num_layers=args.num_layers, mask_sparsity=args.mask_sparsity, seed=args.seed)
+        suite = BenchmarkSuite(data_dir, repeat=args.repeat, include=args.include, exclude=args.exclude,
+                               options=parse_plugin_options(args.plugin_options))
+        suite.logging_level = args.logging_level
+        report = suite.run()
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline, "r") as fp:
+            baseline = json.load(fp)
+        report["comparison"] = compare_benchmarks(baseline, report, max_slowdown=args.max_slowdown)
+        regressions = [x for x in report["comparison"] if x["regression"]]
+
+    if args.output_file is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output_file, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+    for benchmark in report["benchmarks"]:
+        if "error" in benchmark:
+            logger.warning("%s failed: %s" % (benchmark["name"], benchmark["error"]))
+    if len(regressions) > 0:
+        for regression in regressions:
+            logger.error("%s: %.3fs -> %.3fs (x%.2f)" % (regression["name"], regression["baseline_seconds"],
+                                                         regression["seconds"], regression["ratio"]))
+        raise Exception("%d benchmark(s) slower than %.2f times the baseline!" % (len(regressions), args.max_slowdown))
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure.
+    """
+    try:
+        main()
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,14 @@ import numpy as np
 
 from wai.logging import add_logging_level, set_logging_level
 from happy.base.app import init_app
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation
 from happy.base.core import load_class
 from happy.evaluators import PredictionActualHandler, RegressionEvaluator
 from happy.models.generic import GenericSpectroscopyModel, GenericScikitSpectroscopyModel
 from happy.models.spectroscopy import create_false_color_image, SpectroscopyModel
 from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
 from happy.splitters import DataSplits
-from happy.writers import CSVTrainingDataWriter
+from happy.writers.base import CSVTrainingDataWriter
 
 
 PROG = "happy-generic-regression-build"
@@ -35,10 +36,12 @@ def main():
     parser.add_argument('-s', '--splits_file', type=str, help='Happy Splitter file')
     parser.add_argument('-o', '--output_folder', type=str, help='Output JSON file to store the predictions')
     parser.add_argument('-r', '--repeat_num', type=int, default=0, help='Repeat number (default: 1)')
+    add_instrumentation_arguments(parser)
     add_logging_level(parser, short_opt="-V")
 
     args = parser.parse_args()
     set_logging_level(logger, args.logging_level)
+    configure_instrumentation(args)
 
     # Create the output folder if it doesn't exist
     logger.info("Creating output dir: %s" % args.output_folder)
@@ -90,6 +93,8 @@ def main():
             false_color_image.save(os.path.join(args.output_folder, f'false_color_{i}.png'))
         evl.calculate_and_show_metrics()
 
+    output_instrumentation()
+
 
 def sys_main() -> int:
     """
@@ -6,6 +6,7 @@ import traceback
 
 from wai.logging import add_logging_level, set_logging_level
 from happy.base.app import init_app
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation
 from happy.base.core import load_class
 from happy.models.generic import GenericUnsupervisedPixelClusterer
 from happy.models.unsupervised_pixel_clusterer import create_false_color_image, create_prediction_image, UnsupervisedPixelClusterer
@@ -29,10 +30,12 @@ def main():
     parser.add_argument('-s', '--splits_file', type=str, help='Happy Splitter file', required=True)
     parser.add_argument('-o', '--output_folder', type=str, help='Output JSON file to store the predictions', required=True)
     parser.add_argument('-r', '--repeat_num', type=int, default=0, help='Repeat number (default: 0)')
+    add_instrumentation_arguments(parser)
     add_logging_level(parser, short_opt="-V")
 
     args = parser.parse_args()
     set_logging_level(logger, args.logging_level)
+    configure_instrumentation(args)
 
     # Create the output folder if it doesn't exist
     logger.info("Creating output dir: %s" % args.output_folder)
@@ -67,6 +70,8 @@ def main():
         false_color_image = create_false_color_image(prediction)
         false_color_image.save(os.path.join(args.output_folder, f'false_color_{i}.png'))
 
+    output_instrumentation()
+
 
 def sys_main() -> int:
     """
@@ -1,20 +1,26 @@
 import argparse
 import logging
 import os
+import random
+import tempfile
 import traceback
 
 import numpy as np
 
 from wai.logging import add_logging_level, set_logging_level
 from happy.base.app import init_app
-from happy.evaluators import PredictionActualHandler, RegressionEvaluator
+from happy.base.precision import add_compute_dtype_argument, set_compute_dtype
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation
+from happy.evaluators import CrossValidationExecutor, PredictionActualHandler, RegressionEvaluator
 from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
 from happy.models.sklearn import create_model, REGRESSION_MODEL_MAP
 from happy.models.spectroscopy import create_false_color_image
 from happy.pixel_selectors import MultiSelector, PixelSelector
 from happy.preprocessors import Preprocessor, MultiPreprocessor
 from happy.splitters import DataSplits
-from happy.writers import CSVTrainingDataWriter
+from happy.models.dataset_cache import DatasetCache
+from happy.models.prediction_mask import PredictionMask
+from happy.writers.base import CSVTrainingDataWriter
 
 
 PROG = "happy-scikit-regression-build"
@@ -40,6 +46,33 @@ def default_pixel_selectors() -> str:
     return " ".join(args)
 
 
+def cross_validate(args: argparse.Namespace, splits: DataSplits, model: ScikitSpectroscopyModel):
+    """
+    Evaluates the model on all the repeats/folds of the splits.
+
+    :param args: the parsed command-line options
+    :type args: argparse.Namespace
+    :param splits: the splits to evaluate
+    :type splits: DataSplits
+    :param model: the model to evaluate
+    :type model: ScikitSpectroscopyModel
+    :return: iterator of repeat, fold, prediction images and actual images
+    :rtype: iterator
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = tmp_dir if (args.cache_dir is None) else args.cache_dir
+        logger.info("Using dataset cache: %s" % cache_dir)
+        cache = DatasetCache(cache_dir)
+        cache.logging_level = args.logging_level
+        max_memory = None if (args.max_memory is None) else args.max_memory * 1024 * 1024
+        executor = CrossValidationExecutor(splits, model, cache, preprocessors=args.preprocessors, seed=args.seed,
+                                           num_jobs=args.num_jobs, max_memory=max_memory,
+                                           mask=PredictionMask.from_arguments(args))
+        executor.logging_level = args.logging_level
+        for result in executor.execute():
+            yield result
+
+
 def main():
     init_app()
     parser = argparse.ArgumentParser(
@@ -55,10 +88,25 @@ def main():
     parser.add_argument('-s', '--splits_file', type=str, help='Happy Splitter file', required=True)
     parser.add_argument('-o', '--output_folder', type=str, help='Output JSON file to store the predictions', required=True)
     parser.add_argument('-r', '--repeat_num', type=int, default=0, help='Repeat number (default: 0)')
+    parser.add_argument('-C', '--cache_dir', type=str, help='The directory for caching the generated training data; subsequent runs with the same data, splits, pre-processing, pixel selectors and seed skip the data generation', required=False, default=None)
+    parser.add_argument('--model_dir', type=str, help='The directory to save the fitted model in (as model bundle), for making predictions without re-training', required=False, default=None)
+    parser.add_argument('--seed', type=int, help='The seed to use for the random number generators (eg used by the pixel selectors)', required=False, default=None)
+    add_compute_dtype_argument(parser)
+    parser.add_argument('-X', '--cross_validation', action='store_true', help='Whether to evaluate all the repeats/folds of the splits rather than just the first train/test split', required=False)
+    parser.add_argument('-j', '--num_jobs', type=int, help='The number of worker processes to use for the cross-validation', required=False, default=1)
+    parser.add_argument('-M', '--max_memory', type=int, help='The memory budget (in MB) for the folds that get evaluated concurrently during cross-validation, no limit if not specified', required=False, default=None)
+    PredictionMask.add_arguments(parser)
+    add_instrumentation_arguments(parser)
     add_logging_level(parser, short_opt="-V")
 
     args = parser.parse_args()
     set_logging_level(logger, args.logging_level)
+    configure_instrumentation(args)
+    set_compute_dtype(args.compute_dtype)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
 
     # Create the output folder if it doesn't exist
     logger.info("Creating output dir: %s" % args.output_folder)
@@ -83,14 +131,32 @@ def main():
 
     # model
     model = ScikitSpectroscopyModel(args.happy_data_base_dir, args.target_value, happy_preprocessor=preproc, additional_meta_data=None, pixel_selector=train_pixel_selectors, model=regression_method, training_data=None)
+    if args.cross_validation:
+        evl = RegressionEvaluator(splits, model, args.target_value)
+        for repeat, fold, predictions, actuals in cross_validate(args, splits, model):
+            for prediction, actual in zip(predictions, actuals):
+                evl.accumulate_stats(np.array(prediction), actual, repeat, fold)
+        evl.calculate_and_show_metrics()
+        output_instrumentation()
+        return
+
+    if args.cache_dir is not None:
+        logger.info("Using dataset cache: %s" % args.cache_dir)
+        cache = DatasetCache(args.cache_dir)
+        cache.logging_level = args.logging_level
+        key = cache.compute_key(args.happy_data_base_dir, train_ids, args.preprocessors, pixel_selector=train_pixel_selectors, seed=args.seed, target=args.target_value)
+        model.training_data = cache.get(key, lambda: model.generate_training_dataset(train_ids))
     logger.info("Fitting model...")
-    model.fit(train_ids, force=True, keep_training_data=False)
+    model.fit(train_ids, force=(args.cache_dir is None), keep_training_data=False)
+    if args.model_dir is not None:
+        logger.info("Saving model: %s" % args.model_dir)
+        model.save_model(args.model_dir, preprocessors=args.preprocessors)
     
     csv_writer = CSVTrainingDataWriter(args.output_folder)
     csv_writer.write_data(model.get_training_data(), "training_data")
 
     logger.info("Predicting...")
-    predictions, actuals = model.predict_images(test_ids, return_actuals=True)
+    predictions, actuals = model.predict_images(test_ids, return_actuals=True, mask=PredictionMask.from_arguments(args))
     
     evl = RegressionEvaluator(splits, model, args.target_value)
 
@@ -112,6 +178,8 @@ def main():
         false_color_image.save(os.path.join(args.output_folder, f'false_color_{i}.png'))
     evl.calculate_and_show_metrics()
 
+    output_instrumentation()
+
 
 def sys_main() -> int:
     """
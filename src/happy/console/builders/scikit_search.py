@@ -0,0 +1,315 @@
+import argparse
+import ast
+import csv
+import itertools
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+import traceback
+
+import numpy as np
+
+from typing import Dict, List, Tuple
+
+from joblib import Parallel, delayed
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, accuracy_score, f1_score
+from wai.logging import add_logging_level, set_logging_level
+from happy.base.app import init_app
+from happy.base.precision import add_compute_dtype_argument, set_compute_dtype
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation
+from happy.models.dataset_cache import DatasetCache
+from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+from happy.models.sklearn import create_model, REGRESSION_MODEL_MAP, CLASSIFICATION_MODEL_MAP
+from happy.pixel_selectors import MultiSelector, PixelSelector
+from happy.preprocessors import Preprocessor, MultiPreprocessor
+from happy.splitters import DataSplits
+
+
+PROG = "happy-scikit-search"
+
+logger = logging.getLogger(PROG)
+
+METRICS = {
+    # name: (function, higher is better, classification)
+    "r2": (r2_score, True, False),
+    "rmse": (lambda a, p: math.sqrt(mean_squared_error(a, p)), False, False),
+    "mae": (mean_absolute_error, False, False),
+    "accuracy": (accuracy_score, True, True),
+    "f1": (lambda a, p: f1_score(a, p, average="macro"), True, True),
+}
+
+DEFAULT_METRIC_REGRESSION = "r2"
+
+DEFAULT_METRIC_CLASSIFICATION = "accuracy"
+
+
+def default_preprocessors() -> str:
+    args = [
+        "wavelength-subset -f 60 -t 189",
+        "sni",
+        "snv",
+        "derivative -w 15",
+        "pad -W 128 -H 128 -v 0",
+    ]
+    return " ".join(args)
+
+
+def default_pixel_selectors() -> str:
+    args = [
+        "ps-simple -n 64",
+    ]
+    return " ".join(args)
+
+
+def load_search_space(space: str) -> Dict:
+    """
+    Parses the search space, either a Python dictionary string or a file containing one.
+    Each parameter maps either to a list of values or to a distribution dictionary with
+    keys 'type' (uniform|loguniform|int), 'min' and 'max'.
+
+    :param space: the search space or file with it
+    :type space: str
+    :return: the search space
+    :rtype: dict
+    """
+    if os.path.isfile(space):
+        with open(space, "r") as fp:
+            space = fp.read()
+    result = ast.literal_eval(space)
+    if not isinstance(result, dict):
+        raise Exception("Search space must be a dictionary, but got: %s" % str(type(result)))
+    for k, v in result.items():
+        if isinstance(v, dict):
+            if ("type" not in v) or ("min" not in v) or ("max" not in v):
+                raise Exception("Distribution for parameter '%s' requires keys 'type', 'min' and 'max': %s" % (k, str(v)))
+            if v["type"] not in ["uniform", "loguniform", "int"]:
+                raise Exception("Unsupported distribution type for parameter '%s': %s" % (k, v["type"]))
+        elif not isinstance(v, (list, tuple)):
+            raise Exception("Parameter '%s' requires either list of values or distribution, but got: %s" % (k, str(v)))
+    return result
+
+
+def generate_candidates(space: Dict, num_candidates: int = None, seed: int = None) -> List[Dict]:
+    """
+    Generates the parameter settings to evaluate. If the number of candidates is not specified,
+    all the combinations of the value lists are generated (grid search), otherwise the
+    specified number of settings get sampled (random search).
+
+    :param space: the search space
+    :type space: dict
+    :param num_candidates: the number of settings to sample, None for grid search
+    :type num_candidates: int
+    :param seed: the seed for the random search
+    :type seed: int
+    :return: the list of parameter settings
+    :rtype: list
+    """
+    names = sorted(space.keys())
+    if num_candidates is None:
+        for name in names:
+            if isinstance(space[name], dict):
+                raise Exception("Grid search requires lists of values, but parameter '%s' uses a distribution!" % name)
+        return [dict(zip(names, values)) for values in itertools.product(*[space[name] for name in names])]
+
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(num_candidates):
+        params = dict()
+        for name in names:
+            v = space[name]
+            if isinstance(v, dict):
+                if v["type"] == "int":
+                    params[name] = rnd.randint(v["min"], v["max"])
+                elif v["type"] == "loguniform":
+                    params[name] = math.exp(rnd.uniform(math.log(v["min"]), math.log(v["max"])))
+                else:
+                    params[name] = rnd.uniform(v["min"], v["max"])
+            else:
+                params[name] = rnd.choice(v)
+        result.append(params)
+    return result
+
+
+def evaluate_candidate(estimator, params: Dict, X_train: np.ndarray, y_train: np.ndarray,
+                       X_val: np.ndarray, y_val: np.ndarray, metrics: List[str]) -> Tuple[Dict, Dict, float]:
+    """
+    Trains the estimator with the parameter setting and evaluates it on the validation data.
+
+    :param estimator: the template estimator, gets cloned
+    :param params: the parameter setting to use
+    :type params: dict
+    :param X_train: the training data
+    :type X_train: np.ndarray
+    :param y_train: the training targets
+    :type y_train: np.ndarray
+    :param X_val: the validation data
+    :type X_val: np.ndarray
+    :param y_val: the validation targets
+    :type y_val: np.ndarray
+    :param metrics: the metrics to compute
+    :type metrics: list
+    :return: the tuple of parameter setting, metric values and training time in seconds
+    :rtype: tuple
+    """
+    model = clone(estimator)
+    model.set_params(**params)
+    start = time.time()
+    model.fit(X_train, y_train)
+    duration = time.time() - start
+    predictions = np.asarray(model.predict(X_val)).reshape(y_val.shape)
+    scores = dict()
+    for metric in metrics:
+        scores[metric] = float(METRICS[metric][0](y_val, predictions))
+    return params, scores, duration
+
+
+def output_results(results: List[Tuple[Dict, Dict, float]], metrics: List[str], output_file: str = None):
+    """
+    Outputs the ranked results as table, either on stdout or as CSV file.
+
+    :param results: the ranked results (params, scores, time)
+    :type results: list
+    :param metrics: the metrics that were computed
+    :type metrics: list
+    :param output_file: the CSV file to write to, stdout if None
+    :type output_file: str
+    """
+    names = sorted(set(itertools.chain(*[r[0].keys() for r in results])))
+    header = ["rank"] + metrics + ["fit_time"] + names
+    rows = []
+    for i, (params, scores, duration) in enumerate(results):
+        rows.append([str(i + 1)] + ["%.6f" % scores[m] for m in metrics] + ["%.3f" % duration] + [str(params.get(n)) for n in names])
+
+    if output_file is not None:
+        with open(output_file, "w", newline="") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return
+
+    widths = [max([len(header[i])] + [len(row[i]) for row in rows]) for i in range(len(header))]
+    for row in [header, ["-" * w for w in widths]] + rows:
+        print("  ".join(row[i].ljust(widths[i]) for i in range(len(header))).rstrip())
+
+
+def main():
+    init_app()
+    parser = argparse.ArgumentParser(
+        description='Searches the hyperparameter space of a scikit-learn model on Happy Data. The training and validation data get generated only once and shared between the candidates.',
+        prog=PROG,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-d', '--happy_data_base_dir', type=str, help='Directory containing the Happy Data files', required=True)
+    parser.add_argument('-P', '--preprocessors', type=str, help='The preprocessors to apply to the data. Either preprocessor command-line(s) or file with one preprocessor command-line per line.', required=False, default=default_preprocessors())
+    parser.add_argument('-S', '--pixel_selectors', type=str, help='The pixel selectors to use. Either pixel selector command-line(s) or file with one pixel selector command-line per line.', required=False, default=default_pixel_selectors())
+    parser.add_argument('-m', '--method', type=str, default="ridge", help='Regression/classification method name (e.g., ' + ",".join(list(REGRESSION_MODEL_MAP.keys()) + list(CLASSIFICATION_MODEL_MAP.keys())) + ' or full class name)')
+    parser.add_argument('-p', '--params', type=str, default="{}", help='JSON string containing the fixed parameters of the method')
+    parser.add_argument('-g', '--search_space', type=str, help='The search space, either Python dictionary string or file with it. Parameters map either to a list of values or to a distribution, e.g.: {"alpha": {"type": "loguniform", "min": 0.001, "max": 10}} (types: uniform, loguniform, int)', required=True)
+    parser.add_argument('-n', '--num_candidates', type=int, help='The number of candidates to sample (random search); performs a grid search if not specified', required=False, default=None)
+    parser.add_argument('-e', '--metric', choices=sorted(METRICS.keys()), help='The metric to rank the candidates by; uses ' + DEFAULT_METRIC_REGRESSION + ' for regression and ' + DEFAULT_METRIC_CLASSIFICATION + ' for classification if not specified', required=False, default=None)
+    parser.add_argument('-t', '--target_value', type=str, help='Target value column name', required=True)
+    parser.add_argument('-s', '--splits_file', type=str, help='Happy Splitter file', required=True)
+    parser.add_argument('-r', '--repeat_num', type=int, default=0, help='The repeat to use from the splits')
+    parser.add_argument('-f', '--fold_num', type=int, default=0, help='The fold to use from the splits; the candidates are evaluated on the validation set (or the test set if empty)')
+    parser.add_argument('-j', '--num_jobs', type=int, help='The number of candidates to evaluate in parallel', required=False, default=1)
+    parser.add_argument('-C', '--cache_dir', type=str, help='The directory for caching the generated training/validation data; uses a temporary directory if not specified', required=False, default=None)
+    parser.add_argument('--seed', type=int, help='The seed to use for the random number generators (eg used by the pixel selectors and the random search)', required=False, default=None)
+    add_compute_dtype_argument(parser)
+    parser.add_argument('-o', '--output_file', type=str, help='The CSV file to write the ranked results to, outputs them on stdout if not specified', required=False, default=None)
+    add_instrumentation_arguments(parser)
+    add_logging_level(parser, short_opt="-V")
+
+    args = parser.parse_args()
+    set_logging_level(logger, args.logging_level)
+    configure_instrumentation(args)
+    set_compute_dtype(args.compute_dtype)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    # method
+    logger.info("Creating method: %s, options: %s" % (args.method, str(args.params)))
+    estimator = create_model(args.method, args.params)
+    classification = is_classifier(estimator)
+    metric = args.metric
+    if metric is None:
+        metric = DEFAULT_METRIC_CLASSIFICATION if classification else DEFAULT_METRIC_REGRESSION
+    metrics = [m for m in sorted(METRICS.keys()) if METRICS[m][2] == classification]
+    if metric not in metrics:
+        raise Exception("Metric '%s' not applicable to %s!" % (metric, "classification" if classification else "regression"))
+    metrics.remove(metric)
+    metrics.insert(0, metric)
+
+    # candidates
+    space = load_search_space(args.search_space)
+    candidates = generate_candidates(space, num_candidates=args.num_candidates, seed=args.seed)
+    logger.info("# candidates: %d" % len(candidates))
+    if len(candidates) == 0:
+        raise Exception("No candidates to evaluate!")
+
+    # splits
+    logger.info("Loading splits: %s" % args.splits_file)
+    splits = DataSplits.load(args.splits_file)
+    train_ids, valid_ids, test_ids = splits.get_train_validation_test_splits(args.repeat_num, args.fold_num)
+    if len(valid_ids) == 0:
+        logger.info("No validation set, using test set")
+        valid_ids = test_ids
+
+    # pixel selector
+    logger.info("Creating pixel selector")
+    train_pixel_selectors = MultiSelector(PixelSelector.parse_pixel_selectors(args.pixel_selectors))
+
+    # preprocessing
+    logger.info("Creating pre-processing")
+    preproc = MultiPreprocessor(preprocessor_list=Preprocessor.parse_preprocessors(args.preprocessors))
+
+    # data
+    model = ScikitSpectroscopyModel(args.happy_data_base_dir, args.target_value, happy_preprocessor=preproc, additional_meta_data=None, pixel_selector=train_pixel_selectors, model=estimator, training_data=None)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = tmp_dir if (args.cache_dir is None) else args.cache_dir
+        logger.info("Using dataset cache: %s" % cache_dir)
+        cache = DatasetCache(cache_dir)
+        cache.logging_level = args.logging_level
+        datasets = []
+        for ids, purpose in [(train_ids, "train"), (valid_ids, "validation")]:
+            key = cache.compute_key(args.happy_data_base_dir, ids, args.preprocessors, pixel_selector=train_pixel_selectors, seed=args.seed, target=args.target_value, purpose=purpose)
+            datasets.append(cache.get(key, lambda: model.generate_training_dataset(ids)))
+        # cached arrays are memory-mapped, which joblib passes on to the workers without copying
+        X_train = np.asarray(datasets[0]["X_train"])
+        y_train = np.asarray(datasets[0]["y_train"])
+        X_val = np.asarray(datasets[1]["X_train"])
+        y_val = np.asarray(datasets[1]["y_train"])
+        logger.info("train: %s, validation: %s" % (str(X_train.shape), str(X_val.shape)))
+
+        logger.info("Evaluating candidates...")
+        results = Parallel(n_jobs=args.num_jobs)(
+            delayed(evaluate_candidate)(estimator, params, X_train, y_train, X_val, y_val, metrics) for params in candidates)
+
+    # rank
+    results.sort(key=lambda r: r[1][metric], reverse=METRICS[metric][1])
+    output_results(results, metrics, output_file=args.output_file)
+
+    output_instrumentation()
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure.
+    """
+    try:
+        main()
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 import argparse
 import logging
 import os
+import random
 import traceback
 
+import numpy as np
+
 from wai.logging import add_logging_level, set_logging_level
 from happy.base.app import init_app
+from happy.base.precision import add_compute_dtype_argument, set_compute_dtype
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation
 from happy.splitters import DataSplits
+from happy.models.dataset_cache import DatasetCache
+from happy.models.prediction_mask import PredictionMask
 from happy.models.sklearn import create_model, CLUSTERING_MODEL_MAP
 from happy.models.unsupervised_pixel_clusterer import UnsupervisedPixelClusterer, create_false_color_image, create_prediction_image
 from happy.pixel_selectors import MultiSelector, PixelSelector
@@ -48,10 +55,26 @@ def main():
     parser.add_argument('-s', '--splits_file', type=str, help='Happy Splitter file', required=True)
     parser.add_argument('-o', '--output_folder', type=str, help='Output JSON file to store the predictions', required=True)
     parser.add_argument('-r', '--repeat_num', type=int, default=0, help='Repeat number (default: 0)')
+    parser.add_argument('-C', '--cache_dir', type=str, help='The directory for caching the generated training data; subsequent runs with the same data, splits, pre-processing, pixel selectors and seed skip the data generation', required=False, default=None)
+    parser.add_argument('--seed', type=int, help='The seed to use for the random number generators (eg used by the pixel selectors)', required=False, default=None)
+    add_compute_dtype_argument(parser)
+    parser.add_argument('--streaming', action='store_true', help='Whether to train the clusterer incrementally, sample by sample (requires clusterer with partial_fit, e.g., minibatchkmeans or birch); the cache directory gets ignored', required=False)
+    parser.add_argument('--all_pixels', action='store_true', help='Whether to use all pixels for training in streaming mode rather than the ones chosen by the pixel selectors', required=False)
+    parser.add_argument('--batch_size', type=int, help='The number of pixels to feed to the clusterer at a time in streaming mode', required=False, default=10000)
+    parser.add_argument('--num_passes', type=int, help='The number of passes over the training samples in streaming mode', required=False, default=1)
+    parser.add_argument('--chunk_size', type=int, help='The maximum number of pixels to label at a time when predicting, whole images if not specified', required=False, default=None)
+    PredictionMask.add_arguments(parser)
+    add_instrumentation_arguments(parser)
     add_logging_level(parser, short_opt="-V")
 
     args = parser.parse_args()
     set_logging_level(logger, args.logging_level)
+    configure_instrumentation(args)
+    set_compute_dtype(args.compute_dtype)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
 
     # Create the output folder if it doesn't exist
     logger.info("Creating output dir: %s" % args.output_folder)
@@ -77,12 +100,23 @@ def main():
     clusterer = UnsupervisedPixelClusterer(args.data_folder, 'target_variable_name', clusterer=cluster_model, pixel_selector=predict_pixel_selector, happy_preprocessor=preproc)
 
     # Fit the clusterer
-    logger.info("Fitting model...")
-    clusterer.fit(train_ids)
+    training_data = None
+    if args.streaming:
+        logger.info("Fitting model (streaming)...")
+        clusterer.fit_streaming(train_ids, all_pixels=args.all_pixels, batch_size=args.batch_size, num_passes=args.num_passes)
+    elif args.cache_dir is not None:
+        logger.info("Using dataset cache: %s" % args.cache_dir)
+        cache = DatasetCache(args.cache_dir)
+        cache.logging_level = args.logging_level
+        key = cache.compute_key(args.data_folder, train_ids, args.preprocessors, pixel_selector=predict_pixel_selector, seed=args.seed)
+        training_data = cache.get(key, lambda: clusterer.generate_prediction_dataset(train_ids, return_actuals=False))
+    if not args.streaming:
+        logger.info("Fitting model...")
+        clusterer.fit(train_ids, training_data=training_data)
 
     # Predict cluster labels
     logger.info("Predicting...")
-    predictions, actuals = clusterer.predict_images(test_ids)
+    predictions, actuals = clusterer.predict_images(test_ids, chunk_size=args.chunk_size, mask=PredictionMask.from_arguments(args))
 
     # Create grayscale and false color images for visualization
     for i, prediction in enumerate(predictions):
@@ -92,6 +126,8 @@ def main():
         false_color_image = create_false_color_image(prediction)
         false_color_image.save(os.path.join(args.output_folder, f'false_color_{i}.png'))
 
+    output_instrumentation()
+
 
 def sys_main() -> int:
     """
@@ -8,6 +8,8 @@ from PIL import Image
 from wai.logging import add_logging_level, set_logging_level
 
 from happy.base.app import init_app
+from happy.base.journal import Journal
+from happy.base.metrics import MetricsSink
 from happy.data import DataManager
 
 
@@ -27,7 +29,7 @@ def log(msg):
 
 def convert(input_path, output_path, datamanager,
             autodetect_channels=True, red_channel=0, green_channel=0, blue_channel=0,
-            width=None, height=None, dry_run=False):
+            width=None, height=None, dry_run=False, metrics=None):
     """
     Converts the specified file.
 
@@ -51,10 +53,16 @@ def convert(input_path, output_path, datamanager,
     :type height: int
     :param dry_run: whether to omit saving the PNG images
     :type dry_run: bool
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
     """
     log("- %s" % input_path)
+    if metrics is None:
+        metrics = MetricsSink(PROG)
 
-    datamanager.load_scan(input_path)
+    with metrics.time_stage("load"):
+        datamanager.load_scan(input_path)
+    metrics.add_bytes_read(datamanager.scan_data.nbytes)
 
     if autodetect_channels:
         try:
@@ -66,23 +74,52 @@ def convert(input_path, output_path, datamanager,
         except:
             pass
 
-    datamanager.update_image(red_channel, green_channel, blue_channel)
-    image = Image.fromarray(datamanager.display_image)
-    act_width, act_height = image.size
-    if width > 0:
-        act_width = width
-    if height > 0:
-        act_height = height
-    image = image.resize((act_width, act_height), Image.LANCZOS)
+    with metrics.time_stage("convert"):
+        datamanager.update_image(red_channel, green_channel, blue_channel)
+        image = Image.fromarray(datamanager.display_image)
+        act_width, act_height = image.size
+        if width > 0:
+            act_width = width
+        if height > 0:
+            act_height = height
+        image = image.resize((act_width, act_height), Image.LANCZOS)
     log("  --> %s" % output_path)
     if not dry_run:
-        image.save(output_path)
+        with metrics.time_stage("write"):
+            image.save(output_path)
+        metrics.add_bytes_written(os.path.getsize(output_path))
+
+
+def count_files(input_dirs, extension=".hdr", recursive=False) -> int:
+    """
+    Counts the HSI images in the specified directories.
+
+    :param input_dirs: the input dir(s) to traverse
+    :type input_dirs: str or list
+    :param extension: the extension (incl dot) that the HSI images must have
+    :type extension: str
+    :param recursive: whether to traverse the input dir(s) recursively or not
+    :type recursive: bool
+    :return: the number of images
+    :rtype: int
+    """
+    if isinstance(input_dirs, str):
+        input_dirs = [input_dirs]
+    result = 0
+    for input_dir in input_dirs:
+        for f in os.listdir(input_dir):
+            path = os.path.join(input_dir, f)
+            if recursive and os.path.isdir(path):
+                result += count_files(path, extension=extension, recursive=True)
+            if f.endswith(extension):
+                result += 1
+    return result
 
 
 def generate(input_dirs, datamanager, extension=".hdr",
              autodetect_channels=True, red_channel=0, green_channel=0, blue_channel=0,
              recursive=False, output_dir=None, width=None, height=None,
-             dry_run=False, excluded=None):
+             dry_run=False, excluded=None, metrics=None, journal=None, continue_on_error=False):
     """
     Generates fake RGB images from the HSI images found in the specified directories.
 
@@ -112,6 +149,12 @@ def generate(input_dirs, datamanager, extension=".hdr",
     :type dry_run: bool
     :param excluded: set of excluded files
     :type excluded: set
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
+    :param journal: the journal for recording the completed images and skipping them when resuming, ignored if None
+    :type journal: Journal
+    :param continue_on_error: whether to log images that fail to convert and continue with the next one rather than aborting
+    :type continue_on_error: bool
     """
 
     if isinstance(input_dirs, str):
@@ -120,6 +163,12 @@ def generate(input_dirs, datamanager, extension=".hdr",
     if excluded is None:
         excluded = set()
 
+    if metrics is None:
+        metrics = MetricsSink(PROG)
+
+    if journal is None:
+        journal = Journal()
+
     for input_dir in input_dirs:
         log("Entering: %s" % input_dir)
 
@@ -134,17 +183,34 @@ def generate(input_dirs, datamanager, extension=".hdr",
                          autodetect_channels=autodetect_channels,
                          red_channel=red_channel, green_channel=green_channel, blue_channel=blue_channel,
                          recursive=True, output_dir=output_dir, width=width, height=height,
-                         dry_run=dry_run, excluded=excluded)
+                         dry_run=dry_run, excluded=excluded, metrics=metrics, journal=journal,
+                         continue_on_error=continue_on_error)
 
             if f.endswith(extension):
                 if output_dir is None:
                     output_path = os.path.join(input_dir, os.path.splitext(f)[0] + ".png")
                 else:
                     output_path = os.path.join(output_dir, os.path.splitext(f)[0] + ".png")
-                convert(input_path, output_path, datamanager,
-                        autodetect_channels=autodetect_channels,
-                        red_channel=red_channel, green_channel=green_channel, blue_channel=blue_channel,
-                        width=width, height=height, dry_run=dry_run)
+                if journal.is_done(os.path.abspath(input_path)):
+                    log("- %s (already completed, skipping)" % input_path)
+                    metrics.add_queue_depth(-1)
+                    continue
+                try:
+                    convert(input_path, output_path, datamanager,
+                            autodetect_channels=autodetect_channels,
+                            red_channel=red_channel, green_channel=green_channel, blue_channel=blue_channel,
+                            width=width, height=height, dry_run=dry_run, metrics=metrics)
+                except Exception:
+                    metrics.sample_failed()
+                    if not continue_on_error:
+                        raise
+                    logger.exception("Failed to convert: %s" % input_path)
+                    continue
+                finally:
+                    metrics.add_queue_depth(-1)
+                if not dry_run:
+                    journal.record(os.path.abspath(input_path), [output_path])
+                metrics.sample_done()
 
 
 def main(args=None):
@@ -174,6 +240,9 @@ def main(args=None):
     parser.add_argument("--width", metavar="INT", help="the width to scale the images to (<= 0 uses image dimension)", default=0, type=int, required=False)
     parser.add_argument("--height", metavar="INT", help="the height to scale the images to (<= 0 uses image dimension)", default=0, type=int, required=False)
     parser.add_argument("-n", "--dry_run", action="store_true", help="whether to omit saving the PNG images", required=False)
+    MetricsSink.add_arguments(parser)
+    Journal.add_arguments(parser)
+    parser.add_argument("--continue_on_error", action="store_true", help="whether to log inputs that fail to process and continue with the next one rather than aborting (exits with an error at the end if any failed)", required=False)
     add_logging_level(parser, short_opt="-V")
     parsed = parser.parse_args(args=args)
 
@@ -185,11 +254,21 @@ def main(args=None):
     datamanager.set_whiteref_locator(parsed.white_ref_locator)
     datamanager.set_whiteref_method(parsed.white_ref_method)
 
-    generate(parsed.input_dir, datamanager,
-             extension=parsed.extension, autodetect_channels=parsed.autodetect_channels,
-             red_channel=parsed.red, green_channel=parsed.green, blue_channel=parsed.blue,
-             recursive=parsed.recursive, output_dir=parsed.output_dir, width=parsed.width, height=parsed.height,
-             dry_run=parsed.dry_run)
+    journal = Journal.from_arguments(parsed, PROG)
+    journal.logging_level = parsed.logging_level
+    metrics = MetricsSink.from_arguments(parsed, PROG)
+    metrics.logging_level = parsed.logging_level
+    if metrics.is_active():
+        metrics.set_queue_depth(count_files(parsed.input_dir, extension=parsed.extension, recursive=parsed.recursive))
+    with metrics:
+        generate(parsed.input_dir, datamanager,
+                 extension=parsed.extension, autodetect_channels=parsed.autodetect_channels,
+                 red_channel=parsed.red, green_channel=parsed.green, blue_channel=parsed.blue,
+                 recursive=parsed.recursive, output_dir=parsed.output_dir, width=parsed.width, height=parsed.height,
+                 dry_run=parsed.dry_run, metrics=metrics, journal=journal,
+                 continue_on_error=parsed.continue_on_error)
+    if metrics.samples_failed > 0:
+        raise Exception("Failed to convert %d image(s)!" % metrics.samples_failed)
 
 
 def sys_main() -> int:
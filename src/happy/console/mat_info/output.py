@@ -1,7 +1,6 @@
 import argparse
 import numpy as np
 import os
-import scipy.io as sio
 import sys
 import traceback
 
@@ -18,6 +17,7 @@ def main():
     parser.add_argument('-o', '--output_file', type=str, help='Path to the output file; outputs to stdout if omitted', default=None)
     args = parser.parse_args()
 
+    import scipy.io as sio
     mat_file = sio.loadmat(args.input_file)
     struct_names = [name for name in mat_file.keys() if isinstance(mat_file[name], np.ndarray)]
 
@@ -0,0 +1,166 @@
+import argparse
+import io
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import traceback
+
+import numpy as np
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wai.logging import add_logging_level, set_logging_level
+from happy.base.app import init_app
+from happy.models.model_bundle import load_model
+from happy.models.prediction_mask import PredictionMask
+from happy.models.prediction_service import PredictionService
+
+
+PROG = "happy-predict-server"
+
+CONTENT_TYPE_JSON = "application/json"
+
+CONTENT_TYPE_NPY = "application/x-npy"
+
+CONTENT_TYPE_NPZ = "application/x-npz"
+
+logger = logging.getLogger(PROG)
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the HTTP requests:
+    GET /health - returns the status as JSON
+    POST /predict - JSON with 'path' of the scan or .npy array (height, width, bands) as body,
+    returns the prediction images as .npz (arr_0, arr_1, ...)
+    """
+
+    def address_string(self) -> str:
+        # unix sockets have no client address
+        if isinstance(self.client_address, tuple) and (len(self.client_address) > 0):
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def _send(self, code: int, content_type: str, body: bytes):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, code: int, d: dict):
+        self._send(code, CONTENT_TYPE_JSON, json.dumps(d).encode("utf-8"))
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "Unknown path: %s" % self.path})
+            return
+        service = self.server.service
+        self._send_json(200, {"status": "ok", "batches": service.num_batches, "requests": service.num_requests})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "Unknown path: %s" % self.path})
+            return
+        service = self.server.service
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        content_type = self.headers.get("Content-Type", CONTENT_TYPE_JSON)
+        try:
+            if content_type.startswith(CONTENT_TYPE_NPY):
+                images = [service.predict_array(np.load(io.BytesIO(body), allow_pickle=False))]
+            else:
+                d = json.loads(body.decode("utf-8"))
+                if "path" not in d:
+                    raise Exception("No 'path' provided!")
+                images = service.predict_path(d["path"])
+        except Exception as e:
+            logger.error("Failed to process request: %s" % str(e))
+            self._send_json(500, {"error": str(e)})
+            return
+        buffer = io.BytesIO()
+        np.savez(buffer, *images)
+        self._send(200, CONTENT_TYPE_NPZ, buffer.getvalue())
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server listening on a unix socket.
+    """
+    daemon_threads = True
+
+
+def main():
+    init_app()
+    parser = argparse.ArgumentParser(
+        description='Loads a model bundle once and makes predictions for scans or arrays sent via HTTP (TCP port or unix socket), combining concurrent requests into micro-batches.',
+        prog=PROG,
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-m', '--model_dir', type=str, help='The directory with the model bundle', required=True)
+    parser.add_argument('-r', '--reader', type=str, help='The command-line of the reader to use for loading the scans (the path gets split into base dir and sample ID)', required=False, default="envi-reader")
+    parser.add_argument('--host', type=str, help='The host to listen on', required=False, default="127.0.0.1")
+    parser.add_argument('-p', '--port', type=int, help='The TCP port to listen on', required=False, default=8000)
+    parser.add_argument('-s', '--socket', type=str, help='The unix socket to listen on instead of the TCP port', required=False, default=None)
+    parser.add_argument('-b', '--max_batch_pixels', type=int, help='The maximum number of pixels to predict with a single call', required=False, default=1000000)
+    parser.add_argument('-w', '--max_wait', type=float, help='The time in milliseconds to wait for further requests before predicting a batch', required=False, default=5.0)
+    parser.add_argument('-n', '--num_workers', type=int, help='The number of workers for loading and preprocessing the scans', required=False, default=1)
+    PredictionMask.add_arguments(parser)
+    add_logging_level(parser, short_opt="-V")
+
+    args = parser.parse_args()
+    set_logging_level(logger, args.logging_level)
+
+    logger.info("Loading model: %s" % args.model_dir)
+    model = load_model(args.model_dir)
+
+    service = PredictionService(model, max_batch_pixels=args.max_batch_pixels, max_wait=args.max_wait / 1000.0,
+                                num_workers=args.num_workers, mask=PredictionMask.from_arguments(args),
+                                reader=args.reader)
+    service.logging_level = args.logging_level
+    service.start()
+
+    if args.socket is not None:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, PredictionRequestHandler)
+        logger.info("Listening on: %s" % args.socket)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), PredictionRequestHandler)
+        logger.info("Listening on: %s:%d" % (args.host, args.port))
+    server.service = service
+    # clean up when getting terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if (args.socket is not None) and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def sys_main() -> int:
+    """
+    Runs the main function using the system cli arguments, and
+    returns a system error code.
+
+    :return: 0 for success, 1 for failure.
+    """
+    try:
+        main()
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,17 @@ import traceback
 
 from seppl import split_args, args_to_objects, get_class_name, is_help_requested
 from seppl.io import locate_files
+from seppl.variables import expand_variables
 from wai.logging import set_logging_level, add_logging_level
 from happy.base.app import init_app
-from happy.base.registry import REGISTRY, print_help, print_help_all
+from happy.base.fingerprint import Fingerprints
+from happy.base.precision import add_compute_dtype_argument, set_compute_dtype
+from happy.base.instrumentation import add_instrumentation_arguments, configure_instrumentation, output_instrumentation, data_size
+from happy.base.journal import Journal
+from happy.base.metrics import MetricsSink
+from happy.base.registry import REGISTRY, LazyPlugins, print_help, print_help_all
 from happy.readers import HappyDataReader
-from happy.preprocessors import Preprocessor, MultiPreprocessor, apply_preprocessor
+from happy.preprocessors import Preprocessor, MultiPreprocessor, iter_apply_preprocessor
 from happy.writers import HappyDataWriter
 
 PROG = "happy-process-data"
@@ -62,6 +68,39 @@ def main():
             print("  -e REGEXP, --exclude REGEXP")
             print("                        Regular expression for excluding files from batch processing;")
             print("                        gets applied to full file path")
+            print("  --compute_dtype {float32,float64}")
+            print("                        The data type to perform the computations in (and to")
+            print("                        write floating point data with), uses the data types of")
+            print("                        the data if not specified")
+            print("  --instrument          Whether to record time, memory and bytes processed by the")
+            print("                        plugins and output a summary at the end (can be enabled")
+            print("                        via environment variable HAPPY_INSTRUMENT as well)")
+            print("  --trace_file FILE     The Chrome trace JSON file to write the recorded plugin")
+            print("                        calls to, enables the instrumentation (can be set via")
+            print("                        environment variable HAPPY_TRACE_FILE as well)")
+            print("  --metrics_file FILE   The file to periodically write the progress metrics to in")
+            print("                        Prometheus text format (default: None)")
+            print("  --metrics_json FILE   The file to periodically write the progress metrics to in")
+            print("                        JSON format (default: None)")
+            print("  --metrics_port PORT   The port on localhost to serve the progress metrics on")
+            print("                        (/metrics, /metrics.json) (default: None)")
+            print("  --metrics_interval SECONDS")
+            print("                        The interval for writing the metrics files (default: 10.0)")
+            print("  --journal FILE        The JSONL file to record the completed samples in; samples")
+            print("                        already recorded (with their outputs present) get skipped,")
+            print("                        allowing interrupted jobs to resume (default: None)")
+            print("  --journal_verify      Whether to verify the checksums of the outputs of recorded")
+            print("                        samples rather than just their existence before skipping")
+            print("                        them (default: False)")
+            print("  --incremental         Whether to skip samples whose outputs are current, based on")
+            print("                        fingerprints of the input files, the pipeline and the version")
+            print("                        that get stored next to the outputs (default: False)")
+            print("  --fingerprint_hash    Whether to include the checksums of the input files in the")
+            print("                        fingerprints rather than just their size and modification")
+            print("                        time (default: False)")
+            print("  --continue_on_error   Whether to log samples that fail to process and continue with")
+            print("                        the next one rather than aborting (exits with an error at the")
+            print("                        end if any failed) (default: False)")
             print("  -V {DEBUG,INFO,WARNING,ERROR,CRITICAL}, --logging_level {DEBUG,INFO,WARNING,ERROR,CRITICAL}")
             print("                        The logging level to use. (default: WARN)")
             print("")
@@ -69,7 +108,7 @@ def main():
         sys.exit(0)
 
     # create pipeline
-    plugins = {}
+    plugins = LazyPlugins()
     plugins.update(REGISTRY.happydata_readers())
     plugins.update(REGISTRY.preprocessors())
     plugins.update(REGISTRY.happydata_writers())
@@ -80,9 +119,17 @@ def main():
     parser.add_argument("-i", "--input", type=str, required=False, nargs="*")
     parser.add_argument("-I", "--input_list", type=str, required=False, nargs="*")
     parser.add_argument("-e", "--exclude", metavar="REGEXP", type=str, default=None, required=False)
+    add_compute_dtype_argument(parser)
+    add_instrumentation_arguments(parser)
+    MetricsSink.add_arguments(parser)
+    Journal.add_arguments(parser)
+    Fingerprints.add_arguments(parser)
+    parser.add_argument("--continue_on_error", action="store_true", help="whether to log inputs that fail to process and continue with the next one rather than aborting (exits with an error at the end if any failed)", required=False)
     add_logging_level(parser, short_opt="-V")
     parsed = parser.parse_args(split[""] if ("" in split) else [])
     set_logging_level(logger, parsed.logging_level)
+    configure_instrumentation(parsed)
+    set_compute_dtype(parsed.compute_dtype)
 
     # check pipeline
     if len(objs) < 2:
@@ -122,22 +169,67 @@ def main():
         preprocessors = MultiPreprocessor(preprocessor_list=objs)
 
     # execute pipeline
-    for f in batch_files:
-        if f is not None:
-            if not os.path.isdir(f):
-                f = os.path.dirname(f)
-            logger.info("Setting base dir: %s" % f)
-            reader.update_base_dir(f)
-        sample_ids = reader.get_sample_ids()
-        for i, sample_id in enumerate(sample_ids, start=1):
-            logger.info("Processing %d/%d: %s" % (i, len(sample_ids), sample_id))
-            data_list = reader.load_data(sample_id)
-            for data in data_list:
-                if preprocessors is not None:
-                    processed = apply_preprocessor(data, preprocessors)
-                    writer.write_data(processed)
-                else:
-                    writer.write_data(data)
+    journal = Journal.from_arguments(parsed, PROG)
+    journal.logging_level = parsed.logging_level
+    pipeline = " ".join([" ".join(split[k]) for k in split if k != ""])
+    if parsed.compute_dtype is not None:
+        pipeline += " --compute_dtype " + parsed.compute_dtype
+    fingerprints = Fingerprints.from_arguments(parsed, pipeline)
+    fingerprints.logging_level = parsed.logging_level
+    metrics = MetricsSink.from_arguments(parsed, PROG)
+    metrics.logging_level = parsed.logging_level
+    with metrics:
+        for f in batch_files:
+            if f is not None:
+                if not os.path.isdir(f):
+                    f = os.path.dirname(f)
+                logger.info("Setting base dir: %s" % f)
+                reader.update_base_dir(f)
+            sample_ids = reader.get_sample_ids()
+            for i, sample_id in enumerate(sample_ids, start=1):
+                logger.info("Processing %d/%d: %s" % (i, len(sample_ids), sample_id))
+                metrics.set_queue_depth(len(sample_ids) - i + 1)
+                key = os.path.join(os.path.abspath(expand_variables(reader.base_dir)), sample_id)
+                if journal.is_done(key):
+                    logger.info("Already completed, skipping: %s" % sample_id)
+                    continue
+                output_dir = os.path.abspath(expand_variables(writer.base_dir))
+                fingerprint = None
+                if fingerprints.is_active():
+                    fingerprint = fingerprints.compute(reader.get_sample_files(sample_id))
+                    if fingerprints.is_current(output_dir, key, fingerprint):
+                        logger.info("Outputs current, skipping: %s" % sample_id)
+                        continue
+                writer.clear_output_files()
+                try:
+                    with metrics.time_stage("read"):
+                        data_list = reader.load_data(sample_id)
+                    metrics.add_bytes_read(data_size(data_list))
+                    for data in data_list:
+                        if preprocessors is not None:
+                            # stream each processed item to the writer
+                            items = metrics.time_iter("preprocess", iter_apply_preprocessor(data, preprocessors))
+                        else:
+                            items = [data]
+                        for item in items:
+                            with metrics.time_stage("write"):
+                                writer.write_data(item)
+                            metrics.add_bytes_written(data_size(item))
+                except Exception:
+                    metrics.sample_failed()
+                    if not parsed.continue_on_error:
+                        raise
+                    logger.exception("Failed to process: %s" % sample_id)
+                    continue
+                journal.record(key, writer.get_output_files())
+                fingerprints.update(output_dir, key, fingerprint, writer.get_output_files())
+                metrics.sample_done()
+        metrics.set_queue_depth(0)
+
+    output_instrumentation()
+
+    if metrics.samples_failed > 0:
+        raise Exception("Failed to process %d sample(s)!" % metrics.samples_failed)
 
 
 def sys_main() -> int:
@@ -9,12 +9,16 @@ import traceback
 from wai.logging import add_logging_level, set_logging_level
 
 from happy.base.app import init_app
+from happy.base.journal import Journal
+from happy.base.metrics import MetricsSink
 from happy.data import DataManager, LABEL_WHITEREF
 from happy.data.annotations import locate_annotations
 from happy.data import export_sub_images
 from opex import ObjectPredictions
 
 
+PROG = "happy-sub-images"
+
 logger = logging.getLogger("sub-images")
 
 
@@ -43,7 +47,7 @@ def generate(input_dirs, output_dirs, writers, regexp=None, recursive=False, lab
              black_ref_locator=None, black_ref_method=None,
              white_ref_locator=None, white_ref_method=None, white_ref_annotations=None,
              black_ref_locator_for_white_ref=None, black_ref_method_for_white_ref=None,
-             preprocessing=None, dry_run=False, resume_from=None, run_info=None):
+             preprocessing=None, dry_run=False, resume_from=None, run_info=None, metrics=None, journal=None):
     """
     Generates sub-images from ENVI files with OPEX JSON annotations located in the directories.
 
@@ -81,7 +85,16 @@ def generate(input_dirs, output_dirs, writers, regexp=None, recursive=False, lab
     :type resume_from: str
     :param run_info: optional path to JSON file for storing run info in
     :type run_info: str or None
+    :param metrics: the sink for recording the progress metrics, ignored if None
+    :type metrics: MetricsSink
+    :param journal: the journal for recording the completed scans and skipping them when resuming, ignored if None
+    :type journal: Journal
     """
+    if metrics is None:
+        metrics = MetricsSink(PROG)
+    if journal is None:
+        journal = Journal()
+
     info = {
         "options": {
             "input_dirs": input_dirs,
@@ -195,33 +208,55 @@ def generate(input_dirs, output_dirs, writers, regexp=None, recursive=False, lab
     info["files"] = list()
     for i, ann_cont in enumerate(ann_conts, start=1):
         logger.info("Processing %d/%d..." % (i, len(ann_conts)))
+        metrics.set_queue_depth(len(ann_conts) - i + 1)
+        key = os.path.abspath(ann_cont.base)
+        if journal.is_done(key):
+            logger.info("Already completed, skipping: %s" % ann_cont.base)
+            continue
         try:
             logger.info("Base ENVI file: %s" % ann_cont.base)
-            datamanager.load_scan(ann_cont.base)
-            datamanager.load_contours(ann_cont.opex)
-            if whiteref_ann is not None:
-                logger.info("Setting white ref annotation: %s" % str(whiteref_ann))
-                datamanager.set_whiteref_annotation(whiteref_ann, False)
-            datamanager.calc_norm_data()
+            with metrics.time_stage("load"):
+                datamanager.load_scan(ann_cont.base)
+                datamanager.load_contours(ann_cont.opex)
+            metrics.add_bytes_read(datamanager.scan_data.nbytes)
+            with metrics.time_stage("normalize"):
+                if whiteref_ann is not None:
+                    logger.info("Setting white ref annotation: %s" % str(whiteref_ann))
+                    datamanager.set_whiteref_annotation(whiteref_ann, False)
+                datamanager.calc_norm_data()
             if labels is not None:
                 matches = datamanager.contours.get_contours_regexp(labels)
                 logger.info("Label matches: %d" % len(matches))
                 if len(matches) == 0:
+                    if not dry_run:
+                        journal.record(key, [])
+                    metrics.sample_done()
                     continue
 
             info_file = {"file": ann_cont.base}
+            outputs = []
             if not dry_run:
                 for output_dir, writer in zip(output_dirs, writers):
-                    msg = export_sub_images(datamanager, output_dir, labels, False, writer_cmdline=writer)
+                    with metrics.time_stage("export"):
+                        msg = export_sub_images(datamanager, output_dir, labels, False, writer_cmdline=writer,
+                                                output_files=outputs)
                     if msg is not None:
                         logger.error(msg)
                         if "error" not in info_file:
                             info_file["error"] = dict()
                         info_file["error"][writer] = msg
             info["files"].append(info_file)
+            if "error" in info_file:
+                metrics.sample_failed()
+            else:
+                if not dry_run:
+                    journal.record(key, outputs)
+                metrics.sample_done()
 
         except:
             logger.exception("Failed to process: %s" % ann_cont.base)
+            metrics.sample_failed()
+    metrics.set_queue_depth(0)
 
     # output run info?
     if (not dry_run) and (run_info is not None):
@@ -240,7 +275,7 @@ def main(args=None):
     init_app()
     parser = argparse.ArgumentParser(
         description="Exports sub-images from ENVI files annotated with OPEX JSON files. Used for extracting sub-samples. Multiple output/writer pairs can be specified to output in multiple formats in one go.",
-        prog="happy-sub-images",
+        prog=PROG,
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("-i", "--input_dir", nargs="+", metavar="DIR", type=str, help="Path to the files to generate sub-images from", required=True)
     parser.add_argument("-e", "--regexp", type=str, metavar="REGEXP", help="The regexp for matching the ENVI base files (name only), e.g., for selecting a subset.", required=False, default=None)
@@ -259,19 +294,26 @@ def main(args=None):
     parser.add_argument("-n", "--dry_run", action="store_true", help="whether to omit generating any data or creating directories", required=False)
     parser.add_argument("-R" ,"--resume_from", metavar="DIR", type=str, help="The directory to restart the processing with (all determined dirs preceding this one get skipped)", required=False, default=None)
     parser.add_argument("-I", "--run_info", metavar="FILE", type=str, help="The JSON file to store some run information in.", required=False, default=None)
+    MetricsSink.add_arguments(parser)
+    Journal.add_arguments(parser)
     add_logging_level(parser, short_opt="-V")
     parsed = parser.parse_args(args=args)
     set_logging_level(logger, parsed.logging_level)
-    generate(parsed.input_dir, parsed.output_dir, parsed.writer,
-             regexp=parsed.regexp, recursive=parsed.recursive, labels=parsed.labels,
-             black_ref_locator=parsed.black_ref_locator, black_ref_method=parsed.black_ref_method,
-             white_ref_locator=parsed.white_ref_locator, white_ref_method=parsed.white_ref_method,
-             white_ref_annotations=parsed.white_ref_annotations,
-             black_ref_locator_for_white_ref=parsed.black_ref_locator_for_white_ref,
-             black_ref_method_for_white_ref=parsed.black_ref_method_for_white_ref,
-             preprocessing=parsed.preprocessing,
-             dry_run=parsed.dry_run, resume_from=parsed.resume_from,
-             run_info=parsed.run_info)
+    journal = Journal.from_arguments(parsed, PROG)
+    journal.logging_level = parsed.logging_level
+    metrics = MetricsSink.from_arguments(parsed, PROG)
+    metrics.logging_level = parsed.logging_level
+    with metrics:
+        generate(parsed.input_dir, parsed.output_dir, parsed.writer,
+                 regexp=parsed.regexp, recursive=parsed.recursive, labels=parsed.labels,
+                 black_ref_locator=parsed.black_ref_locator, black_ref_method=parsed.black_ref_method,
+                 white_ref_locator=parsed.white_ref_locator, white_ref_method=parsed.white_ref_method,
+                 white_ref_annotations=parsed.white_ref_annotations,
+                 black_ref_locator_for_white_ref=parsed.black_ref_locator_for_white_ref,
+                 black_ref_method_for_white_ref=parsed.black_ref_method_for_white_ref,
+                 preprocessing=parsed.preprocessing,
+                 dry_run=parsed.dry_run, resume_from=parsed.resume_from,
+                 run_info=parsed.run_info, metrics=metrics, journal=journal)
 
 
 def sys_main() -> int:
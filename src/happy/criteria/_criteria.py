@@ -81,6 +81,43 @@ class Criteria(ConfigurableObject):
         else:
             raise ValueError(f"Unsupported operation: {self.operation}")
 
+    def mask(self, happy_data) -> np.ndarray:
+        """
+        Checks all the pixels of the data at once.
+
+        :param happy_data: the data to check
+        :type happy_data: HappyData
+        :return: the boolean mask (height, width), True for pixels that match
+        :rtype: np.ndarray
+        """
+        shape = happy_data.data.shape[:2]
+        if self.operation == OP_SPECTRUM_NOT_ZERO:
+            return (happy_data.data != 0).all(axis=2)
+        if self.operation == OP_NOT_OUTLIER:
+            mean = np.mean(happy_data.data, axis=2, keepdims=True)
+            std = np.std(happy_data.data, axis=2, keepdims=True)
+            return (np.abs(happy_data.data - mean) <= 2 * std).all(axis=2)
+        value = happy_data.get_meta_data(key=self.key)
+        if self.operation == OP_NOT_MISSING:
+            return np.full(shape, value is not None, dtype=bool)
+        if value is None:
+            return np.full(shape, False, dtype=bool)
+        if isinstance(value, np.ndarray) and (value.ndim == 3):
+            value = value[:, :, 0]
+        if self.operation == OP_EQUALS:
+            result = np.asarray(value == self.value)
+        elif self.operation == OP_GREATER_THAN:
+            result = np.asarray(value > self.value)
+        elif self.operation == OP_NOT_IN:
+            result = ~np.isin(value, self.value)
+        elif self.operation == OP_IN:
+            result = np.isin(value, self.value)
+        elif self.operation == OP_MATCHES:
+            result = np.vectorize(lambda v: bool(re.search(self.value, v)), otypes=[bool])(value)
+        else:
+            raise ValueError(f"Unsupported operation: {self.operation}")
+        return np.broadcast_to(result, shape).copy()
+
 
 class CriteriaGroup(ConfigurableObject):
 
@@ -106,6 +143,20 @@ class CriteriaGroup(ConfigurableObject):
         
     def check(self, happy_data, x, y):
         return all(criteria.check(happy_data, x, y) for criteria in self.criteria_list)
+
+    def mask(self, happy_data) -> np.ndarray:
+        """
+        Checks all the pixels of the data at once.
+
+        :param happy_data: the data to check
+        :type happy_data: HappyData
+        :return: the boolean mask (height, width), True for pixels that match all criteria
+        :rtype: np.ndarray
+        """
+        result = np.full(happy_data.data.shape[:2], True, dtype=bool)
+        for criteria in self.criteria_list:
+            result &= criteria.mask(happy_data)
+        return result
      
     def get_keys(self) -> List:
         return [c.key for c in self.criteria_list]
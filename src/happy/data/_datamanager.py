@@ -5,13 +5,13 @@ import traceback
 from typing import List, Dict, Optional, Tuple
 
 from PIL import Image
+from happy.base.precision import check_compute_dtype, to_compute_dtype
 from happy.data import HappyData, LABEL_WHITEREF, LABEL_BLACKREF
 from happy.data.annotations import ContoursManager, Contour, MetaDataManager, PixelManager, MarkersManager
 from happy.data.black_ref import AbstractBlackReferenceMethod, AbstractAnnotationBasedBlackReferenceMethod
 from happy.data.white_ref import AbstractWhiteReferenceMethod, AbstractAnnotationBasedWhiteReferenceMethod
 from happy.data.ref_locator import AbstractReferenceLocator, AbstractFileBasedReferenceLocator, AbstractOPEXAnnotationBasedReferenceLocator
 from happy.data.normalization import AbstractNormalization, SimpleNormalization, AbstractOPEXAnnotationBasedNormalization, CHANNEL_RED, CHANNEL_GREEN, CHANNEL_BLUE
-from happy.preprocessors import MultiPreprocessor, Preprocessor, AbstractOPEXAnnotationsBasedPreprocessor
 from seppl import get_class_name
 from opex import BBox, ObjectPredictions
 
@@ -73,6 +73,7 @@ class DataManager:
         self.wavelengths_norm = None
         self.preprocessors = None
         self.preprocessors_cmdline = None
+        self.compute_dtype = None
         self.normalization = SimpleNormalization()
         self.normalization_cmdline = self.normalization.name()
         self.log_method = log_method
@@ -562,6 +563,7 @@ class DataManager:
         :param preprocessors: the commandline of preprocessors to use or None for no preprocessing
         :type preprocessors: str or None
         """
+        from happy.preprocessors import MultiPreprocessor, Preprocessor
         if preprocessors is None:
             preprocs = None
         else:
@@ -570,6 +572,17 @@ class DataManager:
         self.preprocessors_cmdline = preprocessors
         self.reset_norm_data()
 
+    def set_compute_dtype(self, dtype):
+        """
+        Sets the data type to perform the calculation of the normalized data in
+        (black/white reference and preprocessors).
+
+        :param dtype: the data type (float32 or float64), None for the global one
+        :type dtype: str or None
+        """
+        self.compute_dtype = check_compute_dtype(dtype)
+        self.reset_norm_data()
+
     def reset_norm_data(self):
         """
         Resets the normalized data, forcing a recalculation.
@@ -715,6 +728,7 @@ class DataManager:
         :return: which steps succeeded
         :rtype: dict
         """
+        from happy.preprocessors import AbstractOPEXAnnotationsBasedPreprocessor
         result = dict()
 
         if self.norm_data is not None:
@@ -751,7 +765,7 @@ class DataManager:
                 self.log(traceback.format_exc())
 
             if success:
-                self.norm_data = self.scan_data
+                self.norm_data = to_compute_dtype(self.scan_data, self.compute_dtype)
                 self.update_wavelengths_norm(self.get_wavelengths_list())
 
             # apply black reference
@@ -766,7 +780,7 @@ class DataManager:
                             else:
                                 self.blackref_method.reference = self.blackref_data
                             self.blackref_method.annotation = self.blackref_annotation
-                            self.norm_data = self.blackref_method.apply(self.norm_data)
+                            self.norm_data = to_compute_dtype(self.blackref_method.apply(self.norm_data), self.compute_dtype)
                             self.update_wavelengths_norm(self.get_wavelengths_list())
                             result[CALC_BLACKREF_APPLIED] = True
                         else:
@@ -775,7 +789,7 @@ class DataManager:
                         self.log("Applying black reference method: %s" % self.blackref_method_cmdline)
                         result[CALC_BLACKREF_APPLIED] = False
                         self.blackref_method.reference = self.blackref_data
-                        self.norm_data = self.blackref_method.apply(self.norm_data)
+                        self.norm_data = to_compute_dtype(self.blackref_method.apply(self.norm_data), self.compute_dtype)
                         self.update_wavelengths_norm(self.get_wavelengths_list())
                         result[CALC_BLACKREF_APPLIED] = True
 
@@ -800,7 +814,7 @@ class DataManager:
                                 self.whiteref_method.reference = self.whiteref_data
                             self.log_data("White ref method reference data", self.whiteref_method.reference)
                             self.whiteref_method.annotation = self.whiteref_annotation
-                            self.norm_data = self.whiteref_method.apply(self.norm_data)
+                            self.norm_data = to_compute_dtype(self.whiteref_method.apply(self.norm_data), self.compute_dtype)
                             self.update_wavelengths_norm(self.get_wavelengths_list())
                             result[CALC_WHITEREF_APPLIED] = True
                         else:
@@ -809,7 +823,7 @@ class DataManager:
                         self.log("Applying white reference method: %s" % self.whiteref_method_cmdline)
                         result[CALC_WHITEREF_APPLIED] = False
                         self.whiteref_method.reference = self.whiteref_data
-                        self.norm_data = self.whiteref_method.apply(self.norm_data)
+                        self.norm_data = to_compute_dtype(self.whiteref_method.apply(self.norm_data), self.compute_dtype)
                         self.update_wavelengths_norm(self.get_wavelengths_list())
                         result[CALC_WHITEREF_APPLIED] = True
 
@@ -832,6 +846,7 @@ class DataManager:
                                 preproc.annotations = anns
                     wl = self.get_wavelengths_list()
                     happy_data = HappyData("envi-viewer", "1", self.norm_data, {}, {}, wavenumbers=wl)
+                    self.preprocessors.compute_dtype = self.compute_dtype
                     self.preprocessors.fit(happy_data)
                     new_happy_data = self.preprocessors.apply(happy_data)
                     if len(new_happy_data) == 1:
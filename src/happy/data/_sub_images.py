@@ -1,6 +1,6 @@
 import os
 import traceback
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 from happy.data import HappyData, DataManager
 from happy.writers import HappyDataWriter, HappyDataWriterWithNormalization, ImageWriter
@@ -8,7 +8,8 @@ from happy.data.normalization import SimpleNormalization
 
 
 def export_sub_images(datamanager: DataManager, path: str, label_regexp: Optional[str], raw: bool,
-                      writer_cmdline: str = "happy-writer", rgb: Tuple[int, int, int] = None) -> Optional[str]:
+                      writer_cmdline: str = "happy-writer", rgb: Tuple[int, int, int] = None,
+                      output_files: Optional[List[str]] = None) -> Optional[str]:
     """
     Exports the sub-images defined in the contours as ENVI files.
     Stores them in the specified directory with the specified prefix (and the label as suffix).
@@ -25,6 +26,8 @@ def export_sub_images(datamanager: DataManager, path: str, label_regexp: Optiona
     :param writer_cmdline: str
     :param rgb: the RGB tuple of integers
     :type rgb: tuple
+    :param output_files: the list to add the files to that got written, ignored if None
+    :type output_files: list
     :return: None if successful, otherwise error message
     :rtype: str
     """
@@ -118,6 +121,8 @@ def export_sub_images(datamanager: DataManager, path: str, label_regexp: Optiona
             writer.update_base_dir(path)
             writer.logging_level = "INFO"
             writer.write_data(happy_data)
+            if output_files is not None:
+                output_files.extend(writer.get_output_files())
         except:
             result = "Failed to export sub-image #%d to: %s\n%s" % (i, path, traceback.format_exc())
             datamanager.log(result)
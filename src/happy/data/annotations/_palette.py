@@ -1,5 +1,4 @@
 import math
-from matplotlib.colors import TABLEAU_COLORS, hex2color
 
 
 def tableau_colors(max_colors=255, alpha=None):
@@ -14,6 +13,7 @@ def tableau_colors(max_colors=255, alpha=None):
     :return: the palette (list of (r,g,b) or (r,g,b,a) tuples)
     :rtype: list
     """
+    from matplotlib.colors import TABLEAU_COLORS, hex2color
     result = []
     num_rounds = math.ceil(max_colors / len(TABLEAU_COLORS))
     decrement_per_round = 1.0 / num_rounds
@@ -48,7 +48,7 @@ class BlackReferenceAnnotationAverage(AbstractAnnotationBasedBlackReferenceMetho
             raise Exception("Reference and scan have differing number of bands: %d != %d" % (self.reference.shape[2], scan.shape[2]))
 
         blackref_annotation = []
-        for i in range(self.reference):
+        for i in range(self.reference.shape[2]):
             blackref_annotation.append(np.average(blackref[:, :, i]))
         self.logger().info(f"blackref_annotation: {blackref_annotation}")
 
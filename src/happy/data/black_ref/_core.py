@@ -4,6 +4,7 @@ import spectral.io.envi as envi
 
 from happy.base.registry import REGISTRY
 from happy.base.core import PluginWithLogging
+from happy.base.precision import to_compute_dtype
 from seppl import split_args, split_cmdline, args_to_objects
 
 
@@ -84,11 +85,13 @@ class AbstractBlackReferenceMethod(PluginWithLogging, abc.ABC):
         """
         Applies the black reference to the scan and returns the updated scan.
 
+        Scan and result get converted to the compute dtype, if one has been set.
+
         :param scan: the scan to apply the black reference to
         :return: the updated scan
         """
         self._initialize()
-        return self._do_apply(scan)
+        return to_compute_dtype(self._do_apply(to_compute_dtype(scan)))
 
     @classmethod
     def parse_method(cls, cmdline: str) -> 'AbstractBlackReferenceMethod':
@@ -183,7 +186,7 @@ class AbstractAnnotationBasedBlackReferenceMethod(AbstractFileBasedBlackReferenc
         :type ns: argparse.Namespace
         """
         super()._apply_args(ns)
-        self._annotation = ns.annotation
+        self._annotation = None if (ns.annotation is None) else tuple(ns.annotation)
 
     @property
     def annotation(self):
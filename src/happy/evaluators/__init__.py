@@ -2,3 +2,4 @@ from ._base_evaluator import BaseEvaluator
 from ._classification_evaluator import ClassificationEvaluator
 from ._prediction_actual_handler import PredictionActualHandler
 from ._regression_evaluator import RegressionEvaluator
+from ._cross_validation import CrossValidationExecutor
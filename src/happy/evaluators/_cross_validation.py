@@ -0,0 +1,287 @@
+import random
+import zlib
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional, Tuple, Iterator
+
+from sklearn.base import clone
+from happy.base.core import ObjectWithLogging
+from happy.models.dataset_cache import DatasetCache
+from happy.models.prediction_mask import PredictionMask
+from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+from happy.splitters import DataSplits
+
+
+PURPOSE_TRAIN = "train"
+PURPOSE_PREDICT = "predict"
+
+
+def _seed_for_sample(seed: Optional[int], sample_id: str):
+    """
+    Seeds the random number generators for the specified sample, making the
+    pixel selection independent of the order in which samples get processed.
+
+    :param seed: the base seed, ignored if None
+    :type seed: int
+    :param sample_id: the sample to seed for
+    :type sample_id: str
+    """
+    if seed is None:
+        return
+    s = "%d:%s" % (seed, sample_id)
+    random.seed(s)
+    np.random.seed(zlib.crc32(s.encode("utf-8")))
+
+
+def _sample_key(model: ScikitSpectroscopyModel, cache: DatasetCache, sample_id: str, preprocessors: Optional[str],
+                seed: Optional[int], purpose: str, mask: Optional[PredictionMask] = None) -> str:
+    """
+    Computes the cache key for the dataset of a single sample.
+
+    :param model: the model to generate the data with
+    :type model: ScikitSpectroscopyModel
+    :param cache: the cache to use
+    :type cache: DatasetCache
+    :param sample_id: the sample ID
+    :type sample_id: str
+    :param preprocessors: the pre-processing command-line
+    :type preprocessors: str
+    :param seed: the seed in use
+    :type seed: int
+    :param purpose: PURPOSE_TRAIN or PURPOSE_PREDICT
+    :type purpose: str
+    :param mask: the mask for the pixels to predict, all pixels if None
+    :type mask: PredictionMask
+    :return: the key
+    :rtype: str
+    """
+    pixel_selector = model.pixel_selector if (purpose == PURPOSE_TRAIN) else None
+    if purpose == PURPOSE_TRAIN:
+        mask = None
+    return cache.compute_key(model.data_folder, [sample_id], preprocessors, pixel_selector=pixel_selector,
+                             seed=seed, target=model.target, purpose=purpose, mask=mask)
+
+
+def _get_sample_dataset(model: ScikitSpectroscopyModel, cache: DatasetCache, sample_id: str,
+                        preprocessors: Optional[str], seed: Optional[int], purpose: str,
+                        mask: Optional[PredictionMask] = None):
+    """
+    Returns the (cached) dataset of a single sample, generating it if necessary.
+
+    :param model: the model to generate the data with
+    :type model: ScikitSpectroscopyModel
+    :param cache: the cache to use
+    :type cache: DatasetCache
+    :param sample_id: the sample ID
+    :type sample_id: str
+    :param preprocessors: the pre-processing command-line
+    :type preprocessors: str
+    :param seed: the seed in use
+    :type seed: int
+    :param purpose: PURPOSE_TRAIN or PURPOSE_PREDICT
+    :type purpose: str
+    :param mask: the mask for the pixels to predict, all pixels if None
+    :type mask: PredictionMask
+    :return: the dataset
+    :rtype: dict
+    """
+    key = _sample_key(model, cache, sample_id, preprocessors, seed, purpose, mask=mask)
+
+    def _generate():
+        if purpose == PURPOSE_TRAIN:
+            _seed_for_sample(seed, sample_id)
+            return model.generate_training_dataset([sample_id])
+        else:
+            return model._generate_full_prediction_dataset([sample_id], return_actuals=True, mask=mask)
+
+    return cache.get(key, _generate)
+
+
+def _prepare_sample(model: ScikitSpectroscopyModel, cache: DatasetCache, sample_id: str,
+                    preprocessors: Optional[str], seed: Optional[int], purposes: List[str],
+                    mask: Optional[PredictionMask] = None) -> str:
+    """
+    Generates the cached datasets of a sample (worker function).
+
+    :return: the sample ID
+    :rtype: str
+    """
+    for purpose in purposes:
+        _get_sample_dataset(model, cache, sample_id, preprocessors, seed, purpose, mask=mask)
+    return sample_id
+
+
+def _run_fold(model: ScikitSpectroscopyModel, cache: DatasetCache, train_ids: List[str], test_ids: List[str],
+              preprocessors: Optional[str], seed: Optional[int],
+              mask: Optional[PredictionMask] = None) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """
+    Trains a copy of the model's estimator on the training samples and predicts the
+    images of the test samples (worker function). With a mask, only the valid pixels get predicted.
+
+    :return: the tuple of prediction and actual images
+    :rtype: tuple
+    """
+    X = []
+    y = []
+    for sample_id in train_ids:
+        data = _get_sample_dataset(model, cache, sample_id, preprocessors, seed, PURPOSE_TRAIN)
+        if len(data["X_train"]) > 0:
+            X.append(np.asarray(data["X_train"]))
+            y.append(np.asarray(data["y_train"]))
+    if len(X) == 0:
+        raise ValueError("No training data generated from samples: %s" % ", ".join(train_ids))
+    estimator = clone(model.model)
+    estimator.fit(np.concatenate(X), np.concatenate(y))
+
+    predictions = []
+    actuals = []
+    for sample_id in test_ids:
+        data = _get_sample_dataset(model, cache, sample_id, preprocessors, seed, PURPOSE_PREDICT, mask=mask)
+        for i in range(len(data["X_pred"])):
+            height = data["y"][i]
+            width = data["x"][i]
+            actual = data["y_pred"][i]
+            if (actual is None) or (np.size(actual) != height * width):
+                raise ValueError("Test sample '%s' has no target layer '%s' of size %dx%d, cannot evaluate!"
+                                 % (sample_id, model.target, width, height))
+            predictions.append(model._predict_image(estimator.predict, data, i, mask=mask))
+            actuals.append(np.asarray(actual).reshape(height, width))
+    return predictions, actuals
+
+
+class CrossValidationExecutor(ObjectWithLogging):
+    """
+    Evaluates a model on all the repeats/folds of the splits, using a pool of worker processes.
+    The pre-processed data of each sample gets generated only once and shared between
+    the folds via the dataset cache.
+    """
+
+    def __init__(self, splits: DataSplits, model: ScikitSpectroscopyModel, cache: DatasetCache,
+                 preprocessors: Optional[str] = None, seed: Optional[int] = None, num_jobs: int = 1,
+                 max_memory: Optional[int] = None, mask: Optional[PredictionMask] = None):
+        """
+        Initializes the executor.
+
+        :param splits: the splits to evaluate
+        :type splits: DataSplits
+        :param model: the model to evaluate, its estimator gets cloned for each fold
+        :type model: ScikitSpectroscopyModel
+        :param cache: the cache for storing the generated data of the samples in
+        :type cache: DatasetCache
+        :param preprocessors: the pre-processing command-line (used for the cache keys)
+        :type preprocessors: str
+        :param seed: the seed for the pixel selection, unseeded if None
+        :type seed: int
+        :param num_jobs: the number of worker processes to use
+        :type num_jobs: int
+        :param max_memory: the memory budget in bytes for the concurrently running folds, no limit if None
+        :type max_memory: int
+        :param mask: the mask for the pixels to predict in the test samples, all pixels if None
+        :type mask: PredictionMask
+        """
+        super().__init__()
+        self.splits = splits
+        self.model = model
+        self.cache = cache
+        self.preprocessors = preprocessors
+        self.seed = seed
+        self.num_jobs = max(1, num_jobs)
+        self.max_memory = max_memory
+        self.mask = mask
+
+    def folds(self) -> List[Tuple[int, int]]:
+        """
+        Returns all the repeat/fold combinations defined by the splits.
+
+        :return: the list of repeat/fold tuples
+        :rtype: list
+        """
+        result = []
+        for repeat, repeat_data in enumerate(self.splits.splits):
+            for fold in range(len(repeat_data['repeats'])):
+                result.append((repeat, fold))
+        return result
+
+    def _estimate_memory(self, train_ids: List[str], test_ids: List[str]) -> int:
+        """
+        Estimates the memory required for evaluating a fold, based on the size of the cached data.
+        The training data gets counted twice, as it gets concatenated.
+
+        :return: the estimated number of bytes
+        :rtype: int
+        """
+        result = 0
+        for sample_id in train_ids:
+            result += 2 * self.cache.size(_sample_key(self.model, self.cache, sample_id, self.preprocessors, self.seed, PURPOSE_TRAIN))
+        for sample_id in test_ids:
+            result += self.cache.size(_sample_key(self.model, self.cache, sample_id, self.preprocessors, self.seed, PURPOSE_PREDICT, mask=self.mask))
+        return result
+
+    def _prepare(self, executor: Optional[ProcessPoolExecutor]):
+        """
+        Generates the cached datasets for all the samples used in the splits.
+
+        :param executor: the pool to use, runs sequentially if None
+        :type executor: ProcessPoolExecutor
+        """
+        purposes = dict()
+        for repeat, fold in self.folds():
+            train_ids, _, test_ids = self.splits.get_train_validation_test_splits(repeat, fold)
+            for sample_id in train_ids:
+                purposes.setdefault(sample_id, set()).add(PURPOSE_TRAIN)
+            for sample_id in test_ids:
+                purposes.setdefault(sample_id, set()).add(PURPOSE_PREDICT)
+        self.logger().info("Preparing data for %d samples..." % len(purposes))
+        if executor is None:
+            for sample_id in purposes:
+                _prepare_sample(self.model, self.cache, sample_id, self.preprocessors, self.seed, sorted(purposes[sample_id]), mask=self.mask)
+        else:
+            futures = [executor.submit(_prepare_sample, self.model, self.cache, sample_id, self.preprocessors, self.seed, sorted(purposes[sample_id]), mask=self.mask)
+                       for sample_id in purposes]
+            for future in futures:
+                future.result()
+
+    def execute(self) -> Iterator[Tuple[int, int, List[np.ndarray], List[np.ndarray]]]:
+        """
+        Evaluates all repeats/folds and returns the results in the order of completion.
+
+        :return: iterator of repeat, fold, prediction images and actual images
+        :rtype: iterator
+        """
+        tasks = []
+        if self.num_jobs == 1:
+            self._prepare(None)
+            for repeat, fold in self.folds():
+                train_ids, _, test_ids = self.splits.get_train_validation_test_splits(repeat, fold)
+                self.logger().info("Evaluating repeat=%d, fold=%d" % (repeat, fold))
+                predictions, actuals = _run_fold(self.model, self.cache, train_ids, test_ids, self.preprocessors, self.seed, mask=self.mask)
+                yield repeat, fold, predictions, actuals
+            return
+
+        with ProcessPoolExecutor(max_workers=self.num_jobs) as executor:
+            self._prepare(executor)
+            for repeat, fold in self.folds():
+                train_ids, _, test_ids = self.splits.get_train_validation_test_splits(repeat, fold)
+                tasks.append((repeat, fold, train_ids, test_ids, self._estimate_memory(train_ids, test_ids)))
+
+            running = dict()
+            used = 0
+            while (len(tasks) > 0) or (len(running) > 0):
+                # submit as many folds as the memory budget allows (at least one)
+                while (len(tasks) > 0) and (len(running) < self.num_jobs):
+                    repeat, fold, train_ids, test_ids, memory = tasks[0]
+                    if (self.max_memory is not None) and (len(running) > 0) and (used + memory > self.max_memory):
+                        break
+                    tasks.pop(0)
+                    self.logger().info("Evaluating repeat=%d, fold=%d (estimated memory: %d bytes)" % (repeat, fold, memory))
+                    future = executor.submit(_run_fold, self.model, self.cache, train_ids, test_ids, self.preprocessors, self.seed, mask=self.mask)
+                    running[future] = (repeat, fold, memory)
+                    used += memory
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    repeat, fold, memory = running.pop(future)
+                    used -= memory
+                    predictions, actuals = future.result()
+                    yield repeat, fold, predictions, actuals
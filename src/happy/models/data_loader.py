@@ -0,0 +1,265 @@
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional, Dict, Iterator
+
+from happy.base.core import ObjectWithLogging
+from happy.models.imaging import ImagingModel
+
+
+_END = object()
+""" the marker for the end of the batches. """
+
+
+def _load_regions(model: ImagingModel, sample_id: str, is_train: bool, return_actuals: bool):
+    """
+    Loads the regions of a sample (worker function).
+    """
+    return model.load_regions(sample_id, is_train=is_train, return_actuals=return_actuals)
+
+
+class _BatchBuilder:
+    """
+    Assembles regions into a batch, stacking them in preallocated arrays.
+    """
+
+    def __init__(self, batch_size: int, is_train: bool, return_actuals: bool):
+        self.batch_size = batch_size
+        self.is_train = is_train
+        self.return_actuals = return_actuals
+        self.x_key = "X_train" if is_train else "X_pred"
+        self.y_key = "y_train" if is_train else "y_pred"
+        self.wavelengths = None
+        self.X = None
+        self.y = None
+        self.sample_ids = []
+
+    def __len__(self):
+        return len(self.sample_ids)
+
+    def add(self, data: np.ndarray, target, sample_id: str):
+        n = len(self.sample_ids)
+        if self.X is None:
+            self.X = np.empty((self.batch_size,) + data.shape, dtype=np.float32)
+        elif data.shape != self.X.shape[1:]:
+            raise Exception("Region of sample '%s' has shape %s, expected: %s" % (sample_id, str(data.shape), str(self.X.shape[1:])))
+        self.X[n] = data
+        if self.is_train or self.return_actuals:
+            if self.y is None:
+                target = np.asarray(target)
+                self.y = np.empty((self.batch_size,) + target.shape, dtype=target.dtype)
+            self.y[n] = target
+        self.sample_ids.append(sample_id)
+
+    def build(self) -> Dict:
+        n = len(self.sample_ids)
+        result = {
+            self.x_key: self.X[:n],
+            self.y_key: [] if self.y is None else self.y[:n],
+            "sample_id": self.sample_ids,
+        }
+        if self.wavelengths is not None:
+            result["wavelengths"] = self.wavelengths
+        return result
+
+
+class DataLoader(ObjectWithLogging):
+    """
+    Generates the batches of an imaging model like ImagingModel.generate_batch, but loads
+    and preprocesses the samples in the background using a pool of workers. The assembled
+    batches get buffered in a bounded queue, the region data is stacked into a single
+    float32 array of shape (N, H, W, B). Unlike generate_batch, which stores the regions
+    of training batches as HappyData objects, training and prediction batches both
+    contain the numpy arrays of the regions (ie what get_numpy_yx returns).
+
+    Use as context manager or call close() when not iterating over all the batches
+    (eg in loop mode).
+    """
+
+    def __init__(self, model: ImagingModel, sample_ids: List[str], batch_size: int, is_train: bool = True,
+                 return_actuals: bool = False, loop: bool = False, shuffle: bool = False, seed: Optional[int] = None,
+                 num_workers: int = 2, prefetch: int = 4, use_processes: bool = False):
+        """
+        Initializes the loader.
+
+        :param model: the model to obtain the regions from
+        :type model: ImagingModel
+        :param sample_ids: the samples to load
+        :type sample_ids: list
+        :param batch_size: the number of regions per batch
+        :type batch_size: int
+        :param is_train: whether to generate training batches (regions without target get skipped)
+        :type is_train: bool
+        :param return_actuals: whether to include the targets in prediction batches
+        :type return_actuals: bool
+        :param loop: whether to loop infinitely over the samples
+        :type loop: bool
+        :param shuffle: whether to shuffle the order of the samples in each epoch
+        :type shuffle: bool
+        :param seed: the seed for the shuffling, combined with the epoch for a deterministic order
+        :type seed: int
+        :param num_workers: the number of workers for loading the samples
+        :type num_workers: int
+        :param prefetch: the maximum number of batches to buffer
+        :type prefetch: int
+        :param use_processes: whether to use processes instead of threads (model must be picklable)
+        :type use_processes: bool
+        """
+        super().__init__()
+        if batch_size < 1:
+            raise Exception("Batch size must be at least 1, provided: %d" % batch_size)
+        if loop and (len(sample_ids) == 0):
+            raise Exception("At least one sample ID required when looping!")
+        self.model = model
+        self.sample_ids = list(sample_ids)
+        self.batch_size = batch_size
+        self.is_train = is_train
+        self.return_actuals = return_actuals
+        self.loop = loop
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_workers = max(1, num_workers)
+        self.prefetch = max(1, prefetch)
+        self.use_processes = use_processes
+        self.wait_time = 0.0
+        self._queue = None
+        self._stop = None
+        self._thread = None
+
+    def epoch_order(self, epoch: int) -> List[str]:
+        """
+        Returns the order of the samples for the specified epoch.
+
+        :param epoch: the epoch (0-based)
+        :type epoch: int
+        :return: the sample IDs
+        :rtype: list
+        """
+        result = list(self.sample_ids)
+        if self.shuffle:
+            rng = np.random.default_rng(None if (self.seed is None) else [self.seed, epoch])
+            result = [result[i] for i in rng.permutation(len(result))]
+        return result
+
+    def _sample_stream(self) -> Iterator[str]:
+        """
+        Returns the sample IDs across all the epochs.
+        """
+        epochs = itertools.count() if self.loop else [0]
+        for epoch in epochs:
+            for sample_id in self.epoch_order(epoch):
+                yield sample_id
+
+    def _put(self, item) -> bool:
+        """
+        Adds the item to the queue, blocking until space is available or the loader got closed.
+
+        :return: False if the loader got closed
+        :rtype: bool
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self):
+        """
+        Loads the samples via the workers (keeping the order) and assembles the batches.
+        """
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        try:
+            with executor_cls(max_workers=self.num_workers) as executor:
+                pending = []
+                stream = self._sample_stream()
+                # the number of consecutive samples without regions
+                empty = 0
+                builder = _BatchBuilder(self.batch_size, self.is_train, self.return_actuals)
+                while not self._stop.is_set():
+                    # keep workers busy
+                    while len(pending) < self.num_workers + self.prefetch:
+                        sample_id = next(stream, None)
+                        if sample_id is None:
+                            break
+                        pending.append(executor.submit(_load_regions, self.model, sample_id, self.is_train, self.return_actuals))
+                    if len(pending) == 0:
+                        break
+                    wavelengths, regions = pending.pop(0).result()
+                    empty = 0 if (len(regions) > 0) else (empty + 1)
+                    if self.loop and (empty >= len(self.sample_ids)):
+                        raise Exception("None of the samples provides any regions, cannot loop!")
+                    for data, target, sample_id in regions:
+                        if builder.wavelengths is None:
+                            builder.wavelengths = wavelengths
+                        if self.model.data_shape is None:
+                            self.model.data_shape = data.shape
+                        builder.add(data, target, sample_id)
+                        if len(builder) == self.batch_size:
+                            if not self._put(builder.build()):
+                                break
+                            builder = _BatchBuilder(self.batch_size, self.is_train, self.return_actuals)
+                if len(builder) > 0:
+                    self._put(builder.build())
+                for future in pending:
+                    future.cancel()
+        except Exception as e:
+            self._put(e)
+        self._put(_END)
+
+    def start(self):
+        """
+        Starts the background loading, if not already running.
+        """
+        if self._thread is not None:
+            return
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stops the background loading.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._queue = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        """
+        Returns the batches, in the same format as ImagingModel.generate_batch.
+
+        :return: the iterator over the batches
+        :rtype: iterator
+        """
+        self.close()
+        self.wait_time = 0.0
+        self.start()
+        try:
+            while True:
+                start = time.time()
+                item = self._queue.get()
+                self.wait_time += time.time() - start
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from typing import Dict, List, Optional, Callable
+
+from happy.base.core import ObjectWithLogging
+from happy.base.precision import get_compute_dtype
+
+
+CACHE_VERSION = 1
+""" the version of the cache layout, part of the key. """
+
+FILE_META = "meta.json"
+""" the file with the non-array content of the dataset. """
+
+ARRAY_KEYS = ["X_train", "y_train", "X_pred", "y_pred", "mask"]
+""" the dataset keys that get stored as numpy arrays. """
+
+
+def _split_sample_id(sample_id: str) -> str:
+    """
+    Returns the sample part of a sample ID that may contain a region (SAMPLE:REGION).
+
+    :param sample_id: the ID to split
+    :type sample_id: str
+    :return: the sample part
+    :rtype: str
+    """
+    return sample_id.split(":")[0]
+
+
+def fingerprint_dirs(base_dir: str, sample_ids: List[str]) -> List[List]:
+    """
+    Generates a fingerprint of the sample directories in the base directory,
+    using relative path, size and modification time of all the files.
+
+    :param base_dir: the HAPPy base directory
+    :type base_dir: str
+    :param sample_ids: the sample IDs to fingerprint
+    :type sample_ids: list
+    :return: the list of [path, size, mtime] entries
+    :rtype: list
+    """
+    result = []
+    for sample in sorted(set([_split_sample_id(x) for x in sample_ids])):
+        sample_dir = os.path.join(base_dir, sample)
+        for root, dirs, files in os.walk(sample_dir):
+            dirs.sort()
+            for f in sorted(files):
+                path = os.path.join(root, f)
+                st = os.stat(path)
+                result.append([os.path.relpath(path, base_dir), st.st_size, st.st_mtime_ns])
+    return result
+
+
+class DatasetCache(ObjectWithLogging):
+    """
+    On-disk cache for datasets generated by the models (eg the training data).
+    The arrays get stored as .npy files and are memory-mapped when loaded.
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Initializes the cache.
+
+        :param cache_dir: the directory to store the cached datasets in
+        :type cache_dir: str
+        """
+        super().__init__()
+        self.cache_dir = cache_dir
+
+    def compute_key(self, base_dir: str, sample_ids: List[str], preprocessors: Optional[str],
+                    pixel_selector=None, seed: Optional[int] = None, target: Optional[str] = None,
+                    purpose: Optional[str] = None, mask=None) -> str:
+        """
+        Computes the key for the dataset generated from the specified parameters.
+
+        :param base_dir: the HAPPy base directory the data gets read from
+        :type base_dir: str
+        :param sample_ids: the sample IDs that make up the dataset
+        :type sample_ids: list
+        :param preprocessors: the preprocessing command-line
+        :type preprocessors: str
+        :param pixel_selector: the pixel selector in use, ignored if None
+        :type pixel_selector: PixelSelector
+        :param seed: the seed used for the random number generators
+        :type seed: int
+        :param target: the target value name
+        :type target: str
+        :param purpose: what the dataset is used for (eg train/predict), to distinguish datasets with otherwise same parameters
+        :type purpose: str
+        :param mask: the mask for the pixels to predict, ignored if None
+        :type mask: PredictionMask
+        :return: the key (hex digest)
+        :rtype: str
+        """
+        # preprocessing file? use content instead
+        if (preprocessors is not None) and os.path.isfile(preprocessors):
+            with open(preprocessors, "r") as fp:
+                preprocessors = fp.read()
+        data = {
+            "version": CACHE_VERSION,
+            "files": fingerprint_dirs(base_dir, sample_ids),
+            "sample_ids": list(sample_ids),
+            "preprocessors": preprocessors,
+            "pixel_selector": None if (pixel_selector is None) else pixel_selector.to_dict(),
+            "seed": seed,
+            "target": target,
+            "purpose": purpose,
+        }
+        # only part of the key when set, keeps the keys of existing caches valid
+        if get_compute_dtype() is not None:
+            data["compute_dtype"] = get_compute_dtype().name
+        if mask is not None:
+            data["mask"] = mask.to_dict()
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        """
+        Returns the directory for the specified key.
+
+        :param key: the key of the dataset
+        :type key: str
+        :return: the directory
+        :rtype: str
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def has(self, key: str) -> bool:
+        """
+        Checks whether a dataset is stored under the key.
+
+        :param key: the key of the dataset
+        :type key: str
+        :return: True if available
+        :rtype: bool
+        """
+        return os.path.exists(os.path.join(self._entry_dir(key), FILE_META))
+
+    def size(self, key: str) -> int:
+        """
+        Returns the size of the arrays stored under the key.
+
+        :param key: the key of the dataset
+        :type key: str
+        :return: the size in bytes, 0 if not cached
+        :rtype: int
+        """
+        result = 0
+        if self.has(key):
+            for k in ARRAY_KEYS:
+                path = os.path.join(self._entry_dir(key), k + ".npy")
+                if os.path.exists(path):
+                    result += os.path.getsize(path)
+        return result
+
+    def load(self, key: str) -> Optional[Dict]:
+        """
+        Loads the dataset stored under the key, memory-mapping the arrays.
+
+        :param key: the key of the dataset
+        :type key: str
+        :return: the dataset, None if not cached
+        :rtype: dict
+        """
+        if not self.has(key):
+            return None
+        entry_dir = self._entry_dir(key)
+        with open(os.path.join(entry_dir, FILE_META), "r") as fp:
+            result = json.load(fp)
+        for k in ARRAY_KEYS:
+            path = os.path.join(entry_dir, k + ".npy")
+            if os.path.exists(path):
+                result[k] = np.load(path, mmap_mode="r")
+        self.logger().info("Loaded cached dataset: %s" % entry_dir)
+        return result
+
+    def save(self, key: str, dataset: Dict) -> bool:
+        """
+        Stores the dataset under the key. Datasets with arrays that cannot be stacked
+        into a single numeric array (ragged or non-numeric) do not get cached.
+
+        :param key: the key of the dataset
+        :type key: str
+        :param dataset: the dataset to store
+        :type dataset: dict
+        :return: True if successfully stored
+        :rtype: bool
+        """
+        arrays = dict()
+        for k in ARRAY_KEYS:
+            if (k in dataset) and (len(dataset[k]) > 0):
+                # no values (eg missing targets)? store as part of meta-data
+                if all(x is None for x in dataset[k]):
+                    continue
+                try:
+                    arr = np.asarray(dataset[k])
+                except ValueError:
+                    arr = None
+                if (arr is None) or (arr.dtype == object):
+                    self.logger().warning("Cannot cache '%s', data is ragged or not numeric!" % k)
+                    return False
+                arrays[k] = arr
+        meta = dict()
+        for k in dataset:
+            if k in arrays:
+                continue
+            v = dataset[k]
+            if isinstance(v, np.ndarray):
+                v = v.tolist()
+            meta[k] = v
+
+        # write to temp dir first, then move into place
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir + ".tmp-%d" % os.getpid()
+        os.makedirs(tmp_dir, exist_ok=True)
+        for k in arrays:
+            np.save(os.path.join(tmp_dir, k + ".npy"), arrays[k])
+        with open(os.path.join(tmp_dir, FILE_META), "w") as fp:
+            json.dump(meta, fp, default=str)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # stored concurrently by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.logger().info("Cached dataset: %s" % entry_dir)
+        return True
+
+    def get(self, key: str, generate: Callable[[], Dict]) -> Dict:
+        """
+        Returns the cached dataset for the key. If not present, generates and stores it,
+        returning the memory-mapped version.
+
+        :param key: the key of the dataset
+        :type key: str
+        :param generate: the function for generating the dataset when not cached
+        :return: the dataset
+        :rtype: dict
+        """
+        result = self.load(key)
+        if result is not None:
+            return result
+        self.logger().info("Dataset not cached yet: %s" % key)
+        dataset = generate()
+        if self.save(key, dataset):
+            return self.load(key)
+        return dataset
@@ -50,8 +50,8 @@ class GenericScikitSpectroscopyModel(ScikitSpectroscopyModel):
     def predict(self, sample_ids, prediction_pixel_selector=None, prediction_data=None):
         return self.base_model.predict(sample_ids, prediction_pixel_selector=prediction_pixel_selector, prediction_data=prediction_data)
 
-    def predict_images(self, sample_ids, return_actuals=False):
-        return self.base_model.predict_images(sample_ids, return_actuals=return_actuals)
+    def predict_images(self, sample_ids, return_actuals=False, mask=None):
+        return self.base_model.predict_images(sample_ids, return_actuals=return_actuals, mask=mask)
 
     def generate_training_dataset(self, sample_ids):
         return self.base_model.generate_training_dataset(sample_ids)
@@ -59,9 +59,9 @@ class GenericScikitSpectroscopyModel(ScikitSpectroscopyModel):
     def generate_prediction_dataset(self, sample_ids, pixel_selector=None, return_actuals=False):
         return self.base_model.generate_prediction_dataset(sample_ids, pixel_selector=pixel_selector, return_actuals=return_actuals)
 
-    def save_model(self, folder_name, save_training_data=True):
+    def save_model(self, folder_name, save_training_data=True, preprocessors=None):
         # TODO wrap in Generic?
-        self.base_model.save_model(folder_name, save_training_data=save_training_data)
+        self.base_model.save_model(folder_name, save_training_data=save_training_data, preprocessors=preprocessors)
 
     @classmethod
     def instantiate(cls, c, data_folder, target):
@@ -91,8 +91,14 @@ class GenericUnsupervisedPixelClusterer(UnsupervisedPixelClusterer):
     def predict(self, id_list, return_actuals=False):
         return self.base_model.predict(id_list, return_actuals=return_actuals)
 
-    def predict_images(self, sample_ids, return_actuals=False):
-        return self.base_model.predict_images(sample_ids, return_actuals=return_actuals)
+    def supports_streaming(self):
+        return self.base_model.supports_streaming()
+
+    def fit_streaming(self, id_list, all_pixels=False, batch_size=10000, num_passes=1):
+        self.base_model.fit_streaming(id_list, all_pixels=all_pixels, batch_size=batch_size, num_passes=num_passes)
+
+    def predict_images(self, sample_ids, return_actuals=False, chunk_size=None, mask=None):
+        return self.base_model.predict_images(sample_ids, return_actuals=return_actuals, chunk_size=chunk_size, mask=mask)
 
     @classmethod
     def instantiate(cls, c, data_folder, target):
@@ -1,15 +1,33 @@
 import abc
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
 from happy.readers import HappyReader
 from happy.models.happy import HappyModel
 from happy.preprocessors import apply_preprocessor
 import itertools
 
 
+def _remove_memmap_file(path):
+    """
+    Removes the file backing a memory-mapped array, if still present.
+
+    :param path: the file to remove
+    :type path: str
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
 class ImagingModel(HappyModel, abc.ABC):
     def __init__(self, data_folder, target, happy_preprocessor=None, additional_meta_data=None, region_selector=None):
         super().__init__(data_folder, target, happy_preprocessor, additional_meta_data)
         self.region_selector = region_selector
         self.data_shape = None
+        self.memmap_dir = None
         
     def get_data_shape(self):
         print(f"data shape: {self.data_shape}")
@@ -67,44 +85,119 @@ class ImagingModel(HappyModel, abc.ABC):
             if dataset["X_train"]:
                 yield dataset
     
-    def _generate_dataset(self, sample_ids, is_train=True, return_actuals=False):
-        dataset = {"X_train": [], "y_train": [], "sample_id": []} if is_train else {"X_pred": [], "y_pred": [], "sample_id": []}
-        happy_reader = HappyReader(self.data_folder)
-        # Apply region selection based on the sample_ids
+    def load_regions(self, sample_id, is_train=True, return_actuals=False):
+        """
+        Loads, preprocesses and extracts the regions of a single sample.
+
+        :param sample_id: the sample to load
+        :type sample_id: str
+        :param is_train: whether to load training data (regions without target get skipped)
+        :type is_train: bool
+        :param return_actuals: whether to include the target values when not loading training data
+        :type return_actuals: bool
+        :return: the tuple of wavelengths (None if no regions) and list of (data, target, sample_id) tuples
+        :rtype: tuple
+        """
         if self.region_selector is None:
             raise ValueError("Region selector is not set. Use set_region_selector() method to set the region selector.")
-        added_wavelengths = False
-        for sample_id in sample_ids:
-            happy_data_list = happy_reader.load_data(sample_id)
-            for happy_data in happy_data_list:
-                # Apply HappyPreprocessor if available
-                
-                if self.happy_preprocessor is not None:
-                    happy_data = apply_preprocessor(happy_data, self.happy_preprocessor)[0]
-                
-                region_list = self.region_selector.extract_regions(happy_data)
-                for region in region_list:
-                    if not added_wavelengths:
-                        dataset['wavelengths']=happy_data.get_wavelengths()
-                        added_wavelengths = True
-                    if self.data_shape is None:
-                        self.data_shape = region.get_numpy_yx().shape
-                    # Extract the target variable from the metadata (assuming the target is stored in the metadata)                  
-                    
-                    if is_train:
-                        target_value = self.get_y(happy_data)
-                        if target_value is None:
-                            continue
-                        dataset["X_train"].append(region.get_numpy_yx())
-                        dataset["y_train"].append(target_value)
-                        dataset["sample_id"].append(region.sample_id)
-                    else:
-                        if return_actuals:
-                            target_value = self.get_y(happy_data)
-                            dataset["y_pred"].append(target_value)
-                        dataset["X_pred"].append(region.get_numpy_yx())
-                        dataset["sample_id"].append(sample_id)
+        happy_reader = HappyReader(self.data_folder)
+        wavelengths = None
+        result = []
+        for happy_data in happy_reader.load_data(sample_id):
+            if self.happy_preprocessor is not None:
+                happy_data = apply_preprocessor(happy_data, self.happy_preprocessor)[0]
+            for region in self.region_selector.extract_regions(happy_data):
+                if wavelengths is None:
+                    wavelengths = happy_data.get_wavelengths()
+                target_value = None
+                if is_train or return_actuals:
+                    target_value = self.get_y(happy_data)
+                    if is_train and (target_value is None):
+                        continue
+                result.append((region.get_numpy_yx(), target_value, sample_id))
+        return wavelengths, result
+
+    def _allocate(self, shape, dtype):
+        """
+        Allocates an array for stacking the regions, memory-mapped if a directory has been set.
+        The file of a memory-mapped array gets removed once the array is no longer used.
+
+        :param shape: the shape of the array
+        :type shape: tuple
+        :param dtype: the data type of the array
+        :return: the array
+        :rtype: np.ndarray
+        """
+        if self.memmap_dir is None:
+            return np.empty(shape, dtype=dtype)
+        fd, path = tempfile.mkstemp(suffix=".npy", dir=self.memmap_dir)
+        os.close(fd)
+        self.logger().info("Allocating memory-mapped array %s: %s" % (str(shape), path))
+        result = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        weakref.finalize(result, _remove_memmap_file, path)
+        return result
+
+    def _resize(self, array, capacity):
+        """
+        Returns an array with the new capacity (first axis), containing the data of the old one.
+        In-memory arrays get resized in place.
 
+        :param array: the array to resize
+        :type array: np.ndarray
+        :param capacity: the new capacity, truncates the data if smaller than the current one
+        :type capacity: int
+        :return: the new array
+        :rtype: np.ndarray
+        """
+        if not isinstance(array, np.memmap):
+            array.resize((capacity,) + array.shape[1:], refcheck=False)
+            return array
+        result = self._allocate((capacity,) + array.shape[1:], array.dtype)
+        result[:min(capacity, len(array))] = array[:capacity]
+        path = array.filename
+        del array
+        _remove_memmap_file(path)
+        return result
+
+    def _generate_dataset(self, sample_ids, is_train=True, return_actuals=False):
+        x_key = "X_train" if is_train else "X_pred"
+        y_key = "y_train" if is_train else "y_pred"
+        dataset = {x_key: [], y_key: [], "sample_id": []}
+        X = None
+        y = None
+        n = 0
+        for i, sample_id in enumerate(sample_ids):
+            wavelengths, regions = self.load_regions(sample_id, is_train=is_train, return_actuals=return_actuals)
+            if (wavelengths is not None) and ("wavelengths" not in dataset):
+                dataset["wavelengths"] = wavelengths
+            for data, target_value, region_sample_id in regions:
+                if self.data_shape is None:
+                    self.data_shape = data.shape
+                # first region: estimate the total number of regions from the regions of the current sample
+                if X is None:
+                    capacity = max(1, len(regions) * (len(sample_ids) - i))
+                    X = self._allocate((capacity,) + data.shape, np.float32)
+                    if is_train or return_actuals:
+                        target_value = np.asarray(target_value)
+                        y = np.empty((capacity,) + target_value.shape, dtype=target_value.dtype)
+                elif data.shape != X.shape[1:]:
+                    raise Exception("Region of sample '%s' has shape %s, expected: %s" % (sample_id, str(data.shape), str(X.shape[1:])))
+                # grow geometrically when full
+                if n == len(X):
+                    X = self._resize(X, 2 * len(X))
+                    if y is not None:
+                        y = self._resize(y, 2 * len(y))
+                X[n] = data
+                if y is not None:
+                    y[n] = target_value
+                dataset["sample_id"].append(region_sample_id)
+                n += 1
+
+        # remove unused capacity
+        if X is not None:
+            dataset[x_key] = self._resize(X, n) if (n < len(X)) else X
+        if y is not None:
+            dataset[y_key] = self._resize(y, n) if (n < len(y)) else y
         return dataset
 
     def generate_training_dataset(self, sample_ids):
@@ -115,3 +208,13 @@ class ImagingModel(HappyModel, abc.ABC):
 
     def set_region_selector(self, region_selector):
         self.region_selector = region_selector
+
+    def set_memmap_dir(self, memmap_dir):
+        """
+        Sets the directory for storing the stacked region data of the datasets as memory-mapped
+        arrays, keeps them in memory if None.
+
+        :param memmap_dir: the directory to use, None for in-memory
+        :type memmap_dir: str
+        """
+        self.memmap_dir = memmap_dir
@@ -0,0 +1,171 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from seppl import get_class
+from happy.models.dataset_cache import DatasetCache
+
+
+BUNDLE_VERSION = 1
+""" the version of the bundle layout, bundles with a newer version cannot be loaded. """
+
+FILE_MANIFEST = "manifest.json"
+""" the file describing the bundle. """
+
+FILE_ESTIMATOR = "estimator.pkl"
+""" the file with the pickled estimator. """
+
+FILE_PREPROCESSOR = "preprocessor.pkl"
+""" the file with the pickled preprocessor, only used if no command-line available. """
+
+DIR_PREPROCESSOR_STATE = "preprocessor_state"
+""" the directory with the fitted state of the preprocessors (one .npy file per array). """
+
+KEY_TRAINING_DATA = "training_data"
+""" the sub-directory with the training data (stored like the dataset cache). """
+
+
+def is_bundle(folder_name: str) -> bool:
+    """
+    Checks whether the directory contains a model bundle.
+
+    :param folder_name: the directory to check
+    :type folder_name: str
+    :return: True if a bundle
+    :rtype: bool
+    """
+    return os.path.exists(os.path.join(folder_name, FILE_MANIFEST))
+
+
+def write_manifest(folder_name: str, manifest: Dict):
+    """
+    Writes the manifest to the bundle directory, adding the bundle version.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :param manifest: the manifest to write
+    :type manifest: dict
+    """
+    manifest = dict(manifest)
+    manifest["version"] = BUNDLE_VERSION
+    with open(os.path.join(folder_name, FILE_MANIFEST), "w") as fp:
+        json.dump(manifest, fp, indent=2, default=str)
+
+
+def read_manifest(folder_name: str) -> Dict:
+    """
+    Reads the manifest of the bundle.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :return: the manifest
+    :rtype: dict
+    """
+    with open(os.path.join(folder_name, FILE_MANIFEST), "r") as fp:
+        result = json.load(fp)
+    version = result.get("version", None)
+    if (version is None) or (version > BUNDLE_VERSION):
+        raise Exception("Unsupported model bundle version %s (supported up to: %d): %s" % (str(version), BUNDLE_VERSION, folder_name))
+    return result
+
+
+def save_estimator(folder_name: str, estimator):
+    """
+    Pickles the estimator to its own file in the bundle.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :param estimator: the estimator to save
+    """
+    with open(os.path.join(folder_name, FILE_ESTIMATOR), "wb") as fp:
+        pickle.dump(estimator, fp)
+
+
+def load_estimator(folder_name: str):
+    """
+    Loads the pickled estimator from the bundle.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :return: the estimator
+    """
+    with open(os.path.join(folder_name, FILE_ESTIMATOR), "rb") as fp:
+        return pickle.load(fp)
+
+
+def save_state(folder_name: str, state: Dict[str, np.ndarray]) -> List[str]:
+    """
+    Saves the fitted state of the preprocessors as .npy files.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :param state: the state to save (key -> array)
+    :type state: dict
+    :return: the keys of the saved arrays
+    :rtype: list
+    """
+    if len(state) == 0:
+        return []
+    state_dir = os.path.join(folder_name, DIR_PREPROCESSOR_STATE)
+    os.makedirs(state_dir, exist_ok=True)
+    for k in state:
+        np.save(os.path.join(state_dir, k + ".npy"), np.asarray(state[k]))
+    return sorted(state.keys())
+
+
+def load_state(folder_name: str, keys: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Loads the fitted state of the preprocessors.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :param keys: the keys of the arrays to load
+    :type keys: list
+    :return: the state (key -> array)
+    :rtype: dict
+    """
+    state_dir = os.path.join(folder_name, DIR_PREPROCESSOR_STATE)
+    return {k: np.load(os.path.join(state_dir, k + ".npy")) for k in keys}
+
+
+def save_training_data(folder_name: str, training_data: Dict) -> bool:
+    """
+    Saves the training data in the bundle, with the arrays as .npy files.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :param training_data: the training data to save
+    :type training_data: dict
+    :return: True if successfully saved (ragged data cannot be stored)
+    :rtype: bool
+    """
+    return DatasetCache(folder_name).save(KEY_TRAINING_DATA, training_data)
+
+
+def load_training_data(folder_name: str) -> Optional[Dict]:
+    """
+    Loads the training data from the bundle, memory-mapping the arrays.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :return: the training data, None if not stored
+    :rtype: dict
+    """
+    return DatasetCache(folder_name).load(KEY_TRAINING_DATA)
+
+
+def load_model(folder_name: str):
+    """
+    Loads the model from the bundle, using the model class stored in the manifest.
+
+    :param folder_name: the bundle directory
+    :type folder_name: str
+    :return: the model
+    """
+    manifest = read_manifest(folder_name)
+    c = get_class(full_class_name=manifest["model_class"])
+    return c.load_model(folder_name)
@@ -0,0 +1,113 @@
+import argparse
+
+import numpy as np
+
+from typing import Dict, Optional, Union
+
+from happy.base.core import ObjectWithLogging
+from happy.criteria import Criteria, CriteriaGroup
+
+
+class PredictionMask(ObjectWithLogging):
+    """
+    Determines the pixels of an image that the models should make predictions for,
+    skipping background and padding. A pixel is valid if it passes all the configured
+    checks; without any checks, all pixels are valid.
+    """
+
+    def __init__(self, criteria: Optional[Union[Criteria, CriteriaGroup]] = None, non_zero: bool = False,
+                 layer: Optional[str] = None, fill_value=0):
+        """
+        Initializes the mask.
+
+        :param criteria: the criteria that valid pixels must match, ignored if None
+        :type criteria: Criteria or CriteriaGroup
+        :param non_zero: whether to skip pixels with all-zero spectra
+        :type non_zero: bool
+        :param layer: the meta-data layer (eg 'mask') with non-zero values for valid pixels, ignored if None
+        :type layer: str
+        :param fill_value: the value to use in the output images for the skipped pixels
+        """
+        super().__init__()
+        self.criteria = criteria
+        self.non_zero = non_zero
+        self.layer = layer
+        self.fill_value = fill_value
+
+    def compute(self, happy_data) -> np.ndarray:
+        """
+        Computes the mask for the data.
+
+        :param happy_data: the data to compute the mask for
+        :type happy_data: HappyData
+        :return: the boolean mask (height, width), True for valid pixels
+        :rtype: np.ndarray
+        """
+        result = np.full(happy_data.data.shape[:2], True, dtype=bool)
+        if self.non_zero:
+            result &= np.any(happy_data.data != 0, axis=2)
+        if self.layer is not None:
+            layer = happy_data.get_meta_data(key=self.layer)
+            if not isinstance(layer, np.ndarray):
+                raise Exception("Meta-data layer '%s' not available for sample: %s" % (self.layer, happy_data.get_full_id()))
+            layer = layer.reshape(result.shape)
+            result &= (layer != 0)
+            if np.issubdtype(layer.dtype, np.floating):
+                result &= ~np.isnan(layer)
+        if self.criteria is not None:
+            result &= self.criteria.mask(happy_data)
+        return result
+
+    def is_active(self) -> bool:
+        """
+        Returns whether any checks have been configured.
+
+        :return: True if pixels can get skipped
+        :rtype: bool
+        """
+        return self.non_zero or (self.layer is not None) or (self.criteria is not None)
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser):
+        """
+        Adds the command-line options for configuring the mask to the parser.
+
+        :param parser: the parser to extend
+        :type parser: argparse.ArgumentParser
+        """
+        parser.add_argument('--mask_criteria', type=str, help='The JSON string defining the criteria that pixels must match to get predicted', required=False, default=None)
+        parser.add_argument('--mask_non_zero', action='store_true', help='Whether to skip pixels with all-zero spectra (eg padding) when predicting', required=False)
+        parser.add_argument('--mask_layer', type=str, help='The meta-data layer (eg mask) with non-zero values for the pixels to predict', required=False, default=None)
+        parser.add_argument('--mask_fill_value', type=float, help='The value to use for the skipped pixels in the prediction images', required=False, default=0)
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the configuration of the mask as dictionary.
+
+        :return: the configuration
+        :rtype: dict
+        """
+        return {
+            "criteria": None if (self.criteria is None) else self.criteria.to_dict(),
+            "non_zero": self.non_zero,
+            "layer": self.layer,
+            "fill_value": self.fill_value,
+        }
+
+    @classmethod
+    def from_arguments(cls, ns: argparse.Namespace) -> Optional['PredictionMask']:
+        """
+        Instantiates the mask from the parsed command-line options.
+
+        :param ns: the parsed options
+        :type ns: argparse.Namespace
+        :return: the mask, None if no checks specified
+        :rtype: PredictionMask
+        """
+        criteria = None
+        if ns.mask_criteria is not None:
+            criteria = Criteria.from_json(ns.mask_criteria)
+        result = PredictionMask(criteria=criteria, non_zero=ns.mask_non_zero, layer=ns.mask_layer, fill_value=ns.mask_fill_value)
+        if not result.is_active():
+            return None
+        return result
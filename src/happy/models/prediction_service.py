@@ -0,0 +1,266 @@
+import copy
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from happy.base.core import ObjectWithLogging
+from happy.data import HappyData
+from happy.models.prediction_mask import PredictionMask
+from happy.preprocessors import apply_preprocessor
+from happy.readers import HappyDataReader
+
+
+class PredictionRequest:
+    """
+    The preprocessed pixels of an image waiting to get predicted.
+    """
+
+    def __init__(self, X: np.ndarray, height: int, width: int, valid: Optional[np.ndarray], future: Future):
+        """
+        Initializes the request.
+
+        :param X: the pixels to predict (N, B)
+        :type X: np.ndarray
+        :param height: the height of the image
+        :type height: int
+        :param width: the width of the image
+        :type width: int
+        :param valid: the mask of the valid pixels (height, width), None if all pixels get predicted
+        :type valid: np.ndarray
+        :param future: the future to set the prediction image on
+        :type future: Future
+        """
+        self.X = X
+        self.height = height
+        self.width = width
+        self.valid = valid
+        self.future = future
+
+
+class PredictionService(ObjectWithLogging):
+    """
+    Makes predictions with a loaded spectroscopy model for images that get submitted concurrently.
+    A pool of workers loads and preprocesses the images, a single thread combines the pixels of
+    the waiting images into micro-batches, making only one predict call per batch.
+    """
+
+    def __init__(self, model, max_batch_pixels: int = 1000000, max_wait: float = 0.005, num_workers: int = 1,
+                 mask: Optional[PredictionMask] = None, reader: str = "envi-reader"):
+        """
+        Initializes the service.
+
+        :param model: the model to use (eg ScikitSpectroscopyModel)
+        :param max_batch_pixels: the maximum number of pixels to combine into a single predict call
+        :type max_batch_pixels: int
+        :param max_wait: the number of seconds to wait for more images before predicting a batch
+        :type max_wait: float
+        :param num_workers: the number of workers for loading and preprocessing the images
+        :type num_workers: int
+        :param mask: the mask for determining the pixels to predict, all pixels if None
+        :type mask: PredictionMask
+        :param reader: the command-line of the reader to use for loading scans from paths
+        :type reader: str
+        """
+        super().__init__()
+        self.model = model
+        self.max_batch_pixels = max_batch_pixels
+        self.max_wait = max_wait
+        self.num_workers = num_workers
+        self.mask = mask
+        self.reader = reader
+        self.num_batches = 0
+        self.num_requests = 0
+        self._queue = queue.Queue()
+        self._pool = None
+        self._batcher = None
+        self._running = False
+        self._local = threading.local()
+
+    def start(self):
+        """
+        Starts the workers and the batching thread.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=self.num_workers)
+        self._batcher = threading.Thread(target=self._run_batches, daemon=True)
+        self._batcher.start()
+
+    def stop(self):
+        """
+        Stops the workers and the batching thread, after processing the submitted images.
+        """
+        if not self._running:
+            return
+        self._pool.shutdown(wait=True)
+        self._running = False
+        self._queue.put(None)
+        self._batcher.join()
+
+    def _preprocess(self, happy_data: HappyData) -> HappyData:
+        """
+        Applies the preprocessing of the model to the data. Each worker uses its own copy
+        of the preprocessor, as fitting and applying it is not thread-safe.
+
+        :param happy_data: the data to preprocess
+        :type happy_data: HappyData
+        :return: the preprocessed data
+        :rtype: HappyData
+        """
+        if self.model.happy_preprocessor is None:
+            return happy_data
+        preprocessor = getattr(self._local, "preprocessor", None)
+        if preprocessor is None:
+            preprocessor = copy.deepcopy(self.model.happy_preprocessor)
+            self._local.preprocessor = preprocessor
+        return apply_preprocessor(happy_data, preprocessor)[0]
+
+    def _enqueue(self, happy_data: HappyData, future: Future):
+        """
+        Preprocesses the data and queues its pixels for prediction.
+
+        :param happy_data: the data to predict
+        :type happy_data: HappyData
+        :param future: the future for the prediction image
+        :type future: Future
+        """
+        try:
+            happy_data = self._preprocess(happy_data)
+            data = happy_data.get_numpy_yx()
+            X = data.reshape(-1, data.shape[2])
+            valid = None
+            if self.mask is not None:
+                valid = self.mask.compute(happy_data)
+                X = X[valid.ravel()]
+            self._queue.put(PredictionRequest(X, data.shape[0], data.shape[1], valid, future))
+        except Exception as e:
+            future.set_exception(e)
+
+    def submit(self, happy_data: HappyData) -> Future:
+        """
+        Submits the data for prediction.
+
+        :param happy_data: the data to predict
+        :type happy_data: HappyData
+        :return: the future for the prediction image (height, width)
+        :rtype: Future
+        """
+        if not self._running:
+            raise Exception("Prediction service has not been started!")
+        future = Future()
+        self._pool.submit(self._enqueue, happy_data, future)
+        return future
+
+    def predict_array(self, data: np.ndarray, wavenumbers: Optional[List[float]] = None) -> np.ndarray:
+        """
+        Predicts the image from the raw array.
+
+        :param data: the hyperspectral data (height, width, bands)
+        :type data: np.ndarray
+        :param wavenumbers: the wavelengths of the bands, can be None
+        :type wavenumbers: list
+        :return: the prediction image (height, width)
+        :rtype: np.ndarray
+        """
+        if data.ndim != 3:
+            raise Exception("Expected array with 3 dimensions (height, width, bands), got: %s" % str(data.shape))
+        happy_data = HappyData("array", "", data, dict(), dict(), wavenumbers=wavenumbers)
+        return self.submit(happy_data).result()
+
+    def predict_path(self, path: str) -> List[np.ndarray]:
+        """
+        Loads the scan with the reader and predicts its image(s).
+
+        :param path: the path of the scan (eg the ENVI .hdr file or the HAPPy sample directory)
+        :type path: str
+        :return: the prediction images (height, width)
+        :rtype: list
+        """
+        if not os.path.exists(path):
+            raise Exception("Scan does not exist: %s" % path)
+        reader = HappyDataReader.parse_reader(self.reader)
+        if reader is None:
+            raise Exception("Failed to parse reader: %s" % self.reader)
+        reader.update_base_dir(os.path.dirname(os.path.abspath(path)))
+        futures = [self.submit(x) for x in reader.load_data(os.path.basename(path))]
+        return [x.result() for x in futures]
+
+    def _next_batch(self) -> Optional[List[PredictionRequest]]:
+        """
+        Waits for the next request and collects further ones until the batch is full
+        or the wait time has elapsed.
+
+        :return: the requests of the batch, None if stopped
+        :rtype: list
+        """
+        request = self._queue.get()
+        if request is None:
+            return None
+        result = [request]
+        num_pixels = len(request.X)
+        deadline = time.monotonic() + self.max_wait
+        while num_pixels < self.max_batch_pixels:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                # process the batch first
+                self._queue.put(None)
+                break
+            result.append(request)
+            num_pixels += len(request.X)
+        return result
+
+    def _predict_batch(self, requests: List[PredictionRequest]):
+        """
+        Predicts the pixels of all requests with a single predict call and sets the images.
+
+        :param requests: the requests to predict
+        :type requests: list
+        """
+        counts = [len(x.X) for x in requests]
+        try:
+            non_empty = [x.X for x in requests if len(x.X) > 0]
+            predictions = None
+            if len(non_empty) > 0:
+                predictions = np.asarray(self.model.model.predict(np.concatenate(non_empty)))
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        self.num_batches += 1
+        self.num_requests += len(requests)
+        self.logger().debug("Predicted batch of %d image(s), %d pixel(s)" % (len(requests), sum(counts)))
+        start = 0
+        for request, count in zip(requests, counts):
+            pixel_predictions = None if (count == 0) else predictions[start:start + count]
+            start += count
+            res = {
+                "X_pred": [request.X],
+                "x": [request.width],
+                "y": [request.height],
+                "mask": [request.valid],
+            }
+            image = self.model._predict_image(lambda X: pixel_predictions, res, 0, mask=None if (request.valid is None) else self.mask)
+            request.future.set_result(image)
+
+    def _run_batches(self):
+        """
+        Predicts the batches until stopped.
+        """
+        while True:
+            requests = self._next_batch()
+            if requests is None:
+                break
+            self._predict_batch(requests)
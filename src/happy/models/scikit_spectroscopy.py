@@ -3,7 +3,10 @@ import pickle
 
 import numpy as np
 
+from happy.models import model_bundle
 from happy.models.spectroscopy import SpectroscopyModel
+from happy.base.core import ConfigurableObject
+from happy.preprocessors import Preprocessor, MultiPreprocessor
 
 
 class ScikitSpectroscopyModel(SpectroscopyModel):
@@ -11,6 +14,7 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
         super().__init__(data_folder, target, happy_preprocessor, additional_meta_data, pixel_selector)
         self.model = model
         self.training_data = training_data
+        self.training_data_dir = None
         
         # Extract values from the dictionary
         if mapping is not None:
@@ -23,6 +27,10 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
             self.logger().info("# classes: %d" % self.num_classes)
 
     def get_training_data(self):
+        # training data of a model bundle only gets loaded when needed
+        if (self.training_data is None) and (self.training_data_dir is not None):
+            self.training_data = model_bundle.load_training_data(self.training_data_dir)
+            self.training_data_dir = None
         return self.training_data
         
     def one_hot_encode(self, data):
@@ -63,7 +71,7 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
         return encoded_data
 
     def fit(self, sample_ids, force=False, keep_training_data=False):
-        if self.training_data is None or force or keep_training_data:
+        if self.get_training_data() is None or force or keep_training_data:
             self.training_data = self.generate_training_dataset(sample_ids)
         # Implement logic to fit the scikit-learn model using training_data
         # Assuming the model is already initialized in self.model
@@ -79,9 +87,9 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
         predictions = self.model.predict(prediction_data["X_pred"])
         return predictions
 
-    def predict_images(self, sample_ids, return_actuals=False):
+    def predict_images(self, sample_ids, return_actuals=False, mask=None):
         predictions_list = []
-        res = self._generate_full_prediction_dataset(sample_ids, return_actuals)
+        res = self._generate_full_prediction_dataset(sample_ids, return_actuals, mask=mask)
         plist = res["X_pred"]
         ylist = None
         actuals_list = None
@@ -89,9 +97,8 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
             ylist = res["y_pred"]
             actuals_list = []
         for i, zarray in enumerate(plist):
-            predictions = self.model.predict(zarray)
             # Reshape predicted labels to match the original image size (y, x)
-            prediction_array = predictions.reshape(res["y"][i], res["x"][i])  
+            prediction_array = self._predict_image(self.model.predict, res, i, mask=mask)
             # Append the prediction array to the list
             predictions_list.append(prediction_array)
             
@@ -111,30 +118,62 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
         #return(predictions_list)
         """
     
-    def save_model(self, folder_name, save_training_data=True):
+    def save_model(self, folder_name, save_training_data=True, preprocessors=None):
+        """
+        Saves the model as bundle: a JSON manifest, the fitted state of the preprocessors
+        as .npy files, the pickled estimator and (optionally) the training data as .npy files.
+
+        :param folder_name: the directory to save the bundle in
+        :type folder_name: str
+        :param save_training_data: whether to save the training data as well
+        :type save_training_data: bool
+        :param preprocessors: the command-line of the preprocessors, pickles the preprocessor if None
+        :type preprocessors: str
+        """
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
 
-        model_info = {
-            'data_folder': self.data_folder,
-            'target': self.target,
-            'happy_preprocessor': self.happy_preprocessor,
-            'additional_meta_data': self.additional_meta_data,
-            'pixel_selector': self.pixel_selector,
-            'model': self.model,
-            'training_data': self.training_data if save_training_data else None,
-            # Add any other parameters that need to be saved
+        manifest = {
+            "model_class": self.__class__.__module__ + "." + self.__class__.__name__,
+            "data_folder": self.data_folder,
+            "target": self.target,
+            "additional_meta_data": self.additional_meta_data,
+            "pixel_selector": None if (self.pixel_selector is None) else self.pixel_selector.to_dict(),
+            "estimator": {
+                "file": model_bundle.FILE_ESTIMATOR,
+                "class": self.model.__class__.__module__ + "." + self.model.__class__.__name__,
+            },
+            "preprocessors": None,
+            "preprocessor_file": None,
+            "preprocessor_multi": isinstance(self.happy_preprocessor, MultiPreprocessor),
+            "preprocessor_state": [],
+            "training_data": None,
         }
 
-        model_filepath = os.path.join(folder_name, 'model.pkl')
-        with open(model_filepath, "wb") as f:
-            pickle.dump(model_info, f)
+        if self.happy_preprocessor is not None:
+            if preprocessors is not None:
+                # file with command-lines? store content instead
+                if os.path.isfile(preprocessors):
+                    with open(preprocessors, "r") as fp:
+                        preprocessors = fp.read()
+                manifest["preprocessors"] = preprocessors
+            else:
+                with open(os.path.join(folder_name, model_bundle.FILE_PREPROCESSOR), "wb") as f:
+                    pickle.dump(self.happy_preprocessor, f)
+                manifest["preprocessor_file"] = model_bundle.FILE_PREPROCESSOR
+            manifest["preprocessor_state"] = model_bundle.save_state(folder_name, self.happy_preprocessor.get_state())
+
+        model_bundle.save_estimator(folder_name, self.model)
+
+        training_data = self.get_training_data() if save_training_data else None
+        if training_data is not None:
+            if model_bundle.save_training_data(folder_name, training_data):
+                manifest["training_data"] = model_bundle.KEY_TRAINING_DATA
+            else:
+                self.logger().warning("Failed to save training data: %s" % folder_name)
+
+        model_bundle.write_manifest(folder_name, manifest)
 
-        # Save the model hyperparameters separately to a params file
-        params_filepath = os.path.join(folder_name, 'model_params.pkl')
-        with open(params_filepath, "wb") as f:
-            pickle.dump(self.model.get_params(), f)
-            
         # Generate Python script to load the model
         script_filepath = os.path.join(folder_name, 'load_model.py')
         with open(script_filepath, 'w') as f:
@@ -146,7 +185,15 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
             f.write(f"model = {self.__class__.__name__}.load_model(folder_name)\n")
 
     @classmethod
-    def load_model(cls, folder_name):
+    def _load_pickled_model(cls, folder_name):
+        """
+        Loads a model saved as model.pkl/model_params.pkl (before the bundle format).
+
+        :param folder_name: the directory with the model
+        :type folder_name: str
+        :return: the model
+        :rtype: ScikitSpectroscopyModel
+        """
         model_filepath = os.path.join(folder_name, 'model.pkl')
         with open(model_filepath, "rb") as f:
             model_info = pickle.load(f)
@@ -166,3 +213,49 @@ class ScikitSpectroscopyModel(SpectroscopyModel):
         loaded_model.model.set_params(**model_params)
 
         return loaded_model
+
+    @classmethod
+    def load_model(cls, folder_name):
+        """
+        Loads the model from the bundle directory. The training data does not get loaded
+        until it is needed, and then only memory-mapped.
+
+        :param folder_name: the directory with the model
+        :type folder_name: str
+        :return: the model
+        :rtype: ScikitSpectroscopyModel
+        """
+        if not model_bundle.is_bundle(folder_name):
+            return cls._load_pickled_model(folder_name)
+
+        manifest = model_bundle.read_manifest(folder_name)
+
+        happy_preprocessor = None
+        if manifest["preprocessors"] is not None:
+            preprocessor_list = Preprocessor.parse_preprocessors(manifest["preprocessors"])
+            if manifest["preprocessor_multi"]:
+                happy_preprocessor = MultiPreprocessor(preprocessor_list=preprocessor_list)
+            elif len(preprocessor_list) == 1:
+                happy_preprocessor = preprocessor_list[0]
+            else:
+                raise Exception("Expected a single preprocessor, but got %d: %s" % (len(preprocessor_list), manifest["preprocessors"]))
+        elif manifest["preprocessor_file"] is not None:
+            with open(os.path.join(folder_name, manifest["preprocessor_file"]), "rb") as f:
+                happy_preprocessor = pickle.load(f)
+        if (happy_preprocessor is not None) and (len(manifest["preprocessor_state"]) > 0):
+            happy_preprocessor.set_state(model_bundle.load_state(folder_name, manifest["preprocessor_state"]))
+
+        pixel_selector = None
+        if manifest["pixel_selector"] is not None:
+            pixel_selector = ConfigurableObject.create_from_dict(manifest["pixel_selector"])
+
+        loaded_model = cls(manifest['data_folder'], manifest['target'],
+                           happy_preprocessor=happy_preprocessor,
+                           additional_meta_data=manifest['additional_meta_data'],
+                           pixel_selector=pixel_selector,
+                           model=model_bundle.load_estimator(folder_name),
+                           training_data=None)
+        if manifest["training_data"] is not None:
+            loaded_model.training_data_dir = folder_name
+
+        return loaded_model
@@ -1,5 +1,4 @@
 import numpy as np
-from matplotlib import cm
 from PIL import Image
 
 
@@ -11,6 +10,7 @@ def create_prediction_image(prediction):
 
 
 def create_false_color_image(prediction, mapping):
+    from matplotlib import cm
     # Create a false color prediction image
     prediction = np.argmax(prediction, axis=-1)
     cmap = cm.get_cmap('viridis', len(mapping))
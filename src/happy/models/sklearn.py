@@ -1,31 +1,7 @@
 import ast
-from seppl import get_class
-from sklearn.linear_model import LinearRegression
-from sklearn.linear_model import Ridge
-from sklearn.linear_model import Lasso
-from sklearn.linear_model import ElasticNet
-from sklearn.linear_model import Lars
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.svm import SVR
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.linear_model import LogisticRegression
-from sklearn.neural_network import MLPClassifier
-from sklearn.cross_decomposition import PLSRegression
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.ensemble import AdaBoostClassifier
-from sklearn.ensemble import ExtraTreesClassifier
-from sklearn.cluster import KMeans
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.cluster import SpectralClustering
-from sklearn.cluster import DBSCAN
-from sklearn.cluster import MeanShift
 import numpy as np
+
+from seppl import get_class
 from sklearn.base import BaseEstimator, RegressorMixin
 
 
@@ -35,6 +11,8 @@ class PlsFilteredKnnRegression(BaseEstimator, RegressorMixin):
         self.n_neighbors = n_neighbors
 
     def fit(self, X, y):
+        from sklearn.cross_decomposition import PLSRegression
+        from sklearn.neighbors import KNeighborsRegressor
         # Fit PLS regression on X and y
         pls = PLSRegression(n_components=self.n_components)
         pls.fit(X, y)
@@ -49,6 +27,7 @@ class PlsFilteredKnnRegression(BaseEstimator, RegressorMixin):
         return self
 
     def predict(self, X):
+        from sklearn.linear_model import LinearRegression
         # Transform X using PLS
         X_pls = self.pls_.transform(X)
         # Find the k-nearest neighbors in the PLS-transformed space
@@ -63,46 +42,49 @@ class PlsFilteredKnnRegression(BaseEstimator, RegressorMixin):
         return y_pred
 
 
+# the values are the class names, the classes only get imported when instantiating a model
 REGRESSION_MODEL_MAP = {
-    'linearregression': LinearRegression,
-    'ridge': Ridge,
-    'lars': Lars,
-    'plsregression': PLSRegression,
-    'plsneighbourregression': PlsFilteredKnnRegression,
-    'lasso': Lasso,
-    'elasticnet': ElasticNet,
-    'decisiontreeregressor': DecisionTreeRegressor,
-    'randomforestregressor': RandomForestRegressor,
-    'svr': SVR,
+    'linearregression': "sklearn.linear_model.LinearRegression",
+    'ridge': "sklearn.linear_model.Ridge",
+    'lars': "sklearn.linear_model.Lars",
+    'plsregression': "sklearn.cross_decomposition.PLSRegression",
+    'plsneighbourregression': "happy.models.sklearn.PlsFilteredKnnRegression",
+    'lasso': "sklearn.linear_model.Lasso",
+    'elasticnet': "sklearn.linear_model.ElasticNet",
+    'decisiontreeregressor': "sklearn.tree.DecisionTreeRegressor",
+    'randomforestregressor': "sklearn.ensemble.RandomForestRegressor",
+    'svr': "sklearn.svm.SVR",
 }
 
 CLASSIFICATION_MODEL_MAP = {
-    'randomforestclassifier': RandomForestClassifier,
-    'gradientboostingclassifier': GradientBoostingClassifier,
-    'adaboostclassifier': AdaBoostClassifier,
-    'kneighborsclassifier': KNeighborsClassifier,
-    'decisiontreeclassifier': DecisionTreeClassifier,
-    'gaussiannb': GaussianNB,
-    'logisticregression': LogisticRegression,
-    'mlpclassifier': MLPClassifier,
-    "svm": SVC,
-    "random_forest": RandomForestClassifier,
-    "knn": KNeighborsClassifier,
-    "decision_tree": DecisionTreeClassifier,
-    "gradient_boosting": GradientBoostingClassifier,
-    "naive_bayes": GaussianNB,
-    "logistic_regression": LogisticRegression,
-    "neural_network": MLPClassifier,
-    "adaboost": AdaBoostClassifier,
-    "extra_trees": ExtraTreesClassifier,
+    'randomforestclassifier': "sklearn.ensemble.RandomForestClassifier",
+    'gradientboostingclassifier': "sklearn.ensemble.GradientBoostingClassifier",
+    'adaboostclassifier': "sklearn.ensemble.AdaBoostClassifier",
+    'kneighborsclassifier': "sklearn.neighbors.KNeighborsClassifier",
+    'decisiontreeclassifier': "sklearn.tree.DecisionTreeClassifier",
+    'gaussiannb': "sklearn.naive_bayes.GaussianNB",
+    'logisticregression': "sklearn.linear_model.LogisticRegression",
+    'mlpclassifier': "sklearn.neural_network.MLPClassifier",
+    "svm": "sklearn.svm.SVC",
+    "random_forest": "sklearn.ensemble.RandomForestClassifier",
+    "knn": "sklearn.neighbors.KNeighborsClassifier",
+    "decision_tree": "sklearn.tree.DecisionTreeClassifier",
+    "gradient_boosting": "sklearn.ensemble.GradientBoostingClassifier",
+    "naive_bayes": "sklearn.naive_bayes.GaussianNB",
+    "logistic_regression": "sklearn.linear_model.LogisticRegression",
+    "neural_network": "sklearn.neural_network.MLPClassifier",
+    "adaboost": "sklearn.ensemble.AdaBoostClassifier",
+    "extra_trees": "sklearn.ensemble.ExtraTreesClassifier",
 }
 
 CLUSTERING_MODEL_MAP = {
-    'kmeans': KMeans,
-    'agglomerative': AgglomerativeClustering,
-    'spectral': SpectralClustering,
-    'dbscan': DBSCAN,
-    'meanshift': MeanShift,
+    'kmeans': "sklearn.cluster.KMeans",
+    'minibatchkmeans': "sklearn.cluster.MiniBatchKMeans",
+    'birch': "sklearn.cluster.Birch",
+    'agglomerative': "sklearn.cluster.AgglomerativeClustering",
+    'spectral': "sklearn.cluster.SpectralClustering",
+    'dbscan': "sklearn.cluster.DBSCAN",
+    'meanshift': "sklearn.cluster.MeanShift",
 }
 
 MODEL_MAP = dict()
@@ -141,7 +123,7 @@ def create_model(model_name, model_params=None):
         if key not in MODEL_MAP:
             raise ValueError("Invalid sklearn method '" + model_name + "', neither class name nor key in model map (keys: " + ",".join(MODEL_MAP.keys()) + ")")
         else:
-            c = MODEL_MAP[key]
+            c = get_class(full_class_name=MODEL_MAP[key])
 
     return c(**params)
 
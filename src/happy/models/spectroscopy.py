@@ -12,8 +12,8 @@ class SpectroscopyModel(HappyModel, abc.ABC):
         self.pixel_selector = pixel_selector
         self.logger().info("ps: %s" % str(pixel_selector))
 
-    def _generate_full_prediction_dataset(self, sample_ids, return_actuals=False):
-        dataset = {"X_pred": [], "y_pred": [],"sample_id": [], "x":[], "y":[]}
+    def _generate_full_prediction_dataset(self, sample_ids, return_actuals=False, mask=None):
+        dataset = {"X_pred": [], "y_pred": [],"sample_id": [], "x":[], "y":[], "mask": []}
         happy_reader = HappyReader(self.data_folder)
         added_wavelengths = False
         for sample_id in sample_ids:
@@ -30,6 +30,11 @@ class SpectroscopyModel(HappyModel, abc.ABC):
                     
                 reshaped_hsi_data = happy_data.get_numpy_yx().reshape(-1, happy_data.get_numpy_yx().shape[2])
                 target_value = happy_data.get_meta_data(key=self.target)
+                # only keep the valid pixels
+                if mask is not None:
+                    valid = mask.compute(happy_data)
+                    reshaped_hsi_data = reshaped_hsi_data[valid.ravel()]
+                    dataset["mask"].append(valid)
                 
                 dataset["X_pred"].append(reshaped_hsi_data)
                 if return_actuals:
@@ -38,6 +43,43 @@ class SpectroscopyModel(HappyModel, abc.ABC):
                 dataset["y"].append(happy_data.get_numpy_yx().shape[0])
         return dataset
         
+    def _predict_image(self, predict, res, i, mask=None):
+        """
+        Predicts the pixels of an image from a full prediction dataset. With a mask, only the
+        valid pixels get predicted and the others get set to the mask's fill value.
+
+        :param predict: the function to predict the pixels (N, B) with
+        :param res: the dataset generated by _generate_full_prediction_dataset
+        :type res: dict
+        :param i: the index of the image in the dataset
+        :type i: int
+        :param mask: the mask used for generating the dataset, None if all pixels
+        :type mask: PredictionMask
+        :return: the predictions (y, x)
+        :rtype: np.ndarray
+        """
+        height = res["y"][i]
+        width = res["x"][i]
+        if mask is None:
+            return predict(res["X_pred"][i]).reshape(height, width)
+        valid = res["mask"][i].ravel()
+        predictions = None
+        if len(res["X_pred"][i]) > 0:
+            predictions = np.asarray(predict(res["X_pred"][i])).reshape(-1)
+        # keep integer labels as integers if possible
+        fill_value = mask.fill_value
+        if float(fill_value).is_integer():
+            fill_value = int(fill_value)
+            dtype = np.min_scalar_type(fill_value)
+        else:
+            dtype = np.float32
+        if predictions is not None:
+            dtype = np.result_type(predictions.dtype, dtype)
+        result = np.full(height * width, fill_value, dtype=dtype)
+        if predictions is not None:
+            result[valid] = predictions
+        return result.reshape(height, width)
+
     def _generate_dataset(self, sample_ids, is_train=True, return_actuals=False):
         dataset = {"X_train": [], "y_train": [], "sample_id": []} if is_train else {"X_pred": [], "y_pred": [],"sample_id": []}
         happy_reader = HappyReader(self.data_folder)
@@ -1,10 +1,11 @@
 import pickle
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from PIL import Image
 from happy.models.spectroscopy import SpectroscopyModel
+from happy.preprocessors import apply_preprocessor
+from happy.readers import HappyReader
 
 
 def create_prediction_image(prediction):
@@ -14,6 +15,7 @@ def create_prediction_image(prediction):
 
 
 def create_false_color_image(prediction):
+    import matplotlib.pyplot as plt
     # Create a false color prediction image
     cmap = plt.get_cmap('viridis', np.max(prediction) + 1)
     false_color = cmap(prediction)
@@ -26,12 +28,84 @@ class UnsupervisedPixelClusterer(SpectroscopyModel):
         super().__init__(data_folder, target, happy_preprocessor, additional_meta_data, pixel_selector)
         self.clusterer = clusterer
 
-    def fit(self, id_list, target_variable=None):
+    def fit(self, id_list, target_variable=None, training_data=None):
         # no target values..
-        training_dataset = self.generate_prediction_dataset(id_list, return_actuals=False)
+        if training_data is not None:
+            training_dataset = training_data
+        else:
+            training_dataset = self.generate_prediction_dataset(id_list, return_actuals=False)
         X_train = np.array(training_dataset["X_pred"])
         self.clusterer.fit(X_train)
 
+    def supports_streaming(self):
+        """
+        Returns whether the clusterer can be trained incrementally, i.e., implements partial_fit
+        (e.g., MiniBatchKMeans, Birch).
+
+        :return: True if streaming is supported
+        :rtype: bool
+        """
+        return hasattr(self.clusterer, "partial_fit")
+
+    def iterate_pixels(self, id_list, all_pixels=False):
+        """
+        Loads and preprocesses the samples one at a time and returns their pixels.
+
+        :param id_list: the samples to load
+        :type id_list: list
+        :param all_pixels: whether to return all the pixels rather than the ones chosen by the pixel selector
+        :type all_pixels: bool
+        :return: iterator over the pixel arrays (N, B), one per loaded data object
+        :rtype: iterator
+        """
+        happy_reader = HappyReader(self.data_folder)
+        for sample_id in id_list:
+            for happy_data in happy_reader.load_data(sample_id):
+                if self.happy_preprocessor is not None:
+                    happy_data = apply_preprocessor(happy_data, self.happy_preprocessor)[0]
+                if all_pixels:
+                    data = happy_data.get_numpy_yx()
+                    yield data.reshape(-1, data.shape[2])
+                else:
+                    pixels = [z_data for (x, y, z_data) in self.pixel_selector.select_pixels(happy_data)]
+                    if len(pixels) > 0:
+                        yield np.array(pixels)
+
+    def fit_streaming(self, id_list, all_pixels=False, batch_size=10000, num_passes=1):
+        """
+        Trains the clusterer incrementally, feeding it batches of pixels sample by sample,
+        limiting the memory to the current sample and batch.
+
+        :param id_list: the samples to train on
+        :type id_list: list
+        :param all_pixels: whether to use all the pixels rather than the ones chosen by the pixel selector
+        :type all_pixels: bool
+        :param batch_size: the (minimum) number of pixels to feed to the clusterer at a time
+        :type batch_size: int
+        :param num_passes: the number of passes over the samples
+        :type num_passes: int
+        """
+        if not self.supports_streaming():
+            raise Exception("Clusterer does not support streaming (partial_fit): %s" % str(type(self.clusterer)))
+        for i in range(num_passes):
+            self.logger().info("Pass %d/%d" % (i + 1, num_passes))
+            buffer = []
+            buffered = 0
+            for pixels in self.iterate_pixels(id_list, all_pixels=all_pixels):
+                buffer.append(pixels)
+                buffered += len(pixels)
+                if buffered < batch_size:
+                    continue
+                data = np.concatenate(buffer)
+                # feed full batches, keep the remainder for the next sample
+                num_full = (len(data) // batch_size) * batch_size
+                for start in range(0, num_full, batch_size):
+                    self.clusterer.partial_fit(data[start:start + batch_size])
+                buffer = [data[num_full:]]
+                buffered = len(data) - num_full
+            if buffered > 0:
+                self.clusterer.partial_fit(np.concatenate(buffer))
+
     def predict(self, id_list, return_actuals=False):
         if self.clusterer is None:
             raise ValueError("Clusterer has not been trained. Call the fit method first.")
@@ -44,26 +118,43 @@ class UnsupervisedPixelClusterer(SpectroscopyModel):
         else:
             return predictions,None
 
-    def predict_images(self, sample_ids, return_actuals=False):
+    def _predict_chunked(self, data, chunk_size=None):
+        """
+        Predicts the cluster labels of the pixels, processing at most chunk_size pixels at a time.
+
+        :param data: the pixels to label (N, B)
+        :type data: np.ndarray
+        :param chunk_size: the maximum number of pixels to predict at a time, all if None
+        :type chunk_size: int
+        :return: the labels
+        :rtype: np.ndarray
+        """
+        if (chunk_size is None) or (len(data) <= chunk_size):
+            return self.clusterer.predict(data)
+        result = None
+        for start in range(0, len(data), chunk_size):
+            labels = self.clusterer.predict(data[start:start + chunk_size])
+            if result is None:
+                result = np.empty(len(data), dtype=labels.dtype)
+            result[start:start + len(labels)] = labels
+        return result
+
+    def predict_images(self, sample_ids, return_actuals=False, chunk_size=None, mask=None):
         predictions_list = []
-        res = self._generate_full_prediction_dataset(sample_ids, return_actuals)
-        plist = res["X_pred"]
-        ylist = None
-        actuals_list = None
-        if return_actuals:
-            ylist = res["y_pred"]
-            actuals_list = []
-        for i, zarray in enumerate(plist):
-            predictions = self.clusterer.predict(zarray)
-            # Reshape predicted labels to match the original image size (y, x)
-            prediction_array = predictions.reshape(res["y"][i], res["x"][i])  
-            # Append the prediction array to the list
-            predictions_list.append(prediction_array)
-            
-            if return_actuals:
-                acts = ylist[i]
-                acts_array = acts.reshape(res["y"][i], res["x"][i])  
-                actuals_list.append(acts_array)
+        actuals_list = [] if return_actuals else None
+        # one sample at a time to limit memory usage
+        for sample_id in sample_ids:
+            res = self._generate_full_prediction_dataset([sample_id], return_actuals, mask=mask)
+            for i in range(len(res["X_pred"])):
+                # Reshape predicted labels to match the original image size (y, x)
+                prediction_array = self._predict_image(lambda x: self._predict_chunked(x, chunk_size=chunk_size), res, i, mask=mask)
+                # Append the prediction array to the list
+                predictions_list.append(prediction_array)
+
+                if return_actuals:
+                    acts = res["y_pred"][i]
+                    acts_array = acts.reshape(res["y"][i], res["x"][i])
+                    actuals_list.append(acts_array)
         if return_actuals:
             return predictions_list, actuals_list
         else:
@@ -5,6 +5,7 @@ import random
 from typing import Union, Optional, Dict, List
 
 from happy.base.core import ConfigurableObject
+from happy.base.instrumentation import instrumented, STAGE_SELECT_PIXELS
 from happy.criteria import Criteria, CriteriaGroup
 from happy.data import HappyData
 from ._pixel_selector import PixelSelector
@@ -76,6 +77,7 @@ class BasePixelSelector(PixelSelector, abc.ABC):
                 i += 1
                 yield x, y
 
+    @instrumented(STAGE_SELECT_PIXELS)
     def select_pixels(self, happy_data: HappyData, n: int = None) -> List:
         pixels = []
         if n is None:
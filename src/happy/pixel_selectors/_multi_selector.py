@@ -4,6 +4,7 @@ from typing import List, Dict, Optional
 
 from ._pixel_selector import PixelSelector
 from happy.base.core import ConfigurableObject
+from happy.base.instrumentation import instrumented, STAGE_SELECT_PIXELS
 from happy.data import HappyData
 
 
@@ -53,6 +54,7 @@ class MultiSelector(PixelSelector):
         self._calc_n()
         return self
 
+    @instrumented(STAGE_SELECT_PIXELS)
     def select_pixels(self, happy_data: HappyData, n: int = None) -> List:
         pixels = []
         for selector in self.selectors:
@@ -1,18 +1,23 @@
 from ._utils import check_ragged_data, remove_ragged_data, print_shape
-from ._preprocessor import Preprocessor, apply_preprocessor, AbstractOPEXAnnotationsBasedPreprocessor
+from ._preprocessor import Preprocessor, apply_preprocessor, iter_apply_preprocessor, convert_to_dtype, float_dtype, AbstractOPEXAnnotationsBasedPreprocessor
+from ._preprocessor import LOCALITY_PIXEL, LOCALITY_BAND, LOCALITY_NEIGHBOURHOOD, LOCALITY_IMAGE, LOCALITIES
+from ._bin_spatial import BinSpatialPreprocessor, block_mode
+from ._bin_spectral import BinSpectralPreprocessor
 from ._crop import CropPreprocessor
 from ._derivative import DerivativePreprocessor
 from ._divide_annotation_avg import DivideAnnotationAveragePreprocessor
 from ._downsample import DownsamplePreprocessor
 from ._extract_regions import ExtractRegionsPreprocessor
-from ._multi import MultiPreprocessor
+from ._multi import MultiPreprocessor, PingPongBuffers
 from ._pad_utils import pad_array
 from ._pad import PadPreprocessor
 from ._passthrough import PassThroughPreprocessor
 from ._pca import PCAPreprocessor
+from ._resample_wavelengths import ResampleWavelengthsPreprocessor, resampling_matrix
 from ._sni import SpectralNoiseInterpolator
 from ._snv import SNVPreprocessor
 from ._std_scaler import StandardScalerPreprocessor
 from ._subtract import SubtractPreprocessor
 from ._subtract_annotation_avg import SubtractAnnotationAveragePreprocessor
+from ._tiled import TiledPreprocessor, tile_grid, crop_happy_data
 from ._wavelength_subset import WavelengthSubsetPreprocessor
@@ -0,0 +1,97 @@
+import argparse
+
+import numpy as np
+
+from typing import Dict, List
+
+from ._preprocessor import Preprocessor
+from happy.data import HappyData
+
+
+def block_mode(layer: np.ndarray, bin_y: int, bin_x: int) -> np.ndarray:
+    """
+    Reduces the blocks of bin_y x bin_x pixels of the layer to their most frequent value
+    (the smallest value in case of ties). Incomplete blocks at the bottom/right get dropped.
+
+    :param layer: the layer to reduce (height, width, ...)
+    :type layer: np.ndarray
+    :param bin_y: the height of the blocks
+    :type bin_y: int
+    :param bin_x: the width of the blocks
+    :type bin_x: int
+    :return: the reduced layer (height / bin_y, width / bin_x, ...)
+    :rtype: np.ndarray
+    """
+    height = layer.shape[0] // bin_y
+    width = layer.shape[1] // bin_x
+    rest = layer.shape[2:]
+    size = bin_y * bin_x
+    # (blocks, values in block)
+    blocks = layer[:height * bin_y, :width * bin_x].reshape((height, bin_y, width, bin_x, -1))
+    blocks = blocks.transpose((0, 2, 4, 1, 3)).reshape((-1, size))
+    values = np.sort(blocks, axis=1)
+    # length of the run of identical values up to each position
+    positions = np.arange(size)
+    starts = np.ones(values.shape, dtype=bool)
+    starts[:, 1:] = values[:, 1:] != values[:, :-1]
+    run_starts = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    longest = np.argmax(positions - run_starts, axis=1)
+    result = values[np.arange(len(values)), longest]
+    return result.reshape((height, width) + rest)
+
+
+class BinSpatialPreprocessor(Preprocessor):
+
+    def name(self) -> str:
+        return "bin-spatial"
+
+    def description(self) -> str:
+        return "Data reduction preprocessor that averages blocks of pixels (bin_x by bin_y) into a single pixel. "\
+               "Meta-data layers get reduced to the most frequent value in the block. "\
+               "Incomplete blocks at the right/bottom get dropped."
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        parser = super()._create_argparser()
+        parser.add_argument("-x", "--bin_x", type=int, help="The number of pixels to combine on the x axis", required=False, default=2)
+        parser.add_argument("-y", "--bin_y", type=int, help="The number of pixels to combine on the y axis", required=False, default=2)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        super()._apply_args(ns)
+        self.params["bin_x"] = ns.bin_x
+        self.params["bin_y"] = ns.bin_y
+
+    def _initialize(self):
+        super()._initialize()
+        if (self.params.get("bin_x", 2) < 1) or (self.params.get("bin_y", 2) < 1):
+            raise Exception("Bin sizes must be at least 1, provided: x=%d, y=%d" % (self.params["bin_x"], self.params["bin_y"]))
+
+    def update_pixel_data(self, meta_dict: Dict, bin_x: int, bin_y: int):
+        if meta_dict is None:
+            return None
+
+        new_dict = {}
+        for key, sub_dict in meta_dict.items():
+            if "data" in sub_dict:
+                new_data = block_mode(np.asarray(sub_dict["data"]), bin_y, bin_x)
+                new_sub_dict = {k: v for k, v in sub_dict.items() if k != "data"}
+                new_sub_dict["data"] = new_data
+                new_dict[key] = new_sub_dict
+            else:
+                new_dict[key] = sub_dict
+
+        return new_dict
+
+    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        bin_x = self.params.get('bin_x', 2)
+        bin_y = self.params.get('bin_y', 2)
+        height = happy_data.height // bin_y
+        width = happy_data.width // bin_x
+        if (height == 0) or (width == 0):
+            raise Exception("Bin sizes x=%d/y=%d too large for data: %s" % (bin_x, bin_y, str(happy_data.data.shape)))
+        # average over the block axes of a (height, bin_y, width, bin_x, bands) view
+        blocks = happy_data.data[:height * bin_y, :width * bin_x, :]
+        blocks = blocks.reshape((height, bin_y, width, bin_x, happy_data.data.shape[2]))
+        binned_data = blocks.mean(axis=(1, 3))
+        new_meta_data = self.update_pixel_data(happy_data.metadata_dict, bin_x, bin_y)
+        return [happy_data.copy(data=binned_data, metadata_dict=new_meta_data)]
@@ -0,0 +1,50 @@
+import argparse
+
+import numpy as np
+
+from typing import List
+
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL
+from happy.data import HappyData
+
+
+class BinSpectralPreprocessor(Preprocessor):
+
+    def name(self) -> str:
+        return "bin-spectral"
+
+    def description(self) -> str:
+        return "Data reduction preprocessor that averages groups of adjacent wavelengths into a single one, "\
+               "averaging the wavelengths as well. Incomplete groups at the end get dropped."
+
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        parser = super()._create_argparser()
+        parser.add_argument("-b", "--bin_size", type=int, help="The number of adjacent wavelengths to combine", required=False, default=2)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        super()._apply_args(ns)
+        self.params["bin_size"] = ns.bin_size
+
+    def _initialize(self):
+        super()._initialize()
+        if self.params.get("bin_size", 2) < 1:
+            raise Exception("Bin size must be at least 1, provided: %d" % self.params["bin_size"])
+
+    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        bin_size = self.params.get('bin_size', 2)
+        num_bins = happy_data.data.shape[2] // bin_size
+        if num_bins == 0:
+            raise Exception("Bin size %d too large for number of wavelengths: %d" % (bin_size, happy_data.data.shape[2]))
+        # average over the last axis of a (height, width, bins, bin_size) view
+        groups = happy_data.data[:, :, :num_bins * bin_size]
+        groups = groups.reshape(happy_data.data.shape[:2] + (num_bins, bin_size))
+        binned_data = groups.mean(axis=3)
+        wavenumbers = None
+        if happy_data.wavenumbers is not None:
+            wavenumbers = np.asarray(happy_data.wavenumbers[:num_bins * bin_size], dtype=float)
+            wavenumbers = wavenumbers.reshape((num_bins, bin_size)).mean(axis=1).tolist()
+        return [happy_data.copy(data=binned_data, wavenumbers=wavenumbers)]
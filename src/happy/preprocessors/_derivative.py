@@ -1,12 +1,105 @@
 import argparse
+import functools
 
-from typing import List
+import numpy as np
 
-from scipy.signal import savgol_filter
-from ._preprocessor import Preprocessor
+from typing import List, Tuple
+
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL
 from happy.data import HappyData
 
 
+CHUNK_SIZE = 16384
+""" the number of pixels to process at a time. """
+
+
+@functools.lru_cache(maxsize=None)
+def savgol_kernel(window_length: int, polyorder: int, deriv: int) -> np.ndarray:
+    """
+    Computes the Savitzky-Golay kernel for correlating along the bands (same coefficients
+    as used by savgol_filter). The result gets cached.
+
+    :param window_length: the size of the window (odd number)
+    :type window_length: int
+    :param polyorder: the polynomial order
+    :type polyorder: int
+    :param deriv: the derivative
+    :type deriv: int
+    :return: the kernel
+    :rtype: np.ndarray
+    """
+    from scipy.signal import savgol_coeffs
+    result = savgol_coeffs(window_length, polyorder, deriv=deriv)[::-1].copy()
+    result.setflags(write=False)
+    return result
+
+
+def savgol_bands(data: np.ndarray, window_length: int, polyorder: int, deriv: int,
+                 out: np.ndarray = None, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Applies Savitzky-Golay along the last axis (bands), generating the same output as
+    savgol_filter(data, window_length, polyorder, deriv=deriv, axis=-1). The pixels get
+    processed in chunks and written straight into the output array, so that no full-size
+    temporary arrays are required (eg no float64 copy of integer data).
+
+    :param data: the data to process, eg (H, W, B)
+    :type data: np.ndarray
+    :param window_length: the size of the window (odd number)
+    :type window_length: int
+    :param polyorder: the polynomial order
+    :type polyorder: int
+    :param deriv: the derivative
+    :type deriv: int
+    :param out: the array to store the result in (same shape as data), allocates one if None
+    :type out: np.ndarray
+    :param chunk_size: the number of pixels to process at a time
+    :type chunk_size: int
+    :return: the processed data (float32 for float32 input, otherwise float64)
+    :rtype: np.ndarray
+    """
+    from scipy.ndimage import correlate1d
+    from scipy.signal import savgol_filter
+    num_bands = data.shape[-1]
+    if window_length > num_bands:
+        raise Exception("Window length (%d) cannot be larger than number of bands (%d)!" % (window_length, num_bands))
+    kernel = savgol_kernel(window_length, polyorder, deriv)
+    half = window_length // 2
+    if out is None:
+        out = np.empty(data.shape, dtype=np.float32 if (data.dtype == np.float32) else np.float64)
+    elif out.shape != data.shape:
+        raise Exception("Output array has shape %s, expected: %s" % (str(out.shape), str(data.shape)))
+
+    result = out.reshape(-1, num_bands)
+    if data.flags.c_contiguous or (data.ndim != 3):
+        pixels = data.reshape(-1, num_bands)
+        for start in range(0, len(pixels), chunk_size):
+            end = min(start + chunk_size, len(pixels))
+            # computes in double precision internally, also for integer data
+            correlate1d(pixels[start:end], kernel, axis=1, output=result[start:end], mode="constant")
+    else:
+        # views (eg subset of bands): only copy blocks of rows rather than all the data
+        width = data.shape[1]
+        rows = max(1, chunk_size // max(1, width))
+        for y in range(0, data.shape[0], rows):
+            block = data[y:y + rows].reshape(-1, num_bands)
+            correlate1d(block, kernel, axis=1, output=result[y * width:y * width + len(block)], mode="constant")
+    # edges: polynomial fitted to the first/last window (all pixels at once, like savgol_filter),
+    # only using the bands of these windows
+    if half > 0:
+        if num_bands > 2 * window_length:
+            edges = np.concatenate([data[..., :window_length], data[..., num_bands - window_length:]], axis=-1)
+            edges = edges.reshape(-1, edges.shape[-1])
+        else:
+            edges = data.reshape(-1, num_bands)
+        edges = savgol_filter(edges, window_length, polyorder, deriv=deriv, axis=1)
+        result[:, :half] = edges[:, :half]
+        result[:, num_bands - half:] = edges[:, edges.shape[1] - half:]
+    if not np.shares_memory(result, out):
+        # output array wasn't contiguous, reshape created a copy
+        out[...] = result.reshape(out.shape)
+    return out
+
+
 class DerivativePreprocessor(Preprocessor):
 
     def name(self) -> str:
@@ -15,6 +108,9 @@ class DerivativePreprocessor(Preprocessor):
     def description(self) -> str:
         return "Applies Savitzky-Golay to the data."
 
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
         parser.add_argument("-w", "--window_length", type=int, help="The size of the window (must be odd number)", required=False, default=5)
@@ -28,11 +124,21 @@ class DerivativePreprocessor(Preprocessor):
         self.params["polyorder"] = ns.polyorder
         self.params["deriv"] = ns.deriv
 
+    def supports_apply_into(self) -> bool:
+        return True
+
+    def _result_dtype(self, happy_data: HappyData) -> np.dtype:
+        return np.dtype(np.float32 if (happy_data.data.dtype == np.float32) else np.float64)
+
+    def _do_apply_into(self, happy_data: HappyData, out: np.ndarray):
+        savgol_bands(happy_data.data, self.params.get('window_length', 5), self.params.get('polyorder', 2),
+                     self.params.get('deriv', 1), out=out)
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
         window_length = self.params.get('window_length', 5)
         polyorder = self.params.get('polyorder', 2)
         deriv = self.params.get('deriv', 1)
 
         # Apply Savitzky-Golay derivative along the wavelength dimension
-        derivative_data = savgol_filter(happy_data.data, window_length, polyorder, deriv=deriv, axis=2)
+        derivative_data = savgol_bands(happy_data.data, window_length, polyorder, deriv)
         return [happy_data.copy(data=derivative_data)]
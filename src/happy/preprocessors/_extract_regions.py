@@ -1,6 +1,6 @@
 import argparse
 
-from typing import List
+from typing import Iterator, List
 
 from ._preprocessor import Preprocessor
 from happy.data import HappyData
@@ -29,3 +29,9 @@ class ExtractRegionsPreprocessor(Preprocessor):
         self.logger().info("extractor cmdline: %s" % cmdline)
         region_extractor = RegionExtractor.parse_region_extractor(cmdline)
         return region_extractor.extract_regions(happy_data)
+
+    def _do_iter_apply(self, happy_data: HappyData) -> Iterator[HappyData]:
+        cmdline = self.params.get("region_extractor", "re-full")
+        self.logger().info("extractor cmdline: %s" % cmdline)
+        region_extractor = RegionExtractor.parse_region_extractor(cmdline)
+        yield from region_extractor.iter_regions(happy_data)
@@ -1,11 +1,51 @@
 import argparse
 
-from typing import List, Optional
+import numpy as np
 
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from happy.base.precision import COMPUTE_DTYPES
 from happy.preprocessors import Preprocessor
 from happy.data import HappyData
 
 
+class PingPongBuffers:
+    """
+    Manages two flat buffers that a chain of preprocessors writes its output into alternately.
+    The memory of a buffer gets reused as long as the output fits into it, i.e., only
+    growing the data requires a new allocation.
+    """
+
+    def __init__(self):
+        self._buffers = [None, None]
+        self.num_allocations = 0
+
+    def next(self, current: np.ndarray, shape: Tuple, dtype) -> np.ndarray:
+        """
+        Returns a buffer for the output that does not overlap with the current data.
+
+        :param current: the current data (input of the next step)
+        :type current: np.ndarray
+        :param shape: the shape of the output
+        :type shape: tuple
+        :param dtype: the dtype of the output
+        :return: the buffer
+        :rtype: np.ndarray
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        free = [i for i in range(len(self._buffers))
+                if (self._buffers[i] is None) or not np.may_share_memory(self._buffers[i], current)]
+        large_enough = [i for i in free if (self._buffers[i] is not None) and (len(self._buffers[i]) >= size)]
+        if len(large_enough) > 0:
+            index = large_enough[0]
+        else:
+            index = free[0]
+            self._buffers[index] = np.empty(size, dtype=np.uint8)
+            self.num_allocations += 1
+        return self._buffers[index][:size].view(dtype).reshape(shape)
+
+
 class MultiPreprocessor(Preprocessor):
 
     def name(self) -> str:
@@ -17,6 +57,8 @@ class MultiPreprocessor(Preprocessor):
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
         parser.add_argument("-p", "--preprocessors", type=str, help="The preprocessors to wrap. Either preprocessor command-line(s) or file with one preprocessor command-line per line.", required=False, default=None)
+        parser.add_argument("-f", "--fused", action="store_true", help="Whether to reuse two buffers for the output of preprocessors that preserve the shape (eg snv, derivative, std-scaler, subtract) rather than allocating new data for each step", required=False)
+        parser.add_argument("--compute_dtype", choices=COMPUTE_DTYPES, help="The data type for the wrapped preprocessors to perform the computations in, uses the global one if not specified", required=False, default=None)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -25,6 +67,8 @@ class MultiPreprocessor(Preprocessor):
         if ns.preprocessors is not None:
             preprocessor_list = Preprocessor.parse_preprocessors(ns.preprocessors)
         self.params["preprocessor_list"] = preprocessor_list
+        self.params["fused"] = ns.fused
+        self.compute_dtype = ns.compute_dtype
 
     @property
     def preprocessor_list(self) -> Optional[List[Preprocessor]]:
@@ -36,7 +80,107 @@ class MultiPreprocessor(Preprocessor):
         """
         return self.params["preprocessor_list"]
 
+    def _initialize(self):
+        super()._initialize()
+        # pipeline-specific dtype overrides the global one
+        if self.compute_dtype is not None:
+            for preprocessor in self.params.get('preprocessor_list', []):
+                preprocessor.compute_dtype = self.compute_dtype
+
+    def _detach(self, happy_data: HappyData, original: HappyData) -> HappyData:
+        """
+        Copies the meta-data of the output if it is still shared with the original data
+        (buffered steps pass on the meta-data rather than copying it).
+
+        :param happy_data: the output to check
+        :type happy_data: HappyData
+        :param original: the data that got processed
+        :type original: HappyData
+        :return: the output with its own meta-data
+        :rtype: HappyData
+        """
+        if (happy_data is not original) and (happy_data.metadata_dict is original.metadata_dict):
+            return happy_data.copy(data=happy_data.data)
+        return happy_data
+
+    def _apply_fused(self, happy_data: HappyData, preprocessors: List[Preprocessor]) -> List[HappyData]:
+        """
+        Applies the preprocessors, with the ones that support it writing their output into
+        ping-pong buffers. Shape-changing steps get applied as usual (ideally generating views).
+        If a step generates multiple outputs, each continues with its own buffers.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param preprocessors: the preprocessors to apply
+        :type preprocessors: list
+        :return: the processed data
+        :rtype: list
+        """
+        return list(self._iter_fused(happy_data, preprocessors))
+
+    def _iter_fused(self, happy_data: HappyData, preprocessors: List[Preprocessor]) -> Iterator[HappyData]:
+        """
+        Generator version of _apply_fused, passing each output item of a step through
+        the remaining steps before generating the next one.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param preprocessors: the preprocessors to apply
+        :type preprocessors: list
+        :return: the generator for the processed data
+        :rtype: Iterator
+        """
+        buffers = PingPongBuffers()
+        current = happy_data
+        for i, preprocessor in enumerate(preprocessors):
+            preprocessor.fit(current)
+            if preprocessor.supports_apply_into():
+                out = buffers.next(current.data, current.data.shape, preprocessor.result_dtype(current))
+                preprocessor.apply_into(current, out)
+                current = HappyData(current.sample_id, current.region_id, out, current.global_dict,
+                                    current.metadata_dict, wavenumbers=current.wavenumbers)
+            else:
+                # peek at the output to determine whether the step generates multiple items
+                items = preprocessor.iter_apply(current)
+                first = next(items, None)
+                if first is None:
+                    return
+                second = next(items, None)
+                if second is None:
+                    current = first
+                    continue
+                for item in (first, second):
+                    yield from self._iter_fused(self._detach(item, happy_data), preprocessors[i + 1:])
+                for item in items:
+                    yield from self._iter_fused(self._detach(item, happy_data), preprocessors[i + 1:])
+                return
+        self.logger().debug("Buffer allocations: %d" % buffers.num_allocations)
+        yield self._detach(current, happy_data)
+
+    def _iter_chain(self, happy_data: HappyData, preprocessors: List[Preprocessor]) -> Iterator[HappyData]:
+        """
+        Applies the preprocessors depth-first: each output item of a step gets passed through
+        the remaining steps before the step generates its next item. This keeps at most
+        one item per step alive.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param preprocessors: the preprocessors to apply
+        :type preprocessors: list
+        :return: the generator for the processed data
+        :rtype: Iterator
+        """
+        if len(preprocessors) == 0:
+            yield happy_data
+            return
+        preprocessor = preprocessors[0]
+        preprocessor.fit(happy_data)
+        for item in preprocessor.iter_apply(happy_data):
+            yield from self._iter_chain(item, preprocessors[1:])
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        if self.params.get("fused", False):
+            return self._apply_fused(happy_data, self.params.get('preprocessor_list', []))
         happy_data_list = [happy_data]
         for preprocessor in self.params.get('preprocessor_list', []):
             tmp_list = []
@@ -47,6 +191,26 @@ class MultiPreprocessor(Preprocessor):
             happy_data_list = tmp_list
         return happy_data_list
 
+    def _do_iter_apply(self, happy_data: HappyData) -> Iterator[HappyData]:
+        if self.params.get("fused", False):
+            yield from self._iter_fused(happy_data, self.params.get('preprocessor_list', []))
+        else:
+            yield from self._iter_chain(happy_data, self.params.get('preprocessor_list', []))
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        result = dict()
+        for i, preprocessor in enumerate(self.params.get('preprocessor_list', [])):
+            for k, v in preprocessor.get_state().items():
+                result["%d.%s" % (i, k)] = v
+        return result
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        for i, preprocessor in enumerate(self.params.get('preprocessor_list', [])):
+            prefix = "%d." % i
+            sub_state = {k[len(prefix):]: v for k, v in state.items() if k.startswith(prefix)}
+            if len(sub_state) > 0:
+                preprocessor.set_state(sub_state)
+
     def to_string(self) -> str:
         preprocessor_strings = [preprocessor.to_string() for preprocessor in self.params.get('preprocessor_list', [])]
         return " -> ".join(preprocessor_strings)
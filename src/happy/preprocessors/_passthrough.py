@@ -1,6 +1,6 @@
 from typing import List
 
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_BAND
 from happy.data import HappyData
 
 
@@ -12,5 +12,8 @@ class PassThroughPreprocessor(Preprocessor):
     def description(self) -> str:
         return "Dummy, just passes through the data"
 
+    def locality(self) -> str:
+        return LOCALITY_BAND
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
         return [happy_data]
@@ -2,13 +2,17 @@ import argparse
 import numpy as np
 import pickle
 
-from typing import List
+from typing import Dict, List
 
-from sklearn.decomposition import PCA
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL
 from happy.data import HappyData
 
 
+PCA_STATE = ["components_", "mean_", "explained_variance_", "explained_variance_ratio_", "singular_values_",
+             "noise_variance_", "n_components_", "n_samples_", "n_features_in_"]
+""" the attributes of the fitted sklearn PCA that make up the state. """
+
+
 class PCAPreprocessor(Preprocessor):
 
     def name(self) -> str:
@@ -17,6 +21,12 @@ class PCAPreprocessor(Preprocessor):
     def description(self) -> str:
         return "Applies principal components analysis to the data."
 
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
+    def requires_fit(self) -> bool:
+        return True
+
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
         parser.add_argument("-n", "--components", type=int, help="The number of PCA components", required=False, default=5)
@@ -34,6 +44,7 @@ class PCAPreprocessor(Preprocessor):
         self.params["save"] = ns.save
         self.params["seed"] = ns.seed
         self.pca = None
+        self.restored = False
 
     def _initialize(self):
         super()._initialize()
@@ -43,7 +54,24 @@ class PCAPreprocessor(Preprocessor):
         if percent_pixel > 100:
             raise Exception("'percent_pixels' cannot be larger than 100, provided: %f" % percent_pixel)
 
+    def get_state(self) -> Dict[str, np.ndarray]:
+        # only a loaded/restored PCA applies to all the data, otherwise it gets fitted on each data
+        if (self.pca is None) or (not self.restored and (self.params.get('load', None) is None)):
+            return dict()
+        return {k: np.asarray(getattr(self.pca, k)) for k in PCA_STATE if hasattr(self.pca, k)}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        from sklearn.decomposition import PCA
+        self.pca = PCA(n_components=int(state["n_components_"]))
+        for k in state:
+            value = state[k]
+            setattr(self.pca, k, value.item() if (value.ndim == 0) else value)
+        self.restored = True
+
     def _do_fit(self, happy_data: HappyData):
+        from sklearn.decomposition import PCA
+        if self.restored:
+            return
         if self.params.get('load', None) is not None:
             with open(self.params.get('load', None), "rb") as fp:
                 self.pca = pickle.load(fp)
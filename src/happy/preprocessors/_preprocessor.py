@@ -1,20 +1,87 @@
 import abc
 import argparse
 import os
+import weakref
 
-from typing import List, Optional
+import numpy as np
+
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from PIL import Image, ImageDraw
 
 from seppl import split_args, split_cmdline, args_to_objects
 from happy.base.core import PluginWithLogging
+from happy.base.instrumentation import instrumented, STAGE_FIT, STAGE_APPLY
+from happy.base.precision import resolve_compute_dtype
 from happy.data import HappyData
 from happy.base.registry import REGISTRY
 from opex import ObjectPredictions
 
 
+LOCALITY_PIXEL = "pixel"
+""" the output of a pixel only depends on the spectrum of the same pixel. """
+
+LOCALITY_BAND = "band"
+""" the output of a pixel/band only depends on the same pixel/band. """
+
+LOCALITY_NEIGHBOURHOOD = "neighbourhood"
+""" the output of a pixel depends on the pixels within the halo around it. """
+
+LOCALITY_IMAGE = "image"
+""" the output depends on the whole image (eg changes in geometry), cannot be tiled. """
+
+AVERAGE_CACHE_SIZE = 16
+""" the maximum number of annotation averages to keep in the cache. """
+
+LOCALITIES = [
+    LOCALITY_PIXEL,
+    LOCALITY_BAND,
+    LOCALITY_NEIGHBOURHOOD,
+    LOCALITY_IMAGE,
+]
+
+
+def float_dtype(dtype) -> np.dtype:
+    """
+    Returns the floating point dtype that numpy computes in for data of the specified dtype
+    (eg when subtracting the mean), i.e., float dtypes get kept, others result in float64.
+
+    :param dtype: the dtype of the data
+    :return: the floating point dtype
+    :rtype: np.dtype
+    """
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.floating):
+        return dtype
+    return np.dtype(np.float64)
+
+
+def convert_to_dtype(happy_data: HappyData, dtype: Optional[np.dtype]) -> HappyData:
+    """
+    Converts the spectral data to the specified dtype, if necessary. The converted
+    data shares the meta-data with the original data.
+
+    :param happy_data: the data to convert
+    :type happy_data: HappyData
+    :param dtype: the dtype to convert to, None to keep the data as is
+    :type dtype: np.dtype
+    :return: the (converted) data
+    :rtype: HappyData
+    """
+    if (dtype is None) or (happy_data.data.dtype == dtype):
+        return happy_data
+    return HappyData(happy_data.sample_id, happy_data.region_id, happy_data.data.astype(dtype),
+                     happy_data.global_dict, happy_data.metadata_dict, wavenumbers=happy_data.wavenumbers)
+
+
 class Preprocessor(PluginWithLogging, abc.ABC):
     
     def __init__(self, **kwargs):
         super().__init__()
+        self.compute_dtype = None
+        self._fit_data = None
+        self._fitted_for_tiles = False
         self.params = dict()
         self.parse_args([])
         self.params.update(kwargs)
@@ -25,19 +92,244 @@ class Preprocessor(PluginWithLogging, abc.ABC):
         """
         pass
 
+    def locality(self) -> str:
+        """
+        Returns what data the output of a pixel depends on, which determines whether
+        the preprocessor can be applied to tiles of the image (see LOCALITIES).
+
+        :return: the locality
+        :rtype: str
+        """
+        return LOCALITY_IMAGE
+
+    def halo(self) -> int:
+        """
+        Returns the number of surrounding pixels that the output of a pixel depends on
+        (only for neighbourhood locality).
+
+        :return: the size of the halo
+        :rtype: int
+        """
+        return 0
+
+    def requires_fit(self) -> bool:
+        """
+        Returns whether the preprocessor determines statistics across the whole image
+        in fit, which are then used when applying it to (parts of) the image.
+
+        :return: True if fitting on the whole image is required
+        :rtype: bool
+        """
+        return False
+
+    def supports_apply_into(self) -> bool:
+        """
+        Returns whether the preprocessor preserves the shape of the data, the meta-data and
+        the wavelengths and can write its output into a supplied buffer (see apply_into),
+        which allows chains of preprocessors to reuse their buffers.
+
+        :return: True if apply_into is supported
+        :rtype: bool
+        """
+        return False
+
+    def _result_dtype(self, happy_data: HappyData) -> np.dtype:
+        """
+        Returns the dtype of the output that apply_into generates for the data.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :return: the dtype
+        :rtype: np.dtype
+        """
+        return happy_data.data.dtype
+
+    def result_dtype(self, happy_data: HappyData) -> np.dtype:
+        """
+        Returns the dtype of the buffer that apply_into requires for the data,
+        i.e., the compute dtype if set.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :return: the dtype
+        :rtype: np.dtype
+        """
+        result = self.get_compute_dtype()
+        if result is None:
+            result = self._result_dtype(happy_data)
+        return result
+
+    def get_compute_dtype(self) -> Optional[np.dtype]:
+        """
+        Returns the dtype to perform the computations in: the one set for this preprocessor
+        (eg by the pipeline it is part of) or, if None, the global one.
+
+        :return: the dtype, None if the data types of the data get kept
+        :rtype: np.dtype
+        """
+        return resolve_compute_dtype(self.compute_dtype)
+
+    def _to_compute_dtype(self, happy_data: HappyData) -> HappyData:
+        """
+        Converts the data to the compute dtype, if necessary.
+
+        :param happy_data: the data to convert
+        :type happy_data: HappyData
+        :return: the (converted) data
+        :rtype: HappyData
+        """
+        return convert_to_dtype(happy_data, self.get_compute_dtype())
+
     def _do_fit(self, happy_data: HappyData):
         pass
 
+    @instrumented(STAGE_FIT)
     def fit(self, happy_data: HappyData):
         self._initialize()
+        happy_data = self._to_compute_dtype(happy_data)
         self._do_fit(happy_data)
-        
+        self._fit_data = weakref.ref(happy_data.data)
+
+    def fit_for_tiles(self, happy_data: HappyData):
+        """
+        Fits the preprocessor on the whole image, with the fitted state getting used when
+        applying it to the tiles of that image until end_tiles gets called.
+
+        :param happy_data: the whole image
+        :type happy_data: HappyData
+        """
+        self.fit(happy_data)
+        self._fitted_for_tiles = True
+
+    def end_tiles(self):
+        """
+        Releases the state fitted via fit_for_tiles.
+        """
+        self._fitted_for_tiles = False
+        self._release_fit_state()
+
+    def _is_fit_data(self, happy_data: HappyData) -> bool:
+        """
+        Returns whether the data is the one that the preprocessor just got fitted on.
+
+        :param happy_data: the data being processed
+        :type happy_data: HappyData
+        :return: True if the same data
+        :rtype: bool
+        """
+        return (self._fit_data is not None) and (self._fit_data() is happy_data.data)
+
+    def _uses_fit_state(self, happy_data: HappyData) -> bool:
+        """
+        Returns whether to apply the state determined by fit rather than computing it from
+        the data itself: for the tiles of the image fitted via fit_for_tiles and for the
+        data that the preprocessor just got fitted on.
+
+        :param happy_data: the data being processed
+        :type happy_data: HappyData
+        :return: True if to use the fitted state
+        :rtype: bool
+        """
+        return self._fitted_for_tiles or self._is_fit_data(happy_data)
+
+    def _clear_fit_state(self):
+        """
+        Removes the state determined by fit that only applies to the data it got fitted on.
+        """
+        pass
+
+    def _release_fit_state(self):
+        """
+        Releases the fitted state after applying the preprocessor, unless it is applied to tiles.
+        """
+        if not self._fitted_for_tiles:
+            self._fit_data = None
+            self._clear_fit_state()
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
         raise NotImplementedError()
 
+    @instrumented(STAGE_APPLY)
     def apply(self, happy_data: HappyData) -> List[HappyData]:
         self._initialize()
-        return self._do_apply(happy_data)
+        try:
+            result = self._do_apply(self._to_compute_dtype(happy_data))
+        finally:
+            self._release_fit_state()
+        dtype = self.get_compute_dtype()
+        return [convert_to_dtype(item, dtype) for item in result]
+
+    def _do_iter_apply(self, happy_data: HappyData) -> Iterator[HappyData]:
+        yield from self._do_apply(happy_data)
+
+    @instrumented(STAGE_APPLY)
+    def iter_apply(self, happy_data: HappyData) -> Iterator[HappyData]:
+        """
+        Applies the preprocessor to the data, generating the output items one at a time.
+        Preprocessors that produce many items (eg extracting regions) can generate them
+        lazily, so that each item can get processed further before the next one gets created.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :return: the generator for the processed data
+        :rtype: Iterator
+        """
+        self._initialize()
+        dtype = self.get_compute_dtype()
+        try:
+            for item in self._do_iter_apply(self._to_compute_dtype(happy_data)):
+                yield convert_to_dtype(item, dtype)
+        finally:
+            self._release_fit_state()
+
+    def _do_apply_into(self, happy_data: HappyData, out: np.ndarray):
+        raise NotImplementedError()
+
+    def apply_into(self, happy_data: HappyData, out: np.ndarray):
+        """
+        Applies the preprocessor to the data, writing the output into the buffer
+        (only if supports_apply_into returns True). The meta-data and wavelengths
+        of the data apply to the output as well.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param out: the buffer for the output, same shape as the data and result_dtype; must not overlap with the data
+        :type out: np.ndarray
+        """
+        if not self.supports_apply_into():
+            raise Exception("Preprocessor %s cannot write its output into a buffer!" % self.name())
+        if out.shape != happy_data.data.shape:
+            raise Exception("Output buffer has shape %s, expected: %s" % (str(out.shape), str(happy_data.data.shape)))
+        self._initialize()
+        try:
+            self._do_apply_into(self._to_compute_dtype(happy_data), out)
+        finally:
+            self._release_fit_state()
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the fitted state that is not specific to the data being processed
+        (eg a loaded PCA), for storing it with a model.
+
+        :return: the state (name -> array), empty if nothing to store
+        :rtype: dict
+        """
+        return dict()
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Restores the fitted state obtained via get_state.
+
+        :param state: the state to restore (name -> array)
+        :type state: dict
+        """
+        pass
+
+    def __getstate__(self):
+        result = self.__dict__.copy()
+        # weak references cannot be pickled
+        result["_fit_data"] = None
+        return result
 
     def __str__(self) -> str:
         return self.to_string()
@@ -124,6 +416,26 @@ def apply_preprocessor(happy_data: HappyData, method: 'Preprocessor') -> List[Ha
     return new_happy_data
 
 
+def iter_apply_preprocessor(happy_data: HappyData, method: 'Preprocessor') -> Iterator[HappyData]:
+    """
+    Applies the preprocessing method to the data, generating the processed data one item at a time.
+
+    :param happy_data: the data to process
+    :type happy_data: HappyData
+    :param method: the preprocessing method to apply
+    :type method: Preprocessor
+    :return: the generator for the processed data
+    :rtype: Iterator
+    """
+    method.fit(happy_data)
+    for item in method.iter_apply(happy_data):
+        processing_note = {
+            "preprocessing": [method.to_string()]
+        }
+        item.add_preprocessing_note(processing_note)
+        yield item
+
+
 class AbstractOPEXAnnotationsBasedPreprocessor(Preprocessor, abc.ABC):
     """
     Ancestor for methods that use an annotation rectangle.
@@ -135,6 +447,8 @@ class AbstractOPEXAnnotationsBasedPreprocessor(Preprocessor, abc.ABC):
         """
         super().__init__()
         self.params["annotations"] = None
+        self._average_cache = OrderedDict()
+        self._mask_cache = dict()
 
     def _create_argparser(self) -> argparse.ArgumentParser:
         """
@@ -159,6 +473,7 @@ class AbstractOPEXAnnotationsBasedPreprocessor(Preprocessor, abc.ABC):
         if ns.file is not None:
             anns = ObjectPredictions.load_json_from_file(ns.file)
             self.params["annotations"] = anns
+        self.clear_cache()
 
     @property
     def annotations(self):
@@ -179,6 +494,108 @@ class AbstractOPEXAnnotationsBasedPreprocessor(Preprocessor, abc.ABC):
         :type anns: ObjectPredictions
         """
         self.params["annotations"] = anns
+        self.clear_cache()
+
+    def clear_cache(self):
+        """
+        Removes all cached average spectra and masks.
+        """
+        self._average_cache = OrderedDict()
+        self._mask_cache = dict()
+
+    def locate_annotation(self, label: str):
+        """
+        Returns the first annotation with the specified label.
+
+        :param label: the label to look for
+        :type label: str
+        :return: the annotation, None if not found
+        :rtype: ObjectPrediction
+        """
+        if self.params["annotations"] is None:
+            return None
+        for obj in self.params["annotations"].objects:
+            if obj.label == label:
+                return obj
+        return None
+
+    def _polygon_mask(self, obj, top: int, left: int, height: int, width: int) -> Optional[np.ndarray]:
+        """
+        Rasterizes the polygon of the annotation within the specified rectangle, the masks get cached.
+
+        :param obj: the annotation
+        :type obj: ObjectPrediction
+        :param top: the top of the rectangle
+        :type top: int
+        :param left: the left of the rectangle
+        :type left: int
+        :param height: the height of the rectangle
+        :type height: int
+        :param width: the width of the rectangle
+        :type width: int
+        :return: the mask (height, width), None if no polygon available
+        :rtype: np.ndarray
+        """
+        key = (obj.label, top, left, height, width)
+        if key not in self._mask_cache:
+            mask = None
+            if (obj.polygon is not None) and (obj.polygon.points is not None) and (len(obj.polygon.points) >= 3):
+                img = Image.new("1", (width, height))
+                draw = ImageDraw.Draw(img)
+                draw.polygon([(x - left, y - top) for x, y in obj.polygon.points], fill=1, outline=1)
+                mask = np.array(img)
+            self._mask_cache[key] = mask
+        return self._mask_cache[key]
+
+    def annotation_average(self, happy_data: HappyData, label: str, use_polygon: bool = False) -> Optional[np.ndarray]:
+        """
+        Computes the average spectrum of the pixels in the annotation with the specified label,
+        using either its outer bbox or its polygon (if available). The most recent averages get
+        cached per annotation and data array (identity, not sample ID).
+
+        :param happy_data: the data to compute the average for
+        :type happy_data: HappyData
+        :param label: the label of the annotation to use
+        :type label: str
+        :param use_polygon: whether to use the polygon rather than the bbox
+        :type use_polygon: bool
+        :return: the average spectrum, None if annotation not found
+        :rtype: np.ndarray
+        """
+        obj = self.locate_annotation(label)
+        if obj is None:
+            return None
+        key = (label, use_polygon, id(happy_data.data), happy_data.data.shape)
+        if key in self._average_cache:
+            data_ref, result = self._average_cache[key]
+            # the id of a garbage collected array can get reused
+            if data_ref() is happy_data.data:
+                self._average_cache.move_to_end(key)
+                return result
+            del self._average_cache[key]
+
+        bbox = obj.bbox
+        top = max(0, bbox.top)
+        left = max(0, bbox.left)
+        bottom = min(happy_data.height - 1, bbox.bottom)
+        right = min(happy_data.width - 1, bbox.right)
+        if (bottom < top) or (right < left):
+            raise Exception("Annotation '%s' outside of data: %s" % (label, str(happy_data.data.shape)))
+        region = happy_data.data[top:bottom + 1, left:right + 1, :]
+        pixels = None
+        if use_polygon:
+            mask = self._polygon_mask(obj, top, left, bottom - top + 1, right - left + 1)
+            if (mask is not None) and np.any(mask):
+                pixels = region[mask]
+        if pixels is None:
+            pixels = region.reshape(-1, region.shape[2])
+        result = pixels.mean(axis=0, dtype=np.float64)
+        if np.issubdtype(happy_data.data.dtype, np.floating):
+            result = result.astype(happy_data.data.dtype)
+        self._average_cache[key] = (weakref.ref(happy_data.data), result)
+        while len(self._average_cache) > AVERAGE_CACHE_SIZE:
+            self._average_cache.popitem(last=False)
+        return result
 
     def _initialize(self):
         """
@@ -0,0 +1,181 @@
+import argparse
+import functools
+
+import numpy as np
+
+from typing import List, Optional, Tuple
+
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL
+from happy.data import HappyData
+
+
+METHOD_LINEAR = "linear"
+""" linear interpolation between the neighbouring wavelengths. """
+
+METHOD_GAUSSIAN = "gaussian"
+""" gaussian spectral response of the target bands. """
+
+METHODS = [METHOD_LINEAR, METHOD_GAUSSIAN]
+""" the available resampling methods. """
+
+FWHM_TO_SIGMA = 1.0 / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+""" for converting the full width at half maximum into the standard deviation. """
+
+GAUSSIAN_CUTOFF = 3.0
+""" the number of standard deviations after which the gaussian weights get ignored. """
+
+
+def _linear_weights(source: np.ndarray, target: np.ndarray) -> Tuple[List, List, List]:
+    """
+    Computes the weights for linearly interpolating the target wavelengths.
+    Target wavelengths outside the source range use the closest source wavelength.
+
+    :return: the tuple of rows, columns and values
+    :rtype: tuple
+    """
+    order = np.argsort(source)
+    ordered = source[order]
+    right = np.clip(np.searchsorted(ordered, target), 1, len(ordered) - 1)
+    left = right - 1
+    width = ordered[right] - ordered[left]
+    fraction = np.clip((target - ordered[left]) / np.where(width == 0, 1, width), 0.0, 1.0)
+    columns = np.arange(len(target))
+    rows = np.concatenate([order[left], order[right]])
+    values = np.concatenate([1.0 - fraction, fraction])
+    return rows, np.concatenate([columns, columns]), values
+
+
+def _gaussian_weights(source: np.ndarray, target: np.ndarray, fwhm: Optional[float]) -> Tuple[List, List, List]:
+    """
+    Computes the (normalized) weights of the gaussian spectral responses of the target wavelengths.
+    Without FWHM, the spacing of the target wavelengths gets used.
+
+    :return: the tuple of rows, columns and values
+    :rtype: tuple
+    """
+    if fwhm is not None:
+        sigma = np.full(len(target), fwhm * FWHM_TO_SIGMA)
+    elif len(target) > 1:
+        sigma = np.abs(np.gradient(target)) * FWHM_TO_SIGMA
+    else:
+        raise Exception("FWHM required when resampling to a single wavelength!")
+    # (source, target)
+    distance = (source[:, None] - target[None, :]) / sigma[None, :]
+    weights = np.where(np.abs(distance) <= GAUSSIAN_CUTOFF, np.exp(-0.5 * distance ** 2), 0.0)
+    totals = weights.sum(axis=0)
+    # no source wavelength within range: use closest one
+    empty = totals == 0
+    if np.any(empty):
+        closest = np.argmin(np.abs(distance[:, empty]), axis=0)
+        weights[closest, np.nonzero(empty)[0]] = 1.0
+        totals = weights.sum(axis=0)
+    weights /= totals[None, :]
+    rows, columns = np.nonzero(weights)
+    return rows, columns, weights[rows, columns]
+
+
+@functools.lru_cache(maxsize=32)
+def resampling_matrix(source: Tuple[float], target: Tuple[float], method: str = METHOD_LINEAR,
+                      fwhm: Optional[float] = None, dtype: str = "float64") -> "sparse.csr_matrix":
+    """
+    Computes the sparse matrix (source x target) for resampling spectra from the source to the
+    target wavelengths. The matrices get cached (per dtype).
+
+    :param source: the wavelengths of the data
+    :type source: tuple
+    :param target: the wavelengths to resample to
+    :type target: tuple
+    :param method: the resampling method, see METHODS
+    :type method: str
+    :param fwhm: the full width at half maximum for the gaussian responses, uses the target spacing if None
+    :type fwhm: float
+    :param dtype: the dtype of the matrix (float32 or float64)
+    :type dtype: str
+    :return: the matrix
+    :rtype: sparse.csr_matrix
+    """
+    from scipy import sparse
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if method == METHOD_LINEAR:
+        if len(source) < 2:
+            raise Exception("At least two wavelengths required for linear interpolation!")
+        rows, columns, values = _linear_weights(source, target)
+    elif method == METHOD_GAUSSIAN:
+        rows, columns, values = _gaussian_weights(source, target, fwhm)
+    else:
+        raise Exception("Unsupported resampling method: %s" % method)
+    result = sparse.csr_matrix((values, (rows, columns)), shape=(len(source), len(target)))
+    result.sum_duplicates()
+    return result.astype(dtype)
+
+
+class ResampleWavelengthsPreprocessor(Preprocessor):
+
+    def name(self) -> str:
+        return "resample-wavelengths"
+
+    def description(self) -> str:
+        return "Resamples the spectra to the specified wavelengths, eg for combining data from different instruments. "\
+               "Uses either linear interpolation or gaussian spectral responses. "\
+               "Target wavelengths outside the range of the data use the closest wavelength."
+
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        parser = super()._create_argparser()
+        parser.add_argument("-w", "--wavelengths", type=float, help="The explicit wavelengths to resample to", required=False, nargs="+")
+        parser.add_argument("-f", "--from_wavelength", type=float, help="The first wavelength of the regular grid to resample to", required=False, default=None)
+        parser.add_argument("-t", "--to_wavelength", type=float, help="The last wavelength (inclusive) of the regular grid to resample to", required=False, default=None)
+        parser.add_argument("-s", "--step", type=float, help="The step size of the regular grid to resample to", required=False, default=None)
+        parser.add_argument("-m", "--method", choices=METHODS, help="The resampling method", required=False, default=METHOD_LINEAR)
+        parser.add_argument("--fwhm", type=float, help="The full width at half maximum of the gaussian responses, uses the spacing of the target wavelengths if not specified", required=False, default=None)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        super()._apply_args(ns)
+        self.params["wavelengths"] = ns.wavelengths
+        self.params["from_wavelength"] = ns.from_wavelength
+        self.params["to_wavelength"] = ns.to_wavelength
+        self.params["step"] = ns.step
+        self.params["method"] = ns.method
+        self.params["fwhm"] = ns.fwhm
+
+    def target_wavelengths(self) -> List[float]:
+        """
+        Returns the wavelengths to resample to.
+
+        :return: the wavelengths
+        :rtype: list
+        """
+        wavelengths = self.params.get("wavelengths", None)
+        if wavelengths is not None:
+            return list(wavelengths)
+        from_wavelength = self.params.get("from_wavelength", None)
+        to_wavelength = self.params.get("to_wavelength", None)
+        step = self.params.get("step", None)
+        if (from_wavelength is None) or (to_wavelength is None) or (step is None):
+            raise Exception("Either explicit wavelengths or from/to/step must be specified!")
+        if step <= 0:
+            raise Exception("Step must be larger than 0, provided: %f" % step)
+        num = int(np.floor((to_wavelength - from_wavelength) / step + 1e-9)) + 1
+        return (from_wavelength + np.arange(num) * step).tolist()
+
+    def _initialize(self):
+        super()._initialize()
+        self.target_wavelengths()
+
+    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        target = self.target_wavelengths()
+        source = happy_data.get_wavelengths()
+        if len(source) != happy_data.data.shape[2]:
+            raise Exception("Number of wavelengths (%d) and bands (%d) differ!" % (len(source), happy_data.data.shape[2]))
+        pixels = happy_data.data.reshape(-1, happy_data.data.shape[2])
+        matrix = resampling_matrix(tuple(float(x) for x in source), tuple(target),
+                                   method=self.params.get("method", METHOD_LINEAR), fwhm=self.params.get("fwhm", None),
+                                   dtype="float32" if (pixels.dtype == np.float32) else "float64")
+        # single matrix multiplication over all the pixels
+        resampled = np.asarray(pixels @ matrix)
+        resampled = resampled.reshape(happy_data.data.shape[:2] + (len(target),))
+        return [happy_data.copy(data=resampled, wavenumbers=target)]
@@ -3,7 +3,7 @@ import numpy as np
 
 from typing import List
 
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_NEIGHBOURHOOD
 from happy.data import HappyData
 
 
@@ -18,6 +18,15 @@ class SpectralNoiseInterpolator(Preprocessor):
                "If that difference is larger than the specified threshold (= noisy) then "\
                "interpolate this wavelength."
 
+    def locality(self) -> str:
+        return LOCALITY_NEIGHBOURHOOD
+
+    def halo(self) -> int:
+        return 1
+
+    def requires_fit(self) -> bool:
+        return True
+
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
         parser.add_argument("-t", "--threshold", type=float, help="The threshold for identifying noisy pixels.", required=False, default=0.8)
@@ -26,6 +35,8 @@ class SpectralNoiseInterpolator(Preprocessor):
     def _apply_args(self, ns: argparse.Namespace):
         super()._apply_args(ns)
         self.params['threshold'] = ns.threshold
+        self.median_gradient = None
+        self._fit_gradient = None
 
     def calculate_gradient(self, data: np.ndarray) -> np.ndarray:
         # Calculate the gradient along the spectral dimension
@@ -33,8 +44,24 @@ class SpectralNoiseInterpolator(Preprocessor):
         self.logger().info(f"data:{data.shape} grad:{spectral_gradient.shape}")
         return spectral_gradient
 
-    def identify_noisy_pixels(self, gradient_data: np.ndarray) -> np.ndarray:
-        gradient_diff = np.abs(gradient_data - np.median(gradient_data, axis=(0, 1), keepdims=True))
+    def calculate_median_gradient(self, data: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+        # median gradient per wavelength across all pixels, computed in chunks of wavelengths
+        # to limit memory usage for large (eg memory-mapped) images
+        num_bands = data.shape[2]
+        result = np.empty((1, 1, num_bands))
+        for start in range(0, num_bands, chunk_size):
+            end = min(start + chunk_size, num_bands)
+            # include neighbouring wavelengths for the gradient
+            first = max(0, start - 1)
+            last = min(num_bands, end + 1)
+            gradient = np.gradient(np.asarray(data[:, :, first:last]), axis=2)
+            result[0, 0, start:end] = np.median(gradient[:, :, start - first:end - first], axis=(0, 1))
+        return result
+
+    def identify_noisy_pixels(self, gradient_data: np.ndarray, median_gradient: np.ndarray = None) -> np.ndarray:
+        if median_gradient is None:
+            median_gradient = np.median(gradient_data, axis=(0, 1), keepdims=True)
+        gradient_diff = np.abs(gradient_data - median_gradient)
         noisy_pixel_indices = gradient_diff > self.params.get('threshold', 0.8)
         return noisy_pixel_indices
 
@@ -62,8 +89,35 @@ class SpectralNoiseInterpolator(Preprocessor):
 
         return interpolated_data
 
+    def _do_fit(self, happy_data: HappyData):
+        data = happy_data.data
+        self._fit_gradient = None
+        if isinstance(data, np.memmap):
+            # chunked, avoids loading the whole image
+            self.median_gradient = self.calculate_median_gradient(data)
+        else:
+            gradient_data = self.calculate_gradient(data)
+            self.median_gradient = np.median(gradient_data, axis=(0, 1), keepdims=True).astype(np.float64)
+            # reused when applying to the same data
+            self._fit_gradient = gradient_data
+
+    def _clear_fit_state(self):
+        self.median_gradient = None
+        self._fit_gradient = None
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
-        gradient_data = self.calculate_gradient(happy_data.data)
-        noisy_pixel_indices = self.identify_noisy_pixels(gradient_data)
+        gradient_data = None
+        median_gradient = None
+        if self._uses_fit_state(happy_data):
+            median_gradient = self.median_gradient
+        if self._is_fit_data(happy_data):
+            gradient_data = self._fit_gradient
+        # no longer needed
+        self._fit_gradient = None
+        if gradient_data is None:
+            gradient_data = self.calculate_gradient(happy_data.data)
+        if (median_gradient is not None) and (median_gradient.shape[2] != gradient_data.shape[2]):
+            median_gradient = None
+        noisy_pixel_indices = self.identify_noisy_pixels(gradient_data, median_gradient=median_gradient)
         interpolated_data = self.interpolate_noisy_pixels(happy_data.data, noisy_pixel_indices, gradient_data)
         return [happy_data.copy(data=interpolated_data)]
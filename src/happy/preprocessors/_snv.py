@@ -2,7 +2,7 @@ import numpy as np
 
 from typing import List
 
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL, float_dtype
 from happy.data import HappyData
 
 
@@ -14,6 +14,21 @@ class SNVPreprocessor(Preprocessor):
     def description(self) -> str:
         return "Standard normal variate"
 
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
+    def supports_apply_into(self) -> bool:
+        return True
+
+    def _result_dtype(self, happy_data: HappyData) -> np.dtype:
+        return float_dtype(happy_data.data.dtype)
+
+    def _do_apply_into(self, happy_data: HappyData, out: np.ndarray):
+        mean = np.mean(happy_data.data, axis=2, keepdims=True)
+        std = np.std(happy_data.data, axis=2, keepdims=True)
+        np.subtract(happy_data.data, mean, out=out)
+        np.divide(out, std, out=out)
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
         mean = np.mean(happy_data.data, axis=2, keepdims=True)
         std = np.std(happy_data.data, axis=2, keepdims=True)
@@ -1,10 +1,16 @@
+import argparse
+import numpy as np
+
 from typing import List
 
-from sklearn.preprocessing import StandardScaler
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_BAND
 from happy.data import HappyData
 
 
+CHUNK_SIZE = 100000
+""" the number of pixels to use at a time when fitting memory-mapped data or transforming into a buffer. """
+
+
 class StandardScalerPreprocessor(Preprocessor):
 
     def name(self) -> str:
@@ -13,9 +19,69 @@ class StandardScalerPreprocessor(Preprocessor):
     def description(self) -> str:
         return "Standardize features by removing the mean and scaling to unit variance."
 
+    def locality(self) -> str:
+        return LOCALITY_BAND
+
+    def requires_fit(self) -> bool:
+        return True
+
+    def _apply_args(self, ns: argparse.Namespace):
+        super()._apply_args(ns)
+        self.scaler = None
+
+    def _do_fit(self, happy_data: HappyData):
+        from sklearn.preprocessing import StandardScaler
+        self.scaler = StandardScaler()
+        reshaped_data = happy_data.data.reshape(-1, happy_data.data.shape[-1])  # Flatten the data along the last dimension
+        if isinstance(happy_data.data, np.memmap):
+            # fit incrementally to avoid loading all the data
+            for start in range(0, len(reshaped_data), CHUNK_SIZE):
+                self.scaler.partial_fit(reshaped_data[start:start + CHUNK_SIZE])
+        else:
+            self.scaler.fit(reshaped_data)
+
+    def supports_apply_into(self) -> bool:
+        return True
+
+    def _result_dtype(self, happy_data: HappyData) -> np.dtype:
+        # like check_array of scikit-learn: float32/float64 get kept
+        if happy_data.data.dtype in (np.float32, np.float64):
+            return happy_data.data.dtype
+        return np.dtype(np.float64)
+
+    def _clear_fit_state(self):
+        self.scaler = None
+
+    def _get_scaler(self, happy_data: HappyData):
+        """
+        Returns the scaler to apply: the fitted one for the tiles of the image it got fitted on or
+        the data it just got fitted on, otherwise one fitted on the data itself.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :return: the scaler
+        :rtype: StandardScaler
+        """
+        from sklearn.preprocessing import StandardScaler
+        num_features = happy_data.data.shape[-1]
+        if (self.scaler is not None) and self._uses_fit_state(happy_data) and (self.scaler.n_features_in_ == num_features):
+            return self.scaler
+        result = StandardScaler()
+        result.fit(happy_data.data.reshape(-1, num_features))
+        return result
+
+    def _do_apply_into(self, happy_data: HappyData, out: np.ndarray):
+        scaler = self._get_scaler(happy_data)
+        num_features = happy_data.data.shape[-1]
+        # transform blocks of rows, only requiring temporary arrays for these
+        rows = max(1, CHUNK_SIZE // max(1, happy_data.data.shape[1]))
+        for y in range(0, happy_data.data.shape[0], rows):
+            block = happy_data.data[y:y + rows]
+            out[y:y + rows] = scaler.transform(block.reshape(-1, num_features)).reshape(block.shape)
+
     def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
-        scaler = StandardScaler()
+        scaler = self._get_scaler(happy_data)
         reshaped_data = happy_data.data.reshape(-1, happy_data.data.shape[-1])  # Flatten the data along the last dimension
-        scaled_data = scaler.fit_transform(reshaped_data)
+        scaled_data = scaler.transform(reshaped_data)
         scaled_data = scaled_data.reshape(happy_data.data.shape)  # Reshape back to the original shape
         return [happy_data.copy(data=scaled_data)]
@@ -1,6 +1,8 @@
 import argparse
 import os.path
 
+import numpy as np
+
 from typing import List
 
 import spectral.io.envi as envi
@@ -27,7 +29,13 @@ class SubtractPreprocessor(Preprocessor):
         if "data" in self.params:
             del self.params["data"]
 
-    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+    def _load(self) -> np.ndarray:
+        """
+        Loads the ENVI file to subtract, if necessary.
+
+        :return: the data to subtract
+        :rtype: np.ndarray
+        """
         if "data" not in self.params:
             if self.params["file"] is None:
                 raise Exception("No ENVI file supplied for subtracting!")
@@ -35,6 +43,17 @@ class SubtractPreprocessor(Preprocessor):
                 raise Exception("ENVI file to subtract does not exist: %s" % self.params["file"])
             img = envi.open(self.params["file"])
             self.params["data"] = img.load()
+        return self.params["data"]
+
+    def supports_apply_into(self) -> bool:
+        return True
 
-        new_data = happy_data.data - self.params["data"]
+    def _result_dtype(self, happy_data: HappyData) -> np.dtype:
+        return np.result_type(happy_data.data, self._load())
+
+    def _do_apply_into(self, happy_data: HappyData, out: np.ndarray):
+        np.subtract(happy_data.data, self._load(), out=out)
+
+    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        new_data = happy_data.data - self._load()
         return [happy_data.copy(data=new_data)]
@@ -0,0 +1,463 @@
+import argparse
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+from happy.base.precision import COMPUTE_DTYPES
+from happy.data import HappyData
+from ._preprocessor import Preprocessor, LOCALITY_NEIGHBOURHOOD, LOCALITY_IMAGE
+
+
+def tile_grid(height: int, width: int, tile_size: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Splits the image dimensions into tiles.
+
+    :param height: the height of the image
+    :type height: int
+    :param width: the width of the image
+    :type width: int
+    :param tile_size: the (maximum) width/height of the tiles
+    :type tile_size: int
+    :return: the list of tiles (y0, y1, x0, x1), with exclusive end coordinates
+    :rtype: list
+    """
+    result = []
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            result.append((y, min(y + tile_size, height), x, min(x + tile_size, width)))
+    return result
+
+
+def crop_happy_data(happy_data: HappyData, y0: int, y1: int, x0: int, x1: int) -> HappyData:
+    """
+    Returns the specified rectangle of the data, including the meta-data layers.
+    The data itself is a view on the original data.
+
+    :param happy_data: the data to crop
+    :type happy_data: HappyData
+    :param y0: the top (inclusive)
+    :type y0: int
+    :param y1: the bottom (exclusive)
+    :type y1: int
+    :param x0: the left (inclusive)
+    :type x0: int
+    :param x1: the right (exclusive)
+    :type x1: int
+    :return: the cropped data
+    :rtype: HappyData
+    """
+    metadata_dict = None
+    if happy_data.metadata_dict is not None:
+        metadata_dict = dict()
+        for key, sub_dict in happy_data.metadata_dict.items():
+            if "data" in sub_dict:
+                metadata_dict[key] = {k: v for k, v in sub_dict.items() if k != "data"}
+                metadata_dict[key]["data"] = sub_dict["data"][y0:y1, x0:x1]
+            else:
+                metadata_dict[key] = sub_dict
+    return happy_data.copy(data=happy_data.data[y0:y1, x0:x1], metadata_dict=metadata_dict)
+
+
+def allocate_array(shape: Tuple, dtype, output_dir: Optional[str] = None) -> np.ndarray:
+    """
+    Allocates an array, either in memory or memory-mapped in the output directory.
+
+    :param shape: the shape of the array
+    :type shape: tuple
+    :param dtype: the data type
+    :param output_dir: the directory for the memory-mapped file, in-memory if None
+    :type output_dir: str
+    :return: the array
+    :rtype: np.ndarray
+    """
+    if output_dir is None:
+        return np.empty(shape, dtype=dtype)
+    os.makedirs(output_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".npy", dir=output_dir)
+    os.close(fd)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def release_array(array: np.ndarray):
+    """
+    Removes the file backing a memory-mapped array allocated by allocate_array.
+
+    :param array: the array to release
+    :type array: np.ndarray
+    """
+    if isinstance(array, np.memmap) and (array.filename is not None):
+        path = array.filename
+        array.flush()
+        del array
+        os.remove(path)
+
+
+class SharedArray:
+    """
+    Describes an array that can be accessed by multiple processes without pickling its data,
+    either backed by shared memory or by a memory-mapped file. Only the description gets
+    pickled, the processes attach to the data via attach().
+    """
+
+    def __init__(self, shape: Tuple, dtype, name: str = None, filename: str = None, offset: int = 0):
+        """
+        Initializes the description.
+
+        :param shape: the shape of the array
+        :type shape: tuple
+        :param dtype: the data type
+        :param name: the name of the shared memory block
+        :type name: str
+        :param filename: the memory-mapped file, if not using shared memory
+        :type filename: str
+        :param offset: the offset of the data in the memory-mapped file
+        :type offset: int
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.name = name
+        self.filename = filename
+        self.offset = offset
+        self._shm = None
+        self._array = None
+
+    def __getstate__(self):
+        result = self.__dict__.copy()
+        result["_shm"] = None
+        result["_array"] = None
+        return result
+
+    @classmethod
+    def create(cls, shape: Tuple, dtype, output_dir: Optional[str] = None) -> 'SharedArray':
+        """
+        Allocates a new array, memory-mapped in the output directory or in shared memory.
+
+        :param shape: the shape of the array
+        :type shape: tuple
+        :param dtype: the data type
+        :param output_dir: the directory for the memory-mapped file, shared memory if None
+        :type output_dir: str
+        :return: the array
+        :rtype: SharedArray
+        """
+        if output_dir is not None:
+            array = allocate_array(shape, dtype, output_dir)
+            result = SharedArray(shape, dtype, filename=array.filename, offset=array.offset)
+            result._array = array
+            return result
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        result = SharedArray(shape, dtype, name=shm.name)
+        result._shm = shm
+        return result
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> 'SharedArray':
+        """
+        Makes the array available to other processes. Memory-mapped arrays (eg ones generated
+        by allocate_array) get used as is, other arrays get copied into shared memory.
+
+        :param array: the array to share
+        :type array: np.ndarray
+        :return: the shared array
+        :rtype: SharedArray
+        """
+        # only the complete array of a memory-mapped file, not views on it
+        if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous:
+            result = SharedArray(array.shape, array.dtype, filename=array.filename, offset=array.offset)
+            result._array = array
+            return result
+        result = SharedArray.create(array.shape, array.dtype)
+        result.attach()[:] = array
+        return result
+
+    def is_memmap(self) -> bool:
+        """
+        Returns whether the array is backed by a memory-mapped file.
+
+        :return: True if memory-mapped
+        :rtype: bool
+        """
+        return self.filename is not None
+
+    def attach(self) -> np.ndarray:
+        """
+        Returns the array, attaching to the shared memory or file if necessary.
+
+        :return: the array
+        :rtype: np.ndarray
+        """
+        if self._array is None:
+            if self.is_memmap():
+                self._array = np.memmap(self.filename, dtype=self.dtype, mode="r+", offset=self.offset, shape=self.shape)
+            else:
+                if self._shm is None:
+                    self._shm = shared_memory.SharedMemory(name=self.name)
+                self._array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        return self._array
+
+    def close(self, unlink: bool = False):
+        """
+        Detaches from the data.
+
+        :param unlink: whether to free the shared memory as well (owner only)
+        :type unlink: bool
+        """
+        self._array = None
+        if self._shm is not None:
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+            self._shm = None
+
+
+def apply_single(preprocessor: Preprocessor, happy_data: HappyData, fit: bool) -> HappyData:
+    """
+    Applies the preprocessor to the data, ensuring that a single data object is generated.
+
+    :param preprocessor: the preprocessor to apply
+    :type preprocessor: Preprocessor
+    :param happy_data: the data to process
+    :type happy_data: HappyData
+    :param fit: whether to fit the preprocessor first
+    :type fit: bool
+    :return: the processed data
+    :rtype: HappyData
+    """
+    if fit:
+        preprocessor.fit(happy_data)
+    result = preprocessor.apply(happy_data)
+    if len(result) != 1:
+        raise Exception("Preprocessor %s generated %d data objects, only 1 supported!" % (preprocessor.name(), len(result)))
+    return result[0]
+
+
+def process_tile(happy_data: HappyData, segment: List[Tuple[Preprocessor, bool]], tile: Tuple[int, int, int, int], halo: int) -> Tuple[np.ndarray, HappyData]:
+    """
+    Applies the preprocessors to the tile (including the halo).
+
+    :param happy_data: the full data
+    :type happy_data: HappyData
+    :param segment: the preprocessors and whether to fit them on the tile
+    :type segment: list
+    :param tile: the tile to process (y0, y1, x0, x1)
+    :type tile: tuple
+    :param halo: the margin to add around the tile
+    :type halo: int
+    :return: the tuple of processed tile data (without halo) and the last processed data object
+    :rtype: tuple
+    """
+    y0, y1, x0, x1 = tile
+    ey0 = max(0, y0 - halo)
+    ey1 = min(happy_data.height, y1 + halo)
+    ex0 = max(0, x0 - halo)
+    ex1 = min(happy_data.width, x1 + halo)
+    current = crop_happy_data(happy_data, ey0, ey1, ex0, ex1)
+    for preprocessor, fit in segment:
+        current = apply_single(preprocessor, current, fit)
+        if current.data.shape[:2] != (ey1 - ey0, ex1 - ex0):
+            raise Exception("Preprocessor %s changed the spatial dimensions of the tile!" % preprocessor.name())
+    data = current.data[y0 - ey0:y1 - ey0, x0 - ex0:x1 - ex0]
+    return data, current
+
+
+_worker_state = dict()
+""" the state of the worker process. """
+
+
+def _init_worker(segment: List[Tuple[Preprocessor, bool]], info: Tuple, input_array: SharedArray, output_array: SharedArray):
+    """
+    Attaches the worker process to the input and output arrays.
+    """
+    sample_id, region_id, global_dict, metadata_dict, wavenumbers = info
+    _worker_state["segment"] = segment
+    _worker_state["happy_data"] = HappyData(sample_id, region_id, input_array.attach(), global_dict, metadata_dict, wavenumbers)
+    _worker_state["input"] = input_array
+    _worker_state["output"] = output_array
+    _worker_state["output_data"] = output_array.attach()
+
+
+def _process_tile_worker(tile: Tuple[int, int, int, int], halo: int):
+    """
+    Processes the tile and writes the result to the output array (worker function).
+    """
+    y0, y1, x0, x1 = tile
+    data, _ = process_tile(_worker_state["happy_data"], _worker_state["segment"], tile, halo)
+    _worker_state["output_data"][y0:y1, x0:x1] = data
+
+
+class TiledPreprocessor(Preprocessor):
+
+    def name(self) -> str:
+        return "tiled-pp"
+
+    def description(self) -> str:
+        return "Applies the preprocessors to spatial tiles of the data, stitching the results together, "\
+               "allowing the processing of images that do not fit into memory (using --output_dir). "\
+               "Preprocessors that need a neighbourhood get applied to tiles with extra margins, ones "\
+               "that gather statistics across the image get fitted on the whole image first. "\
+               "Preprocessors that require the whole image (eg ones that change the geometry) get "\
+               "applied to the whole image."
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        parser = super()._create_argparser()
+        parser.add_argument("-p", "--preprocessors", type=str, help="The preprocessors to apply. Either preprocessor command-line(s) or file with one preprocessor command-line per line.", required=False, default=None)
+        parser.add_argument("-t", "--tile_size", type=int, help="The width/height of the tiles", required=False, default=256)
+        parser.add_argument("-n", "--num_workers", type=int, help="The number of processes to use for processing the tiles; the data gets shared with the processes via shared memory or memory-mapped files (--output_dir).", required=False, default=1)
+        parser.add_argument("-o", "--output_dir", type=str, help="The directory for storing the (intermediate) results as memory-mapped arrays; keeps them in memory if not specified. The file of the final result does not get removed automatically.", required=False, default=None)
+        parser.add_argument("--compute_dtype", choices=COMPUTE_DTYPES, help="The data type for the preprocessors to perform the computations in, uses the global one if not specified", required=False, default=None)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        super()._apply_args(ns)
+        preprocessor_list = []
+        if ns.preprocessors is not None:
+            preprocessor_list = Preprocessor.parse_preprocessors(ns.preprocessors)
+        self.params["preprocessor_list"] = preprocessor_list
+        self.params["tile_size"] = ns.tile_size
+        self.params["num_workers"] = ns.num_workers
+        self.params["output_dir"] = ns.output_dir
+        self.compute_dtype = ns.compute_dtype
+
+    def _initialize(self):
+        super()._initialize()
+        if self.params.get("tile_size", 256) < 1:
+            raise Exception("Tile size must be at least 1, provided: %d" % self.params["tile_size"])
+        # pipeline-specific dtype overrides the global one
+        if self.compute_dtype is not None:
+            for preprocessor in self.params.get('preprocessor_list', []):
+                preprocessor.compute_dtype = self.compute_dtype
+
+    def _to_compute_dtype(self, happy_data: HappyData) -> HappyData:
+        # the preprocessors convert the tiles, avoids converting (and loading) the whole image
+        return happy_data
+
+    @property
+    def preprocessor_list(self) -> Optional[List[Preprocessor]]:
+        """
+        Returns the current preprocessor list.
+
+        :return: the list of preprocessors
+        :rtype: list or None
+        """
+        return self.params["preprocessor_list"]
+
+    def _process_segment(self, happy_data: HappyData, segment: List[Tuple[Preprocessor, bool]]) -> HappyData:
+        """
+        Applies the preprocessors tile by tile and stitches the results together.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param segment: the preprocessors and whether to fit them on the tiles
+        :type segment: list
+        :return: the processed data
+        :rtype: HappyData
+        """
+        if len(segment) == 0:
+            return happy_data
+        halo = sum([p.halo() for p, _ in segment if p.locality() == LOCALITY_NEIGHBOURHOOD])
+        tiles = tile_grid(happy_data.height, happy_data.width, self.params.get("tile_size", 256))
+        num_workers = min(self.params.get("num_workers", 1), len(tiles) - 1)
+        self.logger().info("Processing %d tiles with halo %d using %d worker(s): %s" % (len(tiles), halo, max(1, num_workers), ", ".join([p.name() for p, _ in segment])))
+        # the first tile determines the output
+        data, last = process_tile(happy_data, segment, tiles[0], halo)
+        shape = (happy_data.height, happy_data.width, data.shape[2])
+        if num_workers > 1:
+            output = self._process_tiles_parallel(happy_data, segment, tiles, halo, shape, data, num_workers)
+        else:
+            output = allocate_array(shape, data.dtype, self.params.get("output_dir", None))
+            y0, y1, x0, x1 = tiles[0]
+            output[y0:y1, x0:x1] = data
+            for tile in tiles[1:]:
+                y0, y1, x0, x1 = tile
+                output[y0:y1, x0:x1], _ = process_tile(happy_data, segment, tile, halo)
+        return happy_data.copy(data=output, wavenumbers=last.wavenumbers)
+
+    def _process_tiles_parallel(self, happy_data: HappyData, segment: List[Tuple[Preprocessor, bool]],
+                                tiles: List[Tuple[int, int, int, int]], halo: int, shape: Tuple,
+                                first: np.ndarray, num_workers: int) -> np.ndarray:
+        """
+        Processes the tiles with a pool of processes. The input and output arrays get shared
+        with the processes rather than pickled.
+
+        :param happy_data: the data to process
+        :type happy_data: HappyData
+        :param segment: the preprocessors and whether to fit them on the tiles
+        :type segment: list
+        :param tiles: the tiles to process
+        :type tiles: list
+        :param halo: the margin to add around the tiles
+        :type halo: int
+        :param shape: the shape of the output
+        :type shape: tuple
+        :param first: the already processed data of the first tile
+        :type first: np.ndarray
+        :param num_workers: the number of processes to use
+        :type num_workers: int
+        :return: the output array
+        :rtype: np.ndarray
+        """
+        output_dir = self.params.get("output_dir", None)
+        input_array = SharedArray.from_array(happy_data.data)
+        output_array = SharedArray.create(shape, first.dtype, output_dir)
+        try:
+            y0, y1, x0, x1 = tiles[0]
+            output_array.attach()[y0:y1, x0:x1] = first
+            info = (happy_data.sample_id, happy_data.region_id, happy_data.global_dict, happy_data.metadata_dict, happy_data.wavenumbers)
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                     initargs=(segment, info, input_array, output_array)) as executor:
+                futures = [executor.submit(_process_tile_worker, tile, halo) for tile in tiles[1:]]
+                for future in futures:
+                    future.result()
+            # in-memory results get copied out of the shared memory
+            if output_array.is_memmap():
+                output = output_array.attach()
+            else:
+                output = np.array(output_array.attach())
+        finally:
+            output_array.close(unlink=True)
+            input_array.close(unlink=True)
+        return output
+
+    def _do_apply(self, happy_data: HappyData) -> List[HappyData]:
+        current = happy_data
+        segment = []
+
+        def _materialize(data, segment):
+            result = self._process_segment(data, segment)
+            # intermediate result no longer needed?
+            if (data is not happy_data) and (result is not data):
+                release_array(data.data)
+            return result
+
+        fitted = []
+        try:
+            for preprocessor in self.params.get('preprocessor_list', []):
+                if preprocessor.locality() == LOCALITY_IMAGE:
+                    current = _materialize(current, segment)
+                    segment = []
+                    self.logger().warning("Preprocessor %s requires the whole image, cannot use tiles" % preprocessor.name())
+                    current = apply_single(preprocessor, current, True)
+                elif preprocessor.requires_fit():
+                    current = _materialize(current, segment)
+                    segment = [(preprocessor, False)]
+                    self.logger().info("Fitting %s on whole image" % preprocessor.name())
+                    fitted.append(preprocessor)
+                    preprocessor.fit_for_tiles(current)
+                else:
+                    segment.append((preprocessor, True))
+            current = _materialize(current, segment)
+        finally:
+            for preprocessor in fitted:
+                preprocessor.end_tiles()
+        return [current]
+
+    def to_string(self) -> str:
+        preprocessor_strings = [preprocessor.to_string() for preprocessor in self.params.get('preprocessor_list', [])]
+        return "tiled(" + " -> ".join(preprocessor_strings) + ")"
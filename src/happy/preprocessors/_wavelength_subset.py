@@ -2,10 +2,24 @@ import argparse
 
 from typing import List
 
-from ._preprocessor import Preprocessor
+from ._preprocessor import Preprocessor, LOCALITY_PIXEL
 from happy.data import HappyData
 
 
+def is_range(indices: List[int]) -> bool:
+    """
+    Checks whether the indices form a range of consecutive, increasing numbers.
+
+    :param indices: the indices to check
+    :type indices: list
+    :return: True if a range
+    :rtype: bool
+    """
+    if len(indices) == 0:
+        return False
+    return list(indices) == list(range(indices[0], indices[0] + len(indices)))
+
+
 class WavelengthSubsetPreprocessor(Preprocessor):
 
     def name(self) -> str:
@@ -14,6 +28,9 @@ class WavelengthSubsetPreprocessor(Preprocessor):
     def description(self) -> str:
         return "Returns the specified subset of wavelengths."
 
+    def locality(self) -> str:
+        return LOCALITY_PIXEL
+
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
         parser.add_argument("-s", "--subset_indices", type=int, help="The explicit 0-based wavelength indices to use", required=False, nargs="+")
@@ -35,8 +52,11 @@ class WavelengthSubsetPreprocessor(Preprocessor):
             if (from_index is not None) and (to_index is not None):
                 subset_indices = list(range(from_index, to_index + 1))
         if subset_indices is not None:
-            # Select the subset of wavelengths from the data
-            subset_data = happy_data.data[:, :, subset_indices]
+            # Select the subset of wavelengths from the data, a view if the indices are a range
+            if is_range(subset_indices) and (subset_indices[0] >= 0) and (subset_indices[-1] < happy_data.data.shape[2]):
+                subset_data = happy_data.data[:, :, subset_indices[0]:subset_indices[-1] + 1]
+            else:
+                subset_data = happy_data.data[:, :, subset_indices]
             wavenumbers = None
             if happy_data.wavenumbers is not None:
                 wavenumbers = [happy_data.wavenumbers[x] for x in subset_indices]
@@ -52,6 +52,10 @@ class EnviHappyDataReader(HappyDataReader):
         sample_ids = sorted(sample_ids)
         return sample_ids
 
+    def get_sample_files(self, sample_id: str) -> List[str]:
+        # header and image file
+        return super().get_sample_files(os.path.splitext(sample_id)[0])
+
     def _load_data(self, sample_id: str) -> List[HappyData]:
         sample_id = os.path.splitext(sample_id)[0]
         region_id = ""
@@ -137,6 +137,12 @@ class HappyReader(HappyDataReader):
         else:
             raise ValueError(f"Invalid sample_id format: {sample_id}")
 
+    def get_sample_files(self, sample_id: str) -> List[str]:
+        sample_id, region_dir = self._split_sample_id(sample_id)
+        if region_dir is not None:
+            sample_id = os.path.join(sample_id, region_dir)
+        return super().get_sample_files(sample_id)
+
     def _load_data(self, sample_id: str) -> List[HappyData]:
         sample_id, region_dir = self._split_sample_id(sample_id)
 
@@ -1,8 +1,10 @@
 import abc
 import argparse
+import os
 from seppl import split_args, split_cmdline, args_to_objects
-from seppl.variables import VariableSupporter, variable_list
+from seppl.variables import VariableSupporter, variable_list, expand_variables
 from happy.base.core import PluginWithLogging
+from happy.base.instrumentation import instrumented, STAGE_READ
 from happy.data import HappyData
 from happy.base.registry import REGISTRY
 
@@ -47,9 +49,34 @@ class HappyDataReader(PluginWithLogging, abc.ABC, VariableSupporter):
             self._initialize()
         return self._get_sample_ids()
 
+    def get_sample_files(self, sample_id: str) -> List[str]:
+        """
+        Returns the files that make up the sample, e.g., for determining whether it changed.
+        By default, these are all the files in the sample's sub-directory or, if there is no
+        such directory, the files in the base directory named after the sample ID.
+
+        :param sample_id: the sample to get the files for
+        :type sample_id: str
+        :return: the files
+        :rtype: list
+        """
+        result = []
+        base_dir = expand_variables(self.base_dir)
+        sample_path = os.path.join(base_dir, sample_id)
+        if os.path.isdir(sample_path):
+            for root, dirs, files in os.walk(sample_path):
+                for f in files:
+                    result.append(os.path.join(root, f))
+        else:
+            for f in os.listdir(base_dir):
+                if (f == sample_id) or f.startswith(sample_id + "."):
+                    result.append(os.path.join(base_dir, f))
+        return sorted(result)
+
     def _load_data(self, sample_id: str) -> List[HappyData]:
         raise NotImplementedError()
 
+    @instrumented(STAGE_READ)
     def load_data(self, sample_id: str) -> List[HappyData]:
         if not self._initialized:
             self._initialize()
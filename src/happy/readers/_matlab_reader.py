@@ -3,7 +3,6 @@ import os
 from typing import List, Optional, Tuple
 
 import numpy as np
-import scipy.io as sio
 
 from happy.data import HappyData
 from ._happydata_reader import HappyDataReader
@@ -53,6 +52,7 @@ class MatlabReader(HappyDataReader):
         return [self.load_region(sample_id, region_dir)]
 
     def _load_region(self, sample_id: str, region_name: str) -> HappyData:
+        import scipy.io as sio
         global_dict = {}
         metadata_dict = {}
 
@@ -1,6 +1,6 @@
 import argparse
 
-from typing import List
+from typing import Iterator, List
 
 from ._region_extractor import RegionExtractor
 from happy.preprocessors import CropPreprocessor, apply_preprocessor
@@ -30,8 +30,9 @@ class GridRegionExtractor(RegionExtractor):
         self.truncate_regions = ns.truncate_regions
 
     def _extract_regions(self, happy_data: HappyData) -> List[HappyData]:
-        regions = []
+        return list(self._iter_regions(happy_data))
 
+    def _iter_regions(self, happy_data: HappyData) -> Iterator[HappyData]:
         width, height = happy_data.width, happy_data.height
 
         for y in range(0, height, self.region_size[1]):
@@ -50,6 +51,4 @@ class GridRegionExtractor(RegionExtractor):
 
                 new_happy_data = apply_preprocessor(happy_data, CropPreprocessor(x=x_min, y=y_min, width=x_max-x_min, height=y_max-y_min))[0]
                 new_happy_data.append_region_name("%d,%d,%d,%d" % (x_min, y_min, x_max-x_min, y_max-y_min))
-                regions.append(new_happy_data)
-
-        return regions
+                yield new_happy_data
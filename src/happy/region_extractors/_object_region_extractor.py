@@ -1,7 +1,7 @@
 import argparse
 import json
 
-from typing import List
+from typing import Iterator, List
 
 from ._region_extractor import RegionExtractor
 from happy.criteria import Criteria, CriteriaGroup, OP_NOT_MISSING, OP_IN
@@ -41,6 +41,9 @@ class ObjectRegionExtractor(RegionExtractor):
         self.base_criteria = [Criteria.from_json(c) for c in ns.base_criteria]
 
     def _extract_regions(self, happy_data: HappyData) -> List[HappyData]:
+        return list(self._iter_regions(happy_data))
+
+    def _iter_regions(self, happy_data: HappyData) -> Iterator[HappyData]:
         object_values = self.obj_values
         if object_values is None:
             object_values = happy_data.get_unique_values(self.object_key)
@@ -50,8 +53,7 @@ class ObjectRegionExtractor(RegionExtractor):
         criteria_list = self.base_criteria
         if self.target_name is not None:
             criteria_list.extend([Criteria(OP_NOT_MISSING, key=self.target_name)])
-        
-        regions = []
+
         for obj_value in object_values:
             # Skip 0 value, which represents background
             object_criteria = criteria_list + [Criteria(OP_IN, key=self.object_key, value=[obj_value])]
@@ -73,5 +75,4 @@ class ObjectRegionExtractor(RegionExtractor):
             new_happy_data = apply_preprocessor(happy_data, CropPreprocessor(x=x_min, y=y_min, width=x_max-x_min, height=y_max-y_min))[0]
             new_happy_data.append_region_name(str(obj_value))
             new_happy_data.append_region_name("%d,%d,%d,%d" % (x_min, y_min, x_max-x_min, y_max-y_min))
-            regions.append(new_happy_data)
-        return regions
+            yield new_happy_data
@@ -2,10 +2,11 @@ import abc
 import argparse
 import os
 
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from seppl import split_args, split_cmdline, args_to_objects
 from happy.base.registry import REGISTRY
 from happy.base.core import PluginWithLogging
+from happy.base.instrumentation import instrumented, STAGE_EXTRACT_REGIONS
 from happy.data import HappyData
 
 
@@ -45,6 +46,7 @@ class RegionExtractor(PluginWithLogging, abc.ABC):
     def is_compatible(self, region: 'RegionExtractor') -> bool:
         return self.region_size == region.region_size
     
+    @instrumented(STAGE_EXTRACT_REGIONS)
     def extract_regions(self, happy_data: HappyData) -> List[HappyData]:
         # Get metadata for target names    
         regions = self._extract_regions(happy_data)
@@ -55,6 +57,32 @@ class RegionExtractor(PluginWithLogging, abc.ABC):
     def _extract_regions(self, happy_data: HappyData) -> List[HappyData]:
         raise NotImplementedError()
 
+    @instrumented(STAGE_EXTRACT_REGIONS)
+    def iter_regions(self, happy_data: HappyData) -> Iterator[HappyData]:
+        """
+        Generates the regions one at a time, allowing them to get processed further
+        before the next region gets extracted.
+
+        :param happy_data: the data to extract the regions from
+        :type happy_data: HappyData
+        :return: the generator for the regions
+        :rtype: Iterator
+        """
+        for region in self._iter_regions(happy_data):
+            yield from self.add_target_data([region])
+
+    def _iter_regions(self, happy_data: HappyData) -> Iterator[HappyData]:
+        """
+        Generates the regions. Uses _extract_regions by default, extractors that
+        produce many regions should generate them lazily instead.
+
+        :param happy_data: the data to extract the regions from
+        :type happy_data: HappyData
+        :return: the generator for the regions
+        :rtype: Iterator
+        """
+        yield from self._extract_regions(happy_data)
+
     def add_target_data(self, regions: List[HappyData]) -> List[HappyData]:
         return regions
 
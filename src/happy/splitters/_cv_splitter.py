@@ -1,4 +1,3 @@
-from sklearn.model_selection import train_test_split
 from typing import List, Optional, Dict
 
 from ._base_splitter import BaseSplitter
@@ -45,6 +44,7 @@ class CrossValidationSplitter(BaseSplitter):
         :return: the generated splits
         :rtype: DataSplits
         """
+        from sklearn.model_selection import train_test_split
         result = []
 
         for repeat_idx in range(self.num_repeats):
@@ -1,4 +1,3 @@
-from sklearn.model_selection import train_test_split
 from typing import List, Optional, Dict
 
 from ._base_splitter import BaseSplitter
@@ -39,6 +38,7 @@ class TrainTestSplitter(BaseSplitter):
         :return: the generated splits
         :rtype: DataSplits
         """
+        from sklearn.model_selection import train_test_split
         train_ids, test_ids = train_test_split(
             all_sample_ids,
             test_size=1 - self.train_percent / 100,
@@ -90,6 +90,7 @@ class CSVWriter(HappyDataWriterWithOutputPattern):
                     row = [happy_data.sample_id, happy_data.region_id, c, r]
                     row.extend(np.squeeze(happy_data.get_spectrum(c, r)))
                     writer.writerow(row)
+        self._add_output_file(path_csv)
 
         # output meta-data
         if not self._suppress_metadata:
@@ -97,6 +98,7 @@ class CSVWriter(HappyDataWriterWithOutputPattern):
             self.logger().info("Writing: %s" % path_csv)
             with open(path_meta, "w") as fp:
                 json.dump(happy_data.global_dict, fp, indent=2)
+            self._add_output_file(path_meta)
 
     def _write_data(self, happy_data_or_list, datatype_mapping=None):
         if isinstance(happy_data_or_list, list):
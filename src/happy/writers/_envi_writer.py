@@ -29,9 +29,11 @@ class EnviWriter(HappyDataWriterWithOutputPattern):
         path_meta = os.path.splitext(path_envi)[0] + "-meta.json"
         self.logger().info("Writing: %s" % path_envi)
         envi.save_image(path_envi, happy_data.data, force=True)
+        self._add_envi_output_files(path_envi)
         self.logger().info("Saving meta-data to: %s" % path_meta)
         with open(path_meta, "w") as fp:
             json.dump(happy_data.metadata_dict, fp, indent=2)
+        self._add_output_file(path_meta)
 
     def _write_data(self, happy_data_or_list, datatype_mapping=None):
         if isinstance(happy_data_or_list, list):
@@ -1,7 +1,7 @@
 import json
 import os
 
-from happy.data import HappyData
+from happy.data import HappyData, MASK_MAP
 from happy.writers.base import EnviWriter
 from ._happydata_writer import HappyDataWriter
 from seppl.variables import expand_variables
@@ -48,6 +48,7 @@ class HappyWriter(HappyDataWriter):
         envi_writer = EnviWriter(region_dir)
         envi_writer.logging_level = self.logging_level
         envi_writer.write_data(happy_data.data, hyperspec_file_path, datatype=self.get_datatype_mapping_for(datatype_mapping, sample_id), wavelengths=happy_data.wavenumbers)
+        self._add_envi_output_files(hyperspec_file_path)
         self.logger().info(f"data shape: {happy_data.data.shape}")
 
         # Write hyperspectral metadata (global)
@@ -56,12 +57,17 @@ class HappyWriter(HappyDataWriter):
         self.logger().info("global_dict: %s" % str(happy_data.global_dict))
         with open(hyperspec_metadata_file, 'w') as f:
             json.dump(happy_data.global_dict, f)
+        self._add_output_file(hyperspec_metadata_file)
 
         # Write other metadata
         for target_name, target_data in happy_data.metadata_dict.items():
+            # the mask map gets written alongside the mask layer
+            if target_name == MASK_MAP:
+                continue
             self.logger().info(f"target: {target_name}")
             metadata_file_path = os.path.join(region_dir, f"{target_name}.hdr")
             envi_writer.write_data(target_data['data'], metadata_file_path, datatype=self.get_datatype_mapping_for(datatype_mapping, target_name))
+            self._add_envi_output_files(metadata_file_path)
 
             # Write mapping if available
             mapping = target_data.get('mapping')
@@ -69,3 +75,4 @@ class HappyWriter(HappyDataWriter):
                 mapping_json_file = os.path.join(region_dir, f"{target_name}.json")
                 with open(mapping_json_file, 'w') as f:
                     json.dump(mapping, f)
+                self._add_output_file(mapping_json_file)
@@ -1,11 +1,14 @@
 import abc
 import argparse
-from typing import Optional
+import os
+from typing import Optional, List
 
 from seppl import split_args, split_cmdline, args_to_objects
 from seppl.variables import VariableSupporter, expand_variables
 
 from happy.base.core import PluginWithLogging
+from happy.base.instrumentation import instrumented, STAGE_WRITE
+from happy.base.precision import to_compute_dtype
 from happy.base.registry import REGISTRY
 from happy.data import HappyData
 
@@ -38,6 +41,7 @@ class HappyDataWriter(PluginWithLogging, abc.ABC, VariableSupporter):
         super().__init__()
         self.base_dir = base_dir
         self._initialized = False
+        self._output_files = []
 
     def _create_argparser(self) -> argparse.ArgumentParser:
         parser = super()._create_argparser()
@@ -62,6 +66,40 @@ class HappyDataWriter(PluginWithLogging, abc.ABC, VariableSupporter):
         self.base_dir = base_dir
         self._initialized = False
 
+    def _add_output_file(self, path: str):
+        """
+        Records the file that got written.
+
+        :param path: the file that got written
+        :type path: str
+        """
+        self._output_files.append(path)
+
+    def _add_envi_output_files(self, path: str):
+        """
+        Records the header and the image file of the ENVI file that got written.
+
+        :param path: the header file that got written
+        :type path: str
+        """
+        self._add_output_file(path)
+        self._add_output_file(os.path.splitext(path)[0] + ".img")
+
+    def get_output_files(self) -> List[str]:
+        """
+        Returns the files that got written since the last call of clear_output_files.
+
+        :return: the files
+        :rtype: list
+        """
+        return list(self._output_files)
+
+    def clear_output_files(self):
+        """
+        Clears the list of files that got written.
+        """
+        self._output_files = []
+
     def _write_data(self, happy_data_or_list, datatype_mapping=None):
         raise NotImplementedError()
 
@@ -73,6 +111,23 @@ class HappyDataWriter(PluginWithLogging, abc.ABC, VariableSupporter):
         else:
             return "Input should be either a HappyData object or a list of HappyData objects."
 
+    def _to_compute_dtype(self, happy_data: HappyData) -> HappyData:
+        """
+        Converts floating point spectral data to the compute dtype, if one has been set.
+        Integer data (eg raw scans) gets written as is.
+
+        :param happy_data: the data to convert
+        :type happy_data: HappyData
+        :return: the (converted) data
+        :rtype: HappyData
+        """
+        data = to_compute_dtype(happy_data.data, floating_only=True)
+        if data is happy_data.data:
+            return happy_data
+        return HappyData(happy_data.sample_id, happy_data.region_id, data,
+                         happy_data.global_dict, happy_data.metadata_dict, wavenumbers=happy_data.wavenumbers)
+
+    @instrumented(STAGE_WRITE)
     def write_data(self, happy_data_or_list, datatype_mapping=None):
         if not self._initialized:
             self._initialize()
@@ -81,6 +136,10 @@ class HappyDataWriter(PluginWithLogging, abc.ABC, VariableSupporter):
         if msg is not None:
             raise ValueError(msg)
 
+        if isinstance(happy_data_or_list, list):
+            happy_data_or_list = [self._to_compute_dtype(x) for x in happy_data_or_list]
+        else:
+            happy_data_or_list = self._to_compute_dtype(happy_data_or_list)
         self._write_data(happy_data_or_list, datatype_mapping=datatype_mapping)
 
     @classmethod
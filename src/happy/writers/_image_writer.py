@@ -96,12 +96,14 @@ class ImageWriter(HappyDataWriterWithOutputPattern, HappyDataWriterWithNormaliza
         datamanager.set_normalization(self._normalization)
         datamanager.reset_norm_data()
         datamanager.output_image(self._red_channel, self._green_channel, self._blue_channel, path_png, width=self._width, height=self._height)
+        self._add_output_file(path_png)
         if not self._suppress_metadata:
             # output meta-data
             path_meta = os.path.splitext(path_png)[0] + "-meta.json"
             self.logger().info("Writing: %s" % path_png)
             with open(path_meta, "w") as fp:
                 json.dump(happy_data.global_dict, fp, indent=2)
+            self._add_output_file(path_meta)
 
     def _write_data(self, happy_data_or_list, datatype_mapping=None):
         if isinstance(happy_data_or_list, list):
@@ -1,7 +1,6 @@
 import os
 
 import numpy as np
-import scipy.io as sio
 
 from happy.data import HappyData
 from ._happydata_writer import HappyDataWriterWithOutputPattern, PH_BASEDIR, PH_SAMPLEID, PH_REPEAT
@@ -23,6 +22,7 @@ class MatlabWriter(HappyDataWriterWithOutputPattern):
         return PH_BASEDIR + "/" + PH_SAMPLEID + "." + PH_REPEAT + ".mat"
 
     def _write_item(self, happy_data, datatype_mapping=None):
+        import scipy.io as sio
         sample_id = happy_data.sample_id
         region_id = happy_data.region_id
         base_dir = expand_variables(self.base_dir)
@@ -44,6 +44,7 @@ class MatlabWriter(HappyDataWriterWithOutputPattern):
                     mapping_list.append([k, happy_data.metadata_dict["mask"]["mapping"][k]])
                 save_dic["FinalMaskLabels"] = mapping_list
         sio.savemat(filepath, save_dic)
+        self._add_output_file(filepath)
 
     def _write_data(self, happy_data_or_list, datatype_mapping=None):
         if isinstance(happy_data_or_list, list):
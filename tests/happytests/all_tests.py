@@ -1,9 +1,16 @@
 import unittest
 
+import happytests.base.all_tests
+import happytests.bench.all_tests
+import happytests.console.all_tests
 import happytests.criteria.all_tests
+import happytests.data.all_tests
+import happytests.evaluators.all_tests
+import happytests.models.all_tests
 import happytests.readers.all_tests
 import happytests.region_extractors.all_tests
 import happytests.preprocessors.all_tests
+import happytests.writers.all_tests
 
 
 def suite():
@@ -13,10 +20,17 @@ def suite():
     :rtype: unittest.TestSuite
     """
     result = unittest.TestSuite()
+    result.addTests(happytests.base.all_tests.suite())
+    result.addTests(happytests.bench.all_tests.suite())
+    result.addTests(happytests.console.all_tests.suite())
     result.addTests(happytests.criteria.all_tests.suite())
+    result.addTests(happytests.data.all_tests.suite())
+    result.addTests(happytests.evaluators.all_tests.suite())
+    result.addTests(happytests.models.all_tests.suite())
     result.addTests(happytests.readers.all_tests.suite())
     result.addTests(happytests.region_extractors.all_tests.suite())
     result.addTests(happytests.preprocessors.all_tests.suite())
+    result.addTests(happytests.writers.all_tests.suite())
     return result
 
 
@@ -0,0 +1,26 @@
+import unittest
+
+import happytests.base.test_fingerprint
+import happytests.base.test_instrumentation
+import happytests.base.test_journal
+import happytests.base.test_metrics
+import happytests.base.test_registry
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.base.test_fingerprint.suite())
+    result.addTests(happytests.base.test_instrumentation.suite())
+    result.addTests(happytests.base.test_journal.suite())
+    result.addTests(happytests.base.test_metrics.suite())
+    result.addTests(happytests.base.test_registry.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
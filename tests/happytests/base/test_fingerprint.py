@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+
+from happy.base.fingerprint import Fingerprints, FINGERPRINT_PREFIX
+from happytests.tests import HappyTestCase
+
+
+class FingerprintsTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = self.new_file("input.hdr", "data")
+        self.output_dir = os.path.join(self.tmp_dir.name, "output")
+        os.makedirs(self.output_dir)
+        self.output_file = self.new_file(os.path.join("output", "output.hdr"), "result")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def new_file(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as fp:
+            fp.write(content)
+        return path
+
+    def store(self, fingerprints: Fingerprints):
+        fingerprint = fingerprints.compute([self.input_file])
+        fingerprints.update(self.output_dir, "/in/a", fingerprint, [self.output_file])
+
+    def is_current(self, fingerprints: Fingerprints) -> bool:
+        return fingerprints.is_current(self.output_dir, "/in/a", fingerprints.compute([self.input_file]))
+
+    def test_disabled(self):
+        fingerprints = Fingerprints(pipeline="sni")
+        self.store(fingerprints)
+        self.assertFalse(self.is_current(fingerprints))
+        self.assertEqual(["output.hdr"], os.listdir(self.output_dir))
+
+    def test_current(self):
+        fingerprints = Fingerprints(enabled=True, pipeline="sni")
+        self.assertFalse(self.is_current(fingerprints))
+        self.store(fingerprints)
+        self.assertTrue(self.is_current(fingerprints))
+        self.assertTrue(self.is_current(Fingerprints(enabled=True, pipeline="sni")))
+        self.assertFalse(fingerprints.is_current(self.output_dir, "/in/b", fingerprints.compute([self.input_file])))
+        files = [x for x in os.listdir(self.output_dir) if x.startswith(FINGERPRINT_PREFIX)]
+        self.assertEqual(1, len(files))
+        with open(os.path.join(self.output_dir, files[0]), "r") as fp:
+            stored = json.load(fp)
+        self.assertEqual("/in/a", stored["input"])
+        self.assertEqual([self.output_file], stored["outputs"])
+
+    def test_changes(self):
+        self.store(Fingerprints(enabled=True, pipeline="sni"))
+        # pipeline
+        self.assertFalse(self.is_current(Fingerprints(enabled=True, pipeline="snv")))
+        # input file
+        self.new_file("input.hdr", "changed")
+        self.assertFalse(self.is_current(Fingerprints(enabled=True, pipeline="sni")))
+        # missing output
+        self.store(Fingerprints(enabled=True, pipeline="sni"))
+        os.remove(self.output_file)
+        self.assertFalse(self.is_current(Fingerprints(enabled=True, pipeline="sni")))
+
+    def modify_content(self):
+        # same size and modification time, different content
+        stat = os.stat(self.input_file)
+        self.new_file("input.hdr", "dat4")
+        os.utime(self.input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def test_hash(self):
+        self.store(Fingerprints(enabled=True, pipeline="sni"))
+        self.modify_content()
+        self.assertTrue(self.is_current(Fingerprints(enabled=True, pipeline="sni")))
+
+        self.new_file("input.hdr", "data")
+        self.store(Fingerprints(enabled=True, pipeline="sni", use_hash=True))
+        self.assertTrue(self.is_current(Fingerprints(enabled=True, pipeline="sni", use_hash=True)))
+        self.modify_content()
+        self.assertFalse(self.is_current(Fingerprints(enabled=True, pipeline="sni", use_hash=True)))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(FingerprintsTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+
+from happy.base.instrumentation import set_instrumentation, get_records, clear_records, summarize, format_summary, \
+    write_chrome_trace, data_size, STAGE_FIT, STAGE_APPLY, STAGE_SELECT_PIXELS
+from happy.bench import generate_synthetic_data
+from happy.pixel_selectors import SimpleSelector
+from happy.preprocessors import MultiPreprocessor, SNVPreprocessor, PassThroughPreprocessor
+from happytests.tests import HappyTestCase
+
+
+class InstrumentationTest(HappyTestCase):
+
+    def setUp(self):
+        clear_records()
+        self.data = generate_synthetic_data(height=8, width=4, bands=10, seed=1)
+
+    def tearDown(self):
+        set_instrumentation(False)
+        clear_records()
+
+    def test_disabled(self):
+        set_instrumentation(False)
+        SNVPreprocessor().apply(self.data)
+        self.assertEqual(0, len(get_records()))
+
+    def test_calls(self):
+        set_instrumentation(True)
+        multi = MultiPreprocessor(preprocessor_list=[SNVPreprocessor(), PassThroughPreprocessor()])
+        multi.fit(self.data)
+        result = list(multi.iter_apply(self.data))
+        SimpleSelector(5).select_pixels(self.data)
+        records = get_records()
+        self.assertTrue(len(records) > 0)
+        for record in records:
+            self.assertTrue(record["wall"] >= record["self_wall"] >= 0)
+            self.assertIsNotNone(record["peak_memory"])
+
+        summary = {(x["stage"], x["plugin"]): x for x in summarize(records)}
+        self.assertEqual(1, summary[(STAGE_APPLY, "multi-pp")]["calls"])
+        self.assertEqual(data_size(self.data), summary[(STAGE_APPLY, "multi-pp")]["bytes_in"])
+        self.assertEqual(data_size(result), summary[(STAGE_APPLY, "multi-pp")]["bytes_out"])
+        self.assertTrue((STAGE_FIT, "snv") in summary)
+        self.assertTrue((STAGE_APPLY, "pass-through") in summary)
+        self.assertEqual(1, summary[(STAGE_SELECT_PIXELS, "ps-simple")]["calls"])
+        self.assertTrue("multi-pp" in format_summary(records))
+
+    def test_chrome_trace(self):
+        set_instrumentation(True)
+        SNVPreprocessor().apply(self.data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "trace.json")
+            write_chrome_trace(path)
+            with open(path, "r") as fp:
+                trace = json.load(fp)
+        self.assertEqual(1, len(trace["traceEvents"]))
+        event = trace["traceEvents"][0]
+        self.assertEqual("snv", event["name"])
+        self.assertEqual(STAGE_APPLY, event["cat"])
+        self.assertEqual("X", event["ph"])
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(InstrumentationTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from happy.base.journal import Journal, compute_checksum
+from happytests.tests import HappyTestCase
+
+
+class JournalTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "journal.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def new_output(self, name: str, content: str = "data") -> str:
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as fp:
+            fp.write(content)
+        return path
+
+    def test_inactive(self):
+        journal = Journal()
+        journal.record("/in/a", [])
+        self.assertFalse(journal.is_done("/in/a"))
+
+    def test_resume(self):
+        output = self.new_output("a.png")
+        journal = Journal(self.path, job="test")
+        self.assertFalse(journal.is_done("/in/a"))
+        journal.record("/in/a", [output])
+        self.assertTrue(journal.is_done("/in/a"))
+
+        # restarted job
+        journal = Journal(self.path)
+        self.assertTrue(journal.is_done("/in/a"))
+        self.assertFalse(journal.is_done("/in/b"))
+        entry = journal.entries()["/in/a"]
+        self.assertEqual([output], entry["outputs"])
+        self.assertEqual(compute_checksum([output]), entry["checksum"])
+        self.assertEqual("test", entry["job"])
+
+    def test_missing_output(self):
+        output = self.new_output("a.png")
+        Journal(self.path).record("/in/a", [output])
+        os.remove(output)
+        self.assertFalse(Journal(self.path).is_done("/in/a"))
+
+    def test_verify(self):
+        output = self.new_output("a.png")
+        Journal(self.path).record("/in/a", [output])
+        self.new_output("a.png", content="changed")
+        self.assertTrue(Journal(self.path).is_done("/in/a"))
+        self.assertFalse(Journal(self.path, verify=True).is_done("/in/a"))
+
+    def test_incomplete_line(self):
+        Journal(self.path).record("/in/a", [])
+        # simulate crash while appending
+        with open(self.path, "a") as fp:
+            fp.write('{"input": "/in/b", "outp')
+        journal = Journal(self.path)
+        self.assertTrue(journal.is_done("/in/a"))
+        self.assertFalse(journal.is_done("/in/b"))
+        journal.record("/in/c", [])
+        journal = Journal(self.path)
+        self.assertEqual(["/in/a", "/in/c"], sorted(journal.entries().keys()))
+
+    def test_parallel(self):
+        journals = [Journal(self.path) for _ in range(4)]
+
+        def work(index):
+            for i in range(25):
+                journals[index].record("/in/%d-%d" % (index, i), [])
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(journals))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.path, "r") as fp:
+            lines = fp.readlines()
+        self.assertEqual(100, len(lines))
+        for line in lines:
+            json.loads(line)
+        # other journals pick up the entries appended by the others
+        self.assertEqual(100, len(journals[0].entries()))
+        self.assertTrue(journals[0].is_done("/in/3-24"))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(JournalTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
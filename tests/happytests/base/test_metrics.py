@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from happy.base.metrics import MetricsSink, PATH_PROMETHEUS, PATH_JSON
+from happytests.tests import HappyTestCase
+
+
+class MetricsSinkTest(HappyTestCase):
+
+    def new_sink(self, **kwargs) -> MetricsSink:
+        sink = MetricsSink("test-job", buckets=(0.1, 1.0), **kwargs)
+        sink.sample_done(3)
+        sink.sample_failed()
+        sink.set_queue_depth(5)
+        sink.add_queue_depth(-1)
+        sink.add_bytes_read(100)
+        sink.add_bytes_written(50)
+        sink.observe("read", 0.05)
+        sink.observe("read", 0.5)
+        sink.observe("read", 2.0)
+        return sink
+
+    def test_snapshot(self):
+        snapshot = self.new_sink().snapshot()
+        self.assertEqual(3, snapshot["samples_done"])
+        self.assertEqual(1, snapshot["samples_failed"])
+        self.assertEqual(4, snapshot["queue_depth"])
+        self.assertEqual(100, snapshot["bytes_read"])
+        self.assertEqual(50, snapshot["bytes_written"])
+        self.assertEqual(3, snapshot["stages"]["read"]["count"])
+        self.assertAlmostEqual(2.55, snapshot["stages"]["read"]["sum"])
+        self.assertEqual({"0.1": 1, "1": 2, "+Inf": 3}, snapshot["stages"]["read"]["buckets"])
+
+    def test_prometheus(self):
+        lines = self.new_sink().to_prometheus().splitlines()
+        self.assertTrue('happy_samples_done_total{job="test-job"} 3' in lines)
+        self.assertTrue('happy_queue_depth{job="test-job"} 4' in lines)
+        self.assertTrue('happy_stage_duration_seconds_bucket{job="test-job",stage="read",le="1"} 2' in lines)
+        self.assertTrue('happy_stage_duration_seconds_bucket{job="test-job",stage="read",le="+Inf"} 3' in lines)
+        self.assertTrue('happy_stage_duration_seconds_count{job="test-job",stage="read"} 3' in lines)
+        self.assertTrue("# TYPE happy_stage_duration_seconds histogram" in lines)
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prom_file = os.path.join(tmp_dir, "metrics.prom")
+            json_file = os.path.join(tmp_dir, "metrics.json")
+            with self.new_sink(prometheus_file=prom_file, json_file=json_file, interval=60) as sink:
+                sink.sample_done()
+            with open(json_file, "r") as fp:
+                self.assertEqual(4, json.load(fp)["samples_done"])
+            with open(prom_file, "r") as fp:
+                self.assertTrue('happy_samples_done_total{job="test-job"} 4' in fp.read())
+            self.assertEqual(["metrics.json", "metrics.prom"], sorted(os.listdir(tmp_dir)))
+
+    def test_server(self):
+        with self.new_sink(port=0) as sink:
+            url = "http://127.0.0.1:%d" % sink._server.server_port
+            content = urllib.request.urlopen(url + PATH_PROMETHEUS).read().decode("utf-8")
+            self.assertTrue('happy_samples_done_total{job="test-job"} 3' in content)
+            content = json.loads(urllib.request.urlopen(url + PATH_JSON).read().decode("utf-8"))
+            self.assertEqual(1, content["samples_failed"])
+
+    def test_time_iter(self):
+        sink = MetricsSink("test-job")
+        self.assertEqual([1, 2, 3], list(sink.time_iter("apply", [1, 2, 3])))
+        self.assertEqual(3, sink.snapshot()["stages"]["apply"]["count"])
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(MetricsSinkTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
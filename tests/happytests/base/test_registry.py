@@ -0,0 +1,146 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from happy.preprocessors import Preprocessor
+from happy.base.registry import HappyRegistry, LazyPlugins, HAPPY_DEFAULT_CLASS_LISTERS, HAPPY_ENV_CLASS_LISTERS, \
+    HAPPY_ENV_CLASS_LISTERS_EXCL, HAPPY_ENV_PLUGIN_CACHE, HAPPY_ENV_PLUGIN_CACHE_DIR
+from happytests.tests import HappyTestCase
+
+
+PREPROCESSOR = "happy.preprocessors._preprocessor.Preprocessor"
+
+CLASS_LISTER = """
+def list_classes():
+    return {"%s": ["extra_plugins"]}
+""" % PREPROCESSOR
+
+EXTRA_PLUGIN = """
+from happy.preprocessors import PassThroughPreprocessor
+
+
+class ExtraPreprocessor(PassThroughPreprocessor):
+
+    def name(self):
+        return "extra-pp"
+"""
+
+
+def new_registry() -> HappyRegistry:
+    """
+    Creates a new registry, set up like the singleton.
+
+    :return: the registry
+    :rtype: HappyRegistry
+    """
+    return HappyRegistry(default_class_listers=HAPPY_DEFAULT_CLASS_LISTERS,
+                         env_class_listers=HAPPY_ENV_CLASS_LISTERS,
+                         excluded_class_listers=None,
+                         env_excluded_class_listers=HAPPY_ENV_CLASS_LISTERS_EXCL,
+                         env_plugin_cache=HAPPY_ENV_PLUGIN_CACHE,
+                         env_plugin_cache_dir=HAPPY_ENV_PLUGIN_CACHE_DIR)
+
+
+class HappyRegistryTest(HappyTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {HAPPY_ENV_PLUGIN_CACHE_DIR: self.cache_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def test_same_plugins(self):
+        """
+        Checks that the plugin cache returns the same plugins as the discovery via the class listers.
+        """
+        with patch.dict(os.environ, {HAPPY_ENV_PLUGIN_CACHE: "off"}):
+            expected = new_registry().all_plugins()
+        actual = new_registry().all_plugins()
+        self.assertIsInstance(actual, LazyPlugins)
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for name in expected:
+            self.assertEqual(type(expected[name]), type(actual[name]), msg=name)
+
+    def test_cached(self):
+        """
+        Checks that a new registry uses the cache on disk instead of discovering the plugins.
+        """
+        new_registry().preprocessors()
+        self.assertEqual(1, len(os.listdir(self.cache_dir.name)))
+        registry = new_registry()
+        plugins = registry.preprocessors()
+        self.assertEqual(0, len(registry._classes))
+        self.assertEqual("snv", plugins["snv"].name())
+        self.assertEqual(0, len(registry._classes))
+
+    def test_key(self):
+        """
+        Checks that changing the class listers environment variable uses a different cache.
+        """
+        new_registry().preprocessors()
+        with patch.dict(os.environ, {HAPPY_ENV_CLASS_LISTERS_EXCL: "some.module"}):
+            new_registry().preprocessors()
+        self.assertEqual(2, len(os.listdir(self.cache_dir.name)))
+
+    def test_outdated(self):
+        """
+        Checks that an outdated class name in the cache triggers the discovery of the plugins.
+        """
+        registry = new_registry()
+        registry.preprocessors()
+        registry._load_plugin_cache()[PREPROCESSOR]["snv"] = "happy.preprocessors.DoesNotExist"
+        registry._save_plugin_cache()
+        registry = new_registry()
+        self.assertEqual("snv", registry.preprocessors()["snv"].name())
+        self.assertEqual("happy.preprocessors.SNVPreprocessor", new_registry().preprocessors().class_name("snv"))
+
+    def test_new_plugin(self):
+        """
+        Checks that a plugin added without a version change gets discovered, as the modification
+        times of the modules registering the plugins are part of the cache key.
+        """
+        plugins_dir = tempfile.TemporaryDirectory()
+        plugin_dir = plugins_dir.name
+        sys.path.insert(0, plugin_dir)
+        try:
+            with open(os.path.join(plugin_dir, "extra_class_lister.py"), "w") as fp:
+                fp.write(CLASS_LISTER)
+            init = os.path.join(plugin_dir, "extra_plugins.py")
+            with open(init, "w") as fp:
+                fp.write("")
+            env = {HAPPY_ENV_CLASS_LISTERS: ",".join(HAPPY_DEFAULT_CLASS_LISTERS + ["extra_class_lister"])}
+            with patch.dict(os.environ, env):
+                self.assertFalse("extra-pp" in new_registry().preprocessors())
+                with open(init, "w") as fp:
+                    fp.write(EXTRA_PLUGIN)
+                os.utime(init, ns=(os.stat(init).st_atime_ns, os.stat(init).st_mtime_ns + 10**9))
+                sys.modules.pop("extra_plugins", None)
+                registry = new_registry()
+                self.assertTrue("extra-pp" in registry.preprocessors())
+                with patch("happy.preprocessors._preprocessor.REGISTRY", registry):
+                    preprocessors = Preprocessor.parse_preprocessors("std-scaler extra-pp")
+                self.assertEqual(["std-scaler", "extra-pp"], [x.name() for x in preprocessors])
+        finally:
+            sys.path.remove(plugin_dir)
+            sys.modules.pop("extra_plugins", None)
+            sys.modules.pop("extra_class_lister", None)
+            plugins_dir.cleanup()
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(HappyRegistryTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,18 @@
+import unittest
+
+import happytests.bench.test_bench
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.bench.test_bench.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
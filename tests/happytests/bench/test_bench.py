@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from happy.bench import write_synthetic_dataset, BenchmarkSuite, compare_benchmarks, LAYER_TARGET, LAYER_MASK, \
+    GROUP_READER, GROUP_PREPROCESSOR, GROUP_MODEL
+from happy.readers import HappyReader
+from happytests.tests import HappyTestCase
+
+
+class BenchTest(HappyTestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_synthetic(self):
+        ids = write_synthetic_dataset(self.data_dir.name, num_samples=2, num_regions=2, height=16, width=8, bands=20,
+                                      dtype="uint16", num_layers=2, mask_sparsity=0.75)
+        self.assertEqual(["s000", "s001"], ids)
+        reader = HappyReader(self.data_dir.name)
+        self.assertEqual(ids, sorted(reader.get_sample_ids()))
+        data = reader.load_data("s000")
+        self.assertEqual(2, len(data))
+        first = data[0]
+        self.assertEqual((16, 8, 20), first.data.shape)
+        self.assertEqual(20, len(first.get_wavelengths()))
+        self.assertTrue(LAYER_TARGET in first.metadata_dict)
+        self.assertTrue("layer1" in first.metadata_dict)
+        mask = first.metadata_dict[LAYER_MASK]["data"]
+        self.assertAlmostEqual(0.75, 1.0 - np.mean(mask), delta=0.15)
+
+    def test_suite(self):
+        write_synthetic_dataset(self.data_dir.name, num_samples=1, height=8, width=8, bands=10)
+        suite = BenchmarkSuite(self.data_dir.name, repeat=1, include="^(reader|model)/|/snv$")
+        report = suite.run()
+        names = [x["name"] for x in report["benchmarks"]]
+        self.assertEqual([GROUP_READER + "/happy-reader", GROUP_PREPROCESSOR + "/snv", GROUP_MODEL + "/predict_images"], names)
+        for benchmark in report["benchmarks"]:
+            self.assertFalse("error" in benchmark, msg=benchmark.get("error"))
+            self.assertEqual(1, len(benchmark["times"]))
+            self.assertEqual(64, benchmark["pixels"])
+
+    def test_compare(self):
+        baseline = {"benchmarks": [{"name": "a", "seconds": 1.0}, {"name": "b", "seconds": 1.0}, {"name": "c", "error": "x"}]}
+        current = {"benchmarks": [{"name": "a", "seconds": 1.1}, {"name": "b", "seconds": 2.0}, {"name": "c", "seconds": 1.0}]}
+        comparison = compare_benchmarks(baseline, current, max_slowdown=1.25)
+        self.assertEqual(["a", "b"], [x["name"] for x in comparison])
+        self.assertEqual([False, True], [x["regression"] for x in comparison])
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(BenchTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
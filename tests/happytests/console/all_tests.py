@@ -0,0 +1,22 @@
+import unittest
+
+import happytests.console.test_failed_samples
+import happytests.console.test_importtime
+import happytests.console.test_scikit_search
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.console.test_failed_samples.suite())
+    result.addTests(happytests.console.test_importtime.suite())
+    result.addTests(happytests.console.test_scikit_search.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from happy.bench import write_synthetic_dataset
+from happytests.tests import HappyTestCase
+
+
+class FailedSamplesTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp_dir.name, "input")
+        self.output_dir = os.path.join(self.tmp_dir.name, "output")
+        self.metrics_file = os.path.join(self.tmp_dir.name, "metrics.json")
+        os.makedirs(self.output_dir)
+        self.ids = write_synthetic_dataset(self.input_dir, num_samples=3, height=4, width=4, bands=3)
+        # the ENVI header of the second sample has no data file
+        os.remove(os.path.join(self.input_dir, self.ids[1], "1", self.ids[1] + ".img"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def metrics(self):
+        with open(self.metrics_file, "r") as fp:
+            return json.load(fp)
+
+    def run_process_data(self, *options) -> int:
+        from happy.console.process_data.process import sys_main
+        args = ["happy-process-data", "--metrics_json", self.metrics_file] + list(options) + \
+               ["happy-reader", "-b", self.input_dir, "happy-writer", "-b", self.output_dir]
+        with patch("sys.argv", args):
+            return sys_main()
+
+    def run_hsi_to_rgb(self, *options) -> int:
+        from happy.console.hsi_to_rgb.generate import sys_main
+        scans_dir = os.path.join(self.tmp_dir.name, "scans")
+        os.makedirs(scans_dir, exist_ok=True)
+        for sample_id in self.ids:
+            for ext in [".hdr", ".img"]:
+                path = os.path.join(self.input_dir, sample_id, "1", sample_id + ext)
+                if os.path.exists(path):
+                    shutil.copy(path, scans_dir)
+        args = ["happy-hsi2rgb", "-i", scans_dir, "-o", self.output_dir, "--metrics_json", self.metrics_file] + list(options)
+        with patch("sys.argv", args):
+            return sys_main()
+
+    def test_process_data_abort(self):
+        """
+        Checks that happy-process-data aborts at the first failure by default.
+        """
+        self.assertEqual(1, self.run_process_data())
+        self.assertEqual([self.ids[0]], sorted(os.listdir(self.output_dir)))
+        metrics = self.metrics()
+        self.assertEqual(1, metrics["samples_done"])
+        self.assertEqual(1, metrics["samples_failed"])
+
+    def test_process_data_continue(self):
+        """
+        Checks that happy-process-data continues with the next sample after a failure if requested,
+        but still exits with an error.
+        """
+        self.assertEqual(1, self.run_process_data("--continue_on_error"))
+        self.assertEqual([self.ids[0], self.ids[2]], sorted(os.listdir(self.output_dir)))
+        metrics = self.metrics()
+        self.assertEqual(2, metrics["samples_done"])
+        self.assertEqual(1, metrics["samples_failed"])
+
+    def test_process_data_success(self):
+        """
+        Checks that happy-process-data exits without error if no sample failed.
+        """
+        shutil.rmtree(os.path.join(self.input_dir, self.ids[1]))
+        self.assertEqual(0, self.run_process_data("--continue_on_error"))
+        self.assertEqual(0, self.metrics()["samples_failed"])
+
+    def test_hsi_to_rgb_abort(self):
+        """
+        Checks that happy-hsi2rgb aborts at the first failure by default.
+        """
+        self.assertEqual(1, self.run_hsi_to_rgb())
+        self.assertEqual(1, self.metrics()["samples_failed"])
+        self.assertTrue(len(os.listdir(self.output_dir)) < 2)
+
+    def test_hsi_to_rgb_continue(self):
+        """
+        Checks that happy-hsi2rgb continues with the next file after a failure if requested,
+        but still exits with an error.
+        """
+        self.assertEqual(1, self.run_hsi_to_rgb("--continue_on_error"))
+        self.assertEqual([self.ids[0] + ".png", self.ids[2] + ".png"], sorted(os.listdir(self.output_dir)))
+        metrics = self.metrics()
+        self.assertEqual(2, metrics["samples_done"])
+        self.assertEqual(1, metrics["samples_failed"])
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(FailedSamplesTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
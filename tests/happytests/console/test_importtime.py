@@ -0,0 +1,75 @@
+import subprocess
+import sys
+import unittest
+
+from happytests.tests import HappyTestCase
+
+
+LIGHT_MODULES = [
+    "happy.console.hdr_info.output",
+    "happy.console.mat_info.output",
+    "happy.console.help.generate",
+    "happy.console.process_data.process",
+    "happy.console.raw_check.process",
+]
+""" the modules of the tools that should start up quickly. """
+
+HEAVY_MODULES = [
+    "sklearn",
+    "matplotlib",
+    "pandas",
+    "scipy.signal",
+    "scipy.ndimage",
+    "scipy.sparse",
+]
+""" the modules that only get imported when actually needed. """
+
+
+def imported_modules(module: str) -> dict:
+    """
+    Imports the module in a fresh interpreter (python -X importtime) and returns
+    the imported modules with their cumulative import times.
+
+    :param module: the module to import
+    :type module: str
+    :return: the dictionary of module name and cumulative time in microseconds
+    :rtype: dict
+    """
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            capture_output=True, text=True, check=True).stderr
+    result = dict()
+    for line in output.splitlines():
+        if not line.startswith("import time:") or ("|" not in line):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[1].strip().isdigit():
+            continue
+        result[parts[2].strip()] = int(parts[1].strip())
+    return result
+
+
+class ImportTimeTest(HappyTestCase):
+
+    def test_no_heavy_imports(self):
+        """
+        Checks that the light tools do not import the heavy modules at startup.
+        """
+        for module in LIGHT_MODULES:
+            with self.subTest(module=module):
+                modules = imported_modules(module)
+                self.assertIn(module, modules)
+                heavy = [m for m in modules if any((m == h) or m.startswith(h + ".") for h in HEAVY_MODULES)]
+                self.assertEqual([], heavy, msg="%s imports heavy modules (%.3fs)" % (module, modules[module] / 1e6))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(ImportTimeTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
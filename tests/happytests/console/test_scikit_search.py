@@ -0,0 +1,102 @@
+import csv
+import os
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from happy.bench import write_synthetic_dataset, LAYER_TARGET
+from happy.console.builders.scikit_search import main, generate_candidates, load_search_space, evaluate_candidate
+from happy.models.dataset_cache import DatasetCache
+from happy.models.sklearn import create_model
+from happy.splitters import DataSplits
+from happytests.tests import HappyTestCase
+
+
+class ScikitSearchTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        ids = write_synthetic_dataset(self.data_dir, num_samples=4, height=16, width=16, bands=20)
+        self.splits_file = os.path.join(self.tmp_dir.name, "splits.json")
+        folds = [{"train": ids[:2], "validation": [ids[2]], "test": [ids[3]]}]
+        DataSplits(self.data_dir, [{"repeats": folds}], []).save(self.splits_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_candidates(self):
+        """
+        Checks the generation of the grid and the random candidates.
+        """
+        space = load_search_space("{'alpha': [0.1, 1.0], 'fit_intercept': [True, False]}")
+        self.assertEqual(4, len(generate_candidates(space)))
+        self.assertEqual({"alpha": 0.1, "fit_intercept": True}, generate_candidates(space)[0])
+        space = load_search_space("{'alpha': {'type': 'loguniform', 'min': 0.001, 'max': 10}}")
+        candidates = generate_candidates(space, num_candidates=5, seed=1)
+        self.assertEqual(candidates, generate_candidates(space, num_candidates=5, seed=1))
+        self.assertTrue(all(0.001 <= x["alpha"] <= 10 for x in candidates))
+        with self.assertRaises(Exception):
+            generate_candidates(space)
+
+    def test_grid(self):
+        """
+        Checks that the candidates of a small grid get ranked by the metric and written to the CSV file.
+        """
+        output_file = os.path.join(self.tmp_dir.name, "results.csv")
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        args = [
+            "happy-scikit-search",
+            "-d", self.data_dir,
+            "-P", "pass-through",
+            "-S", "ps-simple -n 32",
+            "-m", "ridge",
+            "-g", "{'alpha': [1e6, 0.001, 10.0]}",
+            "-t", LAYER_TARGET,
+            "-s", self.splits_file,
+            "-j", "2",
+            "-C", cache_dir,
+            "--seed", "1",
+            "-o", output_file,
+        ]
+        with patch.object(sys, "argv", args):
+            main()
+        with open(output_file, "r", newline="") as fp:
+            rows = list(csv.reader(fp))
+        self.assertEqual(["rank", "r2", "mae", "rmse", "fit_time", "alpha"], rows[0])
+        self.assertEqual(["1", "2", "3"], [x[0] for x in rows[1:]])
+        scores = [float(x[1]) for x in rows[1:]]
+        self.assertEqual(sorted(scores, reverse=True), scores)
+
+        # evaluate the candidates on the cached training/validation data
+        cache = DatasetCache(cache_dir)
+        datasets = dict()
+        for key in os.listdir(cache_dir):
+            dataset = cache.load(key)
+            datasets[dataset["sample_id"][0].split(":")[0]] = dataset
+        self.assertEqual(["s000", "s002"], sorted(datasets.keys()))
+        train = datasets["s000"]
+        val = datasets["s002"]
+        expected = []
+        for alpha in [1e6, 0.001, 10.0]:
+            _, score, _ = evaluate_candidate(create_model("ridge", "{}"), {"alpha": alpha}, train["X_train"], train["y_train"],
+                                             val["X_train"], val["y_train"], ["r2"])
+            expected.append((round(score["r2"], 6), str(alpha)))
+        expected.sort(key=lambda x: x[0], reverse=True)
+        self.assertEqual([x[1] for x in expected], [x[5] for x in rows[1:]])
+        self.assertEqual([x[0] for x in expected], scores)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(ScikitSearchTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -1,8 +1,11 @@
 import os
 import unittest
 
+import numpy as np
+
 from happy.base.core import ConfigurableObject
-from happy.criteria import Criteria, CriteriaGroup, OP_NOT_MISSING, OP_EQUALS
+from happy.criteria import Criteria, CriteriaGroup, OP_NOT_MISSING, OP_EQUALS, OP_GREATER_THAN, OP_IN, OP_SPECTRUM_NOT_ZERO
+from happy.data import HappyData
 from happytests.tests import HappyRegressionTestCase
 
 
@@ -53,6 +56,26 @@ class CriteriaTestCase(HappyRegressionTestCase):
             cg = ConfigurableObject.from_json(fp)
             self.assertEqual(CriteriaGroup, type(cg), msg="Incorrect type!")
 
+    def test_mask(self):
+        """
+        Tests that the mask for all pixels agrees with checking the pixels individually.
+        """
+        data = np.random.RandomState(1).rand(5, 4, 3)
+        data[0, :, :] = 0
+        types = np.random.RandomState(2).randint(0, 4, (5, 4, 1))
+        happy_data = HappyData("sample", "1", data, {}, {"type": {"data": types}})
+        criteria = [
+            Criteria(operation=OP_NOT_MISSING, key="type"),
+            Criteria(operation=OP_EQUALS, key="type", value=1),
+            Criteria(operation=OP_GREATER_THAN, key="type", value=1),
+            Criteria(operation=OP_IN, key="type", value=[0, 3]),
+            Criteria(operation=OP_SPECTRUM_NOT_ZERO),
+            CriteriaGroup(criteria_list=[Criteria(operation=OP_GREATER_THAN, key="type", value=0), Criteria(operation=OP_SPECTRUM_NOT_ZERO)]),
+        ]
+        for c in criteria:
+            expected = np.array([[bool(c.check(happy_data, x, y)) for x in range(4)] for y in range(5)])
+            np.testing.assert_array_equal(expected, c.mask(happy_data), err_msg=str(c))
+
 
 def suite():
     """
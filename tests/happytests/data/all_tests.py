@@ -0,0 +1,20 @@
+import unittest
+
+import happytests.data.test_black_ref
+import happytests.data.test_white_ref
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.data.test_black_ref.suite())
+    result.addTests(happytests.data.test_white_ref.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
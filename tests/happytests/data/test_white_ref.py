@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from happy.data.white_ref import AbstractWhiteReferenceMethod
+from happytests.tests import HappyTestCase
+
+
+class WhiteReferenceAnnotationAverageTest(HappyTestCase):
+
+    def test_apply(self):
+        """
+        Checks that the annotation gets parsed from the command-line and that the data gets divided
+        by the average per band of the annotation rectangle.
+        """
+        state = np.random.RandomState(1)
+        reference = state.rand(8, 10, 3) + 1.0
+        scan = state.rand(5, 6, 3)
+        method = AbstractWhiteReferenceMethod.parse_method("wr-annotation-avg -a 1 2 4 7")
+        self.assertEqual((1, 2, 4, 7), method.annotation)
+        method.reference = reference
+        actual = method.apply(scan)
+        self.assertTrue(np.allclose(scan / reference[1:4, 2:7, :].mean(axis=(0, 1)), actual))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(WhiteReferenceAnnotationAverageTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,18 @@
+import unittest
+
+import happytests.evaluators.test_cross_validation
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.evaluators.test_cross_validation.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from sklearn.linear_model import LinearRegression
+
+from happy.bench import write_synthetic_dataset, LAYER_TARGET, LAYER_MASK
+from happy.evaluators import CrossValidationExecutor
+from happy.models.dataset_cache import DatasetCache
+from happy.models.prediction_mask import PredictionMask
+from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+from happy.pixel_selectors import SimpleSelector
+from happy.readers import HappyReader
+from happy.splitters import DataSplits
+from happytests.tests import HappyTestCase
+
+
+class CrossValidationExecutorTest(HappyTestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.ids = write_synthetic_dataset(self.data_dir.name, num_samples=4, height=8, width=6, bands=10)
+        folds = [
+            {"train": self.ids[:2], "validation": [], "test": self.ids[2:]},
+            {"train": self.ids[2:], "validation": [], "test": self.ids[:2]},
+        ]
+        self.splits = DataSplits(self.data_dir.name, [{"repeats": folds}], [])
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def evaluate(self, num_jobs: int, cache_dir: str, mask: PredictionMask = None):
+        model = ScikitSpectroscopyModel(self.data_dir.name, LAYER_TARGET, pixel_selector=SimpleSelector(16),
+                                        model=LinearRegression())
+        executor = CrossValidationExecutor(self.splits, model, DatasetCache(cache_dir), seed=1, num_jobs=num_jobs,
+                                           mask=mask)
+        return sorted(executor.execute(), key=lambda x: (x[0], x[1]))
+
+    def test_parallel(self):
+        """
+        Checks that evaluating the folds with two workers gives the same results as evaluating them sequentially.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.evaluate(1, cache_dir)
+        actual = self.evaluate(2, self.cache_dir.name)
+        self.assertEqual([(0, 0), (0, 1)], [(x[0], x[1]) for x in actual])
+        for (_, _, exp_predictions, exp_actuals), (_, _, act_predictions, act_actuals) in zip(expected, actual):
+            self.assertEqual(2, len(act_predictions))
+            for exp, act in zip(exp_predictions, act_predictions):
+                self.assertEqual((8, 6), act.shape)
+                self.assertTrue(np.allclose(exp, act))
+            for exp, act in zip(exp_actuals, act_actuals):
+                self.assertTrue(np.array_equal(exp, act))
+
+    def test_mask(self):
+        """
+        Checks that only the valid pixels of the test samples get predicted when using a mask.
+        """
+        reader = HappyReader(self.data_dir.name)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.evaluate(1, cache_dir)
+        for num_jobs in [1, 2]:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                # unmasked data already cached
+                self.evaluate(1, cache_dir)
+                actual = self.evaluate(num_jobs, cache_dir, mask=PredictionMask(layer=LAYER_MASK, fill_value=-1))
+            for (_, _, exp_predictions, _), (repeat, fold, act_predictions, _) in zip(expected, actual):
+                _, _, test_ids = self.splits.get_train_validation_test_splits(repeat, fold)
+                for sample_id, exp, act in zip(test_ids, exp_predictions, act_predictions):
+                    valid = reader.load_data(sample_id)[0].get_meta_data(key=LAYER_MASK).reshape(exp.shape) != 0
+                    self.assertTrue(np.any(~valid))
+                    self.assertTrue(np.all(act[~valid] == -1))
+                    self.assertTrue(np.allclose(exp[valid], act[valid]))
+
+    def test_missing_target(self):
+        """
+        Checks that a test sample without target layer fails with a clear error.
+        """
+        for ext in [".hdr", ".img"]:
+            os.remove(os.path.join(self.data_dir.name, self.ids[3], "1", LAYER_TARGET + ext))
+        with self.assertRaisesRegex(ValueError, "no target layer"):
+            self.evaluate(1, self.cache_dir.name)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(CrossValidationExecutorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,28 @@
+import unittest
+
+import happytests.models.test_data_loader
+import happytests.models.test_dataset_cache
+import happytests.models.test_imaging
+import happytests.models.test_model_bundle
+import happytests.models.test_prediction_service
+import happytests.models.test_unsupervised_pixel_clusterer
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    result = unittest.TestSuite()
+    result.addTests(happytests.models.test_data_loader.suite())
+    result.addTests(happytests.models.test_dataset_cache.suite())
+    result.addTests(happytests.models.test_imaging.suite())
+    result.addTests(happytests.models.test_model_bundle.suite())
+    result.addTests(happytests.models.test_prediction_service.suite())
+    result.addTests(happytests.models.test_unsupervised_pixel_clusterer.suite())
+    return result
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
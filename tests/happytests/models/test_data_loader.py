@@ -0,0 +1,131 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from happy.models.data_loader import DataLoader
+from happy.models.imaging import ImagingModel
+from happytests.tests import HappyTestCase
+
+
+class DummyImagingModel(ImagingModel):
+    """
+    Generates one region per sample (filled with the sample's index) instead of loading data,
+    recording the number of loaded samples.
+    """
+
+    def __init__(self, delay: float = 0.0, no_regions=None):
+        super().__init__(None, "target")
+        self.delay = delay
+        self.no_regions = set() if (no_regions is None) else set(no_regions)
+        self.num_loaded = 0
+        self._lock = threading.Lock()
+
+    def load_regions(self, sample_id, is_train=True, return_actuals=False):
+        with self._lock:
+            self.num_loaded += 1
+        if self.delay > 0:
+            # later samples finish first
+            time.sleep(self.delay / (1 + int(sample_id[1:])))
+        if sample_id in self.no_regions:
+            return None, []
+        index = int(sample_id[1:])
+        return [1.0, 2.0, 3.0], [(np.full((2, 2, 3), index), index, sample_id)]
+
+
+def sample_ids(num: int):
+    return ["s%03d" % i for i in range(num)]
+
+
+class DataLoaderTest(HappyTestCase):
+
+    def test_order(self):
+        """
+        Checks that the batches keep the order of the samples, despite workers finishing out of order.
+        """
+        ids = sample_ids(10)
+        loader = DataLoader(DummyImagingModel(delay=0.05), ids, 3, num_workers=4)
+        batches = list(loader)
+        self.assertEqual([3, 3, 3, 1], [len(x["sample_id"]) for x in batches])
+        self.assertEqual(ids, [y for x in batches for y in x["sample_id"]])
+        self.assertEqual(list(range(10)), [int(y) for x in batches for y in x["y_train"]])
+        for batch in batches:
+            self.assertIsInstance(batch["X_train"], np.ndarray)
+            self.assertEqual(np.float32, batch["X_train"].dtype)
+            self.assertEqual([1.0, 2.0, 3.0], batch["wavelengths"])
+            self.assertTrue(np.all(batch["X_train"][:, 0, 0, 0] == batch["y_train"]))
+
+    def test_shuffle(self):
+        """
+        Checks that the shuffled order is deterministic for a seed and differs between epochs.
+        """
+        ids = sample_ids(20)
+        loader = DataLoader(DummyImagingModel(), ids, 5, shuffle=True, seed=42)
+        order = [y for x in loader for y in x["sample_id"]]
+        self.assertEqual(loader.epoch_order(0), order)
+        self.assertEqual(sorted(ids), sorted(order))
+        self.assertNotEqual(ids, order)
+        self.assertNotEqual(loader.epoch_order(0), loader.epoch_order(1))
+        self.assertEqual(order, [y for x in DataLoader(DummyImagingModel(), ids, 5, shuffle=True, seed=42) for y in x["sample_id"]])
+
+    def test_prefetch(self):
+        """
+        Checks that the loader stops loading samples once the buffer of batches is full.
+        """
+        model = DummyImagingModel()
+        loader = DataLoader(model, sample_ids(100), 1, num_workers=1, prefetch=2)
+        with loader:
+            batches = iter(loader)
+            next(batches)
+            time.sleep(0.5)
+            self.assertLessEqual(loader._queue.qsize(), 2)
+            # consumed + buffered + waiting to get buffered + submitted to workers
+            self.assertLessEqual(model.num_loaded, 1 + 2 + 1 + 3)
+            self.assertEqual(100, len(list(batches)) + 1)
+
+    def test_close(self):
+        """
+        Checks that closing the loader stops the background loading, also when looping.
+        """
+        loader = DataLoader(DummyImagingModel(), sample_ids(3), 2, loop=True)
+        batches = iter(loader)
+        for i in range(5):
+            next(batches)
+        thread = loader._thread
+        self.assertTrue(thread.is_alive())
+        loader.close()
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(loader._thread)
+        loader.close()
+
+    def test_loop(self):
+        """
+        Checks that looping continues over the epochs and fails without any samples/regions.
+        """
+        ids = sample_ids(3)
+        with DataLoader(DummyImagingModel(), ids, 2, loop=True) as loader:
+            order = []
+            for batch in loader:
+                order.extend(batch["sample_id"])
+                if len(order) >= 8:
+                    break
+        self.assertEqual(ids + ids + ids[:2], order)
+        with self.assertRaises(Exception):
+            DataLoader(DummyImagingModel(), [], 2, loop=True)
+        with DataLoader(DummyImagingModel(no_regions=ids), ids, 2, loop=True) as loader:
+            with self.assertRaises(Exception):
+                list(loader)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(DataLoaderTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from happy.bench import write_synthetic_dataset
+from happy.models.dataset_cache import DatasetCache
+from happy.pixel_selectors import SimpleSelector
+from happytests.tests import HappyTestCase
+
+
+PREPROCESSORS = "wavelength-subset -f 0 -t 9 snv"
+
+
+class DatasetCacheTest(HappyTestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.ids = write_synthetic_dataset(self.data_dir.name, num_samples=2, height=8, width=6, bands=10)
+        self.cache = DatasetCache(self.cache_dir.name)
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def key(self, preprocessors=PREPROCESSORS, pixel_selector=None, seed=1) -> str:
+        if pixel_selector is None:
+            pixel_selector = SimpleSelector(16)
+        return self.cache.compute_key(self.data_dir.name, self.ids, preprocessors, pixel_selector=pixel_selector,
+                                      seed=seed, target="target", purpose="train")
+
+    def test_key(self):
+        """
+        Checks that the key is stable for the same inputs and changes with the files, pre-processing,
+        pixel selector and seed.
+        """
+        key = self.key()
+        self.assertEqual(key, self.key())
+        self.assertNotEqual(key, self.key(preprocessors="snv"))
+        self.assertNotEqual(key, self.key(pixel_selector=SimpleSelector(32)))
+        self.assertNotEqual(key, self.key(seed=2))
+        self.assertNotEqual(key, self.cache.compute_key(self.data_dir.name, self.ids, PREPROCESSORS, pixel_selector=SimpleSelector(16),
+                                                        seed=1, target="target", purpose="predict"))
+        # pre-processing file gets replaced with its content
+        path = os.path.join(self.cache_dir.name, "preprocessors.txt")
+        with open(path, "w") as fp:
+            fp.write(PREPROCESSORS)
+        self.assertEqual(key, self.key(preprocessors=path))
+
+        # modification time
+        global_file = os.path.join(self.data_dir.name, self.ids[0], "1", self.ids[0] + "_global.json")
+        stat = os.stat(global_file)
+        os.utime(global_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        key_mtime = self.key()
+        self.assertNotEqual(key, key_mtime)
+
+        # size
+        with open(global_file, "a") as fp:
+            fp.write(" ")
+        os.utime(global_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertNotEqual(key_mtime, self.key())
+
+    def test_round_trip(self):
+        """
+        Checks that a saved dataset gets loaded with memory-mapped arrays.
+        """
+        dataset = {
+            "X_train": np.arange(60, dtype=np.float32).reshape((6, 10)),
+            "y_train": [0.5, 1.5, 2.5, 3.5, 4.5, 5.5],
+            "sample_id": ["s000"] * 3 + ["s001"] * 3,
+            "wavelengths": np.arange(10.0),
+        }
+        key = self.key()
+        self.assertFalse(self.cache.has(key))
+        self.assertIsNone(self.cache.load(key))
+        self.assertTrue(self.cache.save(key, dataset))
+        self.assertTrue(self.cache.has(key))
+        self.assertGreater(self.cache.size(key), dataset["X_train"].nbytes)
+        loaded = self.cache.load(key)
+        self.assertIsInstance(loaded["X_train"], np.memmap)
+        self.assertIsInstance(loaded["y_train"], np.memmap)
+        self.assertTrue(np.array_equal(dataset["X_train"], loaded["X_train"]))
+        self.assertEqual(np.float32, loaded["X_train"].dtype)
+        self.assertEqual(dataset["y_train"], loaded["y_train"].tolist())
+        self.assertEqual(dataset["sample_id"], loaded["sample_id"])
+        self.assertEqual(dataset["wavelengths"].tolist(), loaded["wavelengths"])
+
+    def test_get(self):
+        """
+        Checks that the dataset only gets generated once and that ragged data does not get cached.
+        """
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return {"X_train": np.ones((2, 3)), "y_train": [1, 2]}
+
+        key = self.key()
+        first = self.cache.get(key, generate)
+        second = self.cache.get(key, generate)
+        self.assertEqual(1, len(calls))
+        self.assertTrue(np.array_equal(first["X_train"], second["X_train"]))
+
+        ragged = {"X_pred": [np.ones((2, 3)), np.ones((4, 3))], "y_pred": [None, None]}
+        self.assertFalse(self.cache.save(self.key(seed=3), ragged))
+        self.assertFalse(self.cache.has(self.key(seed=3)))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(DatasetCacheTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
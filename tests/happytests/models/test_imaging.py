@@ -0,0 +1,89 @@
+import gc
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from happy.models.imaging import ImagingModel
+from happytests.tests import HappyTestCase
+
+
+class DummyImagingModel(ImagingModel):
+    """
+    Generates the regions instead of loading data: the first sample has a single region,
+    the others several, forcing the stacked arrays to grow repeatedly.
+    """
+
+    def __init__(self, num_regions: int = 7):
+        super().__init__(None, "target")
+        self.num_regions = num_regions
+
+    def regions(self, sample_id):
+        index = int(sample_id[1:])
+        num = 1 if (index == 0) else self.num_regions
+        rnd = np.random.default_rng(index)
+        return [(rnd.uniform(size=(3, 2, 4)).astype(np.float32), index * 100 + i, sample_id) for i in range(num)]
+
+    def load_regions(self, sample_id, is_train=True, return_actuals=False):
+        return [1.0, 2.0, 3.0, 4.0], self.regions(sample_id)
+
+
+class ImagingModelTest(HappyTestCase):
+
+    def setUp(self):
+        self.memmap_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.memmap_dir.cleanup()
+
+    def check_dataset(self, model: DummyImagingModel, ids):
+        dataset = model.generate_training_dataset(ids)
+        regions = [x for sample_id in ids for x in model.regions(sample_id)]
+        self.assertTrue(np.array_equal(np.stack([x[0] for x in regions]), dataset["X_train"]))
+        self.assertEqual([x[1] for x in regions], dataset["y_train"].tolist())
+        self.assertEqual([x[2] for x in regions], dataset["sample_id"])
+        self.assertEqual([1.0, 2.0, 3.0, 4.0], dataset["wavelengths"])
+        return dataset
+
+    def test_in_memory(self):
+        """
+        Checks that the stacked arrays grow correctly (several doublings) when kept in memory.
+        """
+        model = DummyImagingModel()
+        dataset = self.check_dataset(model, ["s%d" % i for i in range(5)])
+        self.assertNotIsInstance(dataset["X_train"], np.memmap)
+        self.check_dataset(model, ["s1"])
+
+    def test_memmap(self):
+        """
+        Checks that the stacked arrays grow correctly (several doublings) when memory-mapped
+        and that the files get removed.
+        """
+        model = DummyImagingModel()
+        model.set_memmap_dir(self.memmap_dir.name)
+        dataset = self.check_dataset(model, ["s%d" % i for i in range(5)])
+        self.assertIsInstance(dataset["X_train"], np.memmap)
+        # only the final array is left
+        self.assertEqual([os.path.basename(dataset["X_train"].filename)], os.listdir(self.memmap_dir.name))
+        X = np.asarray(dataset["X_train"])
+        del dataset
+        gc.collect()
+        self.assertEqual(1, len(os.listdir(self.memmap_dir.name)))
+        self.assertEqual((29, 3, 2, 4), X.shape)
+        del X
+        gc.collect()
+        self.assertEqual([], os.listdir(self.memmap_dir.name))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(ImagingModelTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,167 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from sklearn.decomposition import PCA
+from sklearn.linear_model import LinearRegression
+
+from happy.data import HappyData
+from happy.models import model_bundle
+from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+from happy.pixel_selectors import SimpleSelector
+from happy.preprocessors import Preprocessor, MultiPreprocessor
+from happytests.tests import HappyTestCase
+
+
+class ModelBundleTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        state = np.random.RandomState(1)
+        self.cube = state.rand(6, 5, 10)
+        self.X = state.rand(20, 3)
+        self.y = state.rand(20)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _model(self, preprocessors: str) -> ScikitSpectroscopyModel:
+        """
+        Creates a trained model (the multi-preprocessor fits its preprocessors when applied).
+
+        :param preprocessors: the command-line of the preprocessors
+        :type preprocessors: str
+        :return: the model
+        :rtype: ScikitSpectroscopyModel
+        """
+        happy_preprocessor = MultiPreprocessor(preprocessor_list=Preprocessor.parse_preprocessors(preprocessors))
+        happy_data = HappyData("s", "r", self.cube, {}, {})
+        happy_preprocessor.fit(happy_data)
+        happy_preprocessor.apply(happy_data)
+        training_data = {"X_train": self.X, "y_train": self.y}
+        estimator = LinearRegression().fit(self.X, self.y)
+        return ScikitSpectroscopyModel("/some/data", "target", happy_preprocessor=happy_preprocessor,
+                                       additional_meta_data={"a": 1}, pixel_selector=SimpleSelector(16),
+                                       model=estimator, training_data=training_data)
+
+    def test_roundtrip(self):
+        """
+        Checks saving and loading a model bundle: manifest, estimator, preprocessor state and lazily loaded training data.
+        """
+        pca_file = os.path.join(self.tmp_dir.name, "pca.pkl")
+        with open(pca_file, "wb") as fp:
+            pickle.dump(PCA(n_components=3).fit(np.random.RandomState(2).rand(50, 10)), fp)
+        preprocessors = "snv pca -n 3 -l " + pca_file
+        model = self._model(preprocessors)
+        bundle_dir = os.path.join(self.tmp_dir.name, "bundle")
+        model.save_model(bundle_dir, preprocessors=preprocessors)
+
+        # manifest
+        with open(os.path.join(bundle_dir, model_bundle.FILE_MANIFEST), "r") as fp:
+            manifest = json.load(fp)
+        self.assertEqual(model_bundle.BUNDLE_VERSION, manifest["version"])
+        self.assertEqual("happy.models.scikit_spectroscopy.ScikitSpectroscopyModel", manifest["model_class"])
+        self.assertEqual("sklearn.linear_model._base.LinearRegression", manifest["estimator"]["class"])
+        self.assertEqual(preprocessors, manifest["preprocessors"])
+        self.assertIsNone(manifest["preprocessor_file"])
+        self.assertTrue(manifest["preprocessor_multi"])
+        self.assertTrue(len(manifest["preprocessor_state"]) > 0)
+        self.assertEqual(model_bundle.KEY_TRAINING_DATA, manifest["training_data"])
+
+        happy_data = HappyData("s", "r", self.cube, {}, {})
+        expected = model.happy_preprocessor.apply(happy_data)[0].data
+
+        # the state must not depend on the pickled PCA
+        os.remove(pca_file)
+        loaded = model_bundle.load_model(bundle_dir)
+        self.assertIsInstance(loaded, ScikitSpectroscopyModel)
+        self.assertEqual("/some/data", loaded.data_folder)
+        self.assertEqual("target", loaded.target)
+        self.assertEqual({"a": 1}, loaded.additional_meta_data)
+        self.assertEqual(16, loaded.pixel_selector.n)
+
+        # estimator
+        self.assertTrue(np.allclose(model.model.predict(self.X), loaded.model.predict(self.X)))
+
+        # preprocessor state
+        loaded.happy_preprocessor.fit(happy_data)
+        actual = loaded.happy_preprocessor.apply(happy_data)[0].data
+        self.assertTrue(np.allclose(expected, actual))
+
+        # training data only gets loaded on demand
+        self.assertIsNone(loaded.training_data)
+        training_data = loaded.get_training_data()
+        self.assertIsInstance(training_data["X_train"], np.memmap)
+        self.assertTrue(np.array_equal(self.X, training_data["X_train"]))
+        self.assertTrue(np.array_equal(self.y, training_data["y_train"]))
+
+    def test_pickled_preprocessor(self):
+        """
+        Checks that the preprocessor gets pickled if no command-line is supplied and that the
+        training data can be omitted.
+        """
+        model = self._model("snv")
+        bundle_dir = os.path.join(self.tmp_dir.name, "bundle")
+        model.save_model(bundle_dir, save_training_data=False)
+        manifest = model_bundle.read_manifest(bundle_dir)
+        self.assertEqual(model_bundle.FILE_PREPROCESSOR, manifest["preprocessor_file"])
+        self.assertIsNone(manifest["training_data"])
+        loaded = ScikitSpectroscopyModel.load_model(bundle_dir)
+        self.assertIsInstance(loaded.happy_preprocessor, MultiPreprocessor)
+        self.assertIsNone(loaded.get_training_data())
+
+    def test_legacy(self):
+        """
+        Checks that models saved as model.pkl/model_params.pkl still load.
+        """
+        model = self._model("snv")
+        legacy_dir = os.path.join(self.tmp_dir.name, "legacy")
+        os.makedirs(legacy_dir)
+        model_info = {
+            "data_folder": model.data_folder,
+            "target": model.target,
+            "happy_preprocessor": model.happy_preprocessor,
+            "additional_meta_data": model.additional_meta_data,
+            "pixel_selector": model.pixel_selector,
+            "model": model.model,
+            "training_data": model.training_data,
+        }
+        with open(os.path.join(legacy_dir, "model.pkl"), "wb") as fp:
+            pickle.dump(model_info, fp)
+        with open(os.path.join(legacy_dir, "model_params.pkl"), "wb") as fp:
+            pickle.dump(model.model.get_params(), fp)
+        self.assertFalse(model_bundle.is_bundle(legacy_dir))
+        loaded = ScikitSpectroscopyModel.load_model(legacy_dir)
+        self.assertEqual("target", loaded.target)
+        self.assertTrue(np.allclose(model.model.predict(self.X), loaded.model.predict(self.X)))
+        self.assertTrue(np.array_equal(self.X, loaded.get_training_data()["X_train"]))
+
+    def test_newer_version(self):
+        """
+        Checks that bundles with a newer version get rejected.
+        """
+        model_bundle.write_manifest(self.tmp_dir.name, {"model_class": "x"})
+        with open(os.path.join(self.tmp_dir.name, model_bundle.FILE_MANIFEST), "r") as fp:
+            manifest = json.load(fp)
+        manifest["version"] = model_bundle.BUNDLE_VERSION + 1
+        with open(os.path.join(self.tmp_dir.name, model_bundle.FILE_MANIFEST), "w") as fp:
+            json.dump(manifest, fp)
+        with self.assertRaises(Exception):
+            model_bundle.read_manifest(self.tmp_dir.name)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(ModelBundleTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,77 @@
+import copy
+import unittest
+
+import numpy as np
+
+from sklearn.linear_model import LinearRegression
+
+from happy.data import HappyData
+from happy.models.prediction_service import PredictionService
+from happy.models.scikit_spectroscopy import ScikitSpectroscopyModel
+from happy.preprocessors import Preprocessor, apply_preprocessor
+from happytests.tests import HappyTestCase
+
+
+BANDS = 10
+
+
+class PredictionServiceTest(HappyTestCase):
+
+    def new_model(self) -> ScikitSpectroscopyModel:
+        rnd = np.random.default_rng(1)
+        estimator = LinearRegression()
+        estimator.fit(rnd.normal(size=(50, BANDS)), rnd.normal(size=50))
+        # std-scaler gets fitted on each image, i.e., the result depends on the image alone
+        preprocessor = Preprocessor.parse_preprocessor("std-scaler")
+        return ScikitSpectroscopyModel("", "target", happy_preprocessor=preprocessor, model=estimator)
+
+    def new_arrays(self):
+        rnd = np.random.default_rng(2)
+        return [rnd.normal(loc=i * 10.0, scale=i + 1.0, size=(4 + i, 3, BANDS)) for i in range(6)]
+
+    def expected(self, model: ScikitSpectroscopyModel, data: np.ndarray) -> np.ndarray:
+        happy_data = HappyData("array", "", data, dict(), dict())
+        processed = apply_preprocessor(happy_data, copy.deepcopy(model.happy_preprocessor))[0]
+        return model.model.predict(processed.data.reshape(-1, BANDS)).reshape(data.shape[0], data.shape[1])
+
+    def test_concurrent(self):
+        model = self.new_model()
+        arrays = self.new_arrays()
+        service = PredictionService(model, max_wait=2.0, num_workers=4)
+        service.start()
+        try:
+            futures = [service.submit(HappyData("array", "", x, dict(), dict())) for x in arrays]
+            results = [x.result() for x in futures]
+        finally:
+            service.stop()
+        self.assertEqual(1, service.num_batches)
+        self.assertEqual(len(arrays), service.num_requests)
+        for data, result in zip(arrays, results):
+            self.assertEqual(data.shape[:2], result.shape)
+            self.assertTrue(np.allclose(self.expected(model, data), result))
+
+    def test_predict_array(self):
+        model = self.new_model()
+        data = self.new_arrays()[3]
+        service = PredictionService(model, max_wait=0.0)
+        service.start()
+        try:
+            result = service.predict_array(data)
+        finally:
+            service.stop()
+        self.assertTrue(np.allclose(self.expected(model, data), result))
+        with self.assertRaises(Exception):
+            service.predict_array(data)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(PredictionServiceTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from unittest.mock import patch
+from PIL import Image
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from happy.bench import write_synthetic_dataset
+from happy.console.builders.unsupervised_build import main
+from happy.models.unsupervised_pixel_clusterer import UnsupervisedPixelClusterer
+from happy.pixel_selectors import SimpleSelector
+from happy.splitters import DataSplits
+from happytests.tests import HappyTestCase
+
+
+HEIGHT = 12
+
+WIDTH = 10
+
+
+class RecordingMiniBatchKMeans(MiniBatchKMeans):
+    """
+    Records the number of pixels of each partial_fit call.
+    """
+
+    def partial_fit(self, X, y=None, sample_weight=None):
+        if not hasattr(self, "batch_sizes_"):
+            self.batch_sizes_ = []
+        self.batch_sizes_.append(len(X))
+        return super().partial_fit(X, y=y, sample_weight=sample_weight)
+
+
+class UnsupervisedPixelClustererTest(HappyTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.ids = write_synthetic_dataset(self.data_dir, num_samples=3, height=HEIGHT, width=WIDTH, bands=15)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def new_clusterer(self, estimator) -> UnsupervisedPixelClusterer:
+        return UnsupervisedPixelClusterer(self.data_dir, "target", clusterer=estimator, pixel_selector=SimpleSelector(20))
+
+    def test_streaming(self):
+        """
+        Checks that streaming feeds full batches across samples and generates labels of the right shape.
+        """
+        clusterer = self.new_clusterer(RecordingMiniBatchKMeans(n_clusters=3, random_state=0, n_init=1))
+        self.assertTrue(clusterer.supports_streaming())
+        clusterer.fit_streaming(self.ids, all_pixels=True, batch_size=50, num_passes=2)
+        num_pixels = len(self.ids) * HEIGHT * WIDTH
+        expected = ([50] * (num_pixels // 50) + [num_pixels % 50]) * 2
+        self.assertEqual(expected, clusterer.clusterer.batch_sizes_)
+        predictions, actuals = clusterer.predict_images(self.ids)
+        self.assertIsNone(actuals)
+        self.assertEqual(len(self.ids), len(predictions))
+        for prediction in predictions:
+            self.assertEqual((HEIGHT, WIDTH), prediction.shape)
+            self.assertTrue(np.all((prediction >= 0) & (prediction < 3)))
+
+    def test_streaming_unsupported(self):
+        """
+        Checks that streaming fails for clusterers without partial_fit.
+        """
+        clusterer = self.new_clusterer(KMeans(n_clusters=3, n_init=1))
+        self.assertFalse(clusterer.supports_streaming())
+        with self.assertRaises(Exception):
+            clusterer.fit_streaming(self.ids)
+
+    def test_chunked(self):
+        """
+        Checks that labelling the pixels in chunks gives the same result as labelling whole images.
+        """
+        clusterer = self.new_clusterer(KMeans(n_clusters=3, random_state=0, n_init=1))
+        clusterer.fit(self.ids)
+        expected, _ = clusterer.predict_images(self.ids)
+        for chunk_size in [1, 7, HEIGHT * WIDTH, 1000]:
+            actual, _ = clusterer.predict_images(self.ids, chunk_size=chunk_size)
+            for exp, act in zip(expected, actual):
+                self.assertTrue(np.array_equal(exp, act), msg="chunk size: %d" % chunk_size)
+
+    def test_build_streaming(self):
+        """
+        Checks that the build tool generates images of the right size in streaming mode.
+        """
+        splits_file = os.path.join(self.tmp_dir.name, "splits.json")
+        folds = [{"train": self.ids[:2], "validation": [], "test": self.ids[2:]}]
+        DataSplits(self.data_dir, [{"repeats": folds}], []).save(splits_file)
+        output_dir = os.path.join(self.tmp_dir.name, "output")
+        args = [
+            "happy-scikit-unsupervised-build",
+            "-d", self.data_dir,
+            "-P", "snv",
+            "-m", "minibatchkmeans",
+            "-p", '{"n_clusters": 3, "random_state": 0, "n_init": 1}',
+            "-s", splits_file,
+            "-o", output_dir,
+            "--streaming",
+            "--all_pixels",
+            "--batch_size", "64",
+            "--chunk_size", "25",
+        ]
+        with patch.object(sys, "argv", args):
+            main()
+        self.assertEqual(["false_color_0.png", "prediction_0.png"], sorted(os.listdir(output_dir)))
+        with Image.open(os.path.join(output_dir, "prediction_0.png")) as img:
+            self.assertEqual((WIDTH, HEIGHT), img.size)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(UnsupervisedPixelClustererTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -1,6 +1,9 @@
 import abc
-from typing import List
+import os
 
+from typing import List, Optional, Tuple
+
+from happy.base.precision import COMPUTE_DTYPES
 from happy.data import HappyData
 from happy.preprocessors import Preprocessor
 from happytests.tests import HappyDataTestCase
@@ -36,17 +39,22 @@ class PreprocessorTestCase(HappyDataTestCase, abc.ABC):
         """
         return repr(item.data.shape) + "\n\n" + repr(item.data)
 
-    def test_regression(self):
+    def _regression_output(self, compute_dtype: Optional[str] = None) -> Optional[str]:
         """
-        Performs the regression test.
+        Applies the regression setups to the regression data and returns the output.
+
+        :param compute_dtype: the dtype for the preprocessors to compute in, None for the default
+        :type compute_dtype: str
+        :return: the generated output, None if no setups
+        :rtype: str
         """
-        self._init_regression_dir()
         preprocessors = self._regression_setup()
         if len(preprocessors) == 0:
-            return
+            return None
         data_list = self._regression_data()
         processed_data = []
         for preprocessor in preprocessors:
+            preprocessor.compute_dtype = compute_dtype
             for data in data_list:
                 preprocessor.fit(data)
                 new_data = preprocessor.apply(data)
@@ -54,5 +62,41 @@ class PreprocessorTestCase(HappyDataTestCase, abc.ABC):
         regression_data = []
         for data_list in processed_data:
             for data in data_list:
+                if compute_dtype is not None:
+                    self.assertEqual(compute_dtype, data.data.dtype.name)
                 regression_data.append(self._regression_item_to_str(data))
-        self._compare_regression("\n------\n".join(regression_data))
+        return "\n------\n".join(regression_data)
+
+    def test_regression(self):
+        """
+        Performs the regression test. New regression results only get recorded from the official test data.
+        """
+        self._init_regression_dir()
+        output = self._regression_output()
+        if output is None:
+            return
+        if not os.path.exists(self._regression_file()) and not self.is_official_92AV3C():
+            self.skipTest("Not the official 92AV3C test data, cannot record regression results: %s" % self._regression_file())
+        self._compare_regression(output)
+
+    def _compute_dtype_tolerance(self) -> Tuple[float, float]:
+        """
+        Returns the tolerance to use when comparing the output computed in
+        float32/float64 with the regression results.
+
+        :return: the tuple of relative and absolute tolerance
+        :rtype: tuple
+        """
+        return 1e-3, 1e-4
+
+    def test_compute_dtype(self):
+        """
+        Compares the output computed in float32 and float64 with the regression results.
+        """
+        rtol, atol = self._compute_dtype_tolerance()
+        for compute_dtype in COMPUTE_DTYPES:
+            with self.subTest(compute_dtype=compute_dtype):
+                output = self._regression_output(compute_dtype=compute_dtype)
+                if output is None:
+                    return
+                self._compare_regression_numbers(output, rtol=rtol, atol=atol)
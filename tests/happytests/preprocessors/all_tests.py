@@ -1,14 +1,21 @@
 import unittest
 
+import happytests.preprocessors.test_bin_spatial
+import happytests.preprocessors.test_bin_spectral
 import happytests.preprocessors.test_crop
 import happytests.preprocessors.test_derivative
+import happytests.preprocessors.test_divide_annotation_avg
 import happytests.preprocessors.test_downsample
+import happytests.preprocessors.test_multi
 import happytests.preprocessors.test_pad
 import happytests.preprocessors.test_passthrough
 import happytests.preprocessors.test_pca
+import happytests.preprocessors.test_resample_wavelengths
 import happytests.preprocessors.test_sni
 import happytests.preprocessors.test_snv
 import happytests.preprocessors.test_std_scaler
+import happytests.preprocessors.test_subtract_annotation_avg
+import happytests.preprocessors.test_tiled
 import happytests.preprocessors.test_wavelength_subset
 
 
@@ -19,15 +26,22 @@ def suite():
     :rtype: unittest.TestSuite
     """
     result = unittest.TestSuite()
+    result.addTests(happytests.preprocessors.test_bin_spatial.suite())
+    result.addTests(happytests.preprocessors.test_bin_spectral.suite())
     result.addTests(happytests.preprocessors.test_crop.suite())
     result.addTests(happytests.preprocessors.test_derivative.suite())
+    result.addTests(happytests.preprocessors.test_divide_annotation_avg.suite())
     result.addTests(happytests.preprocessors.test_downsample.suite())
+    result.addTests(happytests.preprocessors.test_multi.suite())
     result.addTests(happytests.preprocessors.test_pad.suite())
     result.addTests(happytests.preprocessors.test_passthrough.suite())
     result.addTests(happytests.preprocessors.test_pca.suite())
+    result.addTests(happytests.preprocessors.test_resample_wavelengths.suite())
     result.addTests(happytests.preprocessors.test_sni.suite())
     result.addTests(happytests.preprocessors.test_snv.suite())
     result.addTests(happytests.preprocessors.test_std_scaler.suite())
+    result.addTests(happytests.preprocessors.test_subtract_annotation_avg.suite())
+    result.addTests(happytests.preprocessors.test_tiled.suite())
     result.addTests(happytests.preprocessors.test_wavelength_subset.suite())
     return result
 
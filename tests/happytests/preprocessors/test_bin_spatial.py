@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from typing import List
+
+from happy.data import HappyData
+from happy.preprocessors import Preprocessor, BinSpatialPreprocessor
+from happytests.preprocessors import PreprocessorTestCase
+
+
+class BinSpatialPreprocessorTest(PreprocessorTestCase):
+
+    def _regression_setup(self) -> List[Preprocessor]:
+        """
+        Returns the setups to use in the regression tests.
+
+        :return: the setups
+        :rtype: list
+        """
+        pp1 = BinSpatialPreprocessor()
+        pp2 = BinSpatialPreprocessor()
+        pp2.parse_args(["-x", "3", "-y", "5"])
+        return [pp1, pp2]
+
+    def test_block_means(self):
+        """
+        Checks the averaging of the blocks on a small cube, dropping the incomplete blocks.
+        """
+        data = np.arange(5 * 4 * 2, dtype=float).reshape((5, 4, 2))
+        layer = np.array([
+            [1, 1, 2, 3],
+            [1, 2, 3, 3],
+            [4, 5, 6, 6],
+            [5, 4, 7, 7],
+            [9, 9, 9, 9],
+        ])
+        happy_data = HappyData("s", "r", data, {}, {"mask": {"data": layer, "extra": "x"}}, wavenumbers=[1.0, 2.0])
+        pp = BinSpatialPreprocessor()
+        result = pp.apply(happy_data)[0]
+        self.assertEqual((2, 2, 2), result.data.shape)
+        for y in range(2):
+            for x in range(2):
+                expected = data[y * 2:y * 2 + 2, x * 2:x * 2 + 2].mean(axis=(0, 1))
+                self.assertTrue(np.allclose(expected, result.data[y, x]))
+        # most frequent value, smallest one in case of ties
+        self.assertEqual([[1, 3], [4, 6]], result.metadata_dict["mask"]["data"].tolist())
+        self.assertEqual("x", result.metadata_dict["mask"]["extra"])
+        self.assertEqual([1.0, 2.0], result.wavenumbers)
+
+    def test_too_large(self):
+        """
+        Checks that bin sizes larger than the data get rejected.
+        """
+        happy_data = HappyData("s", "r", np.zeros((2, 2, 3)), {}, {})
+        pp = BinSpatialPreprocessor()
+        pp.parse_args(["-x", "3"])
+        with self.assertRaises(Exception):
+            pp.apply(happy_data)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(BinSpatialPreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from typing import List
+
+from happy.data import HappyData
+from happy.preprocessors import Preprocessor, BinSpectralPreprocessor
+from happytests.preprocessors import PreprocessorTestCase
+
+
+class BinSpectralPreprocessorTest(PreprocessorTestCase):
+
+    def _regression_setup(self) -> List[Preprocessor]:
+        """
+        Returns the setups to use in the regression tests.
+
+        :return: the setups
+        :rtype: list
+        """
+        pp1 = BinSpectralPreprocessor()
+        pp2 = BinSpectralPreprocessor()
+        pp2.parse_args(["-b", "4"])
+        return [pp1, pp2]
+
+    def test_group_means(self):
+        """
+        Checks the averaging of the bands and the wavelengths, dropping the incomplete group.
+        """
+        data = np.arange(2 * 3 * 7, dtype=float).reshape((2, 3, 7))
+        wavenumbers = [400.0, 410.0, 420.0, 430.0, 440.0, 450.0, 460.0]
+        happy_data = HappyData("s", "r", data, {}, {}, wavenumbers=wavenumbers)
+        pp = BinSpectralPreprocessor()
+        pp.parse_args(["-b", "3"])
+        result = pp.apply(happy_data)[0]
+        self.assertEqual((2, 3, 2), result.data.shape)
+        self.assertTrue(np.allclose(data[:, :, 0:3].mean(axis=2), result.data[:, :, 0]))
+        self.assertTrue(np.allclose(data[:, :, 3:6].mean(axis=2), result.data[:, :, 1]))
+        self.assertEqual([410.0, 440.0], result.wavenumbers)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(BinSpectralPreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
@@ -1,8 +1,12 @@
 import unittest
 
-from typing import List
+import numpy as np
+
+from scipy.signal import savgol_filter
+from typing import List, Tuple
 
 from happy.preprocessors import Preprocessor, DerivativePreprocessor
+from happy.preprocessors._derivative import savgol_bands
 from happytests.preprocessors import PreprocessorTestCase
 
 
@@ -22,6 +26,61 @@ class DerivativePreprocessorTest(PreprocessorTestCase):
         pp3.parse_args(["-w", "5", "-d", "2", "-p", "3"])
         return [pp1, pp2, pp3]
 
+    def test_savgol_bands(self):
+        """
+        Compares the chunked correlation (including the edges) with savgol_filter, for integer and float data,
+        chunks not aligned with the number of pixels and windows that span most or all of the bands.
+        """
+        state = np.random.RandomState(1)
+        for dtype in [np.float64, np.float32, np.uint16]:
+            for num_bands in [7, 12, 40]:
+                data = (state.rand(5, 9, num_bands) * 1000).astype(dtype)
+                for window_length, polyorder, deriv in [(5, 2, 1), (5, 2, 0), (7, 3, 2), (3, 1, 1)]:
+                    with self.subTest(dtype=dtype.__name__, num_bands=num_bands, window_length=window_length, polyorder=polyorder, deriv=deriv):
+                        expected = savgol_filter(data.astype(np.float64), window_length, polyorder, deriv=deriv, axis=-1)
+                        actual = savgol_bands(data, window_length, polyorder, deriv, chunk_size=7)
+                        self.assertEqual(np.float32 if (dtype == np.float32) else np.float64, actual.dtype)
+                        tolerance = 1e-3 if (dtype == np.float32) else 1e-8
+                        self.assertTrue(np.allclose(expected, actual, rtol=tolerance, atol=tolerance))
+
+    def test_savgol_bands_view(self):
+        """
+        Compares the row blocks used for non-contiguous data (band subset) and writing into supplied
+        output arrays (contiguous and non-contiguous) with savgol_filter.
+        """
+        data = np.random.RandomState(2).rand(11, 6, 50)
+        view = data[:, :, 5:37]
+        self.assertFalse(view.flags.c_contiguous)
+        expected = savgol_filter(view, 7, 2, deriv=1, axis=-1)
+        for chunk_size in [1, 7, 1000]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertTrue(np.allclose(expected, savgol_bands(view, 7, 2, 1, chunk_size=chunk_size)))
+                out = np.zeros(view.shape)
+                self.assertIs(out, savgol_bands(view, 7, 2, 1, out=out, chunk_size=chunk_size))
+                self.assertTrue(np.allclose(expected, out))
+                out = np.zeros((11, 6, 40))[:, :, 8:]
+                savgol_bands(view, 7, 2, 1, out=out, chunk_size=chunk_size)
+                self.assertTrue(np.allclose(expected, out))
+        with self.assertRaises(Exception):
+            savgol_bands(view, 7, 2, 1, out=np.zeros((11, 6, 31)))
+
+    def test_savgol_bands_window_too_large(self):
+        """
+        Checks that windows larger than the number of bands get rejected.
+        """
+        with self.assertRaises(Exception):
+            savgol_bands(np.zeros((2, 2, 4)), 5, 2, 1)
+
+    def _compute_dtype_tolerance(self) -> Tuple[float, float]:
+        """
+        Returns the tolerance to use when comparing the output computed in
+        float32/float64 with the regression results (differences of neighbouring bands lose precision in float32).
+
+        :return: the tuple of relative and absolute tolerance
+        :rtype: tuple
+        """
+        return 1e-3, 1e-2
+
 
 def suite():
     """
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from happy.data import HappyData
+from happy.preprocessors import DivideAnnotationAveragePreprocessor
+from happytests.preprocessors import PreprocessorTestCase
+from happytests.preprocessors.test_subtract_annotation_avg import preprocessor
+
+
+class DivideAnnotationAveragePreprocessorTest(PreprocessorTestCase):
+
+    def test_bbox_and_polygon(self):
+        """
+        Checks the averages computed from the bbox and from the polygon.
+        """
+        data = np.random.RandomState(1).rand(30, 25, 4) + 1.0
+        happy_data = HappyData("s", "r", data, {}, {})
+        actual = preprocessor(DivideAnnotationAveragePreprocessor, False).apply(happy_data)[0].data
+        self.assertTrue(np.allclose(data / data[0:20, 0:20].mean(axis=(0, 1)), actual))
+        actual = preprocessor(DivideAnnotationAveragePreprocessor, True).apply(happy_data)[0].data
+        self.assertTrue(np.allclose(data / data[5:10, 5:15].mean(axis=(0, 1)), actual))
+
+    def test_same_id_different_data(self):
+        """
+        Checks that data with the same sample ID but different content does not reuse the cached average.
+        """
+        pp = preprocessor(DivideAnnotationAveragePreprocessor, True)
+        data1 = np.full((20, 20, 3), 2.0)
+        data2 = np.full((20, 20, 3), 4.0)
+        data2[5:10, 5:15] = 8.0
+        self.assertTrue(np.allclose(1.0, pp.apply(HappyData("s", "r", data1, {}, {}))[0].data))
+        self.assertTrue(np.allclose(data2 / 8.0, pp.apply(HappyData("s", "r", data2, {}, {}))[0].data))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(DivideAnnotationAveragePreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
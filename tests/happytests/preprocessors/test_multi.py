@@ -0,0 +1,109 @@
+import unittest
+
+import numpy as np
+
+from happy.preprocessors import Preprocessor, MultiPreprocessor, PingPongBuffers, SNVPreprocessor
+from happytests.preprocessors import PreprocessorTestCase
+
+
+CHAIN = "crop -x 10 -y 5 -W 100 -H 80 wavelength-subset -f 10 -t 49 snv derivative std-scaler snv"
+
+REGIONS_CHAIN = "extract-regions -r 're-grid -r 32 32 -T' snv derivative"
+
+
+class RecordingSNVPreprocessor(SNVPreprocessor):
+    """
+    Records the data it gets applied to.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.applied = []
+
+    def _do_apply(self, happy_data):
+        self.applied.append(happy_data.get_full_id())
+        return super()._do_apply(happy_data)
+
+
+class MultiPreprocessorTest(PreprocessorTestCase):
+
+    def test_fused_same_as_default(self):
+        """
+        Checks that the fused execution generates the same output as the default one.
+        """
+        for data in self._regression_data():
+            original = np.copy(data.data)
+            multi = MultiPreprocessor(preprocessor_list=Preprocessor.parse_preprocessors(CHAIN))
+            multi.fit(data)
+            expected = multi.apply(data)
+            fused = MultiPreprocessor()
+            fused.parse_args(["-p", CHAIN, "--fused"])
+            fused.fit(data)
+            actual = fused.apply(data)
+            self.assertEqual(1, len(actual))
+            self.assertEqual(expected[0].data.dtype, actual[0].data.dtype)
+            self.assertTrue(np.array_equal(expected[0].data, actual[0].data))
+            self.assertEqual(expected[0].wavenumbers, actual[0].wavenumbers)
+            self.assertIsNot(data.metadata_dict, actual[0].metadata_dict)
+            self.assertTrue(np.array_equal(original, data.data))
+
+    def test_iter_apply_same_as_apply(self):
+        """
+        Checks that the generated output is the same as the one of apply, for default and fused execution.
+        """
+        for data in self._regression_data():
+            for options in [[], ["--fused"]]:
+                multi = MultiPreprocessor()
+                multi.parse_args(["-p", REGIONS_CHAIN] + options)
+                multi.fit(data)
+                expected = multi.apply(data)
+                actual = list(multi.iter_apply(data))
+                self.assertGreater(len(expected), 1)
+                self.assertEqual(len(expected), len(actual))
+                for e, a in zip(expected, actual):
+                    self.assertEqual(e.get_full_id(), a.get_full_id())
+                    self.assertTrue(np.array_equal(e.data, a.data))
+
+    def test_iter_apply_depth_first(self):
+        """
+        Checks that each item gets passed through the remaining steps before the next one gets generated.
+        """
+        for data in self._regression_data():
+            recorder = RecordingSNVPreprocessor()
+            multi = MultiPreprocessor(preprocessor_list=Preprocessor.parse_preprocessors("extract-regions -r 're-grid -r 32 32 -T'") + [recorder])
+            multi.fit(data)
+            items = multi.iter_apply(data)
+            first = next(items)
+            self.assertEqual(1, len(recorder.applied))
+            self.assertEqual(first.get_full_id(), recorder.applied[0])
+            num_items = 1 + len(list(items))
+            self.assertEqual(num_items, len(recorder.applied))
+
+    def test_buffer_reuse(self):
+        """
+        Checks that the buffers only get allocated when the data grows.
+        """
+        buffers = PingPongBuffers()
+        current = np.zeros((10, 10, 20), dtype=np.float32)
+        for shape in [(10, 10, 20), (10, 10, 20), (10, 10, 20), (5, 10, 20), (5, 10, 10)]:
+            out = buffers.next(current, shape, np.float32)
+            self.assertEqual(shape, out.shape)
+            self.assertFalse(np.may_share_memory(out, current))
+            current = out
+        self.assertEqual(2, buffers.num_allocations)
+        # growing requires a new buffer
+        buffers.next(current, (10, 10, 40), np.float64)
+        self.assertEqual(3, buffers.num_allocations)
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(MultiPreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
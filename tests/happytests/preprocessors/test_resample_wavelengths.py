@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from typing import List
+
+from happy.data import HappyData
+from happy.preprocessors import Preprocessor, ResampleWavelengthsPreprocessor
+from happy.preprocessors._resample_wavelengths import resampling_matrix
+from happytests.preprocessors import PreprocessorTestCase
+
+
+class ResampleWavelengthsPreprocessorTest(PreprocessorTestCase):
+
+    def _regression_setup(self) -> List[Preprocessor]:
+        """
+        Returns the setups to use in the regression tests.
+
+        :return: the setups
+        :rtype: list
+        """
+        pp1 = ResampleWavelengthsPreprocessor()
+        pp2 = ResampleWavelengthsPreprocessor()
+        pp1.parse_args(["-f", "10", "-t", "200", "-s", "2.5"])
+        pp2.parse_args(["-f", "10", "-t", "200", "-s", "5", "-m", "gaussian"])
+        return [pp1, pp2]
+
+    def test_linear(self):
+        """
+        Checks the linear interpolation against np.interp, with ascending and descending source wavelengths
+        and target wavelengths outside the source range.
+        """
+        source = [400.0, 410.0, 425.0, 430.0, 450.0]
+        target = [390.0, 400.0, 405.0, 427.5, 449.0, 460.0]
+        data = np.random.default_rng(1).uniform(size=(3, 2, len(source)))
+        pp = ResampleWavelengthsPreprocessor()
+        pp.parse_args(["-w"] + [str(x) for x in target])
+        for wavelengths, values in [(source, data), (source[::-1], data[:, :, ::-1])]:
+            for dtype in [np.float64, np.float32, np.uint16]:
+                happy_data = HappyData("s", "r", (values * 1000).astype(dtype), {}, {}, wavenumbers=wavelengths)
+                result = pp.apply(happy_data)[0]
+                self.assertEqual((3, 2, len(target)), result.data.shape)
+                self.assertEqual(target, result.wavenumbers)
+                for y in range(3):
+                    for x in range(2):
+                        expected = np.interp(target, source, (data[y, x] * 1000).astype(dtype))
+                        self.assertTrue(np.allclose(expected, result.data[y, x], rtol=1e-5), msg=str(dtype))
+
+    def test_gaussian_weights(self):
+        """
+        Checks that the gaussian responses of all target wavelengths sum up to 1, also for targets
+        that are outside the range of the source wavelengths.
+        """
+        source = tuple(np.linspace(400, 1000, 61).tolist())
+        for target, fwhm in [((450.0, 500.0, 750.0), None), ((395.0, 700.0, 2000.0), 5.0)]:
+            for dtype in ["float64", "float32"]:
+                matrix = resampling_matrix(source, target, method="gaussian", fwhm=fwhm, dtype=dtype)
+                self.assertEqual(np.dtype(dtype), matrix.dtype)
+                self.assertEqual((len(source), len(target)), matrix.shape)
+                self.assertTrue(np.allclose(1.0, np.asarray(matrix.sum(axis=0)).ravel(), atol=1e-6))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(ResampleWavelengthsPreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
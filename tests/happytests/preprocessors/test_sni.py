@@ -1,6 +1,11 @@
+import os
+import tempfile
 import unittest
 
+import numpy as np
+
 from typing import List
+from unittest.mock import patch
 
 from happy.preprocessors import Preprocessor, SpectralNoiseInterpolator
 from happytests.preprocessors import PreprocessorTestCase
@@ -20,6 +25,75 @@ class SpectralNoiseInterpolatorTest(PreprocessorTestCase):
         pp2.parse_args(["-t", "0.9"])
         return [pp1, pp2]
 
+    def test_gradient_reused(self):
+        """
+        Checks that applying the preprocessor to the data it got fitted on computes the gradient only once,
+        with the same output as computing it again.
+        """
+        data = self._regression_data()[0]
+        data = data.copy(data=np.array(data.data[:30, :20]))
+        expected = SpectralNoiseInterpolator().apply(data)[0].data
+        pp = SpectralNoiseInterpolator()
+        with patch.object(pp, "calculate_gradient", wraps=pp.calculate_gradient) as gradient:
+            pp.fit(data)
+            actual = pp.apply(data)[0].data
+            self.assertEqual(1, gradient.call_count)
+            self.assertIsNone(pp._fit_gradient)
+            self.assertIsNone(pp.median_gradient)
+            # applying again
+            pp.apply(data)
+            self.assertEqual(2, gradient.call_count)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_apply_other_data(self):
+        """
+        Checks that data other than the one the preprocessor got fitted on uses its own median gradient.
+        """
+        data = self._regression_data()[0]
+        fit_data = data.copy(data=np.array(data.data[:30, :20]))
+        other = data.copy(data=np.array(data.data[30:40, 20:30]))
+        expected = SpectralNoiseInterpolator().apply(other)[0].data
+        pp = SpectralNoiseInterpolator()
+        pp.fit(fit_data)
+        actual = pp.apply(other)[0].data
+        self.assertIsNone(pp.median_gradient)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_fit_for_tiles(self):
+        """
+        Checks that tiles of the image use the median gradient of the whole image until end_tiles.
+        """
+        data = self._regression_data()[0]
+        data = data.copy(data=np.array(data.data[:30, :20]))
+        pp = SpectralNoiseInterpolator()
+        pp.fit_for_tiles(data)
+        median_gradient = pp.median_gradient
+        tile = data.copy(data=data.data[:10, :10])
+        gradient_data = pp.calculate_gradient(tile.data)
+        noisy = pp.identify_noisy_pixels(gradient_data, median_gradient=median_gradient)
+        expected = pp.interpolate_noisy_pixels(tile.data, noisy, gradient_data)
+        actual = pp.apply(tile)[0].data
+        self.assertTrue(np.array_equal(expected, actual))
+        self.assertIs(median_gradient, pp.median_gradient)
+        pp.end_tiles()
+        self.assertIsNone(pp.median_gradient)
+
+    def test_memmap_fit(self):
+        """
+        Checks that fitting on memory-mapped data (chunked median) gives the same median gradient.
+        """
+        data = self._regression_data()[0]
+        pp = SpectralNoiseInterpolator()
+        pp.fit(data)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            array = np.lib.format.open_memmap(os.path.join(tmp_dir, "data.npy"), mode="w+", dtype=data.data.dtype, shape=data.data.shape)
+            array[:] = data.data
+            pp_memmap = SpectralNoiseInterpolator()
+            pp_memmap.fit(data.copy(data=array))
+            self.assertIsNone(pp_memmap._fit_gradient)
+            self.assertTrue(np.allclose(pp.median_gradient, pp_memmap.median_gradient))
+            del array
+
 
 def suite():
     """
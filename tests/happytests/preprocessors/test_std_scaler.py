@@ -1,5 +1,7 @@
 import unittest
 
+import numpy as np
+
 from typing import List
 
 from happy.preprocessors import Preprocessor, StandardScalerPreprocessor
@@ -17,6 +19,61 @@ class StandardScalerPreprocessorTest(PreprocessorTestCase):
         """
         return [StandardScalerPreprocessor()]
 
+    def _expected(self, data: np.ndarray) -> np.ndarray:
+        """
+        Returns the data standardized with its own statistics.
+
+        :param data: the data to standardize
+        :type data: np.ndarray
+        :return: the standardized data
+        :rtype: np.ndarray
+        """
+        from sklearn.preprocessing import StandardScaler
+        return StandardScaler().fit_transform(data.reshape(-1, data.shape[-1])).reshape(data.shape)
+
+    def test_fit_apply(self):
+        """
+        Checks that applying the preprocessor to the data it got fitted on uses the fitted scaler once.
+        """
+        data = self._regression_data()[0]
+        pp = StandardScalerPreprocessor()
+        pp.fit(data)
+        actual = pp.apply(data)[0].data
+        self.assertIsNone(pp.scaler)
+        self.assertTrue(np.allclose(self._expected(data.data), actual))
+
+    def test_apply_other_data(self):
+        """
+        Checks that data other than the one the preprocessor got fitted on gets standardized with its own statistics.
+        """
+        data = self._regression_data()[0]
+        other = data.copy(data=np.array(data.data[:10, :10]))
+        for apply_into in [False, True]:
+            pp = StandardScalerPreprocessor()
+            pp.fit(data)
+            if apply_into:
+                actual = np.empty(other.data.shape, dtype=pp.result_dtype(other))
+                pp.apply_into(other, actual)
+            else:
+                actual = pp.apply(other)[0].data
+            self.assertIsNone(pp.scaler)
+            self.assertTrue(np.allclose(self._expected(other.data), actual))
+
+    def test_fit_for_tiles(self):
+        """
+        Checks that tiles of the image get standardized with the statistics of the whole image until end_tiles.
+        """
+        data = self._regression_data()[0]
+        expected = self._expected(data.data)
+        pp = StandardScalerPreprocessor()
+        pp.fit_for_tiles(data)
+        for y0, x0 in [(0, 0), (10, 20)]:
+            tile = data.copy(data=data.data[y0:y0 + 10, x0:x0 + 10])
+            actual = pp.apply(tile)[0].data
+            self.assertTrue(np.allclose(expected[y0:y0 + 10, x0:x0 + 10], actual))
+        pp.end_tiles()
+        self.assertIsNone(pp.scaler)
+
 
 def suite():
     """
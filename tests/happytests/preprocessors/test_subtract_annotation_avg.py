@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from opex import ObjectPredictions, ObjectPrediction, BBox, Polygon
+
+from happy.data import HappyData
+from happy.preprocessors import SubtractAnnotationAveragePreprocessor
+from happy.preprocessors._preprocessor import AVERAGE_CACHE_SIZE
+from happytests.preprocessors import PreprocessorTestCase
+
+
+def annotations() -> ObjectPredictions:
+    """
+    Returns an annotation with a bbox of 20x20 pixels and a rectangular polygon of 10x5 pixels inside it.
+
+    :return: the annotations
+    :rtype: ObjectPredictions
+    """
+    obj = ObjectPrediction(label="ref", bbox=BBox(left=0, top=0, right=19, bottom=19),
+                           polygon=Polygon(points=[[5, 5], [14, 5], [14, 9], [5, 9]]))
+    return ObjectPredictions(objects=[obj])
+
+
+def preprocessor(cls, use_polygon: bool):
+    """
+    Instantiates the annotation-based preprocessor using the "ref" label of the annotations.
+
+    :param cls: the preprocessor class
+    :param use_polygon: whether to use the polygon
+    :type use_polygon: bool
+    :return: the preprocessor
+    """
+    result = cls()
+    args = ["--label", "ref"]
+    if use_polygon:
+        args.append("--use_polygon")
+    result.parse_args(args)
+    result.annotations = annotations()
+    return result
+
+
+class SubtractAnnotationAveragePreprocessorTest(PreprocessorTestCase):
+
+    def test_bbox_and_polygon(self):
+        """
+        Checks the averages computed from the bbox and from the polygon.
+        """
+        data = np.random.RandomState(1).rand(30, 25, 4)
+        happy_data = HappyData("s", "r", data, {}, {})
+        actual = preprocessor(SubtractAnnotationAveragePreprocessor, False).apply(happy_data)[0].data
+        self.assertTrue(np.allclose(data - data[0:20, 0:20].mean(axis=(0, 1)), actual))
+        actual = preprocessor(SubtractAnnotationAveragePreprocessor, True).apply(happy_data)[0].data
+        self.assertTrue(np.allclose(data - data[5:10, 5:15].mean(axis=(0, 1)), actual))
+
+    def test_cache(self):
+        """
+        Checks that the cached averages are per data array (not per sample ID) and that the cache is bounded.
+        """
+        pp = preprocessor(SubtractAnnotationAveragePreprocessor, True)
+        state = np.random.RandomState(2)
+        # keep the arrays alive, otherwise their ids may get reused
+        arrays = []
+        for i in range(AVERAGE_CACHE_SIZE + 5):
+            data = state.rand(20, 20, 3)
+            arrays.append(data)
+            # same sample ID every time
+            actual = pp.apply(HappyData("s", "r", data, {}, {}))[0].data
+            self.assertTrue(np.allclose(data - data[5:10, 5:15].mean(axis=(0, 1)), actual))
+        self.assertEqual(AVERAGE_CACHE_SIZE, len(pp._average_cache))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(SubtractAnnotationAveragePreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
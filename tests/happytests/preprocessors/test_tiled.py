@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+
+from happy.preprocessors import Preprocessor, MultiPreprocessor, TiledPreprocessor
+from happytests.preprocessors import PreprocessorTestCase
+
+
+CHAIN = "snv sni derivative pca -n 5 std-scaler"
+
+
+class TiledPreprocessorTest(PreprocessorTestCase):
+
+    def test_same_as_multi(self):
+        """
+        Checks that the tiled processing generates the same output as processing the whole image.
+        """
+        for data in self._regression_data():
+            multi = MultiPreprocessor(preprocessor_list=Preprocessor.parse_preprocessors(CHAIN))
+            multi.fit(data)
+            expected = multi.apply(data)[0]
+            for tile_size, num_workers in [(16, 1), (50, 1), (50, 2)]:
+                tiled = TiledPreprocessor()
+                tiled.parse_args(["-p", CHAIN, "-t", str(tile_size), "-n", str(num_workers)])
+                tiled.fit(data)
+                actual = tiled.apply(data)
+                self.assertEqual(1, len(actual))
+                self.assertEqual(expected.data.shape, actual[0].data.shape)
+                self.assertTrue(np.allclose(expected.data, actual[0].data, atol=1e-4))
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(TiledPreprocessorTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())
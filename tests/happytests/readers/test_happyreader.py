@@ -1,3 +1,4 @@
+import os
 import unittest
 
 from typing import List, Tuple
@@ -26,6 +27,12 @@ class HappyReaderTest(HappyDataReaderTestCase):
         """
         return [(self._data_dir(), "92AV3C")]
 
+    def test_sample_files(self):
+        reader = HappyReader(base_dir=self._data_dir())
+        files = [os.path.relpath(x, self._data_dir()) for x in reader.get_sample_files("92AV3C")]
+        self.assertEqual([os.path.join("92AV3C", "1", x) for x in ["92AV3C.hdr", "92AV3C.img", "92AV3C_global.json"]], files)
+        self.assertEqual(files, [os.path.relpath(x, self._data_dir()) for x in reader.get_sample_files("92AV3C:1")])
+
 
 def suite():
     """
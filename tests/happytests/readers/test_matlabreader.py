@@ -1,3 +1,4 @@
+import os
 import unittest
 
 from typing import List, Tuple
@@ -26,6 +27,10 @@ class MatlabReaderTest(HappyDataReaderTestCase):
         """
         return [(self._data_dir(), "92AV3C.1")]
 
+    def test_sample_files(self):
+        reader = MatlabReader(base_dir=self._data_dir())
+        self.assertEqual([os.path.join(self._data_dir(), "92AV3C.1.mat")], reader.get_sample_files("92AV3C.1"))
+
 
 def suite():
     """
@@ -1,4 +1,4 @@
-from ._test_data import init_92AV3C
+from ._test_data import init_92AV3C, SHAPE_92AV3C
 from ._happy_testcase import HappyTestCase
 from ._happy_regression_testcase import HappyRegressionTestCase
 from ._happy_data_testcase import HappyDataTestCase
@@ -2,7 +2,7 @@ import abc
 
 from typing import List
 
-from ._test_data import init_92AV3C
+from ._test_data import init_92AV3C, SHAPE_92AV3C
 from ._happy_regression_testcase import HappyRegressionTestCase
 from happy.data import HappyData
 from happy.readers import HappyReader
@@ -21,6 +21,15 @@ class HappyDataTestCase(HappyRegressionTestCase, abc.ABC):
         reader = HappyReader(base_dir=self._data_dir())
         return reader.load_data("92AV3C")
 
+    def is_official_92AV3C(self) -> bool:
+        """
+        Checks whether the loaded 92AV3C dataset is the official test data (and not eg a local stand-in).
+
+        :return: True if the official dataset
+        :rtype: bool
+        """
+        return (len(self.data_92AV3C) == 1) and (self.data_92AV3C[0].data.shape == SHAPE_92AV3C)
+
     def setUp(self):
         super().setUp()
         self.data_92AV3C = self.load_92AV3C()
@@ -1,13 +1,20 @@
 import abc
 import os
+import re
 import difflib
 import inspect
 
+import numpy as np
+
 from difflib import SequenceMatcher
 
 from ._happy_testcase import HappyTestCase
 
 
+NUMBER = re.compile(r"(?<![\w.])[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|nan|inf)")
+""" for extracting the numbers from the regression results. """
+
+
 class HappyRegressionTestCase(HappyTestCase, abc.ABC):
 
     def _regression_dir(self) -> str:
@@ -85,3 +92,33 @@ class HappyRegressionTestCase(HappyTestCase, abc.ABC):
         # generate detailed diff
         diff = difflib.unified_diff(a=previous, b=current)
         self.fail("Regression test results differ:\n%s" % "\n".join(diff))
+
+    def _compare_regression_numbers(self, current: str, rtol: float = 1e-3, atol: float = 1e-4):
+        """
+        Compares the numbers in the current results from the regression test with the ones
+        stored on disk within the tolerance, with the text around the numbers (eg dtype info)
+        getting ignored. Skips the test if no results present yet.
+
+        :param current: the results to compare with
+        :type current: str
+        :param rtol: the relative tolerance
+        :type rtol: float
+        :param atol: the absolute tolerance
+        :type atol: float
+        """
+        reg_file = self._regression_file()
+        if not os.path.exists(reg_file):
+            self.skipTest("No regression results available yet: %s" % reg_file)
+
+        with open(reg_file, "r") as fp:
+            previous = fp.read()
+
+        previous = np.array([float(x) for x in NUMBER.findall(previous)])
+        current = np.array([float(x) for x in NUMBER.findall(current)])
+        self.assertEqual(len(previous), len(current), msg="Number of values in regression results differ")
+        diff = np.abs(previous - current) > (atol + rtol * np.abs(previous))
+        diff &= ~(np.isnan(previous) & np.isnan(current))
+        if np.any(diff):
+            index = np.flatnonzero(diff)
+            self.fail("Regression test results differ in %d value(s), first at #%d: %s != %s"
+                      % (len(index), index[0], str(previous[index[0]]), str(current[index[0]])))
@@ -9,6 +9,9 @@ from happy.writers import HappyWriter
 URL_92AV3C_lan = "https://github.com/wairas/happy-tools-testdata/raw/main/92AV3C/92AV3C.lan"
 URL_92AV3C_Matlab = "https://github.com/wairas/happy-tools-testdata/raw/main/92AV3C.matlab/92AV3C.1.mat"
 
+SHAPE_92AV3C = (145, 145, 220)
+""" the shape of the official 92AV3C dataset (height, width, bands). """
+
 
 def download_file(url: str, local_file: str):
     """
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from happy.bench import write_synthetic_dataset, LAYER_MASK, MASK_MAPPING
+from happy.data import MASK_MAP
+from happy.readers import HappyReader
+from happy.writers import HappyWriter
+from happytests.tests import HappyTestCase
+
+
+class HappyWriterTest(HappyTestCase):
+
+    def test_roundtrip(self):
+        """
+        Checks that data read by happy-reader (which adds the mask map) can be written and read again.
+        """
+        with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+            sample_id = write_synthetic_dataset(input_dir, num_samples=1, height=6, width=5, bands=4)[0]
+            happy_data = HappyReader(base_dir=input_dir).load_data(sample_id)[0]
+            self.assertIn(MASK_MAP, happy_data.metadata_dict)
+            HappyWriter(base_dir=output_dir).write_data(happy_data)
+            region_dir = os.path.join(output_dir, happy_data.sample_id, happy_data.region_id)
+            self.assertFalse(os.path.exists(os.path.join(region_dir, MASK_MAP + ".hdr")))
+            actual = HappyReader(base_dir=output_dir).load_data(sample_id)[0]
+            self.assertTrue(np.array_equal(happy_data.data, actual.data))
+            self.assertTrue(np.array_equal(happy_data.metadata_dict[LAYER_MASK]["data"], actual.metadata_dict[LAYER_MASK]["data"]))
+            self.assertEqual(MASK_MAPPING, actual.metadata_dict[MASK_MAP])
+
+
+def suite():
+    """
+    Returns the test suite.
+    :return: the test suite
+    :rtype: unittest.TestSuite
+    """
+    return unittest.TestLoader().loadTestsFromTestCase(HappyWriterTest)
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner().run(suite())